@@ -22,6 +22,7 @@ from .tools.plotting import *
 import colorsys as colors
 from matplotlib import cm
 from pycqed.analysis import composite_analysis as RA
+from pycqed.analysis.tools import transmon_spectrum as tspec
 
 # import qutip as qp
 # import qutip.metrics as qpmetrics
@@ -913,19 +914,25 @@ def get_mean_df(label, starting_timestamp, ending_timestamp,
 ######################################################################
 
 def get_folder(timestamp=None, older_than=None, label='',
-               suppress_printing=True, **kw):
+               suppress_printing=True, folder=None, **kw):
+    """
+    Returns the data folder of a measurement specified by its timestamp,
+    or by its label (and older_than). The search is done in folder,
+    the datadir if None.
+    """
+    datadir = folder
     if timestamp is not None:
-        folder = data_from_time(timestamp)
+        folder = data_from_time(timestamp, folder=datadir)
         if not suppress_printing:
             print('loaded file from folder "%s" using timestamp "%s"' % (
                 folder, timestamp))
     elif older_than is not None:
-        folder = latest_data(label, older_than=older_than)
+        folder = latest_data(label, older_than=older_than, folder=datadir)
         if not suppress_printing:
             print('loaded file from folder "%s"using older_than "%s"' % (
                 folder, older_than))
     else:
-        folder = latest_data(label)
+        folder = latest_data(label, folder=datadir)
         if not suppress_printing:
             print('loaded file from folder "%s" using label "%s"' % (
                 folder, label))
@@ -2083,34 +2090,25 @@ def calculate_transmon_transitions(EC, EJ, asym=0, reduced_flux=0,
                                    return_injs=False):
     """
     Calculates transmon energy levels from the full transmon qubit Hamiltonian.
+
+    reduced_flux (and EC, EJ, asym) can be arrays, in which case the
+    Hamiltonians of all points are diagonalized in a single call and the
+    transitions have shape (len(reduced_flux), no_transitions).
+    The spectra are cached, see tools.transmon_spectrum.
     """
     if dim is None:
         dim = no_transitions * 10
 
-    EJphi = EJ * np.sqrt(
-        asym ** 2 + (1 - asym ** 2) * np.cos(np.pi * reduced_flux) ** 2)
-    Ham = 4 * EC * np.diag(
-        np.arange(-dim - ng, dim - ng + 1) ** 2) - EJphi / 2 * \
-        (np.eye(2 * dim + 1, k=+1) + np.eye(2 * dim + 1, k=-1))
-
     if return_injs:
-        HamEigs, HamEigVs = np.linalg.eigh(Ham)
-        # HamEigs.sort()
-        transitions = HamEigs[1:] - HamEigs[:-1]
-        charge_number_operator = np.diag(np.arange(-dim - ng, dim - ng + 1))
-        injs = np.zeros([dim, dim])
-        for i in range(dim):
-            for j in range(dim):
-                vect_i = np.matrix(HamEigVs[:, i])
-                vect_j = np.matrix(HamEigVs[:, j])
-                injs[i, j] = vect_i * (charge_number_operator * vect_j.getH())
-        return transitions[:no_transitions], injs
-
+        energies, injs = tspec.transmon_eigensystem(
+            EC, EJ, asym=asym, reduced_flux=reduced_flux, dim=dim, ng=ng,
+            return_injs=True)
+        transitions = np.diff(energies, axis=-1)
+        return transitions[..., :no_transitions], injs
     else:
-        HamEigs = np.linalg.eigvalsh(Ham)
-        HamEigs.sort()
-        transitions = HamEigs[1:] - HamEigs[:-1]
-        return transitions[:no_transitions]
+        return tspec.transmon_transitions(
+            EC, EJ, asym=asym, reduced_flux=reduced_flux,
+            no_transitions=no_transitions, dim=dim, ng=ng)
 
 
 def calculate_transmon_and_resonator_transitions_old(EC, EJ, f_r, g_01,
@@ -2176,118 +2174,37 @@ def calculate_transmon_and_resonator_transitions(Ec, Ej, f_bus, gs, ng=0):
     which was assuming only one bus. That one is temporarily kept as
     'calculate_transmon_and_resonator_transitions_old'. It is verified to produce
     the same result to 6 decimal places.
+
+    Ej (and Ec) can be arrays of flux points, gs then is a list of arrays
+    (one per bus). All points are diagonalized in a single call and the
+    spectra are cached, see tools.transmon_spectrum.
     """
     if isinstance(f_bus, float) or isinstance(f_bus, int):
         f_bus = [f_bus]
     if isinstance(gs, float) or isinstance(gs, int):
         gs = [gs]
 
-    # max photons
-    max_ph = 2
-
-    # number of buses
+    # n_bus is the number of buses
     n_bus = len(f_bus)
 
-    # qubit operators
-    (f01, f12), injs = calculate_transmon_transitions(Ec, Ej, asym=0,
-                                                      reduced_flux=0,
-                                                      no_transitions=2,
-                                                      ng=ng, dim=10,
-                                                      return_injs=True)
-    H_q = qp.Qobj(np.diag((0, f01, f01+f12)))
-    H_q = qp.tensor(H_q, *[qp.qeye(max_ph+1)]*n_bus)
-    a_q = qp.Qobj(np.diag((1, np.abs(injs[2, 1]/injs[1, 0])), k=1))
-    a_q = qp.tensor(a_q, *[qp.qeye(max_ph+1)]*n_bus)
-
-    # bus operators
-    n_r_list = []
-    a_r_list = []
-
-    a_r_generating_list = [qp.destroy(
-        max_ph+1)] + [qp.qeye(max_ph+1)]*(n_bus-1)
-    for fb, g in zip(f_bus, gs):
-        a_r = qp.tensor(qp.qeye(3), *a_r_generating_list)
-        a_r_list.append(a_r)
-        n_r_list.append(a_r.dag() * a_r)
-        a_r_generating_list = a_r_generating_list[-1:]+a_r_generating_list[:-1]
-
-    # full hamiltonian
-    H = deepcopy(H_q)
-    for fb, g, a_r, n_r in zip(f_bus, gs, a_r_list, n_r_list):
-        H += fb*n_r
-        H += g*(a_q*a_r.dag() + a_q.dag()*a_r)
-
-    # eigenenergies and eigenstates
-    ees, ess = H.eigenstates()
-
-    # define bare qubit states
-    qubit_g = qp.tensor(qp.fock(3, 0), *[qp.fock(max_ph+1, 0)]*n_bus)
-    qubit_e = qp.tensor(qp.fock(3, 1), *[qp.fock(max_ph+1, 0)]*n_bus)
-    qubit_f = qp.tensor(qp.fock(3, 2), *[qp.fock(max_ph+1, 0)]*n_bus)
-
-    # define bare bus states
-    bus_e_list = []
-    bus_e_qubit_e_list = []
-    bus_e_generating_list = [
-        qp.fock(max_ph+1, 1)] + [qp.fock(max_ph+1, 0)]*(n_bus-1)
-    for fb, g in zip(f_bus, gs):
-        bus_e = qp.tensor(qp.fock(3, 0), *bus_e_generating_list)
-        bus_e_list.append(bus_e)
-        bus_e_qubit_e = qp.tensor(qp.fock(3, 1), *bus_e_generating_list)
-        bus_e_qubit_e_list.append(bus_e_qubit_e)
-        bus_e_generating_list = bus_e_generating_list[-1:] + \
-            bus_e_generating_list[:-1]
-
-    # find states with the largest overlap to specific state
-    def largest_overlap_index(state, ess, ees):
-        max_fid = 0
-        best_index = 0
-        for i, es in enumerate(ess):
-            fid = qpmetrics.fidelity(state, es)**2
-            if fid > max_fid:
-                max_fid = fid
-                best_index = i
-            if max_fid > 0.5:
-                break
-        return i, max_fid, ees[i]
-
-    # find states with the largest overlap to specific state
-    def largest_overlap_energy(state, ess, ees):
-        return largest_overlap_index(state, ess, ees)[2]
-
-    # ground state energy
-    E_g = largest_overlap_energy(qubit_g, ess, ees)
-    # excited state energy
-    E_e = largest_overlap_energy(qubit_e, ess, ees)
-    # second_excited state energy
-    E_f = largest_overlap_energy(qubit_f, ess, ees)
-
-    # transitions of dressed states
-    f01_dressed = E_e - E_g
-    f12_dressed = E_f - E_e
-
-    # bus transition with qubit in ground state
-    f_bus_transitions = []
-    # bus transition with qubit in excited state
-    f_bus_shifted_transitions = []
-    # qubit 01 transition with a photon in a bus
-    f01_dressed_shifted = []
-
-    # dressed bus transitions
-    for bus_qubit_g, bus_qubit_e in zip(bus_e_list, bus_e_qubit_e_list):
-        E_b_g = largest_overlap_energy(bus_qubit_g, ess, ees)
-        E_b_e = largest_overlap_energy(bus_qubit_e, ess, ees)
-
-        f_bus_transitions.append(E_b_g-E_g)
-        f_bus_shifted_transitions.append(E_b_e-E_e)
-        f01_dressed_shifted.append(E_b_e - E_b_g)
+    # the spectrum engine expects the buses on the last axis
+    f_bus = np.stack(np.broadcast_arrays(*f_bus), axis=-1)
+    gs = np.stack(np.broadcast_arrays(*gs), axis=-1)
+
+    f01_dressed, f12_dressed, f_bus_transitions, f01_dressed_shifted, \
+        f_bus_shifted_transitions = tspec.transmon_resonator_spectrum(
+            Ec, Ej, f_bus, gs, ng=ng, max_ph=2)
+    # one entry per bus
+    f_bus_transitions, f01_dressed_shifted, f_bus_shifted_transitions = [
+        [tr[()] for tr in np.moveaxis(trs, -1, 0)] for trs in
+        (f_bus_transitions, f01_dressed_shifted, f_bus_shifted_transitions)]
 
     if n_bus == 1:
         f_bus_transitions = f_bus_transitions[0]
         f_bus_shifted_transitions = f_bus_shifted_transitions[0]
         f01_dressed_shifted = f01_dressed_shifted[0]
 
-    return f01_dressed, f12_dressed, f_bus_transitions, f01_dressed_shifted, f_bus_shifted_transitions
+    return f01_dressed[()], f12_dressed[()], f_bus_transitions, f01_dressed_shifted, f_bus_shifted_transitions
 
 
 def fit_Ec_Ej_fbus_g(f01, f12, fbus, f01_shifted):
@@ -2820,38 +2737,21 @@ def fit_EC_EJ_g_f_res_ng(flux_01, f_01, flux_12, f_12, flux_r, f_r, ng=0,
     def g01(g_01_ss, EC, EJ, EJmax):
         return (EJ / EC) ** (1 / 4) / (EJmax / EC) ** (1 / 4) * g_01_ss
 
+    n_01, n_12 = len(flux_01), len(flux_12)
+    fluxes = np.concatenate([flux_01, flux_12, flux_r])
+
     def penaltyfn(params):
         EC, EJmax, f_r_bare, g_01_ss, asym = params
-        # calculate f01s
-        f01s = []
-        for fl in flux_01:
-            EJ = EJmax * np.sqrt(
-                asym ** 2 + (1 - asym ** 2) * np.cos(np.pi * fl) ** 2)
-            g_01 = g01(g_01_ss, EC, EJ, EJmax)
-            f01s.append(
-                calculate_transmon_and_resonator_transitions(EC, EJ, f_r_bare,
-                                                             g_01, ng=ng)[0])
-        f01s = np.array(f01s)
-        # calculate f12s
-        f12s = []
-        for fl in flux_12:
-            EJ = EJmax * np.sqrt(
-                asym ** 2 + (1 - asym ** 2) * np.cos(np.pi * fl) ** 2)
-            g_01 = g01(g_01_ss, EC, EJ, EJmax)
-            f12s.append(
-                calculate_transmon_and_resonator_transitions(EC, EJ, f_r_bare,
-                                                             g_01, ng=ng)[1])
-        f12s = np.array(f12s)
-        # calculate f_rs
-        f_rs = []
-        for fl in flux_r:
-            EJ = EJmax * np.sqrt(
-                asym ** 2 + (1 - asym ** 2) * np.cos(np.pi * fl) ** 2)
-            g_01 = g01(g_01_ss, EC, EJ, EJmax)
-            f_rs.append(
-                calculate_transmon_and_resonator_transitions(EC, EJ, f_r_bare,
-                                                             g_01, ng=ng)[2])
-        f_rs = np.array(f_rs)
+        # calculate the spectrum at all flux points at once
+        EJ = EJmax * np.sqrt(
+            asym ** 2 + (1 - asym ** 2) * np.cos(np.pi * fluxes) ** 2)
+        g_01 = g01(g_01_ss, EC, EJ, EJmax)
+        f01_calc, f12_calc, f_r_calc, _, _ = \
+            calculate_transmon_and_resonator_transitions(
+                EC, EJ, f_r_bare, [g_01], ng=ng)
+        f01s = f01_calc[:n_01]
+        f12s = f12_calc[n_01:n_01 + n_12]
+        f_rs = f_r_calc[n_01 + n_12:]
 
         penalty_01 = f_01 - f01s
         penalty_12 = f_12 - f12s
@@ -0,0 +1,480 @@
+"""
+Batched least-squares fitting of common models.
+
+Analyses that fit the same model to many traces (one per qubit, per flux
+point or per timestamp) spend most of their time in the set-up of the
+individual lmfit fits. This module fits a stack of traces at once:
+
+    1. the initial guesses are determined for all traces in a vectorized
+       way (following the guess functions in fitting_models),
+    2. a Levenberg-Marquardt solver with analytic Jacobians iterates on the
+       whole stack, every trace having its own damping parameter,
+    3. the results are returned as lmfit ModelResult objects such that the
+       saving and plotting of BaseDataAnalysis keep working.
+
+Supported are the model functions in batch_models, use batch_fit to fit a
+stack of traces or set fit_dict['batch_fit'] = True in a BaseDataAnalysis.
+"""
+import logging
+import numpy as np
+import lmfit
+from pycqed.analysis import fitting_models as fit_mods
+
+log = logging.getLogger(__name__)
+
+
+class BatchModel():
+    """
+    Describes a model function for batched fitting.
+
+    Args:
+        func (callable): the model function, vectorized over the parameters.
+        independent_var (str): name of the independent variable of func.
+        param_names (list): names of the parameters of func.
+        jacobian (callable): jacobian(x, **params) returns a list with the
+            derivatives of func with respect to each parameter.
+        guess (callable): guess(x, y) returns a dict {param: hints} with
+            hints a dict containing the (arrays of) 'value' and optionally
+            'vary', 'min' and 'max'.
+    """
+
+    def __init__(self, func, independent_var: str, param_names: list,
+                 jacobian, guess):
+        self.func = func
+        self.independent_var = independent_var
+        self.param_names = param_names
+        self.jacobian = jacobian
+        self.guess = guess
+
+    def eval(self, x, p):
+        """Evaluates func for parameter array p of shape (B, P)."""
+        # trial steps of the solver can overflow, these are rejected
+        with np.errstate(over='ignore', invalid='ignore'):
+            return self.func(x, **self._param_dict(p))
+
+    def jac(self, x, p):
+        """Jacobian of shape (B, N, P)."""
+        with np.errstate(over='ignore', invalid='ignore'):
+            derivs = self.jacobian(x, **self._param_dict(p))
+        return np.stack([np.broadcast_to(d, x.shape) for d in derivs],
+                        axis=-1)
+
+    def _param_dict(self, p):
+        return {name: p[:, j:j+1] for j, name in enumerate(self.param_names)}
+
+
+#####################################
+# Jacobians and vectorized guesses  #
+#####################################
+
+def _rows(y):
+    return np.arange(y.shape[0])
+
+
+def _log_t_over_tau(t, tau):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(t > 0, np.log(np.abs(t/tau)), 0)
+
+
+def _exp_decay_jacobian(t, tau, amplitude, offset, n):
+    x_n = np.abs(t/tau)**n
+    e = np.exp(-x_n)
+    return [amplitude*e*n*x_n/tau,
+            e,
+            np.ones_like(t),
+            -amplitude*e*x_n*_log_t_over_tau(t, tau)]
+
+
+def _exp_decay_guess(t, y):
+    """Vectorized version of fitting_models.exp_dec_guess."""
+    rows = _rows(y)
+    offs_guess = y[rows, np.argmax(t, axis=1)]
+    amp_guess = y[rows, np.argmin(t, axis=1)] - offs_guess
+    # guess tau by looking for value closest to 1/e
+    idx = np.argmin(np.abs((amp_guess*(1/np.e) + offs_guess)[:, None] - y),
+                    axis=1)
+    tau_guess = t[rows, idx]
+    tau_guess = np.where(tau_guess > 0, tau_guess, np.ptp(t, axis=1)/3)
+    return {'tau': {'value': tau_guess},
+            'amplitude': {'value': amp_guess},
+            'offset': {'value': offs_guess},
+            'n': {'value': np.ones(len(y)), 'vary': False}}
+
+
+def _fft_freq_phase_guess(t, y):
+    """Vectorized version of fitting_models.fft_freq_phase_guess."""
+    rows = _rows(y)
+    nr_points = y.shape[1]
+    w = np.fft.fft(y, axis=1)[:, :nr_points // 2]
+    w[:, 0] = 0  # Removes DC component from fourier transform
+    f = np.fft.fftfreq(nr_points)[:nr_points // 2] / \
+        (t[:, 1] - t[:, 0])[:, None]
+    freq_guess = np.abs(f[rows, np.argmax(np.abs(w), axis=1)])
+    ph_guess = 2*np.pi - 2*np.pi*t[rows, np.argmax(y, axis=1)]*freq_guess
+    return freq_guess, ph_guess
+
+
+def _cos_jacobian(t, amplitude, frequency, phase, offset):
+    arg = 2*np.pi*frequency*t + phase
+    sin = np.sin(arg)
+    return [np.cos(arg), -amplitude*sin*2*np.pi*t, -amplitude*sin,
+            np.ones_like(t)]
+
+
+def _cos_guess(t, y):
+    """Vectorized version of fitting_models.Cos_guess."""
+    freq_guess, ph_guess = _fft_freq_phase_guess(t, y)
+    return {'amplitude': {'value': np.ptp(y, axis=1)/2, 'min': 0},
+            'frequency': {'value': freq_guess, 'min': 0},
+            'phase': {'value': ph_guess},
+            'offset': {'value': np.mean(y, axis=1)}}
+
+
+def _exp_damp_osc_jacobian(t, tau, n, frequency, phase, amplitude,
+                           oscillation_offset, exponential_offset):
+    x_n = np.abs(t/tau)**n
+    e = np.exp(-x_n)
+    arg = 2*np.pi*frequency*t + phase
+    osc = np.cos(arg) + oscillation_offset
+    sin = np.sin(arg)
+    return [amplitude*e*osc*n*x_n/tau,
+            -amplitude*e*osc*x_n*_log_t_over_tau(t, tau),
+            -amplitude*e*sin*2*np.pi*t,
+            -amplitude*e*sin,
+            e*osc,
+            amplitude*e,
+            np.ones_like(t)]
+
+
+def _exp_damp_osc_guess(t, y):
+    """Vectorized version of fitting_models.exp_damp_osc_guess."""
+    freq_guess, ph_guess = _fft_freq_phase_guess(t, y)
+    return {'tau': {'value': 2/3*np.max(t, axis=1)},
+            'n': {'value': np.ones(len(y))},
+            'frequency': {'value': freq_guess},
+            'phase': {'value': ph_guess},
+            'amplitude': {'value': np.ptp(y, axis=1)/2},
+            'oscillation_offset': {'value': np.zeros(len(y))},
+            'exponential_offset': {'value': np.mean(y, axis=1)}}
+
+
+def _lorentz_jacobian(f, amplitude, center, sigma):
+    D = (f - center)**2 + sigma**2
+    return [sigma/(np.pi*D),
+            amplitude/np.pi*sigma*2*(f - center)/D**2,
+            amplitude/np.pi*(D - 2*sigma**2)/D**2]
+
+
+def _lorentz_guess(f, y):
+    """
+    The center is the point of maximum absolute value, the width is
+    estimated from the number of points above half maximum.
+    """
+    rows = _rows(y)
+    idx = np.argmax(np.abs(y), axis=1)
+    center_guess = f[rows, idx]
+    peak = y[rows, idx]
+    df = np.abs(np.mean(np.diff(f, axis=1), axis=1))
+    nr_above_half_max = np.sum(np.abs(y) >= np.abs(peak)[:, None]/2, axis=1)
+    sigma_guess = np.maximum(nr_above_half_max*df/2, df)
+    return {'amplitude': {'value': peak*np.pi*sigma_guess},
+            'center': {'value': center_guess},
+            'sigma': {'value': sigma_guess, 'min': 0}}
+
+
+def _rb_jacobian(numCliff, Amplitude, p, offset):
+    return [p**numCliff,
+            Amplitude*numCliff*p**(numCliff-1),
+            np.ones_like(numCliff)]
+
+
+def _rb_guess(numCliff, y):
+    """
+    The offset and amplitude are estimated from the first and last point,
+    p from a linear fit of the logarithm of the normalized decay.
+    """
+    rows = _rows(y)
+    offset_guess = y[rows, np.argmax(numCliff, axis=1)]
+    amp_guess = y[rows, np.argmin(numCliff, axis=1)] - offset_guess
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.clip((y - offset_guess[:, None])/amp_guess[:, None],
+                        1e-3, 1)
+        log_p = np.sum(np.log(ratio)*numCliff, axis=1) / \
+            np.sum(numCliff**2, axis=1)
+    p_guess = np.clip(np.nan_to_num(np.exp(log_p), nan=0.99), 0.01, 0.999)
+    return {'Amplitude': {'value': amp_guess},
+            'p': {'value': p_guess},
+            'offset': {'value': offset_guess}}
+
+
+batch_models = {
+    fit_mods.ExpDecayFunc: BatchModel(
+        fit_mods.ExpDecayFunc, 't', ['tau', 'amplitude', 'offset', 'n'],
+        _exp_decay_jacobian, _exp_decay_guess),
+    fit_mods.CosFunc: BatchModel(
+        fit_mods.CosFunc, 't', ['amplitude', 'frequency', 'phase', 'offset'],
+        _cos_jacobian, _cos_guess),
+    fit_mods.ExpDampOscFunc: BatchModel(
+        fit_mods.ExpDampOscFunc, 't',
+        ['tau', 'n', 'frequency', 'phase', 'amplitude',
+         'oscillation_offset', 'exponential_offset'],
+        _exp_damp_osc_jacobian, _exp_damp_osc_guess),
+    fit_mods.LorentzFunc: BatchModel(
+        fit_mods.LorentzFunc, 'f', ['amplitude', 'center', 'sigma'],
+        _lorentz_jacobian, _lorentz_guess),
+    fit_mods.RandomizedBenchmarkingDecay: BatchModel(
+        fit_mods.RandomizedBenchmarkingDecay, 'numCliff',
+        ['Amplitude', 'p', 'offset'],
+        _rb_jacobian, _rb_guess),
+}
+
+
+def is_batch_fittable(func) -> bool:
+    """True if func is supported by batch_fit."""
+    return func in batch_models
+
+
+############################
+# Levenberg-Marquardt      #
+############################
+
+def levenberg_marquardt(batch_model, x, y, p0, vary, lower, upper,
+                        max_nfev: int = 200, ftol: float = 1e-10,
+                        xtol: float = 1e-10):
+    """
+    Minimizes the sum of squared residuals of every trace in a stack.
+
+    Args:
+        batch_model (BatchModel): the model.
+        x, y (array): shape (B, N).
+        p0, lower, upper (array): initial values and bounds of shape (B, P).
+        vary (array of bool): shape (B, P), False for fixed parameters.
+
+    Returns:
+        p (array): optimal parameters of shape (B, P)
+        covar (array): shape (B, P, P), zero for fixed parameters.
+        chisqr (array): sum of squared residuals of shape (B,)
+        nfev (array): number of function evaluations of shape (B,)
+        success (array of bool): shape (B,)
+    """
+    nr_traces, nr_pars = p0.shape
+    p = np.clip(p0, lower, upper)
+    fixed_diag = np.eye(nr_pars)[None] * (~vary)[:, :, None]
+
+    r = y - batch_model.eval(x, p)
+    cost = np.sum(r**2, axis=1)
+    lam = np.full(nr_traces, 1e-3)
+    nfev = np.ones(nr_traces, dtype=int)
+    active = np.isfinite(cost)
+    success = np.zeros(nr_traces, dtype=bool)
+
+    for it in range(max_nfev):
+        if not np.any(active):
+            break
+        J = batch_model.jac(x[active], p[active]) * vary[active][:, None, :]
+        # matmul is much faster than the equivalent einsum
+        Jt = J.transpose(0, 2, 1)
+        JtJ = Jt @ J
+        g = (Jt @ r[active][:, :, None])[:, :, 0]
+        diag = np.einsum('bpp->bp', JtJ)
+        # Marquardt scaling, fixed parameters get a unit diagonal such that
+        # the system stays solvable
+        A = JtJ + lam[active][:, None, None]*np.einsum(
+            'bp,pq->bpq', np.maximum(diag, 1e-30), np.eye(nr_pars)) + \
+            fixed_diag[active]
+        try:
+            delta = np.linalg.solve(A, g[:, :, None])[:, :, 0]
+        except np.linalg.LinAlgError:
+            delta = np.einsum('bpq,bq->bp', np.linalg.pinv(A), g)
+
+        p_new = np.clip(p[active] + delta, lower[active], upper[active])
+        r_new = y[active] - batch_model.eval(x[active], p_new)
+        with np.errstate(over='ignore', invalid='ignore'):
+            cost_new = np.sum(r_new**2, axis=1)
+        nfev[active] += 1
+
+        better = cost_new < cost[active]
+        idx = np.where(active)[0]
+        step = np.abs(p_new - p[active])
+        small_step = np.all(step <= xtol*(np.abs(p[active]) + xtol), axis=1)
+        small_gain = (cost[active] - cost_new) <= ftol*cost[active]
+
+        upd = idx[better]
+        p[upd] = p_new[better]
+        r[upd] = r_new[better]
+        cost[upd] = cost_new[better]
+        lam[upd] = np.maximum(lam[upd]/10, 1e-12)
+        lam[idx[~better]] *= 10
+
+        converged = (better & (small_step | small_gain)) | \
+            (~better & small_step) | (cost_new == 0)
+        stuck = lam[idx] > 1e16
+        success[idx[converged]] = True
+        active[idx[converged | stuck]] = False
+
+    # covariance from the final Jacobian, scaled by the reduced chi-square
+    # (equivalent to lmfit with scale_covar=True)
+    J = batch_model.jac(x, p) * vary[:, None, :]
+    JtJ = J.transpose(0, 2, 1) @ J + fixed_diag
+    covar = np.linalg.pinv(JtJ) * vary[:, :, None] * vary[:, None, :]
+    nfree = np.maximum(x.shape[1] - np.sum(vary, axis=1), 1)
+    covar *= (cost/nfree)[:, None, None]
+    return p, covar, cost, nfev, success
+
+
+############################
+# Public interface         #
+############################
+
+def batch_fit(func, xvals, yvals, guess_dicts=None, model=None,
+              max_nfev: int = 200, param_hints=None, guess: bool = True):
+    """
+    Fits func to a stack of traces.
+
+    The initial parameters are determined as in the lmfit based fitting of
+    BaseDataAnalysis.run_fitting: the parameter hints of the model are
+    updated with the (vectorized) guess and then with the guess_dict.
+
+    Args:
+        func (callable): model function, one of batch_models.
+        xvals (array): independent variable of shape (N,) or (B, N).
+        yvals (array): data of shape (B, N).
+        guess_dicts (dict or list of dict): overrides of the guessed
+            parameters in the format of fit_dict['guess_dict'], either one
+            for all traces or one per trace.
+        model (lmfit.Model or list): model used for the returned results,
+            either one for all traces or one per trace, created from func
+            if not given.
+        max_nfev (int): maximum number of iterations.
+        param_hints (dict or list of dict): parameter hints in the format of
+            lmfit.Model.param_hints, either one for all traces or one per
+            trace. By default the param_hints of model.
+        guess (bool): if False the vectorized guess is not used and the
+            initial values are taken from param_hints and guess_dicts.
+
+    Returns:
+        list of lmfit.model.ModelResult, one per trace.
+    """
+    batch_model = batch_models[func]
+    names = batch_model.param_names
+    y = np.atleast_2d(np.asarray(yvals, dtype=float))
+    x = np.broadcast_to(np.asarray(xvals, dtype=float), y.shape)
+    nr_traces, nr_pars = len(y), len(names)
+    models = list(model) if isinstance(model, (list, tuple)) else \
+        [model]*nr_traces
+    if param_hints is None:
+        param_hints = [m.param_hints if m is not None else None
+                       for m in models]
+
+    # 1. initial parameters: hints, vectorized guess and guess_dict
+    p0 = np.zeros((nr_traces, nr_pars))
+    vary = np.ones((nr_traces, nr_pars), dtype=bool)
+    lower = np.full((nr_traces, nr_pars), -np.inf)
+    upper = np.full((nr_traces, nr_pars), np.inf)
+    attrs = {'value': p0, 'vary': vary, 'min': lower, 'max': upper}
+    _set_hints(attrs, names, param_hints, nr_traces)
+    if guess:
+        guesses = batch_model.guess(x, y)
+        for j, name in enumerate(names):
+            for attr, val in guesses.get(name, {}).items():
+                attrs[attr][:, j] = val
+    _set_hints(attrs, names, guess_dicts, nr_traces)
+
+    # 2. solve all traces at once
+    p, covar, chisqr, nfev, success = levenberg_marquardt(
+        batch_model, x, y, p0, vary, lower, upper, max_nfev=max_nfev)
+
+    # 3. convert to lmfit results
+    default_model = None
+    for i, m in enumerate(models):
+        if m is None:
+            if default_model is None:
+                default_model = lmfit.Model(func)
+            models[i] = default_model
+    best_fit = batch_model.eval(x, p)
+    init_fit = batch_model.eval(x, p0)
+    return [_make_model_result(
+        models[i], batch_model, x[i], y[i], p[i], p0[i], covar[i], vary[i],
+        lower[i], upper[i], chisqr[i], nfev[i], success[i],
+        best_fit[i], init_fit[i]) for i in range(nr_traces)]
+
+
+def _set_hints(attrs: dict, names: list, hint_dicts, nr_traces: int):
+    """
+    Sets the value, vary, min and max of the parameters from dicts
+    {param: {attr: value}}, either one for all traces or one per trace.
+    """
+    if hint_dicts is None:
+        return
+    if isinstance(hint_dicts, dict):
+        hint_dicts = [hint_dicts]*nr_traces
+    for i, hint_dict in enumerate(hint_dicts):
+        for name, hints in (hint_dict or {}).items():
+            if name not in names:
+                continue
+            for attr, val in hints.items():
+                if attr in attrs and val is not None:
+                    attrs[attr][i, names.index(name)] = val
+
+
+def supports_hints(hint_dict) -> bool:
+    """
+    False if a dict of parameter hints (or a guess_dict) contains
+    constraints that batch_fit does not support (expressions).
+    """
+    return not any(hints.get('expr', None)
+                   for hints in (hint_dict or {}).values())
+
+
+def _make_model_result(model, batch_model, x, y, values, init_values,
+                       covar, vary, lower, upper, chisqr, nfev, success,
+                       best_fit, init_fit):
+    names = batch_model.param_names
+    params = lmfit.Parameters()
+    init_params = lmfit.Parameters()
+    for j, name in enumerate(names):
+        params.add(name, value=values[j], vary=bool(vary[j]),
+                   min=lower[j], max=upper[j])
+        init_params.add(name, value=init_values[j], vary=bool(vary[j]),
+                        min=lower[j], max=upper[j])
+        params[name].init_value = init_values[j]
+        if vary[j]:
+            params[name].stderr = np.sqrt(np.abs(covar[j, j]))
+
+    var_names = [name for j, name in enumerate(names) if vary[j]]
+    var_idx = [j for j in range(len(names)) if vary[j]]
+    for j in var_idx:
+        params[names[j]].correl = {}
+        for k in var_idx:
+            if j != k and covar[j, j] > 0 and covar[k, k] > 0:
+                params[names[j]].correl[names[k]] = \
+                    covar[j, k]/np.sqrt(covar[j, j]*covar[k, k])
+
+    res = lmfit.model.ModelResult(model, params, data=y,
+                                  method='batched_leastsq')
+    res.init_params = init_params
+    res.init_values = {name: init_values[j] for j, name in enumerate(names)}
+    res.best_values = {name: values[j] for j, name in enumerate(names)}
+    res.userkws = {batch_model.independent_var: x}
+    res.init_fit = init_fit
+    res.best_fit = best_fit
+    res.residual = best_fit - y
+    res.var_names = var_names
+    res.covar = covar[np.ix_(var_idx, var_idx)]
+    res.ndata = len(y)
+    res.nvarys = len(var_names)
+    res.nfree = max(res.ndata - res.nvarys, 1)
+    res.chisqr = chisqr
+    res.redchi = chisqr/res.nfree
+    with np.errstate(divide='ignore'):
+        _neg2_log_likel = res.ndata*np.log(chisqr/res.ndata)
+    res.aic = _neg2_log_likel + 2*res.nvarys
+    res.bic = _neg2_log_likel + np.log(res.ndata)*res.nvarys
+    res.nfev = int(nfev)
+    res.success = bool(success)
+    res.errorbars = bool(success) and bool(np.all(np.isfinite(
+        np.diag(res.covar))))
+    res.message = ('Fit succeeded.' if success else
+                   'Fit did not converge within the maximum number of '
+                   'iterations.')
+    return res
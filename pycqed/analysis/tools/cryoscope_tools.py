@@ -12,6 +12,8 @@ import matplotlib.pyplot as plt
 import matplotlib.ticker
 from pycqed.analysis.tools.plotting import (set_xlabel, set_ylabel,
                                             flex_colormesh_plot_vs_xy)
+from pycqed.analysis.tools import flux_conversion as flux_conv
+from pycqed.analysis.tools import batch_fitting as bf
 
 import scipy.signal as ss
 import scipy.optimize as so
@@ -24,8 +26,12 @@ def normalize_sincos(
         window_size=None,
         do_envelope=True):
 
+    """
+    Normalizes complex sine/cosine data to oscillate around zero with unit
+    amplitude. Works on stacks of traces, along the last axis of data.
+    """
     if window_size is None:
-        window_size = len(data) // window_size_frac
+        window_size = np.shape(data)[-1] // window_size_frac
 
         # window size for savgol filter must be odd
         window_size -= (window_size + 1) % 2
@@ -56,18 +62,28 @@ def fft_based_freq_guess_complex(y):
         sampling rate), by selecting the peak in the fft.
     return guess (f, ph, off, amp) for the model
         y = amp*exp(2pi i f t + ph) + off.
-    """
-    fft = np.fft.fft(y)[1:len(y)]
-    freq_guess_idx = np.argmax(np.abs(fft))
-    if freq_guess_idx >= len(y) // 2:
-        freq_guess_idx -= len(y)
-    freq_guess = 1 / len(y) * (freq_guess_idx + 1)
-
-    phase_guess = np.angle(fft[freq_guess_idx]) + np.pi / 2
-    amp_guess = np.absolute(fft[freq_guess_idx]) / len(y)
-    offset_guess = np.mean(y)
 
-    return freq_guess, phase_guess, offset_guess, amp_guess
+    For a stack of traces the guesses are determined along the last axis of
+    y and arrays of guesses are returned.
+    """
+    y = np.asarray(y)
+    n = y.shape[-1]
+    fft = np.fft.fft(y, axis=-1)[..., 1:n]
+    freq_guess_idx = np.argmax(np.abs(fft), axis=-1)
+    freq_guess_idx = np.where(freq_guess_idx >= n // 2,
+                              freq_guess_idx - n, freq_guess_idx)
+    freq_guess = 1 / n * (freq_guess_idx + 1)
+
+    # negative indices wrap around the fft (without the DC component)
+    fft_peak = np.take_along_axis(
+        fft, (freq_guess_idx % (n - 1))[..., None], axis=-1)[..., 0]
+    phase_guess = np.angle(fft_peak) + np.pi / 2
+    amp_guess = np.absolute(fft_peak) / n
+    offset_guess = np.mean(y, axis=-1)
+
+    # [()] returns scalars instead of 0-d arrays for a single trace
+    return (freq_guess[()], phase_guess[()], offset_guess[()],
+            amp_guess[()])
 
 
 class CryoscopeAnalyzer:
@@ -304,6 +320,112 @@ class CryoscopeAnalyzer:
         set_ylabel(ax, 'Amplitude', 'V')
 
 
+class BatchCryoscopeAnalyzer:
+    """
+    Vectorized CryoscopeAnalyzer for a stack of cryoscope traces, e.g. all
+    amplitudes of all qubits of a cryoscope run.
+
+    The normalization, frequency guess, demodulation, phase unwrapping and
+    derivative filter are applied along the time axis of all traces at
+    once. The attributes have the same names as those of CryoscopeAnalyzer,
+    with the leading (trace) dimensions of complex_data.
+    """
+
+    def __init__(
+            self,
+            time,
+            complex_data,
+            norm_window_size=61,
+            demod_freq=None,
+            derivative_window_length=None,
+            derivative_order=2,
+            nyquist_order=0,
+            demod_smooth=None):
+        """
+        analyse a stack of cryoscope measurements.
+
+        time: array of times (lengths of Z pulse), shared by all traces
+        complex_data: array of shape (..., len(time)), e.g. (traces, time)
+            or (qubits, amplitudes, time)
+
+        norm_window_size: window size used for normalizing sine and cosine.
+            N.B. CryoscopeAnalyzer always uses a window size of 61.
+
+        demod_freq: frequency for demodulation, a scalar or an array with
+            the leading shape of complex_data. Is guessed per trace if None.
+
+        nyquist_order: a scalar or an array with the leading shape of
+            complex_data.
+
+        derivative_window_length, derivative_order, demod_smooth: see
+            CryoscopeAnalyzer.
+        """
+        self.time = np.asarray(time)
+        self.data = np.asarray(complex_data)
+        self.norm_data = normalize_sincos(self.data,
+                                          window_size=norm_window_size)
+        self.derivative_window_length = derivative_window_length
+        self.demod_smooth = demod_smooth
+        self.nyquist_order = nyquist_order
+
+        self.sampling_rate = 1 / (self.time[1] - self.time[0])
+
+        if self.derivative_window_length is None:
+            self.derivative_window_length = 7 / self.sampling_rate
+
+        self.derivative_window_size = max(
+            3, int(self.derivative_window_length * self.sampling_rate))
+        self.derivative_window_size += (self.derivative_window_size + 1) % 2
+
+        if demod_freq is None:
+            demod_freq = - \
+                fft_based_freq_guess_complex(self.norm_data)[
+                    0] * self.sampling_rate
+        self.demod_freq = np.array(
+            np.broadcast_to(demod_freq, self.data.shape[:-1]), dtype=float)
+
+        self.demod_data = np.exp(
+            2 * np.pi * 1j * self.time * self.demod_freq[..., None]) * \
+            self.norm_data
+
+        if self.demod_smooth:
+            n, o = self.demod_smooth
+            r, i = self.demod_data.real, self.demod_data.imag
+            r = ss.savgol_filter(r, n, o, 0, axis=-1)
+            i = ss.savgol_filter(i, n, o, 0, axis=-1)
+            self.demod_data = r + 1j * i
+
+        self.phase = np.unwrap(np.angle(self.demod_data), axis=-1)
+
+        self.detuning = ss.savgol_filter(
+            self.phase / (
+                2 * np.pi),
+            window_length=self.derivative_window_size,
+            polyorder=derivative_order,
+            deriv=1, axis=-1) * self.sampling_rate
+        self.real_detuning = self.get_real_detuning(self.nyquist_order)
+
+    def get_real_detuning(self, nyquist_order=None):
+        if nyquist_order is None:
+            nyquist_order = self.nyquist_order
+
+        real_detuning = self.detuning - self.demod_freq[..., None] + \
+            self.sampling_rate * np.asarray(nyquist_order)[..., None]
+        return real_detuning
+
+    def get_amplitudes(self):
+        """
+        Converts the real detuning to amplitude
+        """
+        real_detuning = self.get_real_detuning()
+        if hasattr(self, 'freq_to_amp'):
+
+            amplitudes = self.freq_to_amp(real_detuning)
+            return amplitudes
+        else:
+            raise NotImplementedError('Add a "freq_to_amp" method.')
+
+
 def sincos_model_real_imag(times, freq, phase):
     r, i = np.cos(2 *
                   np.pi *
@@ -317,6 +439,53 @@ def sincos_model_real_imag(times, freq, phase):
     return np.hstack((r, i))
 
 
+def _sincos_jacobian(times, freq, phase):
+    arg = 2 * np.pi * times * freq + phase
+    d_phase = np.hstack((-np.sin(arg), np.cos(arg)))
+    return [d_phase * np.hstack((2 * np.pi * times, 2 * np.pi * times)),
+            d_phase]
+
+
+class _SinCosBatchModel(bf.BatchModel):
+    # the real and imaginary parts are stacked, such that the jacobian is
+    # twice as long as the times
+    def jac(self, x, p):
+        return np.stack(self.jacobian(x, **self._param_dict(p)), axis=-1)
+
+
+_sincos_batch_model = _SinCosBatchModel(
+    sincos_model_real_imag, 'times', ['freq', 'phase'],
+    _sincos_jacobian, guess=None)
+
+
+def fit_sincos_batch(times, norm_data, freq_guess, phase_guess,
+                     max_nfev: int = 200):
+    """
+    Fits sincos_model_real_imag to a stack of normalized traces at once
+    (batched Levenberg-Marquardt, see batch_fitting).
+
+    Args:
+        times (array): shape (N, ).
+        norm_data (array): complex normalized data of shape (B, N).
+        freq_guess, phase_guess (array): shape (B, ).
+
+    Returns:
+        fits (array): fitted (freq, phase) of shape (B, 2), nan for the
+            traces for which the fit did not converge.
+    """
+    norm_data = np.asarray(norm_data)
+    x = np.broadcast_to(times, norm_data.shape)
+    y = np.hstack([norm_data.real, norm_data.imag])
+    p0 = np.stack([freq_guess, phase_guess], axis=1).astype(float)
+    fits, _, _, _, success = bf.levenberg_marquardt(
+        _sincos_batch_model, x, y, p0,
+        vary=np.ones(p0.shape, dtype=bool),
+        lower=np.full(p0.shape, -np.inf), upper=np.full(p0.shape, np.inf),
+        max_nfev=max_nfev)
+    fits[~success] = np.nan
+    return fits
+
+
 class DacArchAnalysis:
     """
     Given cryscope time series from a square region in time and amplitude,
@@ -334,7 +503,9 @@ class DacArchAnalysis:
             poly_fit_order=2,
             nyquist_calc='auto',
             invert_frequency_sign=False,
-            plot_fits=False):
+            plot_fits=False,
+            batch_fit=True,
+            fits=None):
         """
         Extract a dac arch from a set of cryoscope-style measurements.
 
@@ -350,6 +521,13 @@ class DacArchAnalysis:
             interchanged in measurement
 
         plot_fits: plots how the fit is going, for display.
+
+        batch_fit: if True the oscillations of all amplitudes are fitted at
+            once (fit_sincos_batch), otherwise one curve_fit per amplitude.
+
+        fits: optional array of shape (len(amps), 2) with the fitted
+            (freq, phase) of the oscillations, e.g. determined for several
+            qubits at once by batch_dac_arch_analysis.
         """
         self.data = data
         self.times = times
@@ -364,30 +542,35 @@ class DacArchAnalysis:
         self.excl_freqs = []
         self.exclusion_indices = exclusion_indices
 
-        self.norm_data = []
-
-        for d in self.data:
-            self.norm_data.append(normalize_sincos(d, window_size=11))
-
-        self.norm_data = np.array(self.norm_data)
-
-        for idx, nd in enumerate(self.norm_data):
-            guess_f, guess_ph, *_ = fft_based_freq_guess_complex(nd)
-            guess_f *= self.sampling_rate
-
-            nd_real_imag = np.hstack([nd.real, nd.imag])
-            try:
-                fit, err = so.curve_fit(sincos_model_real_imag,
-                                        self.times, nd_real_imag,
-                                        p0=[guess_f, guess_ph])
-            except Exception as e:
-                logging.warning(e)
+        # normalization and frequency guesses of all traces at once
+        self.norm_data = normalize_sincos(np.array(self.data), window_size=11)
+        guess_fs, guess_phs, *_ = fft_based_freq_guess_complex(
+            self.norm_data)
+        guess_fs = guess_fs * self.sampling_rate
+
+        if fits is not None:
+            fits = np.asarray(fits)
+        elif batch_fit:
+            fits = fit_sincos_batch(self.times, self.norm_data, guess_fs,
+                                    guess_phs)
+            for idx in np.where(np.isnan(fits[:, 0]))[0]:
                 logging.warning('Fitting failed for trace: {}, '
                                 'replacing with nan'.format(idx))
-                fit = [np.nan]
-                err = [np.nan]
-
-            if plot_fits:
+        else:
+            fits = np.full((len(self.norm_data), 2), np.nan)
+            for idx, nd in enumerate(self.norm_data):
+                nd_real_imag = np.hstack([nd.real, nd.imag])
+                try:
+                    fits[idx], err = so.curve_fit(
+                        sincos_model_real_imag, self.times, nd_real_imag,
+                        p0=[guess_fs[idx], guess_phs[idx]])
+                except Exception as e:
+                    logging.warning(e)
+                    logging.warning('Fitting failed for trace: {}, '
+                                    'replacing with nan'.format(idx))
+
+        if plot_fits:
+            for nd, fit in zip(self.norm_data, fits):
                 plt.figure()
                 plt.plot(self.times, nd.real, "-.b")
                 plt.plot(self.times, nd.imag, ".-r")
@@ -396,9 +579,7 @@ class DacArchAnalysis:
                 plt.plot(tt, sincos_model_real_imag(tt, *fit)[:len(tt)], "--b")
                 plt.plot(tt, sincos_model_real_imag(tt, *fit)[len(tt):], "--r")
 
-            self.freqs.append(fit[0])
-
-        self.freqs = np.array(self.freqs)
+        self.freqs = fits[:, 0]
 
         self.nyquist = self._calc_nyquist(nyquist_calc)
 
@@ -554,6 +735,34 @@ class DacArchAnalysis:
         ax.legend()
 
 
+def batch_dac_arch_analysis(times, amps, data, **kw) -> list:
+    """
+    Extracts the dac arches of several qubits, fitting the oscillations of
+    all qubits and amplitudes at once.
+
+    Args:
+        times (array): pulse lengths, shared by all qubits.
+        amps (array): pulse amplitudes of shape (nr_amps, ) or
+            (nr_qubits, nr_amps).
+        data (array): complex data of shape (nr_qubits, nr_amps, len(times)).
+        **kw: passed on to DacArchAnalysis.
+
+    Returns:
+        list of DacArchAnalysis, one per qubit.
+    """
+    data = np.asarray(data)
+    amps = np.broadcast_to(amps, data.shape[:2])
+    sampling_rate = 1 / (times[1] - times[0])
+
+    norm_data = normalize_sincos(data, window_size=11).reshape(
+        -1, data.shape[2])
+    guess_fs, guess_phs, *_ = fft_based_freq_guess_complex(norm_data)
+    fits = fit_sincos_batch(times, norm_data, guess_fs * sampling_rate,
+                            guess_phs).reshape(data.shape[0], -1, 2)
+    return [DacArchAnalysis(times, amps[i], data[i], fits=fits[i], **kw)
+            for i in range(len(data))]
+
+
 def freq_to_amp_root_parabola(freq, poly_coeffs, positive_branch=True):
     """
     Converts freq in Hz to amplitude in V.
@@ -567,20 +776,7 @@ def freq_to_amp_root_parabola(freq, poly_coeffs, positive_branch=True):
     N.B. this method assumes that the polycoeffs are with respect to the
         amplitude in units of V.
     """
-    # recursive allows dealing with an array of freqs
-    if isinstance(freq, (list, np.ndarray)):
-        return np.array([freq_to_amp_root_parabola(
-            freq=f, poly_coeffs=poly_coeffs,
-            positive_branch=positive_branch) for f in freq])
-
-    p = np.poly1d(poly_coeffs)
-    sols = (p-freq).roots
-
-    # sols returns 2 solutions (for a 2nd order polynomial)
-    if positive_branch:
-        sol = np.max(sols)
-    else:
-        sol = np.min(sols)
-
-    # imaginary part is ignored, instead sticking to closest real value
-    return np.real(sol)
+    # inverts an array of freqs at once, the imaginary part of the roots
+    # is ignored, instead sticking to closest real value
+    return flux_conv.poly_inverse(freq, poly_coeffs,
+                                  positive_branch=positive_branch)
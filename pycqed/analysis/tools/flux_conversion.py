@@ -0,0 +1,103 @@
+"""
+Vectorized conversions between flux pulse amplitudes (or DC currents) and
+qubit frequencies.
+
+The flux arc of a qubit is described by a polynomial
+
+    f(amp) = np.polyval(poly_coeffs, amp)
+
+(see e.g. HDAWG_Flux_LutMan.get_polycoeffs_state and the fl_dc_polycoeff
+of the CCL_Transmon). The inverse, amp(f), is the root of f(amp) - freq on
+the requested branch. Instead of solving the roots one frequency at a time,
+poly_inverse inverts whole arrays of frequencies at once:
+
+    - for polynomials up to second order (the flux arc model) in closed
+      form,
+    - for higher orders by diagonalizing the companion matrices of all
+      frequencies in a single call to np.linalg.eigvals.
+
+The results are identical to the largest (positive_branch) or smallest real
+part of np.roots, which was used previously.
+"""
+from functools import lru_cache
+import numpy as np
+
+
+def poly_inverse(values, poly_coeffs, positive_branch: bool=True):
+    """
+    Inverts y = np.polyval(poly_coeffs, x) for an array of values.
+
+    Args:
+        values (float or array): the values y to invert, e.g. frequencies.
+        poly_coeffs (array): polynomial coefficients, highest order first.
+        positive_branch (bool): if True returns the root with the largest
+            real part, else the one with the smallest real part.
+
+    Returns:
+        x (float or array): the real part of the root on the branch. Values
+            outside of the range of the polynomial map onto the real part of
+            the complex roots (the extremum for a parabola), nan is returned
+            for a constant polynomial.
+    """
+    coeffs = _trimmed_coeffs(tuple(np.asarray(poly_coeffs, dtype=float)))
+    y = np.asarray(values, dtype=float)
+    order = len(coeffs) - 1
+
+    if order < 1:
+        x = np.full(y.shape, np.nan)
+    elif order == 1:
+        x = (y - coeffs[1]) / coeffs[0]
+    elif order == 2:
+        x = _quadratic_inverse(y, coeffs, positive_branch)
+    else:
+        x = _companion_inverse(y, coeffs, positive_branch)
+
+    if np.ndim(x) == 0:
+        return float(x)
+    return x
+
+
+@lru_cache(maxsize=128)
+def _trimmed_coeffs(poly_coeffs: tuple):
+    # leading zeros do not contribute roots (same as np.roots)
+    coeffs = np.trim_zeros(np.array(poly_coeffs), 'f')
+    coeffs.flags.writeable = False
+    return coeffs
+
+
+def _quadratic_inverse(y, coeffs, positive_branch):
+    a, b = coeffs[0], coeffs[1]
+    c = coeffs[2] - y
+    discriminant = b**2 - 4*a*c
+    real = discriminant >= 0
+    sqrt_D = np.sqrt(np.where(real, discriminant, 0))
+    # numerically stable form of the quadratic formula
+    q = -(b + np.copysign(sqrt_D, b)) / 2
+    root_1 = q / a
+    with np.errstate(divide='ignore', invalid='ignore'):
+        root_2 = np.where(q != 0, c / q, root_1)
+    if positive_branch:
+        x = np.maximum(root_1, root_2)
+    else:
+        x = np.minimum(root_1, root_2)
+    # complex conjugate roots share the real part
+    return np.where(real, x, -b / (2*a))
+
+
+@lru_cache(maxsize=128)
+def _companion_template(coeffs: tuple):
+    order = len(coeffs) - 1
+    companion = np.diag(np.ones(order - 1), k=-1)
+    companion[0, :] = -np.array(coeffs[1:]) / coeffs[0]
+    companion.flags.writeable = False
+    return companion
+
+
+def _companion_inverse(y, coeffs, positive_branch):
+    companion = _companion_template(tuple(coeffs))
+    companions = np.tile(companion, y.shape + (1, 1))
+    companions[..., 0, -1] += y / coeffs[0]
+    roots = np.linalg.eigvals(companions)
+    if positive_branch:
+        return np.max(roots.real, axis=-1)
+    return np.min(roots.real, axis=-1)
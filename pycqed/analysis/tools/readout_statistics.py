@@ -0,0 +1,191 @@
+"""
+Statistics of single-shot readout.
+
+Contains the core used by the single-shot readout (SSRO) analyses to
+determine assignment fidelities, thresholds, the SNR and the I/Q rotation
+angle. All functions work on contiguous float arrays of shots and avoid
+numerical optimization:
+
+    - the raw assignment fidelity is evaluated at every possible threshold
+      using the exact empirical cumulative distribution functions, which
+      only requires sorting the shots (O(n log n)),
+    - the optimal threshold of a double-Gaussian model is located at the
+      intersection of the two Gaussians and is known in closed form.
+"""
+import numpy as np
+from scipy.special import erfc
+
+
+def as_shot_array(shots) -> np.ndarray:
+    """Returns the shots as a contiguous float array."""
+    return np.ascontiguousarray(shots, dtype=float)
+
+
+def empirical_cdf(shots, x=None, presorted: bool=False):
+    """
+    Exact empirical cumulative distribution function P(shot <= x).
+
+    Args:
+        shots (array): single-shot values.
+        x (array): points to evaluate the CDF at, defaults to the unique
+            values of the shots.
+        presorted (bool): set to True if the shots are already sorted.
+
+    Returns:
+        x (array)
+        cdf (array): fraction of shots smaller than or equal to x.
+    """
+    sorted_shots = as_shot_array(shots)
+    if not presorted:
+        sorted_shots = np.sort(sorted_shots)
+    if x is None:
+        x = _unique_sorted(sorted_shots)
+    cdf = np.searchsorted(sorted_shots, x, side='right')/len(sorted_shots)
+    return x, cdf
+
+
+def _unique_sorted(sorted_x):
+    if len(sorted_x) == 0:
+        return sorted_x
+    mask = np.empty(len(sorted_x), dtype=bool)
+    mask[0] = True
+    np.not_equal(sorted_x[1:], sorted_x[:-1], out=mask[1:])
+    return sorted_x[mask]
+
+
+def raw_assignment_fidelity(shots_0, shots_1):
+    """
+    Optimal average assignment fidelity and threshold from the shots.
+
+        F_assignment_raw = 1 - (P(1|0) + P(0|1))/2
+
+    is evaluated for every distinct shot value as threshold. If several
+    thresholds give the same fidelity, the center one is returned.
+
+    Args:
+        shots_0 (array): shots when preparing the ground state.
+        shots_1 (array): shots when preparing the excited state.
+
+    Returns:
+        F_assignment_raw (float)
+        threshold (float)
+    """
+    shots_0 = np.sort(as_shot_array(shots_0))
+    shots_1 = np.sort(as_shot_array(shots_1))
+    # merging the two sorted runs with a stable sort is linear, the labels
+    # of the merged shots give the cumulative counts of both states
+    merged = np.concatenate([shots_0, shots_1])
+    order = np.argsort(merged, kind='stable')
+    merged = merged[order]
+    counts_0 = np.cumsum(order < len(shots_0))
+    counts_1 = np.arange(1, len(merged) + 1) - counts_0
+    # the CDF at a value includes all shots equal to it
+    last = np.empty(len(merged), dtype=bool)
+    last[-1] = True
+    np.not_equal(merged[1:], merged[:-1], out=last[:-1])
+    all_x = merged[last]
+    cdf_0 = counts_0[last]/len(shots_0)
+    cdf_1 = counts_1[last]/len(shots_1)
+    F_vs_th = 1 - (1 - np.abs(cdf_0 - cdf_1))/2
+    opt_idxs = np.flatnonzero(F_vs_th == np.max(F_vs_th))
+    opt_idx = int(round(np.average(opt_idxs)))
+    return F_vs_th[opt_idx], all_x[opt_idx]
+
+
+def gaussian_intersections(mu_0, sigma_0, mu_1, sigma_1):
+    """
+    Points where two normalized Gaussians have equal probability density.
+
+    Solves (x-mu_0)^2/sigma_0^2 - (x-mu_1)^2/sigma_1^2 = 2 ln(sigma_1/sigma_0)
+    for x. Works on arrays of parameters (broadcasting).
+
+    Returns:
+        array of shape (2, ...) with the two solutions, nan where there is
+        no real solution. For equal sigmas the first solution is infinite
+        and the second one is the midpoint between the centers.
+    """
+    mu_0, sigma_0, mu_1, sigma_1 = np.broadcast_arrays(
+        *[np.asarray(v, dtype=float) for v in (mu_0, sigma_0, mu_1, sigma_1)])
+    a = 1/sigma_0**2 - 1/sigma_1**2
+    b = -2*(mu_0/sigma_0**2 - mu_1/sigma_1**2)
+    c = mu_0**2/sigma_0**2 - mu_1**2/sigma_1**2 + \
+        2*np.log(sigma_0/sigma_1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sqrt_D = np.sqrt(b**2 - 4*a*c)
+        # numerically stable form of the quadratic formula
+        q = -(b + np.copysign(sqrt_D, b))/2
+        return np.array([q/a, c/q])
+
+
+def double_gauss_threshold(mu_0, sigma_0, mu_1, sigma_1,
+                           spurious_0=0, spurious_1=0):
+    """
+    Optimal threshold and assignment fidelity of the double-Gaussian model
+    used to fit single-shot histograms (fitting_models.ro_CDF).
+
+    In this model the CDFs of both states are mixtures of the Gaussian CDFs
+    Phi_0 and Phi_1 with spurious fractions spurious_0 and spurious_1.
+    The difference of the CDFs, (1-spurious_0-spurious_1)(Phi_0 - Phi_1),
+    is extremal where the probability densities are equal, so the optimal
+    threshold is one of the intersections of the two Gaussians.
+
+    Args:
+        mu_0, sigma_0 (float or array): Gaussian of the ground state.
+        mu_1, sigma_1 (float or array): Gaussian of the excited state.
+        spurious_0 (float or array): residual excitation.
+        spurious_1 (float or array): relaxation during measurement.
+
+    Returns:
+        threshold (float or array)
+        fidelity (float or array): 1 - (P(1|0) + P(0|1))/2 at threshold.
+    """
+    # the sign of a fitted sigma is arbitrary
+    sigma_0, sigma_1 = np.abs(sigma_0), np.abs(sigma_1)
+    candidates = gaussian_intersections(mu_0, sigma_0, mu_1, sigma_1)
+    contrast = np.abs(
+        gaussian_cdf(candidates, mu_0, sigma_0) -
+        gaussian_cdf(candidates, mu_1, sigma_1))
+    contrast = np.where(np.isnan(contrast), -np.inf, contrast)
+    opt = np.argmax(contrast, axis=0)
+    threshold = np.take_along_axis(candidates, opt[None], axis=0)[0]
+    contrast = np.take_along_axis(contrast, opt[None], axis=0)[0]
+    fidelity = 1 - (1 - (1 - spurious_0 - spurious_1)*contrast)/2
+    if np.ndim(threshold) == 0:
+        return float(threshold), float(fidelity)
+    return threshold, fidelity
+
+
+def gaussian_cdf(x, mu, sigma):
+    """Normalized version of fitting_models.gaussianCDF."""
+    return 0.5*erfc((mu - x)/(np.sqrt(2)*sigma))
+
+
+def SNR(mu_0, sigma_0, mu_1, sigma_1):
+    """
+    Signal-to-noise ratio of two Gaussians, as defined in
+    fitting_models.ro_double_gauss_guess.
+    """
+    return np.abs(mu_0 - mu_1)*2/(sigma_0 + sigma_1)
+
+
+def iq_rotation_angle(shots_0, shots_1):
+    """
+    Angle of the line connecting the centers of the two states in the
+    I/Q plane.
+
+    The centers are the medians of the shots, which are insensitive to
+    residual excitation and relaxation events.
+
+    Args:
+        shots_0, shots_1 (array): shots of shape (2, nr_shots) with the
+            I and Q quadratures.
+
+    Returns:
+        angle (float): in radians.
+        centers (array): [[I_0, I_1], [Q_0, Q_1]].
+    """
+    center_0 = np.median(as_shot_array(shots_0), axis=1)
+    center_1 = np.median(as_shot_array(shots_1), axis=1)
+    d = center_1 - center_0
+    return np.arctan2(d[1], d[0]), np.array([center_0, center_1]).T
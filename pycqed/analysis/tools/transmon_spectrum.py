@@ -0,0 +1,333 @@
+"""
+Spectrum engine for transmons coupled to resonators (buses).
+
+The fits of transmon parameters (EC, EJ, g, bare bus frequencies) evaluate
+the spectrum at every flux point and for every evaluation of the optimizer.
+This module makes these evaluations cheap by
+
+    1. building the static operators of the charge-basis and the dressed
+       Hamiltonians only once per (dim, ng) and (nr of buses, max photons),
+    2. diagonalizing the Hamiltonians of all flux points in a single call
+       to np.linalg.eigh/eigvalsh on a stacked array,
+    3. caching the spectra in an LRU cache keyed on the parameters rounded
+       to CACHE_SIGNIFICANT_DIGITS significant digits. The spectra are
+       calculated from the rounded parameters, such that a cached result
+       does not depend on the order of the calls.
+
+The functions are used by the transmon functions in analysis_toolbox.
+"""
+from functools import lru_cache
+import numpy as np
+
+# 12 digits are well below the relative step of the finite differences
+# used by scipy.optimize.leastsq (~1e-8)
+CACHE_SIGNIFICANT_DIGITS = 12
+CACHE_SIZE = 512
+
+
+def round_significant(values, digits: int=CACHE_SIGNIFICANT_DIGITS):
+    """Rounds (an array of) values to a number of significant digits."""
+    values = np.asarray(values, dtype=float)
+    with np.errstate(divide='ignore'):
+        magnitude = np.floor(np.log10(np.abs(values)))
+    magnitude = np.where(np.isfinite(magnitude), magnitude, 0)
+    scale = 10.0**(digits - 1 - magnitude)
+    return np.round(values*scale)/scale
+
+
+def _cache_key(values):
+    values = round_significant(values)
+    return values.shape, tuple(values.ravel().tolist())
+
+
+def _from_cache_key(key):
+    shape, values = key
+    return np.array(values, dtype=float).reshape(shape)
+
+
+def clear_spectrum_cache():
+    """Clears the cached spectra."""
+    _transmon_eigensystem_cached.cache_clear()
+    _transmon_resonator_spectrum_cached.cache_clear()
+
+
+######################################################################
+#    Static operators
+######################################################################
+
+
+@lru_cache(maxsize=32)
+def charge_operators(dim: int, ng: float=0):
+    """
+    Static operators of the transmon Hamiltonian in the charge basis
+    n = -dim, ..., dim.
+
+    Returns:
+        charge (array): diagonal of the charge operator n - ng.
+        hopping (array): (2*dim+1, 2*dim+1) matrix |n><n+1| + |n+1><n|.
+    The arrays are read-only as they are shared between calls.
+    """
+    charge = np.arange(-dim - ng, dim - ng + 1)
+    hopping = np.eye(2 * dim + 1, k=+1) + np.eye(2 * dim + 1, k=-1)
+    for op in (charge, hopping):
+        op.flags.writeable = False
+    return charge, hopping
+
+
+@lru_cache(maxsize=32)
+def dressed_operators(nr_buses: int, max_ph: int=2):
+    """
+    Static operators of a three-level transmon coupled to nr_buses buses,
+    in the product basis |q, n_1, ..., n_nr_buses> with q = 0, 1, 2 and
+    n_k = 0, ..., max_ph (the qubit is the first tensor factor).
+
+    Returns a dict with
+        'P1', 'P2': projectors on the first and second excited qubit state.
+        'n_r': list with the photon number operators of the buses.
+        'X01', 'X12': lists with the exchange operators
+            |0><1| a_r^dag + h.c. and |1><2| a_r^dag + h.c. for every bus.
+    """
+    nr_ph = max_ph + 1
+    eye_bus = np.eye(nr_ph)
+    destroy = np.diag(np.sqrt(np.arange(1, nr_ph)), k=1)
+
+    def tensor(qubit_op, bus_ops):
+        op = qubit_op
+        for bus_op in bus_ops:
+            op = np.kron(op, bus_op)
+        return op
+
+    ops = {'P1': tensor(np.diag([0., 1, 0]), [eye_bus]*nr_buses),
+           'P2': tensor(np.diag([0., 0, 1]), [eye_bus]*nr_buses),
+           'n_r': [], 'X01': [], 'X12': []}
+    lower_01 = np.diag([1., 0], k=1)
+    lower_12 = np.diag([0., 1], k=1)
+    for k in range(nr_buses):
+        bus_ops = [eye_bus]*nr_buses
+        bus_ops[k] = destroy
+        a_r = tensor(np.eye(3), bus_ops)
+        ops['n_r'].append(a_r.T @ a_r)
+        for name, lower in (('X01', lower_01), ('X12', lower_12)):
+            a_q = tensor(lower, [eye_bus]*nr_buses)
+            ops[name].append(a_q @ a_r.T + a_r @ a_q.T)
+
+    for op in [ops['P1'], ops['P2']] + ops['n_r'] + ops['X01'] + ops['X12']:
+        op.flags.writeable = False
+    return ops
+
+
+def bare_state_index(qubit_level: int, photons, max_ph: int=2):
+    """
+    Index of the product state |qubit_level, n_1, ..., n_k> in the basis
+    of dressed_operators.
+    """
+    idx = qubit_level
+    for n in photons:
+        idx = idx * (max_ph + 1) + n
+    return idx
+
+
+######################################################################
+#    Transmon in the charge basis
+######################################################################
+
+
+def transmon_hamiltonians(EC, EJ, asym=0, reduced_flux=0, dim: int=20,
+                          ng: float=0):
+    """
+    Stacked charge-basis Hamiltonians of a (flux tunable) transmon
+
+        H = 4 EC (n - ng)^2 - EJ(flux)/2 (|n><n+1| + h.c.)
+
+    The parameters are broadcast against each other.
+
+    Returns:
+        array of shape broadcast_shape + (2*dim+1, 2*dim+1)
+    """
+    charge, hopping = charge_operators(dim, ng)
+    EC, EJ, asym, reduced_flux = np.broadcast_arrays(
+        *[np.asarray(v, dtype=float) for v in (EC, EJ, asym, reduced_flux)])
+    EJphi = EJ * np.sqrt(
+        asym ** 2 + (1 - asym ** 2) * np.cos(np.pi * reduced_flux) ** 2)
+    ham = -EJphi[..., None, None] / 2 * hopping
+    diag = np.einsum('...ii->...i', ham)
+    diag += 4 * EC[..., None] * charge ** 2
+    return ham
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _transmon_eigensystem_cached(EC_key, EJ_key, asym_key, flux_key, dim,
+                                 ng, nr_levels, return_injs):
+    hams = transmon_hamiltonians(
+        _from_cache_key(EC_key), _from_cache_key(EJ_key),
+        _from_cache_key(asym_key), _from_cache_key(flux_key), dim=dim, ng=ng)
+    if not return_injs:
+        energies = np.linalg.eigvalsh(hams)[..., :nr_levels]
+        energies.flags.writeable = False
+        return energies, None
+    energies, vects = np.linalg.eigh(hams)
+    charge, _ = charge_operators(dim, ng)
+    vects = vects[..., :nr_levels]
+    # matrix elements <i|n|j> of the charge operator
+    injs = np.einsum('...ki,k,...kj->...ij', vects, charge, vects)
+    energies = energies[..., :nr_levels]
+    for arr in (energies, injs):
+        arr.flags.writeable = False
+    return energies, injs
+
+
+def transmon_eigensystem(EC, EJ, asym=0, reduced_flux=0, dim: int=20,
+                         ng: float=0, nr_levels: int=None,
+                         return_injs: bool=False):
+    """
+    Energies (and charge matrix elements) of the lowest transmon levels.
+
+    All parameters can be arrays, which are broadcast against each other and
+    diagonalized in a single call. The results are cached.
+
+    Args:
+        EC, EJ (float or array): charging and (maximal) Josephson energy.
+        asym (float or array): junction asymmetry.
+        reduced_flux (float or array): flux in units of the flux quantum.
+        dim (int): the charge basis is n = -dim, ..., dim.
+        ng (float): offset charge.
+        nr_levels (int): number of levels to return, defaults to dim.
+        return_injs (bool): also return the matrix elements of the charge
+            operator between the levels.
+
+    Returns:
+        energies (array): shape broadcast_shape + (nr_levels, ).
+        injs (array): shape broadcast_shape + (nr_levels, nr_levels), only
+            if return_injs is True.
+    """
+    if nr_levels is None:
+        nr_levels = dim
+    EC, EJ, asym, reduced_flux = np.broadcast_arrays(
+        *[np.asarray(v, dtype=float) for v in (EC, EJ, asym, reduced_flux)])
+    energies, injs = _transmon_eigensystem_cached(
+        _cache_key(EC), _cache_key(EJ), _cache_key(asym),
+        _cache_key(reduced_flux), int(dim), float(ng), int(nr_levels),
+        bool(return_injs))
+    # the cached arrays are shared, return copies
+    if return_injs:
+        return energies.copy(), injs.copy()
+    return energies.copy()
+
+
+def transmon_transitions(EC, EJ, asym=0, reduced_flux=0,
+                         no_transitions: int=2, dim: int=None, ng: float=0):
+    """
+    Transitions between subsequent transmon levels (f01, f12, ...).
+
+    Vectorized version of analysis_toolbox.calculate_transmon_transitions,
+    returns an array of shape broadcast_shape + (no_transitions, ).
+    """
+    if dim is None:
+        dim = no_transitions * 10
+    energies = transmon_eigensystem(EC, EJ, asym, reduced_flux, dim=dim,
+                                    ng=ng, nr_levels=no_transitions + 1)
+    return np.diff(energies, axis=-1)
+
+
+######################################################################
+#    Transmon coupled to buses
+######################################################################
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _transmon_resonator_spectrum_cached(EC_key, EJ_key, f_bus_key, gs_key,
+                                        ng, max_ph):
+    EC, EJ = _from_cache_key(EC_key), _from_cache_key(EJ_key)
+    f_bus, gs = _from_cache_key(f_bus_key), _from_cache_key(gs_key)
+    nr_buses = f_bus.shape[-1]
+    ops = dressed_operators(nr_buses, max_ph)
+
+    energies, injs = transmon_eigensystem(EC, EJ, dim=10, ng=ng,
+                                          nr_levels=3, return_injs=True)
+    f01 = energies[..., 1] - energies[..., 0]
+    f12 = energies[..., 2] - energies[..., 1]
+    # relative strength of the 12 transition
+    ratio = np.abs(injs[..., 2, 1] / injs[..., 1, 0])
+
+    def col(arr):
+        return arr[..., None, None]
+
+    ham = col(f01) * ops['P1'] + col(f01 + f12) * ops['P2']
+    for k in range(nr_buses):
+        ham = ham + col(f_bus[..., k]) * ops['n_r'][k]
+        ham = ham + col(gs[..., k]) * ops['X01'][k]
+        ham = ham + col(gs[..., k] * ratio) * ops['X12'][k]
+    ees, ess = np.linalg.eigh(ham)
+
+    def dressed_energy(idx):
+        # energy of the eigenstate with the largest overlap to a bare state
+        overlap = np.abs(ess[..., idx, :])**2
+        best = np.argmax(overlap, axis=-1)
+        return np.take_along_axis(ees, best[..., None], axis=-1)[..., 0]
+
+    E_g = dressed_energy(bare_state_index(0, [0]*nr_buses, max_ph))
+    E_e = dressed_energy(bare_state_index(1, [0]*nr_buses, max_ph))
+    E_f = dressed_energy(bare_state_index(2, [0]*nr_buses, max_ph))
+    f_bus_transitions = []
+    f01_dressed_shifted = []
+    f_bus_shifted_transitions = []
+    for k in range(nr_buses):
+        photons = [0]*nr_buses
+        photons[k] = 1
+        E_b_g = dressed_energy(bare_state_index(0, photons, max_ph))
+        E_b_e = dressed_energy(bare_state_index(1, photons, max_ph))
+        f_bus_transitions.append(E_b_g - E_g)
+        f_bus_shifted_transitions.append(E_b_e - E_e)
+        f01_dressed_shifted.append(E_b_e - E_b_g)
+
+    result = (np.asarray(E_e - E_g), np.asarray(E_f - E_e),
+              np.stack(f_bus_transitions, axis=-1),
+              np.stack(f01_dressed_shifted, axis=-1),
+              np.stack(f_bus_shifted_transitions, axis=-1))
+    for arr in result:
+        arr.flags.writeable = False
+    return result
+
+
+def transmon_resonator_spectrum(EC, EJ, f_bus, gs, ng: float=0,
+                                max_ph: int=2):
+    """
+    Dressed transitions of a transmon coupled to one or more buses.
+
+    The transmon is truncated to three levels, the buses to max_ph photons.
+    The dressed states are identified with the bare states by the largest
+    overlap.
+
+    Args:
+        EC, EJ (float or array): transmon charging and Josephson energy,
+            arrays of flux points are evaluated in a single call.
+        f_bus (float or array): bare bus frequencies, the last axis runs
+            over the buses.
+        gs (float or array): qubit-bus couplings, the last axis runs over
+            the buses.
+        ng (float): offset charge.
+        max_ph (int): maximum number of photons per bus.
+
+    Returns:
+        f01_dressed, f12_dressed (arrays): shape points_shape.
+        f_bus_transitions (array): dressed bus transitions with the qubit
+            in the ground state, shape points_shape + (nr_buses, ).
+        f01_dressed_shifted (array): qubit transition with a photon in the
+            bus, shape points_shape + (nr_buses, ).
+        f_bus_shifted_transitions (array): dressed bus transitions with the
+            qubit in the excited state, shape points_shape + (nr_buses, ).
+    """
+    f_bus = np.atleast_1d(np.asarray(f_bus, dtype=float))
+    gs = np.atleast_1d(np.abs(np.asarray(gs, dtype=float)))
+    EC, EJ = np.broadcast_arrays(np.asarray(EC, dtype=float),
+                                 np.asarray(EJ, dtype=float))
+    points_shape = np.broadcast_shapes(
+        EC.shape, f_bus.shape[:-1], gs.shape[:-1])
+    nr_buses = np.broadcast_shapes(f_bus.shape[-1:], gs.shape[-1:])
+    EC, EJ = [np.broadcast_to(v, points_shape) for v in (EC, EJ)]
+    f_bus, gs = [np.broadcast_to(v, points_shape + nr_buses)
+                 for v in (f_bus, gs)]
+    result = _transmon_resonator_spectrum_cached(
+        _cache_key(EC), _cache_key(EJ), _cache_key(f_bus), _cache_key(gs),
+        float(ng), int(max_ph))
+    return tuple(arr.copy() for arr in result)
@@ -23,11 +23,22 @@ import json
 import lmfit
 import h5py
 from pycqed.measurement.hdf5_data import write_dict_to_hdf5
+from pycqed.analysis.tools import batch_fitting
 from collections.abc import Iterable
-
+import pickle
 import importlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+
 importlib.reload(a_tools)
 
+log = logging.getLogger(__name__)
+
+# Number of background processes used for deferred figure rendering
+FIGURE_RENDER_WORKERS = 1
+_figure_render_executor = None
+
 
 class BaseDataAnalysis(object):
     """
@@ -137,6 +148,9 @@ class BaseDataAnalysis(object):
                                     dictionary of parameter names as keys and
                                     values as values. Only datasets with specified values
                                     of parameters will be extracted and used in analysis
+                                -'deferred_plotting'
+                                    render and save the figures in a
+                                    background process, see plot_deferred
         :param extract_only: Should we also do the plots?
         :param do_fitting: Should the run_fitting method be executed?
         :param save_qois: Should the save save_quantities_of_interest method be executed?
@@ -201,6 +215,8 @@ class BaseDataAnalysis(object):
         self.plot_dicts = OrderedDict()
         self.axs = OrderedDict()
         self.figs = OrderedDict()
+        # handle of the figures rendered in the background
+        self.deferred_figures = None
         self.presentation_mode = self.options_dict.get(
             'presentation_mode', False)
         if self.presentation_mode:
@@ -256,6 +272,12 @@ class BaseDataAnalysis(object):
 
     def run_post_extract(self):
         self.prepare_plots()  # specify default plots
+        if self.options_dict.get('deferred_plotting', False) and \
+                self.options_dict.get('save_figs', False):
+            self.deferred_figures = self.plot_deferred(
+                tag_tstamp=self.options_dict.get('tag_tstamp', True))
+            if self.deferred_figures is not None:
+                return
         self.plot(key_list='auto')  # make the plots
 
         if self.options_dict.get('save_figs', False):
@@ -263,6 +285,66 @@ class BaseDataAnalysis(object):
                 close_figs=self.options_dict.get('close_figs', True),
                 tag_tstamp=self.options_dict.get('tag_tstamp', True))
 
+    def plot_deferred(self, key_list='auto', tag_tstamp: bool = True,
+                      fmt: str = 'png'):
+        """
+        Renders and saves the figures in a background process.
+
+        The plot_dicts and the (picklable) attributes of the analysis that
+        the plotting functions refer to, such as the data dicts and fit
+        results, are serialized and handed to a rendering worker process,
+        which runs plot and save_figures on a copy of the analysis.
+        This is used by run_post_extract if options_dict['deferred_plotting']
+        and options_dict['save_figs'] are True.
+
+        Returns:
+            a concurrent.futures.Future, future.result(timeout) waits for
+            the rendering and returns the filenames of the saved figures.
+            None if the plots cannot be serialized, in which case nothing is
+            rendered.
+        """
+        cls = type(self)
+        if cls.__module__ == '__main__':
+            log.warning('Deferred plotting is not supported for analyses '
+                        'defined in __main__.')
+            return None
+
+        plot_dicts = OrderedDict()
+        for key, pdict in self.plot_dicts.items():
+            pdict = dict(pdict)
+            plotfn = pdict.get('plotfn')
+            # methods of the analysis are looked up again in the worker,
+            # this includes methods bound to copies of the analysis, e.g.,
+            # of plot_dicts that were created using deepcopy
+            if isinstance(getattr(plotfn, '__self__', None),
+                          BaseDataAnalysis):
+                pdict['plotfn'] = plotfn.__name__
+            plot_dicts[key] = pdict
+        try:
+            plot_dicts = pickle.dumps(plot_dicts)
+        except Exception as e:
+            log.warning('Deferred plotting not possible, the plot_dicts '
+                        'cannot be serialized: {}'.format(e))
+            return None
+
+        state = {}
+        for attr, val in self.__dict__.items():
+            if attr in ('plot_dicts', 'axs', 'figs', 'deferred_figures'):
+                continue
+            try:
+                state[attr] = pickle.dumps(val)
+            except Exception:
+                log.debug('Attribute {} not serialized for plotting'.format(
+                    attr))
+
+        if key_list == 'auto':
+            key_list = self.auto_keys
+        rc_params = {k: v for k, v in matplotlib.rcParams.items()
+                     if k != 'backend'}
+        job = ('{}:{}'.format(cls.__module__, cls.__qualname__), state,
+               plot_dicts, key_list, tag_tstamp, fmt, rc_params)
+        return _get_figure_render_executor().submit(_render_figures, job)
+
     def get_timestamps(self):
         """
         Extracts timestamps based on variables
@@ -432,7 +514,8 @@ class BaseDataAnalysis(object):
             key_list (list)      : keys of figures to save, if 'auto',
                 saves all figures in self.figs.
 
-
+        Returns:
+            list of the filenames of the saved figures.
         """
         if savedir is None:
             savedir = self.raw_data_dict.get('folder')
@@ -457,21 +540,27 @@ class BaseDataAnalysis(object):
         if self.verbose:
             print('Saving figures to %s' % savedir)
 
+        savenames = []
         for key in key_list:
             if self.presentation_mode:
                 savename = os.path.join(
                     savedir, key + tstag + 'presentation' + '.' + fmt)
-                self.figs[key].savefig(savename, bbox_inches='tight', fmt=fmt)
+                self.figs[key].savefig(
+                    savename, bbox_inches='tight', format=fmt)
+                savenames.append(savename)
                 savename = os.path.join(
                     savedir, key + tstag + 'presentation' + '.svg')
                 self.figs[key].savefig(
-                    savename, bbox_inches='tight', fmt='svg')
+                    savename, bbox_inches='tight', format='svg')
             else:
                 savename = os.path.join(
                     savedir, key + tstag + '.' + fmt)
-                self.figs[key].savefig(savename, bbox_inches='tight', fmt=fmt)
+                self.figs[key].savefig(
+                    savename, bbox_inches='tight', format=fmt)
+            savenames.append(savename)
             if close_figs:
                 plt.close(self.figs[key])
+        return savenames
 
     def save_data(
         self, savedir: str = None, savebase: str = None,
@@ -566,9 +655,18 @@ class BaseDataAnalysis(object):
                 parameters. These guess parameters will converted into the parameter
                 objects required by either model fit or minimize.
 
+        Additional keyword arguments of the model fit (e.g. max_nfev) can be
+        passed as fit_dict['fit_kwargs'].
+
+        Fits of models supported by the batch_fitting module can be done
+        simultaneously by setting fit_dict['batch_fit'] = True (or the
+        option 'batch_fitting' in the options_dict), see run_batch_fitting.
         '''
         self.fit_res = {}
+        batch_fitted = self.run_batch_fitting()
         for key, fit_dict in self.fit_dicts.items():
+            if key in batch_fitted:
+                continue
             guess_dict = fit_dict.get('guess_dict', None)
             guess_pars = fit_dict.get('guess_pars', None)
             guessfn_pars = fit_dict.get('guessfn_pars', {})
@@ -631,8 +729,9 @@ class BaseDataAnalysis(object):
                         'Conversion from guess_pars to params with lmfit.Parameters() needs to be implemented')
                     # TODO: write a method that converts the type model.make_params() to a lmfit.Parameters() object
             if fitting_type == 'model':  # Perform the fitting
-                fit_dict['fit_res'] = model.fit(**fit_xvals, **fit_yvals,
-                                                params=guess_pars)
+                fit_dict['fit_res'] = model.fit(
+                    **fit_xvals, **fit_yvals, params=guess_pars,
+                    **fit_dict.get('fit_kwargs', {}))
                 self.fit_res[key] = fit_dict['fit_res']
             elif fitting_type == 'minimize':  # Perform the fitting
 
@@ -645,6 +744,71 @@ class BaseDataAnalysis(object):
                 fit_dict['fit_res'].fit_fn = fit_fn  # save the fit function
                 self.fit_res[key] = fit_dict['fit_res']
 
+    def run_batch_fitting(self):
+        """
+        Fits all fit_dicts that request a batch fit at once.
+
+        A fit_dict is batch fitted if fit_dict['batch_fit'] (default
+        options_dict['batch_fitting']) is True, it is a model fit without
+        'guess_pars', custom guess function or 'guessfn_pars' and the model
+        function is supported by batch_fitting. The fit_dicts are grouped
+        per model function and number of points. As in run_fitting, the
+        param_hints of the model are updated with the (vectorized) guess,
+        unless fit_dict['fit_guess'] is False, and with
+        fit_dict['guess_dict']. Fit dicts with constraints the batched
+        solver does not support (parameter expressions or fit_kwargs other
+        than 'max_nfev') are fitted by run_fitting.
+
+        Returns:
+            list of the keys of the fit_dicts that were fitted.
+        """
+        groups = OrderedDict()
+        for key, fit_dict in self.fit_dicts.items():
+            if not fit_dict.get('batch_fit',
+                                self.options_dict.get('batch_fitting', False)):
+                continue
+            if (fit_dict.get('fitting_type', 'model') != 'model' or
+                    fit_dict.get('guess_pars', None) is not None or
+                    fit_dict.get('fit_guess_fn', None) is not None or
+                    fit_dict.get('guessfn_pars', None)):
+                continue
+            model = fit_dict.get('model', None)
+            func = model.func if model is not None else fit_dict.get('fit_fn')
+            if not batch_fitting.is_batch_fittable(func):
+                continue
+            fit_kwargs = fit_dict.get('fit_kwargs', None) or {}
+            if set(fit_kwargs) - {'max_nfev'}:
+                continue
+            if model is not None and \
+                    not batch_fitting.supports_hints(model.param_hints):
+                continue
+            if not batch_fitting.supports_hints(fit_dict.get('guess_dict')):
+                continue
+            indep_var = batch_fitting.batch_models[func].independent_var
+            xvals = np.asarray(fit_dict['fit_xvals'][indep_var], dtype=float)
+            group_key = (func, len(xvals), fit_dict.get('fit_guess', True),
+                         fit_kwargs.get('max_nfev', 200))
+            groups.setdefault(group_key, []).append((key, xvals))
+
+        fitted = []
+        for (func, _, guess, max_nfev), members in groups.items():
+            keys = [key for key, _ in members]
+            fit_dicts = [self.fit_dicts[key] for key in keys]
+            yvals = [list(fit_dict['fit_yvals'].values())[0]
+                     for fit_dict in fit_dicts]
+            results = batch_fitting.batch_fit(
+                func, np.array([xvals for _, xvals in members]),
+                np.array(yvals, dtype=float),
+                guess_dicts=[fit_dict.get('guess_dict', None)
+                             for fit_dict in fit_dicts],
+                model=[fit_dict.get('model', None) for fit_dict in fit_dicts],
+                max_nfev=max_nfev, guess=guess)
+            for key, fit_res in zip(keys, results):
+                self.fit_dicts[key]['fit_res'] = fit_res
+                self.fit_res[key] = fit_res
+                fitted.append(key)
+        return fitted
+
     def save_fit_results(self):
         """
         Save fit_results that are part of self.fit_res.
@@ -1653,3 +1817,57 @@ def _complex_residual_function(pars, fit_function, x, data):
     res = np.append(res.real, res.imag)
 
     return res
+
+
+def _get_figure_render_executor():
+    global _figure_render_executor
+    if _figure_render_executor is None:
+        # spawn avoids forking the state of GUI event loops and instruments
+        _figure_render_executor = ProcessPoolExecutor(
+            max_workers=FIGURE_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_figure_render_worker)
+    return _figure_render_executor
+
+
+def shutdown_figure_rendering(wait: bool = True):
+    """
+    Shuts down the background process rendering deferred figures.
+    If wait is True, waits for the pending figures to be saved.
+    """
+    global _figure_render_executor
+    if _figure_render_executor is not None:
+        _figure_render_executor.shutdown(wait=wait)
+        _figure_render_executor = None
+
+
+def _init_figure_render_worker():
+    matplotlib.use('Agg')
+
+
+def _render_figures(job):
+    """
+    Runs in the rendering worker, see BaseDataAnalysis.plot_deferred.
+    """
+    class_path, state, plot_dicts, key_list, tag_tstamp, fmt, rc_params = job
+    matplotlib.rcParams.update(rc_params)
+    module_name, class_name = class_path.split(':')
+    cls = importlib.import_module(module_name)
+    for attr in class_name.split('.'):
+        cls = getattr(cls, attr)
+
+    # a copy of the analysis without running its __init__
+    a = cls.__new__(cls)
+    for attr, val in state.items():
+        try:
+            setattr(a, attr, pickle.loads(val))
+        except Exception:
+            # e.g. fit results of models with methods added at runtime
+            log.debug('Attribute {} not restored for plotting'.format(attr))
+    a.plot_dicts = pickle.loads(plot_dicts)
+    a.axs = OrderedDict()
+    a.figs = OrderedDict()
+    a.deferred_figures = None
+
+    a.plot(key_list=key_list)
+    return a.save_figures(close_figs=True, tag_tstamp=tag_tstamp, fmt=fmt)
@@ -0,0 +1,371 @@
+"""
+Batch re-analysis of datasets over a range of timestamps.
+
+Runs an analysis_v2 class on every timestamp in a range that matches the
+label filters, in a pool of worker processes and with plotting disabled.
+The quantities of interest (and optionally the fit parameters) of all
+datasets are collected in a single table, failing datasets are reported in
+a separate table without aborting the batch.
+
+Python API:
+
+    from pycqed.analysis_v2 import batch_analysis as bta
+    results, failures = bta.run_batch_analysis(
+        'Singleshot_Readout_Analysis', '20180508_182642', '20180508_183214',
+        label='SSRO', output_path='ssro_batch.hdf5')
+
+Command line:
+
+    python -m pycqed.analysis_v2.batch_analysis \\
+        Singleshot_Readout_Analysis 20180508_182642 20180508_183214 \\
+        --label SSRO --output ssro_batch.hdf5
+
+The table is written to HDF5 (.h5/.hdf5, using h5py) or Parquet
+(.parquet, requires pyarrow or fastparquet) and can be loaded with
+load_batch_results.
+"""
+import argparse
+import importlib
+import inspect
+import json
+import logging
+import numbers
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import h5py
+import numpy as np
+import pandas as pd
+from pycqed.analysis import analysis_toolbox as a_tools
+
+log = logging.getLogger(__name__)
+
+# analysis classes given by name are looked up in this module
+DEFAULT_ANALYSIS_MODULE = 'pycqed.analysis_v2.measurement_analysis'
+
+
+def run_batch_analysis(analysis_class, t_start: str, t_stop: str,
+                       label='', exact_label_match: bool=False,
+                       analysis_kw: dict=None, processes: int=None,
+                       include_fit_params: bool=True, plot: bool=False,
+                       datadir: str=None, output_path: str=None):
+    """
+    Runs an analysis on all timestamps in a range.
+
+    Args:
+        analysis_class (class or str): the analysis class, or its name in
+            pycqed.analysis_v2.measurement_analysis, or a string
+            'module.path:ClassName'.
+        t_start, t_stop (str): timestamps delimiting the range.
+        label (str or list): only analyse datasets with this label.
+        exact_label_match (bool): require an exact match of the label.
+        analysis_kw (dict): keyword arguments passed to the analysis class
+            (e.g. options_dict), every dataset is analysed with
+            analysis_class(t_start=timestamp, **analysis_kw).
+        processes (int): number of worker processes, defaults to the
+            number of CPUs. For processes=1 the analyses run in this process.
+        include_fit_params (bool): also collect the values and standard
+            errors of the fit parameters in self.fit_res.
+        plot (bool): make and save the figures of the analyses. If False,
+            the analyses are run with extract_only=True.
+        datadir (str): data directory, defaults to a_tools.datadir.
+        output_path (str): if given, the results are saved to this file,
+            see save_batch_results.
+
+    Returns:
+        results (DataFrame): one row per successfully analysed timestamp
+            (index), the columns are the quantities of interest and fit
+            parameters.
+        failures (DataFrame): one row per failed timestamp with the columns
+            'error' and 'traceback'.
+    """
+    class_path = _get_class_path(analysis_class)
+    if datadir is None:
+        datadir = a_tools.datadir
+    timestamps = a_tools.get_timestamps_in_range(
+        t_start, t_stop, label=label, exact_label_match=exact_label_match,
+        folder=datadir)
+    log.info('Running {} on {} timestamps'.format(class_path,
+                                                   len(timestamps)))
+
+    jobs = [(class_path, ts, analysis_kw, include_fit_params, plot, datadir)
+            for ts in timestamps]
+    if processes == 1:
+        old_datadir = a_tools.datadir
+        try:
+            _init_worker()
+            outputs = [_analyze_timestamp(job) for job in jobs]
+        finally:
+            a_tools.datadir = old_datadir
+    else:
+        with ProcessPoolExecutor(max_workers=processes,
+                                 initializer=_init_worker) as executor:
+            outputs = list(executor.map(_analyze_timestamp, jobs))
+
+    rows, failed = [], []
+    for ts, row, failure in outputs:
+        if failure is None:
+            rows.append(row)
+        else:
+            log.warning('Analysis of {} failed: {}'.format(
+                ts, failure['error']))
+            failed.append(failure)
+
+    results = pd.DataFrame(rows, columns=_ordered_columns(rows))
+    results = results.set_index('timestamp')
+    failures = pd.DataFrame(failed,
+                            columns=['timestamp', 'error', 'traceback'])
+    failures = failures.set_index('timestamp')
+
+    if output_path is not None:
+        save_batch_results(output_path, results, failures)
+    return results, failures
+
+
+def _get_class_path(analysis_class):
+    if isinstance(analysis_class, str):
+        if ':' in analysis_class:
+            return analysis_class
+        return '{}:{}'.format(DEFAULT_ANALYSIS_MODULE, analysis_class)
+    return '{}:{}'.format(analysis_class.__module__,
+                          analysis_class.__qualname__)
+
+
+def _import_class(class_path: str):
+    module_name, class_name = class_path.split(':')
+    obj = importlib.import_module(module_name)
+    for attr in class_name.split('.'):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def _init_worker():
+    # no figures are shown in the workers
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _analyze_timestamp(job):
+    """
+    Runs the analysis of a single timestamp.
+
+    Returns:
+        (timestamp, row, None) on success and (timestamp, None, failure)
+        if an exception was raised.
+    """
+    (class_path, timestamp, analysis_kw, include_fit_params, plot,
+     datadir) = job
+    kw = dict(analysis_kw or {})
+    try:
+        analysis_class = _import_class(class_path)
+        # Set after the import, as importing base_analysis reloads a_tools
+        # which resets the datadir
+        a_tools.datadir = datadir
+        parameters = inspect.signature(analysis_class).parameters
+        accepts_kw = any(p.kind == p.VAR_KEYWORD
+                         for p in parameters.values())
+        if 'extract_only' in parameters or accepts_kw:
+            kw.setdefault('extract_only', not plot)
+        a = analysis_class(t_start=timestamp, **kw)
+
+        row = {'timestamp': timestamp}
+        qois = getattr(a, 'proc_data_dict', {}).get(
+            'quantities_of_interest', {})
+        if isinstance(qois, dict):
+            row.update(flatten_quantities(qois))
+        if include_fit_params:
+            row.update(flatten_fit_results(getattr(a, 'fit_res', None)))
+        if plot:
+            import matplotlib.pyplot as plt
+            plt.close('all')
+        return timestamp, row, None
+    except Exception as e:
+        failure = {'timestamp': timestamp,
+                   'error': '{}: {}'.format(type(e).__name__, e),
+                   'traceback': traceback.format_exc()}
+        return timestamp, None, failure
+
+
+def flatten_quantities(quantities: dict, prefix: str=''):
+    """
+    Flattens a (nested) dict of quantities of interest into scalar columns.
+
+    Nested dicts are flattened with '.' separated keys, values with an
+    uncertainty (uncertainties.ufloat) are split into the nominal value
+    and a '<key>_stderr' column. Non-scalar values are skipped.
+    """
+    columns = {}
+    for key, val in quantities.items():
+        name = prefix + str(key)
+        if isinstance(val, dict):
+            columns.update(flatten_quantities(val, prefix=name + '.'))
+        elif hasattr(val, 'nominal_value') and hasattr(val, 'std_dev'):
+            columns[name] = float(val.nominal_value)
+            columns[name + '_stderr'] = float(val.std_dev)
+        elif isinstance(val, (numbers.Number, np.number, np.bool_)):
+            columns[name] = val.item() if hasattr(val, 'item') else val
+        elif isinstance(val, str):
+            columns[name] = val
+        elif isinstance(val, np.ndarray) and val.size == 1:
+            columns[name] = val.item()
+        else:
+            log.debug('Skipping non-scalar quantity {}'.format(name))
+    return columns
+
+
+def flatten_fit_results(fit_res: dict):
+    """
+    Columns '<fit_key>.<param>' and '<fit_key>.<param>_stderr' with the
+    values and standard errors of the fit parameters.
+    """
+    columns = {}
+    if not isinstance(fit_res, dict):
+        return columns
+    for key, fr in fit_res.items():
+        params = getattr(fr, 'params', None)
+        if params is None:
+            continue
+        for par_name, par in params.items():
+            name = '{}.{}'.format(key, par_name)
+            columns[name] = par.value
+            columns[name + '_stderr'] = (np.nan if par.stderr is None
+                                         else par.stderr)
+    return columns
+
+
+def _ordered_columns(rows):
+    # union of the columns of all rows in order of appearance
+    columns = {'timestamp': None}
+    for row in rows:
+        columns.update(dict.fromkeys(row))
+    return list(columns)
+
+
+######################################################################
+#    Saving and loading
+######################################################################
+
+
+def save_batch_results(path: str, results, failures=None):
+    """
+    Saves the tables of run_batch_analysis.
+
+    For HDF5 files the tables are stored in the groups 'results' and
+    'failures' with one dataset per column. For Parquet files the failures
+    are saved to '<path>_failures.parquet'.
+    """
+    base, extension = os.path.splitext(path)
+    if extension == '.parquet':
+        results.to_parquet(path)
+        if failures is not None:
+            failures.to_parquet(base + '_failures.parquet')
+    elif extension in ('.h5', '.hdf5'):
+        with h5py.File(path, 'w') as f:
+            _write_table(f.create_group('results'), results)
+            if failures is not None:
+                _write_table(f.create_group('failures'), failures)
+    else:
+        raise ValueError('Unknown file extension "{}", use ".hdf5", ".h5" '
+                         'or ".parquet"'.format(extension))
+
+
+def load_batch_results(path: str):
+    """
+    Loads the tables saved by save_batch_results.
+
+    Returns:
+        results (DataFrame)
+        failures (DataFrame): None if no failures were saved.
+    """
+    base, extension = os.path.splitext(path)
+    if extension == '.parquet':
+        results = pd.read_parquet(path)
+        failures_path = base + '_failures.parquet'
+        failures = (pd.read_parquet(failures_path)
+                    if os.path.exists(failures_path) else None)
+        return results, failures
+    with h5py.File(path, 'r') as f:
+        results = _read_table(f['results'])
+        failures = _read_table(f['failures']) if 'failures' in f else None
+    return results, failures
+
+
+def _write_table(group, table):
+    table = table.reset_index()
+    group.attrs['columns'] = json.dumps(list(map(str, table.columns)))
+    group.attrs['index'] = str(table.columns[0])
+    for i, col in enumerate(table.columns):
+        values = table[col].values
+        if values.dtype.kind in 'biuf':
+            data = values
+        else:
+            # strings and mixed columns, missing values become ''
+            data = np.array(['' if v is None or v != v else str(v)
+                             for v in values], dtype=object)
+            data = data.astype(h5py.string_dtype())
+        # the column names can contain '/'
+        group.create_dataset(str(i), data=data)
+
+
+def _read_table(group):
+    columns = json.loads(group.attrs['columns'])
+    data = {}
+    for i, col in enumerate(columns):
+        values = group[str(i)][()]
+        if values.dtype.kind in 'OS':
+            values = values.astype(str)
+        data[col] = values
+    return pd.DataFrame(data, columns=columns).set_index(
+        group.attrs['index'])
+
+
+######################################################################
+#    Command line interface
+######################################################################
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Runs an analysis_v2 class on all datasets in a range '
+                    'of timestamps and saves the quantities of interest to '
+                    'a table.')
+    parser.add_argument('analysis_class',
+                        help='name of the class in analysis_v2.'
+                             'measurement_analysis or "module:ClassName"')
+    parser.add_argument('t_start', help='first timestamp (YYYYMMDD_hhmmss)')
+    parser.add_argument('t_stop', help='last timestamp (YYYYMMDD_hhmmss)')
+    parser.add_argument('--label', action='append', default=None,
+                        help='label filter, can be given multiple times')
+    parser.add_argument('--exact-label-match', action='store_true')
+    parser.add_argument('--output', '-o', required=True,
+                        help='output file (.hdf5, .h5 or .parquet)')
+    parser.add_argument('--processes', '-n', type=int, default=None,
+                        help='number of worker processes')
+    parser.add_argument('--datadir', default=None)
+    parser.add_argument('--analysis-kw', default='{}',
+                        help='JSON dict of keyword arguments for the '
+                             'analysis class')
+    parser.add_argument('--plot', action='store_true',
+                        help='make and save the figures')
+    parser.add_argument('--no-fit-params', action='store_true',
+                        help='only collect the quantities of interest')
+    args = parser.parse_args(argv)
+
+    results, failures = run_batch_analysis(
+        args.analysis_class, args.t_start, args.t_stop,
+        label=args.label if args.label is not None else '',
+        exact_label_match=args.exact_label_match,
+        analysis_kw=json.loads(args.analysis_kw),
+        processes=args.processes,
+        include_fit_params=not args.no_fit_params, plot=args.plot,
+        datadir=args.datadir, output_path=args.output)
+    print('Analysed {} datasets, {} failed. Results saved to {}'.format(
+        len(results) + len(failures), len(failures), args.output))
+    for ts, failure in failures.iterrows():
+        print('    {}: {}'.format(ts, failure['error']))
+    return 1 if len(results) == 0 and len(failures) > 0 else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
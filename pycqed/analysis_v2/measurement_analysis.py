@@ -1,106 +1,164 @@
 """
 This file imports all the relevant classes for daily use.
-"""
 
-# This snippet ensures all submodules get reloaded properly as we like to
-# modify things when using it.
-from importlib import reload
-
-# Do not comment this out as other modules rely on this import being present
-from pycqed.analysis import analysis_toolbox as a_tools
-
-import pycqed.analysis_v2.base_analysis as ba
-reload(ba)
-import pycqed.analysis_v2.simple_analysis as sa
-reload(sa)
-import pycqed.analysis_v2.timedomain_analysis as ta
-reload(ta)
-import pycqed.analysis_v2.readout_analysis as ra
-reload(ra)
-import pycqed.analysis_v2.syndrome_analysis as synda
-reload(sa)
-# only one of these two files should exist in the end
-import pycqed.analysis_v2.cryo_scope_analysis as csa
-reload(csa)
-import pycqed.analysis_v2.cryo_spectrumanalyzer_analysis as csa
-reload(csa)
-import pycqed.analysis_v2.distortions_analysis as da
-
-import pycqed.analysis_v2.optimization_analysis as oa
-reload(da)
-import pycqed.analysis_v2.coherence_analysis as cs
-reload(cs)
-import pycqed.analysis_v2.spectroscopy_analysis as sa
-reload(sa)
-import pycqed.analysis_v2.dac_scan_analysis as da
-reload(da)
-import pycqed.analysis_v2.quantum_efficiency_analysis as qea
-reload(qea)
-import pycqed.analysis_v2.cross_dephasing_analysis as cda
-reload(cda)
-import pycqed.analysis_v2.randomized_benchmarking_analysis as rba
-reload(rba)
-# import pycqed.analysis_v2.gate_set_tomography_analysis as gsa
-# reload(gsa)
-
-import pycqed.analysis_v2.fluxing_analysis as fla
-reload(fla)
-
-import pycqed.analysis_v2.timing_cal_analysis as ta
-reload(ta)
-
-
-# from pycqed.analysis_v2.base_analysis import  # remove me if everything still works*
-from pycqed.analysis_v2.simple_analysis import (
-    Basic1DAnalysis, Basic1DBinnedAnalysis,
-    Basic2DAnalysis, Basic2DInterpolatedAnalysis)
-from pycqed.analysis_v2.timedomain_analysis import (
-    FlippingAnalysis, Intersect_Analysis, CZ_1QPhaseCal_Analysis,
-    Oscillation_Analysis,
-    Conditional_Oscillation_Analysis, Idling_Error_Rate_Analyisis,
-    Grovers_TwoQubitAllStates_Analysis)
-from pycqed.analysis_v2.readout_analysis import (
-    Singleshot_Readout_Analysis, RO_acquisition_delayAnalysis,
-    Dispersive_shift_Analysis, Readout_landspace_Analysis)
-
-from pycqed.analysis_v2.multiplexed_readout_analysis import \
-    Multiplexed_Readout_Analysis
-
-from pycqed.analysis_v2.syndrome_analysis import (
-    Single_Qubit_RoundsToEvent_Analysis, One_Qubit_Paritycheck_Analysis)
-
-
-from pycqed.analysis_v2.cryo_scope_analysis import RamZFluxArc, \
-    SlidingPulses_Analysis, Cryoscope_Analysis
-from pycqed.analysis_v2.cryo_spectrumanalyzer_analysis import Cryospec_Analysis
-from pycqed.analysis_v2.distortions_analysis import Scope_Trace_analysis
-
-from pycqed.analysis_v2.optimization_analysis import OptimizationAnalysis
-from pycqed.analysis_v2.timing_cal_analysis import Timing_Cal_Flux_Coarse, \
-    Timing_Cal_Flux_Fine
-
-from pycqed.analysis_v2.coherence_analysis import CoherenceAnalysis, \
-    CoherenceTimesAnalysisSingle, AliasedCoherenceTimesAnalysisSingle, \
-    CoherenceTimesAnalysis_old, CoherenceAnalysisDataExtractor
-from pycqed.analysis_v2.spectroscopy_analysis import Spectroscopy, \
-    ResonatorSpectroscopy, VNA_analysis, complex_spectroscopy, VNA_DAC_Analysis
-from pycqed.analysis_v2.dac_scan_analysis import FluxFrequency, \
-    Susceptibility_to_Flux_Bias, DACarcPolyFit
-from pycqed.analysis_v2.quantum_efficiency_analysis import \
-    QuantumEfficiencyAnalysis, DephasingAnalysisSingleScans, \
-    DephasingAnalysisSweep, SSROAnalysisSingleScans, SSROAnalysisSweep, \
-    QuantumEfficiencyAnalysisTWPA
-from pycqed.analysis_v2.cross_dephasing_analysis import CrossDephasingAnalysis
-from pycqed.analysis_v2.randomized_benchmarking_analysis import (
-    RandomizedBenchmarking_SingleQubit_Analysis,
-    RandomizedBenchmarking_TwoQubit_Analysis,
-    UnitarityBenchmarking_TwoQubit_Analysis,
-    InterleavedRandomizedBenchmarkingAnalysis,
-    CharacterBenchmarking_TwoQubit_Analysis)
-from pycqed.analysis_v2.gate_set_tomography_analysis import \
-    GST_SingleQubit_DataExtraction, GST_TwoQubit_DataExtraction
-
-
-from pycqed.analysis_v2.fluxing_analysis import Chevron_Analysis,\
-    Conditional_Oscillation_Heatmap_Analysis, interp_to_1D_arr,\
-    Chevron_Alignment_Analysis
+The analysis modules are imported lazily (PEP 562): an analysis class or
+module alias listed in the registries below is imported on first access,
+e.g. `ma2.Singleshot_Readout_Analysis` only imports readout_analysis.
+This keeps importing this module cheap for kernels and batch-analysis
+workers. To add an analysis, add it to _ANALYSIS_REGISTRY.
+
+As we like to modify things when using it, the imported analysis modules
+can be reloaded with reload_analysis_modules().
+"""
+import importlib
+import sys
+from contextlib import contextmanager
+
+_V2 = 'pycqed.analysis_v2.'
+
+# Short module aliases, e.g. ma2.ra.Singleshot_Readout_Analysis
+# Do not remove a_tools as other modules rely on this attribute being present
+_MODULE_ALIASES = {
+    'a_tools': 'pycqed.analysis.analysis_toolbox',
+    'ba': _V2 + 'base_analysis',
+    'ra': _V2 + 'readout_analysis',
+    'synda': _V2 + 'syndrome_analysis',
+    # only one of these two files should exist in the end
+    'csa': _V2 + 'cryo_spectrumanalyzer_analysis',
+    'oa': _V2 + 'optimization_analysis',
+    'cs': _V2 + 'coherence_analysis',
+    'sa': _V2 + 'spectroscopy_analysis',
+    'da': _V2 + 'dac_scan_analysis',
+    'qea': _V2 + 'quantum_efficiency_analysis',
+    'cda': _V2 + 'cross_dephasing_analysis',
+    'rba': _V2 + 'randomized_benchmarking_analysis',
+    'fla': _V2 + 'fluxing_analysis',
+    'ta': _V2 + 'timing_cal_analysis',
+}
+
+# Analysis class (or function) -> module it is defined in
+_ANALYSIS_MODULES = {
+    _V2 + 'simple_analysis': [
+        'Basic1DAnalysis', 'Basic1DBinnedAnalysis',
+        'Basic2DAnalysis', 'Basic2DInterpolatedAnalysis'],
+    _V2 + 'timedomain_analysis': [
+        'FlippingAnalysis', 'Intersect_Analysis', 'CZ_1QPhaseCal_Analysis',
+        'Oscillation_Analysis',
+        'Conditional_Oscillation_Analysis', 'Idling_Error_Rate_Analyisis',
+        'Grovers_TwoQubitAllStates_Analysis'],
+    _V2 + 'readout_analysis': [
+        'Singleshot_Readout_Analysis', 'RO_acquisition_delayAnalysis',
+        'Dispersive_shift_Analysis', 'Readout_landspace_Analysis'],
+    _V2 + 'multiplexed_readout_analysis': [
+        'Multiplexed_Readout_Analysis'],
+    _V2 + 'syndrome_analysis': [
+        'Single_Qubit_RoundsToEvent_Analysis',
+        'One_Qubit_Paritycheck_Analysis'],
+    _V2 + 'cryo_scope_analysis': [
+        'RamZFluxArc', 'SlidingPulses_Analysis', 'Cryoscope_Analysis'],
+    _V2 + 'cryo_spectrumanalyzer_analysis': ['Cryospec_Analysis'],
+    _V2 + 'distortions_analysis': ['Scope_Trace_analysis'],
+    _V2 + 'optimization_analysis': ['OptimizationAnalysis'],
+    _V2 + 'timing_cal_analysis': [
+        'Timing_Cal_Flux_Coarse', 'Timing_Cal_Flux_Fine'],
+    _V2 + 'coherence_analysis': [
+        'CoherenceAnalysis', 'CoherenceTimesAnalysisSingle',
+        'AliasedCoherenceTimesAnalysisSingle', 'CoherenceTimesAnalysis_old',
+        'CoherenceAnalysisDataExtractor'],
+    _V2 + 'spectroscopy_analysis': [
+        'Spectroscopy', 'ResonatorSpectroscopy', 'VNA_analysis',
+        'complex_spectroscopy', 'VNA_DAC_Analysis'],
+    _V2 + 'dac_scan_analysis': [
+        'FluxFrequency', 'Susceptibility_to_Flux_Bias', 'DACarcPolyFit'],
+    _V2 + 'quantum_efficiency_analysis': [
+        'QuantumEfficiencyAnalysis', 'DephasingAnalysisSingleScans',
+        'DephasingAnalysisSweep', 'SSROAnalysisSingleScans',
+        'SSROAnalysisSweep', 'QuantumEfficiencyAnalysisTWPA'],
+    _V2 + 'cross_dephasing_analysis': ['CrossDephasingAnalysis'],
+    _V2 + 'randomized_benchmarking_analysis': [
+        'RandomizedBenchmarking_SingleQubit_Analysis',
+        'RandomizedBenchmarking_TwoQubit_Analysis',
+        'UnitarityBenchmarking_TwoQubit_Analysis',
+        'InterleavedRandomizedBenchmarkingAnalysis',
+        'CharacterBenchmarking_TwoQubit_Analysis'],
+    _V2 + 'gate_set_tomography_analysis': [
+        'GST_SingleQubit_DataExtraction', 'GST_TwoQubit_DataExtraction'],
+    _V2 + 'fluxing_analysis': [
+        'Chevron_Analysis', 'Conditional_Oscillation_Heatmap_Analysis',
+        'interp_to_1D_arr', 'Chevron_Alignment_Analysis'],
+}
+
+_ANALYSIS_REGISTRY = {name: module_name
+                      for module_name, names in _ANALYSIS_MODULES.items()
+                      for name in names}
+
+__all__ = sorted(_ANALYSIS_REGISTRY)
+
+
+@contextmanager
+def _keep_datadir():
+    """
+    Importing (or reloading) base_analysis reloads a_tools, which resets
+    a_tools.datadir. This context restores the datadir set by the user,
+    e.g. using `ma2.a_tools.datadir = datadir`.
+    """
+    a_tools = sys.modules.get(_MODULE_ALIASES['a_tools'])
+    datadir = getattr(a_tools, 'datadir', None)
+    try:
+        yield
+    finally:
+        if a_tools is not None:
+            a_tools.datadir = datadir
+
+
+def __getattr__(name: str):
+    if name in _MODULE_ALIASES:
+        with _keep_datadir():
+            value = importlib.import_module(_MODULE_ALIASES[name])
+    elif name in _ANALYSIS_REGISTRY:
+        with _keep_datadir():
+            module = importlib.import_module(_ANALYSIS_REGISTRY[name])
+        value = getattr(module, name)
+    else:
+        raise AttributeError(
+            'module {!r} has no attribute {!r}'.format(__name__, name))
+    # cache it, __getattr__ is only called for missing attributes
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_MODULE_ALIASES) |
+                  set(_ANALYSIS_REGISTRY))
+
+
+def reload_analysis_modules():
+    """
+    Reloads the analysis modules that have been imported so far.
+
+    base_analysis is reloaded first, such that the reloaded analyses derive
+    from the reloaded base class. The attributes of this module resolve to
+    the reloaded classes afterwards.
+
+    Returns:
+        list of the names of the reloaded modules.
+    """
+    module_names = [_MODULE_ALIASES['ba']]
+    for module_name in list(_MODULE_ALIASES.values()) + \
+            list(_ANALYSIS_MODULES):
+        if module_name not in module_names and \
+                module_name != _MODULE_ALIASES['a_tools']:
+            module_names.append(module_name)
+
+    reloaded = []
+    with _keep_datadir():
+        for module_name in module_names:
+            module = sys.modules.get(module_name)
+            if module is not None:
+                importlib.reload(module)
+                reloaded.append(module_name)
+
+    module_globals = globals()
+    for name in list(_MODULE_ALIASES) + list(_ANALYSIS_REGISTRY):
+        module_globals.pop(name, None)
+    return reloaded
@@ -7,7 +7,6 @@ import pycqed.analysis_v2.base_analysis as ba
 from pycqed.analysis.analysis_toolbox import get_datafilepath_from_timestamp
 from pycqed.analysis.tools.plotting import set_xlabel, set_ylabel, \
     cmap_to_alpha, cmap_first_to_alpha
-import pycqed.analysis.tools.data_manipulation as dm_tools
 from pycqed.utilities.general import int2base
 import pycqed.measurement.hdf5_data as h5d
 
@@ -101,91 +100,58 @@ class Multiplexed_Readout_Analysis(ba.BaseDataAnalysis):
 
         # Bin data in histograms
         raw_shots = self.raw_data_dict['data'][:, 1:]
-        hist_data = {}
-        # for i, ch_name in enumerate(value_names):
-        #     ch_data = raw_shots[:, i]  # select per channel
-        #     hist_data[ch_name] = {}
-        #     for j, comb in enumerate(combinations):
-        #         cnts, bin_edges = np.histogram(
-        #             ch_data[j::len(combinations)],
-        #             bins=100, range=(np.min(ch_data), np.max(ch_data)))
-        #         bin_centers = bin_edges[:-1]+(bin_edges[1]-bin_edges[0])/2
-        #         hist_data[ch_name][comb] = (cnts, bin_centers)
-        # self.proc_data_dict['hist_data'] = hist_data
-        
-        #############################################
-        # Sort post-selection from measurement shots
-        #############################################
+        nr_combs = len(combinations)
         if self.post_selection == True:
-            self.proc_data_dict['post_selected_shots'] = \
-                {ch_name : {} for ch_name in value_names}
-            self.proc_data_dict['post_selecting_shots'] = \
-                {ch_name : {} for ch_name in value_names}
-        # Loop over qubits
+            # Every measurement is preceded by a post-selection measurement
+            nr_shots = len(raw_shots)//2
+            post_selec_shots = raw_shots[0:2*nr_shots:2]
+            shots = raw_shots[1:2*nr_shots:2]
+        else:
+            shots = raw_shots
+        # index of the prepared combination of each shot
+        prepared = np.arange(len(shots)) % nr_combs
+
+        hist_data = {}
         for i, ch_name in enumerate(value_names):
             ch_data = raw_shots[:, i]  # select per channel
-            hist_data[ch_name] = {}
-            # Loop over prepared state
-            for j, comb in enumerate(combinations):
-                if self.post_selection == True:
-                    post_selec_shots = ch_data[2*j::len(combinations)*2]
-                    shots = ch_data[2*j+1::len(combinations)*2]
-                    self.proc_data_dict['post_selected_shots'][ch_name][comb] = shots
-                    self.proc_data_dict['post_selecting_shots'][ch_name][comb] = post_selec_shots
-                else:
-                    shots = ch_data[j::len(combinations)]
-        
-                cnts, bin_edges = np.histogram(shots, bins=100,
-                    range=(min(ch_data), max(ch_data)))
-                    #range=(np.min(ch_data), np.max(ch_data))) # was crashing with np (check if necessary)
-                bin_centers = bin_edges[:-1]+(bin_edges[1]-bin_edges[0])/2
-                hist_data[ch_name][comb] = (cnts, bin_centers) 
+            cnts, bin_centers = histogram_per_combination(
+                shots[:, i], prepared, nr_combs, bins=100,
+                range=(min(ch_data), max(ch_data)))
+            hist_data[ch_name] = {
+                comb: (cnts[j], bin_centers)
+                for j, comb in enumerate(combinations)}
         self.proc_data_dict['hist_data'] = hist_data
+
         #########################
         # Execute post_selection
         #########################
         if self.post_selection == True:
-            for comb in combinations: # Loop over prepared states    
-                Idxs = []
-                '''
-                For each prepared state one needs to eliminate every shot 
-                if a single qubit fails post selection.
-                '''
-                for ch in value_names: # Loop over qubits
-                    '''
-                    First find all idxs for all qubits. This has to loop
-                    over alll qubits before in pre-measurement.
-                    '''
-                    post_selec_shots = self.proc_data_dict['post_selecting_shots'][ch][comb]
-                    post_select_indices = dm_tools.get_post_select_indices(
-                        thresholds=[0], 
-                        init_measurements=[post_selec_shots])           
-                    Idxs += list(post_select_indices)
-                for ch in value_names: # Loop over qubits
-                    '''
-                    Now that we have all idxs, we can discard the shots that
-                    failed in every qubit.
-                    '''
-                    shots = self.proc_data_dict['post_selected_shots'][ch][comb]
-                
-                    shots[Idxs] = np.nan # signal post_selection
-                    shots = shots[~np.isnan(shots)] # discard post failed shots
-                    self.proc_data_dict['post_selected_shots'][ch][comb] = shots
-        
+            # For each prepared state one needs to eliminate every shot
+            # if a single qubit fails post selection.
+            passed = get_post_selection_mask(post_selec_shots, thresholds=0)
+            pre_split = split_per_combination(
+                post_selec_shots, prepared, nr_combs)
+            shots_split = split_per_combination(
+                shots[passed], prepared[passed], nr_combs)
+            self.proc_data_dict['post_selecting_shots'] = {
+                ch_name: {comb: pre_split[j][:, i]
+                          for j, comb in enumerate(combinations)}
+                for i, ch_name in enumerate(value_names)}
+            self.proc_data_dict['post_selected_shots'] = {
+                ch_name: {comb: shots_split[j][:, i]
+                          for j, comb in enumerate(combinations)}
+                for i, ch_name in enumerate(value_names)}
+            shots = shots[passed]
+            prepared = prepared[passed]
+
         ###############################################
         # Calculate mean voltages (used for threshold)
         ###############################################
-        binned_data = {}
-        for i, ch_name in enumerate(value_names):
-            ch_data = raw_shots[:, i]  # select per channel
-            binned_data[ch_name] = {}
-            for j, comb in enumerate(combinations):
-                if self.post_selection == True:
-                    binned_data[ch_name][comb] = np.mean(
-                        self.proc_data_dict['post_selected_shots'][ch_name][comb])
-                else:
-                    binned_data[ch_name][comb] = np.mean(
-                        ch_data[j::len(combinations)])  # start at
+        mean_shots = mean_per_combination(shots, prepared, nr_combs)
+        binned_data = {
+            ch_name: {comb: mean_shots[j, i]
+                      for j, comb in enumerate(combinations)}
+            for i, ch_name in enumerate(value_names)}
 
         mn_voltages = {}
         for i, ch_name in enumerate(value_names):
@@ -207,75 +173,45 @@ class Multiplexed_Readout_Analysis(ba.BaseDataAnalysis):
         ################
         # Digitize data
         ################
+        thresholds = np.array([mn_voltages[vn]['threshold']
+                               for vn in value_names])
+        digitized_data = np.array(shots > thresholds, dtype=int)
         if self.post_selection == True:
-            self.proc_data_dict['post_selected_shots_digitized'] = {ch_name : {} for ch_name in value_names}
-            for ch in value_names:
-                for comb in combinations:
-                    self.proc_data_dict['post_selected_shots_digitized'][ch][comb] = np.array( 
-                        self.proc_data_dict['post_selected_shots'][ch][comb] > mn_voltages[ch]['threshold'], dtype=int)
-        else:
-            digitized_data = np.zeros(raw_shots.shape)
-            for i, vn in enumerate(value_names):
-                digitized_data[:, i] = np.array(
-                    raw_shots[:, i] > mn_voltages[vn]['threshold'], dtype=int)
-        
-        # Bin digitized data
-        binned_dig_data = {}
-        for i, ch_name in enumerate(value_names):
-            binned_dig_data[ch_name] = {}
-            if self.post_selection == True:
-                ch_data = self.proc_data_dict['post_selected_shots_digitized'][ch_name]
-                for comb in combinations:
-                    binned_dig_data[ch_name][comb] = np.mean(
-                        ch_data[comb])  # start at
-            else:
-                ch_data = digitized_data[:, i]  # select per channel
-                for j, comb in enumerate(combinations):
-                    binned_dig_data[ch_name][comb] = np.mean(
-                        ch_data[j::len(combinations)])  # start at
+            dig_split = split_per_combination(
+                digitized_data, prepared, nr_combs)
+            self.proc_data_dict['post_selected_shots_digitized'] = {
+                ch_name: {comb: dig_split[j][:, i]
+                          for j, comb in enumerate(combinations)}
+                for i, ch_name in enumerate(value_names)}
 
+        # Bin digitized data
+        mean_dig_data = mean_per_combination(
+            digitized_data, prepared, nr_combs)
+        binned_dig_data = {
+            ch_name: {comb: mean_dig_data[j, i]
+                      for j, comb in enumerate(combinations)}
+            for i, ch_name in enumerate(value_names)}
         self.proc_data_dict['binned_dig_data'] = binned_dig_data
+
         # Calculate assignment probability matrix
+        declared = digitized_to_state_codes(digitized_data)
+        valid_codes = combinations_to_state_codes(valid_combinations)
+        counts = calc_assignment_count_matrix(
+            prepared, declared, nr_combs, valid_codes,
+            ignore_invalid=self.post_selection)
         if self.post_selection == True:
-            assignment_prob_matrix = calc_assignment_prob_matrix(combinations,
-                        self.proc_data_dict['post_selected_shots_digitized'],
-                        valid_combinations = valid_combinations,
-                        post_selection = True)
+            # normalize by the number of post-selected shots per prepared state
+            assignment_prob_matrix = counts/np.bincount(
+                prepared, minlength=nr_combs)[:, None]
         else:
-            assignment_prob_matrix = calc_assignment_prob_matrix(
-                combinations, digitized_data, valid_combinations=valid_combinations)
+            assignment_prob_matrix = counts/np.sum(counts, axis=1)[0]
         self.proc_data_dict['assignment_prob_matrix'] = assignment_prob_matrix
         self.proc_data_dict['quantities_of_interest'] = {'assignment_probability_matrix':assignment_prob_matrix,
                                                          'trace':np.trace(assignment_prob_matrix)}
 
         # calculate cross-fidelity matrix
-        len_labs = len(self.proc_data_dict['qubit_labels'])
-
-        crossFidMat = np.zeros((len_labs, len_labs))
-        for i in range(len_labs):
-            for j in range(len_labs):
-                PeiIj = 0
-                PgiPj = 0
-
-                # Loop over all entries in the Assignment probability matrix
-                for prep_idx, c_prep in enumerate(combinations):
-                    for decl_idx, c_decl in enumerate(combinations):
-                        # Select all entries in the assignment matrix for ei|Ij
-                        if (c_decl[i]=='1') and (c_prep[j] == '0'):
-                            PeiIj += assignment_prob_matrix[prep_idx, decl_idx]
-                        # Select all entries in the assignment matrix for ei|Ij
-                        elif (c_decl[i]=='0') and (c_prep[j] == '1'): # gi|Pj
-                            PgiPj += assignment_prob_matrix[prep_idx, decl_idx]
-
-                # Normalize probabilities
-                normalization_factor = (len(combinations)/2)
-
-                PeiIj = PeiIj/normalization_factor
-                PgiPj = PgiPj/normalization_factor
-
-                # Add entry to cross fidelity matrix
-                Fc = 1 - PeiIj - PgiPj
-                crossFidMat[i,j] = Fc
+        crossFidMat = calc_cross_fidelity_matrix(
+            assignment_prob_matrix, combinations)
 
         self.proc_data_dict['cross_fidelity_matrix'] = crossFidMat
         self.proc_data_dict['quantities_of_interest'] = {'cross_fidelity_matrix': crossFidMat,
@@ -314,63 +250,213 @@ class Multiplexed_Readout_Analysis(ba.BaseDataAnalysis):
             }
 
 
-# def calc_assignment_prob_matrix(combinations, digitized_data,
-#         valid_combinations=None):
+# #######################################
+# Vectorized readout statistics engine
+#######################################
+# Multi-qubit shots are represented by integer state codes, the first qubit
+# being the most significant bit such that the binary representation of a
+# code corresponds to the combination string (e.g., 0b011 -> '011'). All
+# statistics are obtained using np.bincount over (prepared, declared) pairs
+# and scale to many qubits and shots.
+
+
+def digitized_to_state_codes(digitized_data):
+    """
+    Packs digitized shots of shape (nr_shots, nr_qubits) into integer state
+    codes, the first qubit is the most significant bit.
+    """
+    digitized_data = np.asarray(digitized_data, dtype=np.int64)
+    nr_qubits = digitized_data.shape[1]
+    weights = 2**np.arange(nr_qubits-1, -1, -1, dtype=np.int64)
+    return digitized_data @ weights
+
+
+def combinations_to_state_codes(combinations):
+    """
+    Converts combination strings (e.g., '011') to integer state codes.
+    Combinations that are not a valid calibration point (e.g., '012') are
+    converted to -1.
+    """
+    return np.array([int(c, 2) if set(c) <= {'0', '1'} else -1
+                     for c in combinations], dtype=np.int64)
+
+
+def calc_assignment_count_matrix(prepared, declared, nr_prepared: int,
+                                 valid_codes, ignore_invalid: bool = False):
+    """
+    Counts how often each valid state is declared for each prepared state.
+
+    Args:
+        prepared (array of int): index of the prepared combination per shot.
+        declared (array of int): declared state code per shot, see
+            digitized_to_state_codes.
+        nr_prepared (int): number of prepared combinations.
+        valid_codes (array of int): state codes corresponding to the columns
+            of the matrix.
+        ignore_invalid (bool): if False, a ValueError is raised when a shot
+            is declared in a state that is not in valid_codes.
+
+    Returns:
+        counts (array): shape (nr_prepared, len(valid_codes)), rows
+            correspond to the prepared and columns to the declared states.
+    """
+    prepared = np.asarray(prepared, dtype=np.int64)
+    declared = np.asarray(declared, dtype=np.int64)
+    valid_codes = np.asarray(valid_codes, dtype=np.int64)
+    nr_valid = len(valid_codes)
+
+    # lookup table from state code to column index
+    lut_size = max(np.max(valid_codes, initial=-1),
+                   np.max(declared, initial=-1)) + 1
+    lut = -np.ones(lut_size, dtype=np.int64)
+    lut[valid_codes[valid_codes >= 0]] = np.arange(nr_valid)[valid_codes >= 0]
+    declared_idx = lut[declared]
+
+    is_valid = declared_idx >= 0
+    if not np.all(is_valid):
+        if not ignore_invalid:
+            raise ValueError('Declared state {} is not a valid '
+                             'combination.'.format(
+                                 declared[~is_valid][0]))
+        prepared = prepared[is_valid]
+        declared_idx = declared_idx[is_valid]
+
+    counts = np.bincount(prepared*nr_valid + declared_idx,
+                         minlength=nr_prepared*nr_valid)
+    return counts.reshape(nr_prepared, nr_valid).astype(float)
+
+
+def calc_cross_fidelity_matrix(assignment_prob_matrix, combinations):
+    """
+    Calculates the cross-fidelity matrix F_ij = 1 - P(e_i|I_j) - P(g_i|P_j)
+    from an assignment probability matrix. I_j (P_j) denotes that qubit j
+    was prepared in the ground (excited) state.
+    """
+    bits = np.array([[c == '1' for c in comb] for comb in combinations],
+                    dtype=float)
+    nr_decl = np.shape(assignment_prob_matrix)[1]
+    prep_1, decl_1 = bits, bits[:nr_decl]
+    prep_0, decl_0 = 1-prep_1, 1-decl_1
+    # [j, i] elements of the probability sums
+    PeiIj = prep_0.T @ assignment_prob_matrix @ decl_1
+    PgiPj = prep_1.T @ assignment_prob_matrix @ decl_0
+
+    # Normalize probabilities
+    normalization_factor = (len(combinations)/2)
+    return 1 - (PeiIj + PgiPj).T/normalization_factor
+
+
+def histogram_per_combination(shots, prepared, nr_prepared: int,
+                              bins: int = 100, range: tuple = None):
+    """
+    Histograms the shots of a single channel for every prepared combination
+    at once, equivalent to calling np.histogram for every combination.
+
+    Returns:
+        counts (array): shape (nr_prepared, bins).
+        bin_centers (array)
+    """
+    shots = np.asarray(shots, dtype=float)
+    if range is None:
+        range = (np.min(shots), np.max(shots))
+    lo, hi = float(range[0]), float(range[1])
+    if lo == hi:
+        lo, hi = lo - 0.5, hi + 0.5
+    bin_edges = np.linspace(lo, hi, bins+1)
+
+    bin_idx = np.searchsorted(bin_edges, shots, side='right') - 1
+    # the last bin includes the right edge
+    bin_idx[shots == hi] = bins - 1
+    in_range = (bin_idx >= 0) & (bin_idx < bins)
+
+    counts = np.bincount(
+        np.asarray(prepared)[in_range]*bins + bin_idx[in_range],
+        minlength=nr_prepared*bins).reshape(nr_prepared, bins)
+    bin_centers = bin_edges[:-1]+(bin_edges[1]-bin_edges[0])/2
+    return counts, bin_centers
+
+
+def mean_per_combination(shots, prepared, nr_prepared: int):
+    """
+    Mean of shots of shape (nr_shots, nr_channels) for every prepared
+    combination, returns an array of shape (nr_prepared, nr_channels).
+    """
+    shots = np.asarray(shots, dtype=float)
+    nr_shots = np.bincount(prepared, minlength=nr_prepared)
+    sums = np.stack([np.bincount(prepared, weights=shots[:, i],
+                                 minlength=nr_prepared)
+                     for i in np.arange(shots.shape[1])], axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums/nr_shots[:, None]
+
 
-#     if valid_combinations is None:
-#         valid_combinations = combinations
-#     assignment_prob_matrix = np.zeros((len(combinations),
-#         len(valid_combinations)))
-#     # for input_state in combinations:
+def split_per_combination(shots, prepared, nr_prepared: int):
+    """
+    Splits shots of shape (nr_shots, nr_channels) into a list containing
+    the shots of every prepared combination.
+    """
+    order = np.argsort(prepared, kind='stable')
+    boundaries = np.cumsum(np.bincount(prepared, minlength=nr_prepared))
+    return np.split(np.asarray(shots)[order], boundaries[:-1])
 
-#     for i, outcome in enumerate(digitized_data):
-#         decl_state = ''.join([str(int(s)) for s in outcome])
-#         # check what combination the declared state corresponds to
-#         decl_state_idx = valid_combinations.index(decl_state)
 
-#         # row -> input state
-#         # column -> declared state
-#         # increment the count of the declared state for the input state by 1
-#         assignment_prob_matrix[i % len(combinations), decl_state_idx] += 1
+def get_post_selection_mask(post_selec_shots, thresholds,
+                            positive_case: bool = True):
+    """
+    Returns a boolean mask of the shots that pass post-selection, i.e.,
+    none of the channels of the post-selection measurement (shape
+    (nr_shots, nr_channels)) exceeds its threshold (positive_case=True) or
+    is below its threshold (positive_case=False).
+    """
+    if positive_case:
+        failed = post_selec_shots > thresholds
+    else:
+        failed = post_selec_shots < thresholds
+    return ~np.any(failed, axis=1)
 
-#     # Normalize the matrix
-#     assignment_prob_matrix /= np.sum(assignment_prob_matrix, axis=1)[0]
-#     return assignment_prob_matrix
 
 def calc_assignment_prob_matrix(combinations, digitized_data,
         valid_combinations=None, post_selection = False):
-
+    """
+    Calculates the assignment probability matrix.
+
+    Args:
+        combinations (list of str): prepared combinations.
+        digitized_data: if post_selection is False, an array of shape
+            (nr_shots, nr_qubits) where shot i corresponds to combination
+            i % len(combinations). If post_selection is True, a dict
+            {channel: {combination: digitized shots}}.
+        valid_combinations (list of str): declared combinations
+    """
     if valid_combinations is None:
         valid_combinations = combinations
-    assignment_prob_matrix = np.zeros((len(combinations),
-        len(valid_combinations)))
+    valid_codes = combinations_to_state_codes(valid_combinations)
 
     if post_selection == True:
+        channels = list(digitized_data.keys())
+        prepared, declared = [], []
         for i, input_state in enumerate(combinations):
-            
-            for j, outcome in enumerate(valid_combinations):
-                first_key = next(iter(digitized_data))
-                Check = np.ones(len(digitized_data[first_key][input_state])) # use first qubit for reference
-                
-                for k, ch in enumerate(digitized_data.keys()):
-                    check = digitized_data[ch][input_state] == int(outcome[k])
-                    Check *= check
-
-                assignment_prob_matrix[i][j] = sum(Check)/len(Check)
+            shots = np.stack([digitized_data[ch][input_state]
+                              for ch in channels], axis=1)
+            prepared.append(np.full(len(shots), i))
+            declared.append(digitized_to_state_codes(shots))
+        counts = calc_assignment_count_matrix(
+            np.concatenate(prepared), np.concatenate(declared),
+            len(combinations), valid_codes, ignore_invalid=True)
+        nr_shots = np.array([len(d) for d in declared])
+        assignment_prob_matrix = counts/nr_shots[:, None]
     else:
-        for i, outcome in enumerate(digitized_data):
-            decl_state = ''.join([str(int(s)) for s in outcome])
-            # check what combination the declared state corresponds to
-            decl_state_idx = valid_combinations.index(decl_state)
-
-            # row -> input state
-            # column -> declared state
-            # increment the count of the declared state for the input state by 1
-            assignment_prob_matrix[i % len(combinations), decl_state_idx] += 1
+        digitized_data = np.asarray(digitized_data)
+        # row -> input state
+        # column -> declared state
+        prepared = np.arange(len(digitized_data)) % len(combinations)
+        counts = calc_assignment_count_matrix(
+            prepared, digitized_to_state_codes(digitized_data),
+            len(combinations), valid_codes)
 
         # Normalize the matrix
-        assignment_prob_matrix /= np.sum(assignment_prob_matrix, axis=1)[0]
-        
+        assignment_prob_matrix = counts/np.sum(counts, axis=1)[0]
+
     return assignment_prob_matrix
 
 
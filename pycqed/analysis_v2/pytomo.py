@@ -8,6 +8,7 @@ import subprocess
 import string
 import getopt
 from numpy import zeros, eye
+import numpy as np
 import uuid
 
 i = j = 1j
@@ -16,6 +17,12 @@ File that prepares the input and reads the output from the .exe executable file.
 The executable contains a Convex semidefinite programming code, that is a faster version of MLE.
 This code was originally developed by NATHAN LANGFORD.
 
+The same (weighted least squares) problems are also solved in-process by a
+numpy implementation based on projected gradient descent, see
+tomo_state_mle and tomo_process_mle. This is the default solver ('mle') of
+tomo_state and tomo_process and supports reconstructing a stack of datasets
+at once.
+
 """
 
 #-------------------------------------------------------------------------
@@ -820,11 +827,19 @@ def reconstructrho_process(x, dim, OPT):
 def tomo_state(data, observables, weights, filebase=None, fixedweight=True, tomo_options={}):
 
     OPT = {'verbose': False, 'prettyprint': False,
-           'solver': 'csdp', 'normalised': False}
+           'solver': 'mle', 'normalised': False}
     for o, a in list(tomo_options.items()):
         OPT[o] = a
     # default option defaults
 
+    if OPT['solver'] == 'mle':
+        rho = tomo_state_mle(data, observables, weights,
+                             fixedweight=fixedweight,
+                             normalised=OPT['normalised'])
+        if OPT['prettyprint']:
+            pretty_print(rho)
+        return rho
+
     if filebase is None:
         filebase = 'temp' + str(uuid.uuid4())
 
@@ -893,11 +908,19 @@ def tomo_state(data, observables, weights, filebase=None, fixedweight=True, tomo
 def tomo_process(data, inputs, observables, weights, filebase=None, fixedweight=True, tomo_options={}):
 
     OPT = {'verbose': False, 'prettyprint': False,
-           'solver': 'csdp', 'normalised': False}
+           'solver': 'mle', 'normalised': False}
     for o, a in list(tomo_options.items()):
         OPT[o] = a
     # default option defaults
 
+    if OPT['solver'] == 'mle':
+        rho = tomo_process_mle(data, inputs, observables, weights,
+                               fixedweight=fixedweight,
+                               normalised=OPT['normalised'])
+        if OPT['prettyprint']:
+            pretty_print(rho)
+        return rho
+
     if filebase is None:
         filebase = 'temp' + str(uuid.uuid4())
 
@@ -962,3 +985,208 @@ def tomo_process(data, inputs, observables, weights, filebase=None, fixedweight=
     return rho
 
 #-------------------------------------------------------------------------
+
+
+#-------------------------------------------------------------------------
+# In-process solver
+#-------------------------------------------------------------------------
+# The SDP solved by the external solvers minimises
+#     sum_k (data_k - weights_k*tr(E_k rho))**2 / s_k
+# over rho >= 0 (the trace of rho, i.e., the normalisation, is free), where
+# s_k = data_k for fixed weights and s_k = weights_k*tr(E_k rho) otherwise.
+# Here rho is expanded in the orthonormal Gell-Mann basis, such that the
+# problem becomes a linear least squares problem in real coefficients that
+# is solved by accelerated projected gradient descent (FISTA). The
+# non-fixed weights are handled by iteratively reweighting.
+#
+# For process tomography, rho is the d**2 x d**2 process matrix expanded in
+# the products G_j x G_k, and the prediction is
+#     weights_mn*d*tr((R_mn^T x E_mn) rho)
+# rho is constrained to be completely positive and trace preserving
+# (tr_2(rho) proportional to the identity), the projection onto this set is
+# done using Dykstra's alternating projection algorithm.
+
+
+def gellmann_matrices(dim):
+    """
+    Returns the orthonormal Gell-Mann basis of bases(dim) as an array of
+    shape (dim**2, dim, dim).
+    """
+    G = np.zeros((dim**2, dim, dim), dtype=complex)
+    for mu, B in enumerate(bases(dim)):
+        for item in B:
+            G[mu, item[0], item[1]] += item[2]
+    return G
+
+
+def _coefficients_to_matrices(x, G):
+    return np.einsum('bm,mij->bij', x, G)
+
+
+def _matrices_to_coefficients(rho, G):
+    return np.einsum('bij,mji->bm', rho, G).real
+
+
+def _project_psd(x, G):
+    """Projects the matrices with coefficients x onto the PSD cone."""
+    rho = _coefficients_to_matrices(x, G)
+    # enforce exact hermiticity before diagonalisation
+    rho = (rho + np.conj(np.swapaxes(rho, 1, 2)))/2
+    evals, evecs = np.linalg.eigh(rho)
+    evals = np.clip(evals, 0, None)
+    rho = np.einsum('bik,bk,bjk->bij', evecs, evals, np.conj(evecs))
+    return _matrices_to_coefficients(rho, G)
+
+
+def _project_cptp(x, G, not_tp_idx, max_iter=200, tol=1e-10):
+    """
+    Dykstra's alternating projection onto the intersection of the PSD cone
+    and the trace preserving subspace (coefficients not_tp_idx are zero).
+    """
+    p = np.zeros_like(x)
+    q = np.zeros_like(x)
+    for ii in range(max_iter):
+        y = _project_psd(x + p, G)
+        p = x + p - y
+        x_new = y + q
+        x_new[:, not_tp_idx] = 0
+        q = y + q - x_new
+        converged = np.all(np.linalg.norm(x_new - x, axis=1) <=
+                           tol*(1+np.linalg.norm(x, axis=1)))
+        x = x_new
+        if converged:
+            break
+    return x
+
+
+def _fista(A, b, project, x0, max_iter, tol):
+    """
+    Minimises |A x - b|**2 for a stack of problems A (B, K, D), b (B, K)
+    subject to x in the convex set defined by project.
+    """
+    # Lipschitz constant of the gradient 2 A^T (A x - b)
+    L = 2*np.linalg.svd(A, compute_uv=False)[:, 0]**2
+    L[L == 0] = 1
+    x = project(x0)
+    z = x.copy()
+    t = 1.0
+    for ii in range(max_iter):
+        grad = 2*np.einsum('bkm,bk->bm', A, np.einsum('bkm,bm->bk', A, z)-b)
+        x_new = project(z - grad/L[:, None])
+        t_new = (1 + np.sqrt(1 + 4*t**2))/2
+        z = x_new + (t-1)/t_new*(x_new - x)
+        converged = np.all(np.linalg.norm(x_new - x, axis=1) <=
+                           tol*(1+np.linalg.norm(x_new, axis=1)))
+        x, t = x_new, t_new
+        if converged:
+            break
+    return x
+
+
+def _solve_weighted_lsq(data, weights, T, project, fixedweight,
+                        max_iter, tol, n_reweight):
+    """
+    Shared solver of tomo_state_mle and tomo_process_mle, T contains the
+    (unweighted) predictions of the basis elements.
+    """
+    data = np.atleast_2d(np.asarray(data, dtype=float))
+    weights = np.broadcast_to(np.asarray(weights, dtype=float), data.shape)
+    A_raw = weights[:, :, None]*T[None, :, :]
+
+    # variances are floored to avoid infinite weights for zero counts
+    floor = 1e-3*np.mean(np.abs(data), axis=1, keepdims=True)
+    floor[floor == 0] = 1
+
+    # start from the unconstrained (linear inversion) solution
+    x = np.einsum('bmk,bk->bm', np.linalg.pinv(A_raw), data)
+    for ii in range(1 if fixedweight else n_reweight):
+        if fixedweight:
+            s = data
+        else:
+            s = np.einsum('bkm,bm->bk', A_raw, project(x))
+        s = np.maximum(s, floor)
+        A = A_raw/np.sqrt(s)[:, :, None]
+        b = data/np.sqrt(s)
+        x = _fista(A, b, project, x, max_iter=max_iter, tol=tol)
+    return x
+
+
+def tomo_state_mle(data, observables, weights, fixedweight=True,
+                   normalised=False, max_iter=5000, tol=1e-9, n_reweight=5):
+    """
+    In-process reconstruction of a density matrix, solves the same problem
+    as tomo_state with the csdp solver.
+
+    Args:
+        data (array): measured data of shape (K,) or a stack of datasets of
+            shape (B, K) that are reconstructed at once.
+        observables (list): K measurement operators of shape (d, d).
+        weights (array): shape (K,) or (B, K), the prediction of
+            measurement k is weights[k]*tr(observables[k] rho).
+        fixedweight (bool): if True the variance of a measurement is
+            estimated by the data, otherwise by the prediction.
+        normalised (bool): normalise rho to unit trace.
+        max_iter (int): maximum number of projected gradient iterations.
+        tol (float): relative tolerance on the change of rho.
+        n_reweight (int): number of reweighting iterations used if
+            fixedweight is False.
+
+    Returns:
+        rho (array): shape (d, d), or (B, d, d) for a stack of datasets.
+    """
+    observables = np.asarray(observables, dtype=complex)
+    dim = observables.shape[-1]
+    G = gellmann_matrices(dim)
+    # T[k, mu] = tr(E_k G_mu)
+    T = np.einsum('kab,mba->km', observables, G).real
+
+    x = _solve_weighted_lsq(
+        data, weights, T, lambda x: _project_psd(x, G),
+        fixedweight=fixedweight, max_iter=max_iter, tol=tol,
+        n_reweight=n_reweight)
+    rho = _coefficients_to_matrices(x, G)
+    if normalised:
+        rho = rho/np.trace(rho, axis1=1, axis2=2)[:, None, None]
+    return rho[0] if np.ndim(data) == 1 else rho
+
+
+def tomo_process_mle(data, inputs, observables, weights, fixedweight=True,
+                     normalised=False, max_iter=5000, tol=1e-9,
+                     n_reweight=5):
+    """
+    In-process reconstruction of a CPTP process matrix, solves the same
+    problem as tomo_process with the csdp solver.
+
+    Args:
+        data (array): measured data of shape (K,) or (B, K).
+        inputs (list): K input states R_k of shape (d, d).
+        observables (list): K measurement operators E_k of shape (d, d).
+        weights (array): shape (K,) or (B, K).
+        see tomo_state_mle for the other arguments.
+
+    Returns:
+        rho (array): process matrix of shape (d**2, d**2) in the format of
+            reconstructrho_process, or (B, d**2, d**2).
+    """
+    observables = np.asarray(observables, dtype=complex)
+    inputs = np.asarray(inputs, dtype=complex)
+    dim = observables.shape[-1]
+    G = gellmann_matrices(dim)
+    G2 = np.einsum('jab,kce->jkacbe', G, G).reshape(
+        dim**4, dim**2, dim**2)
+    # T[mn, (j, k)] = d tr(R_mn^T G_j) tr(E_mn G_k)
+    TrRG = np.einsum('nab,jab->nj', inputs, G)
+    TrEG = np.einsum('nab,kba->nk', observables, G)
+    T = (dim*np.einsum('nj,nk->njk', TrRG, TrEG).reshape(
+        len(observables), dim**4)).real
+    # coefficients of G_j x G_0 with j > 0 violate trace preservation
+    not_tp_idx = np.arange(1, dim**2)*dim**2
+
+    x = _solve_weighted_lsq(
+        data, weights, T, lambda x: _project_cptp(x, G2, not_tp_idx),
+        fixedweight=fixedweight, max_iter=max_iter, tol=tol,
+        n_reweight=n_reweight)
+    rho = _coefficients_to_matrices(x, G2)
+    if normalised:
+        rho = rho/np.trace(rho, axis1=1, axis2=2)[:, None, None]
+    return rho[0] if np.ndim(data) == 1 else rho
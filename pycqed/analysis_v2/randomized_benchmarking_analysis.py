@@ -8,6 +8,8 @@ from pycqed.analysis import measurement_analysis as ma_old
 import pycqed.analysis_v2.base_analysis as ba
 import numpy as np
 import logging
+import os
+import h5py
 from scipy.stats import sem
 from pycqed.analysis.tools.data_manipulation import \
     populations_using_rate_equations
@@ -72,7 +74,6 @@ class RandomizedBenchmarking_SingleQubit_Analysis(ba.BaseDataAnalysis):
 
         if 'bins' in a.data_file['Experimental Data']['Experimental Metadata'].keys():
             bins = a.data_file['Experimental Data']['Experimental Metadata']['bins'].value
-            self.raw_data_dict['ncl'] = bins[:-6:2]
             self.raw_data_dict['bins'] = bins
 
             self.raw_data_dict['value_names'] = a.value_names
@@ -80,12 +81,7 @@ class RandomizedBenchmarking_SingleQubit_Analysis(ba.BaseDataAnalysis):
             self.raw_data_dict['measurementstring'] = a.measurementstring
             self.raw_data_dict['timestamp_string'] = a.timestamp_string
 
-            self.raw_data_dict['binned_vals'] = OrderedDict()
-            self.raw_data_dict['cal_pts_zero'] = OrderedDict()
-            self.raw_data_dict['cal_pts_one'] = OrderedDict()
-            self.raw_data_dict['cal_pts_two'] = OrderedDict()
-            self.raw_data_dict['measured_values_I'] = OrderedDict()
-            self.raw_data_dict['measured_values_X'] = OrderedDict()
+            binned_vals = OrderedDict()
             for i, val_name in enumerate(a.value_names):
 
                 invalid_idxs = np.where((a.measured_values[0] == 0) &
@@ -93,26 +89,9 @@ class RandomizedBenchmarking_SingleQubit_Analysis(ba.BaseDataAnalysis):
                 a.measured_values[:, invalid_idxs] = \
                     np.array([[np.nan]*len(invalid_idxs)]*2)
 
-                binned_yvals = np.reshape(
+                binned_vals[val_name] = np.reshape(
                     a.measured_values[i], (len(bins), -1), order='F')
-
-                self.raw_data_dict['binned_vals'][val_name] = binned_yvals
-                self.raw_data_dict['cal_pts_zero'][val_name] =\
-                    binned_yvals[-6:-4, :].flatten()
-                self.raw_data_dict['cal_pts_one'][val_name] =\
-                    binned_yvals[-4:-2, :].flatten()
-
-                if self.ignore_f_cal_pts:
-                    self.raw_data_dict['cal_pts_two'][val_name] =\
-                        self.raw_data_dict['cal_pts_one'][val_name]
-                else:
-                    self.raw_data_dict['cal_pts_two'][val_name] =\
-                        binned_yvals[-2:, :].flatten()
-
-                self.raw_data_dict['measured_values_I'][val_name] =\
-                    binned_yvals[:-6:2, :]
-                self.raw_data_dict['measured_values_X'][val_name] =\
-                    binned_yvals[1:-6:2, :]
+            self.set_binned_data(binned_vals)
 
         else:
             bins = None
@@ -121,6 +100,41 @@ class RandomizedBenchmarking_SingleQubit_Analysis(ba.BaseDataAnalysis):
         self.raw_data_dict['timestamps'] = self.timestamps
         a.finish()  # closes data file
 
+    def set_binned_data(self, binned_vals):
+        """
+        Sorts the binned data into the calibration points and the
+        measurements of the different sequence lengths.
+
+        Args:
+            binned_vals (OrderedDict): for every value name an array of
+                shape (nr_bins, nr_shots_per_bin), invalid shots are nan.
+        """
+        self.raw_data_dict['ncl'] = self.raw_data_dict['bins'][:-6:2]
+        self.raw_data_dict['binned_vals'] = OrderedDict()
+        self.raw_data_dict['cal_pts_zero'] = OrderedDict()
+        self.raw_data_dict['cal_pts_one'] = OrderedDict()
+        self.raw_data_dict['cal_pts_two'] = OrderedDict()
+        self.raw_data_dict['measured_values_I'] = OrderedDict()
+        self.raw_data_dict['measured_values_X'] = OrderedDict()
+        for val_name, binned_yvals in binned_vals.items():
+            self.raw_data_dict['binned_vals'][val_name] = binned_yvals
+            self.raw_data_dict['cal_pts_zero'][val_name] =\
+                binned_yvals[-6:-4, :].flatten()
+            self.raw_data_dict['cal_pts_one'][val_name] =\
+                binned_yvals[-4:-2, :].flatten()
+
+            if self.ignore_f_cal_pts:
+                self.raw_data_dict['cal_pts_two'][val_name] =\
+                    self.raw_data_dict['cal_pts_one'][val_name]
+            else:
+                self.raw_data_dict['cal_pts_two'][val_name] =\
+                    binned_yvals[-2:, :].flatten()
+
+            self.raw_data_dict['measured_values_I'][val_name] =\
+                binned_yvals[:-6:2, :]
+            self.raw_data_dict['measured_values_X'][val_name] =\
+                binned_yvals[1:-6:2, :]
+
     def process_data(self):
         self.proc_data_dict = deepcopy(self.raw_data_dict)
 
@@ -427,7 +441,6 @@ class RandomizedBenchmarking_TwoQubit_Analysis(
 
         if 'bins' in a.data_file['Experimental Data']['Experimental Metadata'].keys():
             bins = a.data_file['Experimental Data']['Experimental Metadata']['bins'].value
-            self.raw_data_dict['ncl'] = bins[:-7:2]  # 7 calibration points
             self.raw_data_dict['bins'] = bins
 
             self.raw_data_dict['value_names'] = a.value_names
@@ -435,17 +448,7 @@ class RandomizedBenchmarking_TwoQubit_Analysis(
             self.raw_data_dict['measurementstring'] = a.measurementstring
             self.raw_data_dict['timestamp_string'] = a.timestamp_string
 
-            self.raw_data_dict['binned_vals'] = OrderedDict()
-            self.raw_data_dict['cal_pts_x0'] = OrderedDict()
-            self.raw_data_dict['cal_pts_x1'] = OrderedDict()
-            self.raw_data_dict['cal_pts_x2'] = OrderedDict()
-            self.raw_data_dict['cal_pts_0x'] = OrderedDict()
-            self.raw_data_dict['cal_pts_1x'] = OrderedDict()
-            self.raw_data_dict['cal_pts_2x'] = OrderedDict()
-
-            self.raw_data_dict['measured_values_I'] = OrderedDict()
-            self.raw_data_dict['measured_values_X'] = OrderedDict()
-
+            binned_vals = OrderedDict()
             for i, val_name in enumerate(a.value_names):
                 invalid_idxs = np.where((a.measured_values[0] == 0) &
                                         (a.measured_values[1] == 0) &
@@ -454,30 +457,9 @@ class RandomizedBenchmarking_TwoQubit_Analysis(
                 a.measured_values[:, invalid_idxs] = \
                     np.array([[np.nan]*len(invalid_idxs)]*4)
 
-                binned_yvals = np.reshape(
+                binned_vals[val_name] = np.reshape(
                     a.measured_values[i], (len(bins), -1), order='F')
-                self.raw_data_dict['binned_vals'][val_name] = binned_yvals
-
-                # 7 cal points:  [00, 01, 10, 11, 02, 20, 22]
-                #      col_idx:  [-7, -6, -5, -4, -3, -2, -1]
-                self.raw_data_dict['cal_pts_x0'][val_name] =\
-                    binned_yvals[(-7, -5), :].flatten()
-                self.raw_data_dict['cal_pts_x1'][val_name] =\
-                    binned_yvals[(-6, -4), :].flatten()
-                self.raw_data_dict['cal_pts_x2'][val_name] =\
-                    binned_yvals[(-3, -1), :].flatten()
-
-                self.raw_data_dict['cal_pts_0x'][val_name] =\
-                    binned_yvals[(-7, -6), :].flatten()
-                self.raw_data_dict['cal_pts_1x'][val_name] =\
-                    binned_yvals[(-5, -4), :].flatten()
-                self.raw_data_dict['cal_pts_2x'][val_name] =\
-                    binned_yvals[(-2, -1), :].flatten()
-
-                self.raw_data_dict['measured_values_I'][val_name] =\
-                    binned_yvals[:-7:2, :]
-                self.raw_data_dict['measured_values_X'][val_name] =\
-                    binned_yvals[1:-7:2, :]
+            self.set_binned_data(binned_vals)
 
         else:
             bins = None
@@ -486,6 +468,52 @@ class RandomizedBenchmarking_TwoQubit_Analysis(
         self.raw_data_dict['timestamps'] = self.timestamps
         a.finish()  # closes data file
 
+    def set_binned_data(self, binned_vals):
+        """
+        Sorts the binned data into the calibration points and the
+        measurements of the different sequence lengths.
+
+        Args:
+            binned_vals (OrderedDict): for every value name an array of
+                shape (nr_bins, nr_shots_per_bin), invalid shots are nan.
+        """
+        # 7 calibration points
+        self.raw_data_dict['ncl'] = self.raw_data_dict['bins'][:-7:2]
+        self.raw_data_dict['binned_vals'] = OrderedDict()
+        self.raw_data_dict['cal_pts_x0'] = OrderedDict()
+        self.raw_data_dict['cal_pts_x1'] = OrderedDict()
+        self.raw_data_dict['cal_pts_x2'] = OrderedDict()
+        self.raw_data_dict['cal_pts_0x'] = OrderedDict()
+        self.raw_data_dict['cal_pts_1x'] = OrderedDict()
+        self.raw_data_dict['cal_pts_2x'] = OrderedDict()
+
+        self.raw_data_dict['measured_values_I'] = OrderedDict()
+        self.raw_data_dict['measured_values_X'] = OrderedDict()
+
+        for val_name, binned_yvals in binned_vals.items():
+            self.raw_data_dict['binned_vals'][val_name] = binned_yvals
+
+            # 7 cal points:  [00, 01, 10, 11, 02, 20, 22]
+            #      col_idx:  [-7, -6, -5, -4, -3, -2, -1]
+            self.raw_data_dict['cal_pts_x0'][val_name] =\
+                binned_yvals[(-7, -5), :].flatten()
+            self.raw_data_dict['cal_pts_x1'][val_name] =\
+                binned_yvals[(-6, -4), :].flatten()
+            self.raw_data_dict['cal_pts_x2'][val_name] =\
+                binned_yvals[(-3, -1), :].flatten()
+
+            self.raw_data_dict['cal_pts_0x'][val_name] =\
+                binned_yvals[(-7, -6), :].flatten()
+            self.raw_data_dict['cal_pts_1x'][val_name] =\
+                binned_yvals[(-5, -4), :].flatten()
+            self.raw_data_dict['cal_pts_2x'][val_name] =\
+                binned_yvals[(-2, -1), :].flatten()
+
+            self.raw_data_dict['measured_values_I'][val_name] =\
+                binned_yvals[:-7:2, :]
+            self.raw_data_dict['measured_values_X'][val_name] =\
+                binned_yvals[1:-7:2, :]
+
     def process_data(self):
         self.proc_data_dict = deepcopy(self.raw_data_dict)
 
@@ -725,7 +753,6 @@ class UnitarityBenchmarking_TwoQubit_Analysis(
 
         if 'bins' in a.data_file['Experimental Data']['Experimental Metadata'].keys():
             bins = a.data_file['Experimental Data']['Experimental Metadata']['bins'].value
-            self.raw_data_dict['ncl'] = bins[:-7:10]  # 7 calibration points
             self.raw_data_dict['bins'] = bins
 
             self.raw_data_dict['value_names'] = a.value_names
@@ -733,25 +760,7 @@ class UnitarityBenchmarking_TwoQubit_Analysis(
             self.raw_data_dict['measurementstring'] = a.measurementstring
             self.raw_data_dict['timestamp_string'] = a.timestamp_string
 
-            self.raw_data_dict['binned_vals'] = OrderedDict()
-            self.raw_data_dict['cal_pts_x0'] = OrderedDict()
-            self.raw_data_dict['cal_pts_x1'] = OrderedDict()
-            self.raw_data_dict['cal_pts_x2'] = OrderedDict()
-            self.raw_data_dict['cal_pts_0x'] = OrderedDict()
-            self.raw_data_dict['cal_pts_1x'] = OrderedDict()
-            self.raw_data_dict['cal_pts_2x'] = OrderedDict()
-
-            self.raw_data_dict['measured_values_ZZ'] = OrderedDict()
-            self.raw_data_dict['measured_values_XZ'] = OrderedDict()
-            self.raw_data_dict['measured_values_YZ'] = OrderedDict()
-            self.raw_data_dict['measured_values_ZX'] = OrderedDict()
-            self.raw_data_dict['measured_values_XX'] = OrderedDict()
-            self.raw_data_dict['measured_values_YX'] = OrderedDict()
-            self.raw_data_dict['measured_values_ZY'] = OrderedDict()
-            self.raw_data_dict['measured_values_XY'] = OrderedDict()
-            self.raw_data_dict['measured_values_YY'] = OrderedDict()
-            self.raw_data_dict['measured_values_mZmZ'] = OrderedDict()
-
+            binned_vals = OrderedDict()
             for i, val_name in enumerate(a.value_names):
                 invalid_idxs = np.where((a.measured_values[0] == 0) &
                                         (a.measured_values[1] == 0) &
@@ -760,46 +769,9 @@ class UnitarityBenchmarking_TwoQubit_Analysis(
                 a.measured_values[:, invalid_idxs] = \
                     np.array([[np.nan]*len(invalid_idxs)]*4)
 
-                binned_yvals = np.reshape(
+                binned_vals[val_name] = np.reshape(
                     a.measured_values[i], (len(bins), -1), order='F')
-                self.raw_data_dict['binned_vals'][val_name] = binned_yvals
-
-                # 7 cal points:  [00, 01, 10, 11, 02, 20, 22]
-                #      col_idx:  [-7, -6, -5, -4, -3, -2, -1]
-                self.raw_data_dict['cal_pts_x0'][val_name] =\
-                    binned_yvals[(-7, -5), :].flatten()
-                self.raw_data_dict['cal_pts_x1'][val_name] =\
-                    binned_yvals[(-6, -4), :].flatten()
-                self.raw_data_dict['cal_pts_x2'][val_name] =\
-                    binned_yvals[(-3, -1), :].flatten()
-
-                self.raw_data_dict['cal_pts_0x'][val_name] =\
-                    binned_yvals[(-7, -6), :].flatten()
-                self.raw_data_dict['cal_pts_1x'][val_name] =\
-                    binned_yvals[(-5, -4), :].flatten()
-                self.raw_data_dict['cal_pts_2x'][val_name] =\
-                    binned_yvals[(-2, -1), :].flatten()
-
-                self.raw_data_dict['measured_values_ZZ'][val_name] =\
-                    binned_yvals[0:-7:10, :]
-                self.raw_data_dict['measured_values_XZ'][val_name] =\
-                    binned_yvals[1:-7:10, :]
-                self.raw_data_dict['measured_values_YZ'][val_name] =\
-                    binned_yvals[2:-7:10, :]
-                self.raw_data_dict['measured_values_ZX'][val_name] =\
-                    binned_yvals[3:-7:10, :]
-                self.raw_data_dict['measured_values_XX'][val_name] =\
-                    binned_yvals[4:-7:10, :]
-                self.raw_data_dict['measured_values_YX'][val_name] =\
-                    binned_yvals[5:-7:10, :]
-                self.raw_data_dict['measured_values_ZY'][val_name] =\
-                    binned_yvals[6:-7:10, :]
-                self.raw_data_dict['measured_values_XY'][val_name] =\
-                    binned_yvals[7:-7:10, :]
-                self.raw_data_dict['measured_values_YY'][val_name] =\
-                    binned_yvals[8:-7:10, :]
-                self.raw_data_dict['measured_values_mZmZ'][val_name] =\
-                    binned_yvals[9:-7:10, :]
+            self.set_binned_data(binned_vals)
 
         else:
             bins = None
@@ -808,6 +780,77 @@ class UnitarityBenchmarking_TwoQubit_Analysis(
         self.raw_data_dict['timestamps'] = self.timestamps
         a.finish()  # closes data file
 
+    def set_binned_data(self, binned_vals):
+        """
+        Sorts the binned data into the calibration points and the
+        measurements in the different bases.
+
+        Args:
+            binned_vals (OrderedDict): for every value name an array of
+                shape (nr_bins, nr_shots_per_bin), invalid shots are nan.
+                The shots of every bin are ordered per seed.
+        """
+        # 7 calibration points
+        self.raw_data_dict['ncl'] = self.raw_data_dict['bins'][:-7:10]
+        self.raw_data_dict['binned_vals'] = OrderedDict()
+        self.raw_data_dict['cal_pts_x0'] = OrderedDict()
+        self.raw_data_dict['cal_pts_x1'] = OrderedDict()
+        self.raw_data_dict['cal_pts_x2'] = OrderedDict()
+        self.raw_data_dict['cal_pts_0x'] = OrderedDict()
+        self.raw_data_dict['cal_pts_1x'] = OrderedDict()
+        self.raw_data_dict['cal_pts_2x'] = OrderedDict()
+
+        self.raw_data_dict['measured_values_ZZ'] = OrderedDict()
+        self.raw_data_dict['measured_values_XZ'] = OrderedDict()
+        self.raw_data_dict['measured_values_YZ'] = OrderedDict()
+        self.raw_data_dict['measured_values_ZX'] = OrderedDict()
+        self.raw_data_dict['measured_values_XX'] = OrderedDict()
+        self.raw_data_dict['measured_values_YX'] = OrderedDict()
+        self.raw_data_dict['measured_values_ZY'] = OrderedDict()
+        self.raw_data_dict['measured_values_XY'] = OrderedDict()
+        self.raw_data_dict['measured_values_YY'] = OrderedDict()
+        self.raw_data_dict['measured_values_mZmZ'] = OrderedDict()
+
+        for val_name, binned_yvals in binned_vals.items():
+            self.raw_data_dict['binned_vals'][val_name] = binned_yvals
+
+            # 7 cal points:  [00, 01, 10, 11, 02, 20, 22]
+            #      col_idx:  [-7, -6, -5, -4, -3, -2, -1]
+            self.raw_data_dict['cal_pts_x0'][val_name] =\
+                binned_yvals[(-7, -5), :].flatten()
+            self.raw_data_dict['cal_pts_x1'][val_name] =\
+                binned_yvals[(-6, -4), :].flatten()
+            self.raw_data_dict['cal_pts_x2'][val_name] =\
+                binned_yvals[(-3, -1), :].flatten()
+
+            self.raw_data_dict['cal_pts_0x'][val_name] =\
+                binned_yvals[(-7, -6), :].flatten()
+            self.raw_data_dict['cal_pts_1x'][val_name] =\
+                binned_yvals[(-5, -4), :].flatten()
+            self.raw_data_dict['cal_pts_2x'][val_name] =\
+                binned_yvals[(-2, -1), :].flatten()
+
+            self.raw_data_dict['measured_values_ZZ'][val_name] =\
+                binned_yvals[0:-7:10, :]
+            self.raw_data_dict['measured_values_XZ'][val_name] =\
+                binned_yvals[1:-7:10, :]
+            self.raw_data_dict['measured_values_YZ'][val_name] =\
+                binned_yvals[2:-7:10, :]
+            self.raw_data_dict['measured_values_ZX'][val_name] =\
+                binned_yvals[3:-7:10, :]
+            self.raw_data_dict['measured_values_XX'][val_name] =\
+                binned_yvals[4:-7:10, :]
+            self.raw_data_dict['measured_values_YX'][val_name] =\
+                binned_yvals[5:-7:10, :]
+            self.raw_data_dict['measured_values_ZY'][val_name] =\
+                binned_yvals[6:-7:10, :]
+            self.raw_data_dict['measured_values_XY'][val_name] =\
+                binned_yvals[7:-7:10, :]
+            self.raw_data_dict['measured_values_YY'][val_name] =\
+                binned_yvals[8:-7:10, :]
+            self.raw_data_dict['measured_values_mZmZ'][val_name] =\
+                binned_yvals[9:-7:10, :]
+
     def process_data(self):
         """Averages shot data and calculates unitarity from raw_data_dict.
 
@@ -1294,7 +1337,24 @@ class CharacterBenchmarking_TwoQubit_Analysis(ba.BaseDataAnalysis):
         self.raw_data_dict['timestamp_string'] = a.timestamp_string
         self.raw_data_dict['folder'] = a.folder
         self.raw_data_dict['timestamps'] = self.timestamps
+        self.raw_data_dict['bins'] = bins
+
+        binned_vals = OrderedDict()
+        for i, val_name in enumerate(a.value_names[:4]):
+            binned_vals[val_name] = np.reshape(
+                a.measured_values[i], (len(bins), -1), order='F')
+        self.set_binned_data(binned_vals)
+
+    def set_binned_data(self, binned_vals):
+        """
+        Averages the binned data and groups it per Pauli and interleaved
+        gate.
 
+        Args:
+            binned_vals (OrderedDict): for the I and Q channels of both
+                qubits an array of shape (nr_bins, nr_shots_per_bin).
+        """
+        bins = self.raw_data_dict['bins']
         df = pd.DataFrame(
             columns={'ncl', 'pauli', 'I_q0', 'Q_q0', 'I_q1', 'Q_q1',
                      'interleaving_cl'})
@@ -1319,9 +1379,8 @@ class CharacterBenchmarking_TwoQubit_Analysis(ba.BaseDataAnalysis):
             ['']*4 + ['CZ']*4, len(bins)//8+1)[:len(bins)]
 
         # Data is grouped and single shots are averaged.
-        for i, ch in enumerate(['I_q0', 'Q_q0', 'I_q1', 'Q_q1']):
-            binned_yvals = np.reshape(
-                a.measured_values[i], (len(bins), -1), order='F')
+        for ch, binned_yvals in zip(['I_q0', 'Q_q0', 'I_q1', 'Q_q1'],
+                                    binned_vals.values()):
             yvals = np.mean(binned_yvals, axis=1)
             df[ch] = yvals
 
@@ -1474,6 +1533,217 @@ class CharacterBenchmarking_TwoQubit_Analysis(ba.BaseDataAnalysis):
             'qoi': self.proc_data_dict['quantities_of_interest']}
 
 
+class StreamingBinAverager(object):
+    """
+    Averages single shots per bin while they are being acquired.
+
+    The shots are expected in acquisition order, i.e., shot k belongs to
+    bin k % nr_bins. For every bin the sum and number of valid shots are
+    kept, optionally split in groups of consecutive repetitions (e.g. one
+    group per seed). Shots for which all channels are 0 (missed triggers)
+    or nan are ignored, identical to the extract_data of the RB analyses.
+    """
+
+    def __init__(self, nr_bins: int, nr_channels: int,
+                 shots_per_group: int=None):
+        """
+        Args:
+            nr_bins (int): number of bins (sequence elements).
+            nr_channels (int): number of acquisition channels.
+            shots_per_group (int): number of repetitions of the bins that
+                form a group, all repetitions form a single group if None.
+        """
+        self.nr_bins = nr_bins
+        self.nr_channels = nr_channels
+        self.shots_per_group = shots_per_group
+        self.reset()
+
+    def reset(self):
+        self.nr_shots = 0
+        self.sums = np.zeros((self.nr_channels, self.nr_bins, 1))
+        self.counts = np.zeros((self.nr_bins, 1), dtype=int)
+
+    def add_shots(self, shots):
+        """
+        Args:
+            shots (array): shape (nr_channels, nr_new_shots).
+        """
+        shots = np.asarray(shots, dtype=float).reshape(self.nr_channels, -1)
+        idx = self.nr_shots + np.arange(shots.shape[1])
+        self.nr_shots += shots.shape[1]
+
+        valid = ~(np.all(shots == 0, axis=0) |
+                  np.any(np.isnan(shots), axis=0))
+        idx = idx[valid]
+        shots = shots[:, valid]
+        if len(idx) == 0:
+            return
+
+        bin_idxs = idx % self.nr_bins
+        if self.shots_per_group is None:
+            group_idxs = np.zeros(len(idx), dtype=int)
+        else:
+            group_idxs = idx // self.nr_bins // self.shots_per_group
+        nr_groups = max(group_idxs[-1] + 1, self.counts.shape[1])
+        if nr_groups > self.counts.shape[1]:
+            extra = nr_groups - self.counts.shape[1]
+            self.sums = np.pad(self.sums, ((0, 0), (0, 0), (0, extra)),
+                               mode='constant')
+            self.counts = np.pad(self.counts, ((0, 0), (0, extra)),
+                                 mode='constant')
+
+        flat_idxs = bin_idxs*nr_groups + group_idxs
+        size = self.nr_bins*nr_groups
+        self.counts += np.bincount(
+            flat_idxs, minlength=size).reshape(self.nr_bins, nr_groups)
+        for ch in range(self.nr_channels):
+            self.sums[ch] += np.bincount(
+                flat_idxs, weights=shots[ch], minlength=size).reshape(
+                    self.nr_bins, nr_groups)
+
+    def complete_groups(self):
+        """Indices of the groups that contain shots for every bin."""
+        return np.where(np.all(self.counts > 0, axis=0))[0]
+
+    def binned_means(self, complete_groups_only: bool=True):
+        """
+        Average per bin and group.
+
+        Returns:
+            array of shape (nr_channels, nr_bins, nr_groups)
+        """
+        groups = (self.complete_groups() if complete_groups_only
+                  else np.arange(self.counts.shape[1]))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.sums[:, :, groups]/self.counts[None, :, groups]
+
+
+class StreamingRBAnalysis(object):
+    """
+    Streaming mode for the randomized benchmarking analyses.
+
+    Instead of extracting and averaging the complete dataset for every
+    update, the shots are averaged per bin (and seed) chunk by chunk as
+    they are acquired. A refit only processes these averages, which makes
+    it possible to follow the RB curves during the measurement.
+
+    Supports the analyses that implement set_binned_data:
+    RandomizedBenchmarking_TwoQubit_Analysis,
+    UnitarityBenchmarking_TwoQubit_Analysis,
+    CharacterBenchmarking_TwoQubit_Analysis and the single qubit RB analysis.
+
+    Example:
+        stream = StreamingRBAnalysis(
+            RandomizedBenchmarking_TwoQubit_Analysis, bins=bins,
+            value_names=value_names, t_start=timestamp)
+        while measuring:
+            stream.read_new_shots()  # or stream.add_shots(shots)
+            a = stream.refit()
+    """
+
+    def __init__(self, analysis_class, bins, value_names: list,
+                 t_start: str=None, data_file_path: str=None,
+                 shots_per_seed: int=None, value_units: list=None,
+                 analysis_kw: dict=None):
+        """
+        Args:
+            analysis_class: the analysis used to process and fit the data.
+            bins (array): the bins (sequence elements) of the measurement.
+            value_names (list): names of the acquisition channels.
+            t_start (str): timestamp of the measurement.
+            data_file_path (str): path of the datafile the shots are read
+                from by read_new_shots.
+            shots_per_seed (int): number of repetitions of every bin for
+                one seed. Required for the unitarity analysis, where every
+                seed is averaged separately.
+            value_units (list): units of the acquisition channels.
+            analysis_kw (dict): keyword arguments for the analysis_class.
+        """
+        if t_start is None and data_file_path is None:
+            raise ValueError('Either t_start or data_file_path must be '
+                             'given.')
+        self.analysis_class = analysis_class
+        self.bins = np.asarray(bins)
+        self.value_names = list(value_names)
+        self.value_units = (list(value_units) if value_units is not None
+                            else ['']*len(value_names))
+        self.t_start = t_start
+        self.data_file_path = data_file_path
+        self.analysis_kw = {} if analysis_kw is None else analysis_kw
+        self.averager = StreamingBinAverager(
+            nr_bins=len(self.bins), nr_channels=len(self.value_names),
+            shots_per_group=shots_per_seed)
+        self._nr_rows_read = 0
+        self.analysis = None
+
+    def add_shots(self, shots):
+        """
+        Adds a chunk of shots of shape (nr_channels, nr_new_shots).
+        """
+        self.averager.add_shots(shots)
+
+    def read_new_shots(self):
+        """
+        Reads the rows that were added to the datafile since the last call.
+
+        Returns:
+            the number of new rows.
+        """
+        with h5py.File(self.data_file_path, 'r') as data_file:
+            dset = data_file['Experimental Data']['Data']
+            new_rows = dset[self._nr_rows_read:]
+        if len(new_rows):
+            nr_sweep_cols = new_rows.shape[1] - len(self.value_names)
+            self.add_shots(new_rows[:, nr_sweep_cols:].T)
+            self._nr_rows_read += len(new_rows)
+        return len(new_rows)
+
+    def refit(self, plot: bool=False):
+        """
+        Processes the averaged shots and fits the decay.
+
+        Fit results are not saved to the datafile as the measurement is
+        still writing to it.
+
+        Returns:
+            the analysis object.
+        """
+        if self.analysis is None:
+            self.analysis = self.analysis_class(
+                t_start=self.t_start, auto=False, **self.analysis_kw)
+        a = self.analysis
+
+        means = self.averager.binned_means()
+        if means.shape[2] == 0:
+            raise ValueError('Not all bins have been measured yet.')
+        if hasattr(a, 'nseeds'):
+            if self.averager.shots_per_group is None:
+                raise ValueError('shots_per_seed is required to average '
+                                 'the seeds separately.')
+            # every complete seed is averaged in one column
+            a.nseeds = means.shape[2]
+
+        a.raw_data_dict = OrderedDict()
+        a.raw_data_dict['bins'] = self.bins
+        a.raw_data_dict['value_names'] = self.value_names
+        a.raw_data_dict['value_units'] = self.value_units
+        a.raw_data_dict['measurementstring'] = 'Streaming RB'
+        a.raw_data_dict['timestamp_string'] = self.t_start
+        a.raw_data_dict['timestamps'] = [self.t_start]
+        a.raw_data_dict['folder'] = (
+            os.path.dirname(self.data_file_path)
+            if self.data_file_path is not None else '')
+        a.set_binned_data(OrderedDict(zip(self.value_names, means)))
+
+        a.process_data()
+        a.prepare_fitting()
+        a.run_fitting()
+        a.analyze_fit_results()
+        if plot:
+            a.run_post_extract()
+        return a
+
+
 def plot_cal_points_hexbin(shots_0,
                            shots_1,
                            shots_2,
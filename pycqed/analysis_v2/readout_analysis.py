@@ -19,12 +19,12 @@ from pycqed.analysis.fitting_models import ro_gauss, ro_CDF, ro_CDF_discr, gauss
 import pycqed.analysis.analysis_toolbox as a_tools
 import pycqed.analysis_v2.base_analysis as ba
 import pycqed.analysis_v2.simple_analysis as sa
-from scipy.optimize import minimize
 from pycqed.analysis.tools.plotting import SI_val_to_msg_str, \
     set_xlabel, set_ylabel, set_cbarlabel, flex_colormesh_plot_vs_xy
 from pycqed.analysis_v2.tools.plotting import scatter_pnts_overlay
 from mpl_toolkits.axes_grid1 import make_axes_locatable
 import pycqed.analysis.tools.data_manipulation as dm_tools
+import pycqed.analysis.tools.readout_statistics as ro_stats
 from pycqed.utilities.general import int2base
 from pycqed.utilities.general import format_value_string
 
@@ -41,6 +41,8 @@ class Singleshot_Readout_Analysis(ba.BaseDataAnalysis):
             'fixed_p10'   fixes p(e|g)  res_exc (do not vary in fit)
             'fixed_p01' : fixes p(g|pi) mmt_rel (do not vary in fit)
             'auto_rotation_angle' : (bool) automatically find the I/Q mixing angle
+            'rotation_angle_method' : 'fit' (default) fits 2D gaussians to
+                the I/Q histograms, 'median' uses the medians of the shots
             'rotation_angle' : manually define the I/Q mixing angle (ignored if auto_rotation_angle is set to True)
             'nr_bins' : number of bins to use for the histograms
             'post_select' : (bool) sets on or off the post_selection based on an initialization measurement (needs to be in agreement with nr_samples)
@@ -97,8 +99,9 @@ class Singleshot_Readout_Analysis(ba.BaseDataAnalysis):
         ######################################################
         meas_val = self.raw_data_dict['measured_values']
         unit = self.raw_data_dict['value_units'][0]
-        # loop through channels
-        shots = np.zeros((2, len(meas_val),), dtype=np.ndarray)
+        # loop through channels, the shots of each state are stored as a
+        # contiguous float array of shape (nr_channels, nr_shots)
+        shots_0, shots_1 = [], []
         for j, dat in enumerate(meas_val):
             assert unit == self.raw_data_dict['value_units'][
                 j], 'The channels have been measured using different units. This is not supported yet.'
@@ -106,28 +109,29 @@ class Singleshot_Readout_Analysis(ba.BaseDataAnalysis):
                 dat, post_select=post_select, nr_samples=nr_samples,
                 post_select_threshold=post_select_threshold,
                 sample_0=sample_0, sample_1=sample_1)
-            shots[0, j] = sh_0
-            shots[1, j] = sh_1
-        #shots = np.array(shots, dtype=float)
+            shots_0.append(sh_0)
+            shots_1.append(sh_1)
+        shots = [ro_stats.as_shot_array(shots_0),
+                 ro_stats.as_shot_array(shots_1)]
 
         # Do we have two quadratures?
         if len(meas_val) == 2:
             ########################################################
             # Bin the data in 2D, to calculate the opt. angle
             ########################################################
-            data_range_x = (np.min([np.min(b) for b in shots[:, 0]]),
-                            np.max([np.max(b) for b in shots[:, 0]]))
-            data_range_y = (np.min([np.min(b) for b in shots[:, 1]]),
-                            np.max([np.max(b) for b in shots[:, 1]]))
+            data_range_x = (min(np.min(shots[0][0]), np.min(shots[1][0])),
+                            max(np.max(shots[0][0]), np.max(shots[1][0])))
+            data_range_y = (min(np.min(shots[0][1]), np.min(shots[1][1])),
+                            max(np.max(shots[0][1]), np.max(shots[1][1])))
             data_range_xy = (data_range_x, data_range_y)
             nr_bins_2D = int(self.options_dict.get(
                 'nr_bins_2D', 6*np.sqrt(nr_bins)))
-            H0, xedges, yedges = np.histogram2d(x=shots[0, 0],
-                                                y=shots[0, 1],
+            H0, xedges, yedges = np.histogram2d(x=shots[0][0],
+                                                y=shots[0][1],
                                                 bins=nr_bins_2D,
                                                 range=data_range_xy)
-            H1, xedges, yedges = np.histogram2d(x=shots[1, 0],
-                                                y=shots[1, 1],
+            H1, xedges, yedges = np.histogram2d(x=shots[1][0],
+                                                y=shots[1][1],
                                                 bins=nr_bins_2D,
                                                 range=data_range_xy)
             binsize_x = xedges[1] - xedges[0]
@@ -141,7 +145,13 @@ class Singleshot_Readout_Analysis(ba.BaseDataAnalysis):
             # Find and apply the effective/rotated integrated voltage
             angle = self.options_dict.get('rotation_angle', 0)
             auto_angle = self.options_dict.get('auto_rotation_angle', True)
-            if auto_angle:
+            angle_method = self.options_dict.get('rotation_angle_method',
+                                                 'fit')
+            if auto_angle and angle_method == 'median':
+                angle, iq_pos = ro_stats.iq_rotation_angle(shots[0], shots[1])
+                self.proc_data_dict['IQ_pos'] = iq_pos.tolist()
+                mid = list(np.mean(iq_pos, axis=1))
+            elif auto_angle:
                 ##########################################
                 #  Determining the rotation of the data  #
                 ##########################################
@@ -187,12 +197,11 @@ class Singleshot_Readout_Analysis(ba.BaseDataAnalysis):
             rot_mat = [[+np.cos(-angle), -np.sin(-angle)],
                        [+np.sin(-angle), +np.cos(-angle)]]
             # rotate data accordingly
-            eff_sh = np.zeros(len(shots[0]), dtype=np.ndarray)
-            eff_sh[0] = np.dot(rot_mat[0], shots[0])  # - mid
-            eff_sh[1] = np.dot(rot_mat[0], shots[1])  # - mid
+            eff_sh = [np.dot(rot_mat[0], shots[0]),  # - mid
+                      np.dot(rot_mat[0], shots[1])]  # - mid
         else:
             # If we have only one quadrature, use that (doh!)
-            eff_sh = shots[:, 0]
+            eff_sh = [shots[0][0], shots[1][0]]
 
         self.proc_data_dict['all_channel_int_voltages'] = shots
         # self.raw_data_dict['value_names'][0]
@@ -243,11 +252,10 @@ class Singleshot_Readout_Analysis(ba.BaseDataAnalysis):
         #######################################################
         # Average assignment fidelity: F_ass = (P01 - P10 )/2
         # where Pxy equals probability to measure x when starting in y
-        F_vs_th = (1-(1-abs(necumsum0 - necumsum1))/2)
-        opt_idxs = np.argwhere(F_vs_th == np.amax(F_vs_th))
-        opt_idx = int(round(np.average(opt_idxs)))
-        self.proc_data_dict['F_assignment_raw'] = F_vs_th[opt_idx]
-        self.proc_data_dict['threshold_raw'] = all_x[opt_idx]
+        # evaluated exactly at every shot value
+        F_ass_raw, th_raw = ro_stats.raw_assignment_fidelity(*eff_sh)
+        self.proc_data_dict['F_assignment_raw'] = F_ass_raw
+        self.proc_data_dict['threshold_raw'] = th_raw
 
     def prepare_fitting(self):
         ###################################
@@ -321,16 +329,12 @@ class Singleshot_Readout_Analysis(ba.BaseDataAnalysis):
         self._CDF_1 = CDF_1
         self._infid_vs_th = infid_vs_th
 
-        thr_guess = (3*bv['B_center'] - bv['A_center'])/2
-        opt_fid = minimize(infid_vs_th, thr_guess)
-
-        # for some reason the fit sometimes returns a list of values
-        if isinstance(opt_fid['fun'], float):
-            self.proc_data_dict['F_assignment_fit'] = (1-opt_fid['fun'])
-        else:
-            self.proc_data_dict['F_assignment_fit'] = (1-opt_fid['fun'])[0]
-
-        self.proc_data_dict['threshold_fit'] = opt_fid['x'][0]
+        # The optimal threshold lies at an intersection of the gaussians
+        threshold_fit, F_assignment_fit = ro_stats.double_gauss_threshold(
+            bv['A_center'], bv['A_sigma'], bv['B_center'], bv['B_sigma'],
+            bv['A_spurious'], bv['B_spurious'])
+        self.proc_data_dict['F_assignment_fit'] = F_assignment_fit
+        self.proc_data_dict['threshold_fit'] = threshold_fit
 
         # Calculate the fidelity of both
 
@@ -357,15 +361,10 @@ class Singleshot_Readout_Analysis(ba.BaseDataAnalysis):
         self._CDF_1_discr = CDF_1_discr
         self._disc_infid_vs_th = disc_infid_vs_th
 
-        opt_fid_discr = minimize(disc_infid_vs_th, thr_guess)
-
-        # for some reason the fit sometimes returns a list of values
-        if isinstance(opt_fid_discr['fun'], float):
-            self.proc_data_dict['F_discr'] = (1-opt_fid_discr['fun'])
-        else:
-            self.proc_data_dict['F_discr'] = (1-opt_fid_discr['fun'])[0]
-
-        self.proc_data_dict['threshold_discr'] = opt_fid_discr['x'][0]
+        threshold_discr, F_discr = ro_stats.double_gauss_threshold(
+            bv['A_center'], bv['A_sigma'], bv['B_center'], bv['B_sigma'])
+        self.proc_data_dict['F_discr'] = F_discr
+        self.proc_data_dict['threshold_discr'] = threshold_discr
 
         fr = self.fit_res['shots_all']
         bv = fr.params
@@ -568,7 +567,7 @@ class Singleshot_Readout_Analysis(ba.BaseDataAnalysis):
             # Scatter Shots
             volts = self.proc_data_dict['all_channel_int_voltages']
 
-            v_flat = np.concatenate(np.concatenate(volts))
+            v_flat = np.concatenate([v.ravel() for v in volts])
             plot_range = (np.min(v_flat), np.max(v_flat))
 
             vxr = plot_range
@@ -80,6 +80,9 @@ class TomoAnalysis():
         self.basis_comp_to_pauli_trafo_matrix= np.linalg.inv(A)
         #get dims of qutip objects
         self.qt_dims = [[2 for i in range(self.n_qubits)], [2 for i in range(self.n_qubits)]]
+        # pseudo-inverses of the linear inversion coefficient matrices,
+        # see _get_LI_pseudo_inverse
+        self._LI_pinv_cache = {}
         if check_labels is True:
                 # prints the order of basis set corresponding to the
                 # tomographic rotations
@@ -100,24 +103,77 @@ class TomoAnalysis():
 
 
         #for each independent set of measurements(with their own measurement operator, calculate the coeff matrix)
-        coeff_matrices = []
-        for measurement_operator in meas_operators:
-            coeff_matrices.append(self.calculate_LI_coefficient_matrix(measurement_operator, do_in_pauli=use_pauli_basis))
-        coefficient_matrix = np.vstack(coeff_matrices)
+        pinv = self._get_LI_pseudo_inverse(meas_operators,
+                                           use_pauli_basis=use_pauli_basis)
         basis_decomposition = np.zeros(4 ** self.n_qubits, dtype=complex)
         if use_pauli_basis:
             # first skip beta0
             #basis_decomposition[1:] = np.dot(np.linalg.pinv(coefficient_matrix[:, 1:]), meas_tomo)
-            basis_decomposition[:] = np.dot(np.linalg.pinv(coefficient_matrix[:, :]), meas_tomo)
+            basis_decomposition[:] = np.dot(pinv, meas_tomo)
             # re-add beta0
             #basis_decomposition[0] = betas[0]
             rho = self.trans_pauli_to_comp(basis_decomposition)
         else:
-            basis_decomposition = np.conj(np.linalg.pinv(coefficient_matrix)).dot(meas_tomo)
+            basis_decomposition = np.conj(pinv).dot(meas_tomo)
             rho = qt.Qobj(np.reshape(basis_decomposition, [self.n_states, self.n_states]),
                      dims=self.qt_dims)
         return (basis_decomposition, rho)
 
+    def execute_pseudo_inverse_tomo_batch(self, meas_operators, meas_tomo,
+                                          target_rho=None,
+                                          project_physical=True):
+        """
+        Linear inversion tomography of a stack of datasets (e.g., bootstrap
+        resamples, see resample_tomo_data) in a single matrix multiply.
+
+        Args:
+            meas_operators: measurement operator(s), see
+                execute_pseudo_inverse_tomo.
+            meas_tomo (array): shape (n_datasets, n_measurements).
+            target_rho (Qobj or array): if given, the fidelity of every
+                reconstructed state to the target state is calculated.
+            project_physical (bool): project the reconstructed states onto
+                the closest physical states, see project_to_physical_states.
+
+        Returns:
+            dict with
+                'rhos' (array): shape (n_datasets, n_states, n_states)
+                'purities' (array): shape (n_datasets,)
+                'fidelities' (array): shape (n_datasets,), only if
+                    target_rho is given.
+        """
+        meas_operators = [meas_operators] if type(meas_operators) == qt.Qobj else meas_operators
+        pinv = self._get_LI_pseudo_inverse(meas_operators)
+
+        meas_tomo = np.atleast_2d(meas_tomo)
+        rhos = np.dot(meas_tomo, np.conj(pinv).T).reshape(
+            len(meas_tomo), self.n_states, self.n_states)
+        if project_physical:
+            rhos = project_to_physical_states(rhos)
+
+        result = {'rhos': rhos, 'purities': calc_purities(rhos)}
+        if target_rho is not None:
+            result['fidelities'] = calc_fidelities(rhos, target_rho)
+        return result
+
+    def _get_LI_pseudo_inverse(self, meas_operators, use_pauli_basis=False):
+        """
+        Returns the pseudo-inverse of the linear inversion coefficient matrix
+        of a set of measurement operators. The pseudo-inverse is calculated
+        once per set of operators and cached.
+        """
+        key = (self.n_qubits, use_pauli_basis,
+               tuple(np.asarray(m.full() if type(m) == qt.Qobj else m,
+                                dtype=complex).tobytes()
+                     for m in meas_operators))
+        if key not in self._LI_pinv_cache:
+            coeff_matrices = []
+            for measurement_operator in meas_operators:
+                coeff_matrices.append(self.calculate_LI_coefficient_matrix(measurement_operator, do_in_pauli=use_pauli_basis))
+            coefficient_matrix = np.vstack(coeff_matrices)
+            self._LI_pinv_cache[key] = np.linalg.pinv(coefficient_matrix)
+        return self._LI_pinv_cache[key]
+
 
 
     def execute_mle_T_matrix_tomo(self, measurement_operators, meas_tomo, weights_tomo =False,
@@ -193,26 +249,9 @@ class TomoAnalysis():
         # if(np.sum(np.where(np.array(counts_tomo) == 0)) > 0):
                 # print("WARNING: Some bins contain zero counts, this violates gaussian assumptions. \n \
                         # If correct_zero_count_bins=True these will be set to 1 to minimize errors")
-        if correct_zero_count_bins:
-            counts_tomo = np.array([[int(b) if b > 0 else  1 for b in bin_counts] for bin_counts in counts_tomo])
-
-
-        #Select the correct data based on the bins used
-        #(and therefore based on the projection operators used)
-        data = counts_tomo[:,used_bins].T.flatten()
-        #get the total number of counts per tomo
-        N = np.array([np.sum(counts_tomo, axis=1) for k in used_bins]).flatten()
-
-        # add weights based on the total number of data points kept each run
-        # N_total is a bit arbitrary but should be the average number of total counts of all runs, since in nathans code this
-        # average is estimated as a parameter.
-        weights = N/float(N_total)
-        #get the observables from the rotation operators and the bins kept(and their corresponding projection operators)
-        measurement_vectors = []
-        for k in used_bins:
-            measurement_vectors.append([m.full() for m in  self.get_measurement_vector(measurement_operators[k])])
-        measurement_vector = np.vstack(measurement_vectors)
-        # print('length of the measurement vector'len(measurement_vector))
+        data, N, weights, measurement_vector = self._get_SDPA_problem(
+            measurement_operators, counts_tomo, N_total, used_bins,
+            correct_zero_count_bins)
         #calculate the density matrix using the csdp solver
         a = time.time()
         rho_nathan = csdp_tomo.tomo_state(data, measurement_vector, weights)
@@ -248,21 +287,57 @@ class TomoAnalysis():
         If array_like is set to true it will just return a 3D array of rhos
         """
 
-        rhos= []
-        for i in range(n_runs):
-            #generate a data set based on multinomial distribution with means according to the measured data
-            mc = [np.random.multinomial(sum(counts),(np.array(counts)+0.0) / sum(counts)) for counts in counts_tomo]
-            rhos.append(self.execute_SDPA_2qubit_tomo(measurement_operators,
-                                                      mc,
-                                                      N_total,
-                                                      used_bins,
-                                                      correct_measurement_operators,
-                                                      TE_correction_matrix=TE_correction_matrix))
+        # generate the data sets based on a multinomial distribution with
+        # means according to the measured data
+        counts_tomo = np.array(counts_tomo)
+        problems = [
+            self._get_SDPA_problem(
+                measurement_operators,
+                [np.random.multinomial(sum(counts), (np.array(counts)+0.0) /
+                                       sum(counts))
+                 for counts in counts_tomo],
+                N_total, used_bins)
+            for i in range(n_runs)]
+        data = np.array([p[0] for p in problems])
+        weights = np.array([p[2] for p in problems])
+        measurement_vector = problems[0][3]
+
+        # all data sets are reconstructed at once
+        rhos = csdp_tomo.tomo_state_mle(data, measurement_vector, weights)
+        rhos = rhos/np.trace(rhos, axis1=1, axis2=2)[:, None, None]
 
         if array_like:
-            return np.array([rho.full() for rho in rhos])
-        else:
             return rhos
+        else:
+            return [qt.Qobj(rho, dims=self.qt_dims) for rho in rhos]
+
+    def _get_SDPA_problem(self, measurement_operators, counts_tomo, N_total,
+                          used_bins, correct_zero_count_bins=True):
+        """
+        Returns the data, normalisations, weights and observables used by
+        the SDPA tomography.
+        """
+        if correct_zero_count_bins:
+            counts_tomo = np.array([[int(b) if b > 0 else  1 for b in bin_counts] for bin_counts in counts_tomo])
+        else:
+            counts_tomo = np.array(counts_tomo)
+
+        #Select the correct data based on the bins used
+        #(and therefore based on the projection operators used)
+        data = counts_tomo[:,used_bins].T.flatten()
+        #get the total number of counts per tomo
+        N = np.array([np.sum(counts_tomo, axis=1) for k in used_bins]).flatten()
+
+        # add weights based on the total number of data points kept each run
+        # N_total is a bit arbitrary but should be the average number of total counts of all runs, since in nathans code this
+        # average is estimated as a parameter.
+        weights = N/float(N_total)
+        #get the observables from the rotation operators and the bins kept(and their corresponding projection operators)
+        measurement_vectors = []
+        for k in used_bins:
+            measurement_vectors.append([m.full() for m in  self.get_measurement_vector(measurement_operators[k])])
+        measurement_vector = np.vstack(measurement_vectors)
+        return data, N, weights, measurement_vector
 
 
 
@@ -487,6 +562,62 @@ def generate_tomo_data(rho, M, R, N, M_bins = None):
 
     return bin_counts, expectations
 
+def resample_tomo_data(meas_tomo, meas_tomo_std, n_resamples: int = 1000):
+    """
+    Generates parametric bootstrap resamples of averaged tomography data by
+    adding Gaussian noise with standard deviation meas_tomo_std.
+
+    Returns:
+        array of shape (n_resamples, n_measurements)
+    """
+    meas_tomo = np.asarray(meas_tomo, dtype=float)
+    noise = np.random.normal(size=(n_resamples, len(meas_tomo)))
+    return meas_tomo + noise*np.asarray(meas_tomo_std, dtype=float)
+
+
+def project_to_physical_states(rhos):
+    """
+    Projects a stack of (hermitian) matrices of shape (n, d, d) onto the
+    closest density matrices (positive semidefinite, unit trace).
+
+    The projection is done in the eigenbasis of each matrix by projecting
+    the eigenvalues onto the probability simplex, which is the closest
+    physical state in the 2-norm (Smolin et al., PRL 108, 070502 (2012)).
+    """
+    rhos = np.asarray(rhos, dtype=complex)
+    rhos = (rhos + np.conj(np.swapaxes(rhos, -1, -2)))/2
+    evals, evecs = np.linalg.eigh(rhos)
+
+    # Euclidean projection of the eigenvalues onto the simplex
+    d = evals.shape[-1]
+    mu = -np.sort(-evals, axis=-1)
+    cumsum = np.cumsum(mu, axis=-1) - 1
+    k = np.arange(1, d+1)
+    nr_pos = np.sum(mu - cumsum/k > 0, axis=-1)
+    theta = np.take_along_axis(cumsum, nr_pos[:, None]-1, axis=-1)/nr_pos[:, None]
+    evals = np.clip(evals - theta, 0, None)
+
+    return np.einsum('nik,nk,njk->nij', evecs, evals, np.conj(evecs))
+
+
+def calc_purities(rhos):
+    """Purity tr(rho^2) of a stack of density matrices."""
+    return np.sum(np.abs(rhos)**2, axis=(-1, -2))
+
+
+def calc_fidelities(rhos, target_rho):
+    """
+    Fidelity (tr sqrt(sqrt(sigma) rho sqrt(sigma)))^2 of a stack of density
+    matrices rhos to a target density matrix sigma.
+    """
+    sigma = target_rho.full() if type(target_rho) == qt.Qobj else np.asarray(target_rho)
+    evals, evecs = np.linalg.eigh(sigma)
+    sqrt_sigma = (evecs * np.sqrt(np.clip(evals, 0, None))) @ np.conj(evecs.T)
+    M = sqrt_sigma @ rhos @ sqrt_sigma
+    eigs = np.clip(np.linalg.eigvalsh(M), 0, None)
+    return np.sum(np.sqrt(eigs), axis=-1)**2
+
+
 def get_TE_calibration_points(e_01, e_10, get_coefficient_matrix=False):
     """
     Mixes the standard computational basis projectors to account for a certain thermal excitation fraction in qubit 1 and 2
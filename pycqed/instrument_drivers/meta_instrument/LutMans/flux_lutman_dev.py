@@ -24,6 +24,7 @@ import PyQt5
 from qcodes.plots.pyqtgraph import QtPlot
 import matplotlib.pyplot as plt
 from pycqed.analysis.tools.plotting import set_xlabel, set_ylabel
+from pycqed.analysis.tools import flux_conversion as flux_conv
 import time
 from datetime import datetime
 import cma
@@ -898,21 +899,6 @@ class HDAWG_Flux_LutMan(Base_Flux_LutMan):
 
                 amp_Volts = amp_dac_val * channel_amp * channel_range
         """
-        # recursive allows dealing with an array of freqs
-        if isinstance(eps, (list, np.ndarray)):
-            return np.array(
-                [
-                    self.calc_eps_to_amp(
-                        eps=e,
-                        state_A=state_A,
-                        state_B=state_B,
-                        which_gate=which_gate,
-                        positive_branch=positive_branch,
-                    )
-                    for e in eps
-                ]
-            )
-
         polycoeffs_A = self.get_polycoeffs_state(state=state_A, which_gate=which_gate)
         if state_B is not None:
             polycoeffs_B = self.get_polycoeffs_state(
@@ -923,18 +909,11 @@ class HDAWG_Flux_LutMan(Base_Flux_LutMan):
             polycoeffs = copy(polycoeffs_A)
             polycoeffs[-1] = 0
 
-        p = np.poly1d(polycoeffs)
-        sols = (p - eps).roots
-
-        # sols returns 2 solutions (for a 2nd order polynomial)
-        if positive_branch:
-            sol = np.max(sols)
-        else:
-            sol = np.min(sols)
-
-        # imaginary part is ignored, instead sticking to closest real value
-        # float is because of a typecasting bug in np 1.12 (solved in 1.14)
-        return float(np.real(sol))
+        # inverts an array of eps at once, the imaginary part of the roots
+        # is ignored, instead sticking to closest real value
+        return flux_conv.poly_inverse(
+            eps, polycoeffs, positive_branch=positive_branch
+        )
 
     def calc_net_zero_length_ratio(self, which_gate: str = "NE"):
         """
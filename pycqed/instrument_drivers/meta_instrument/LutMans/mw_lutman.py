@@ -101,6 +101,8 @@ class Base_MW_LutMan(Base_LutMan):
     def _add_waveform_parameters(self):
         # defined here so that the VSM based LutMan can overwrite this
         self.wf_func = wf.mod_gauss
+        # used to generate all DRAG pulses of the lutmap at once
+        self.wf_batch_func = wf.mod_gauss_batch
         self.spec_func = wf.block_pulse
 
         self._add_channel_params()
@@ -185,6 +187,10 @@ class Base_MW_LutMan(Base_LutMan):
         else:
             f_modulation = 0
 
+        # DRAG pulses are collected per (f_modulation, motzoi) and generated
+        # in a single vectorized operation after the loop.
+        drag_pulses = OrderedDict()
+
         # lutmap is expected to obey lutmap mw schema
         for idx, waveform in self.LutMap().items():
             if waveform['type'] == 'ge':
@@ -193,23 +199,18 @@ class Base_MW_LutMan(Base_LutMan):
                 else:
                     amp = theta_to_amp(theta=waveform['theta'],
                                        amp180=self.mw_amp180())
-                self._wave_dict[idx] = self.wf_func(
-                    amp=amp,
-                    phase=waveform['phi'],
-                    sigma_length=self.mw_gauss_width(),
-                    f_modulation=f_modulation,
-                    sampling_rate=self.sampling_rate(),
-                    motzoi=self.mw_motzoi())
+                drag_pulses.setdefault(
+                    (f_modulation, self.mw_motzoi()), []).append(
+                    (idx, amp, waveform['phi']))
+                # placeholder to preserve the order of the lutmap
+                self._wave_dict[idx] = None
             elif waveform['type'] == 'ef':
                 amp = theta_to_amp(theta=waveform['theta'],
                                    amp180=self.mw_ef_amp180())
-                self._wave_dict[idx] = self.wf_func(
-                    amp=amp,
-                    phase=waveform['phi'],
-                    sigma_length=self.mw_gauss_width(),
-                    f_modulation=self.mw_ef_modulation(),
-                    sampling_rate=self.sampling_rate(),
-                    motzoi=0)
+                drag_pulses.setdefault(
+                    (self.mw_ef_modulation(), 0), []).append(
+                    (idx, amp, waveform['phi']))
+                self._wave_dict[idx] = None
             elif waveform['type'] == 'raw-drag':
                 self._wave_dict[idx] = self.wf_func(
                     **waveform["drag_pars"])
@@ -244,6 +245,18 @@ class Base_MW_LutMan(Base_LutMan):
             else:
                 raise ValueError
 
+        for (f_mod, motzoi), pulses in drag_pulses.items():
+            idxs, amps, phases = zip(*pulses)
+            waves = self.wf_batch_func(
+                amps=amps,
+                phases=phases,
+                sigma_length=self.mw_gauss_width(),
+                f_modulation=f_mod,
+                sampling_rate=self.sampling_rate(),
+                motzoi=motzoi)
+            for idx, wave in zip(idxs, waves):
+                self._wave_dict[idx] = tuple(wave)
+
         # Add predistortions + test
         if (self.mixer_apply_predistortion_matrix()
                 and apply_predistortion_matrix):
@@ -254,8 +267,9 @@ class Base_MW_LutMan(Base_LutMan):
     def apply_mixer_predistortion_corrections(self, wave_dict):
         M = wf.mixer_predistortion_matrix(self.mixer_alpha(),
                                           self.mixer_phi())
-        for key, val in wave_dict.items():
-            wave_dict[key] = np.dot(M, val)
+        for keys, waves in wf.stack_waves(wave_dict):
+            for key, wave in zip(keys, wf.apply_mixer_predistortion(M, waves)):
+                wave_dict[key] = wave
         return wave_dict
 
     def load_waveform_onto_AWG_lookuptable(self, waveform_name: str,
@@ -555,6 +569,7 @@ class AWG8_VSM_MW_LutMan(AWG8_MW_LutMan):
         self._num_channels = 8
         super().__init__(name, **kw)
         self.wf_func = wf.mod_gauss_VSM
+        self.wf_batch_func = wf.mod_gauss_VSM_batch
         self.spec_func = wf.block_pulse_vsm
 
     def _add_waveform_parameters(self):
@@ -657,10 +672,13 @@ class AWG8_VSM_MW_LutMan(AWG8_MW_LutMan):
         M_D = wf.mixer_predistortion_matrix(self.D_mixer_alpha(),
                                             self.D_mixer_phi())
 
-        for key, val in wave_dict.items():
-            GI, GQ = np.dot(M_G, val[0:2])  # Mixer correction Gaussian comp.
-            DI, DQ = np.dot(M_D, val[2:4])  # Mixer correction Derivative comp.
-            wave_dict[key] = GI, GQ, DI, DQ
+        for keys, waves in wf.stack_waves(wave_dict):
+            # Mixer correction Gaussian comp.
+            G = wf.apply_mixer_predistortion(M_G, waves[:, 0:2])
+            # Mixer correction Derivative comp.
+            D = wf.apply_mixer_predistortion(M_D, waves[:, 2:4])
+            for key, (GI, GQ), (DI, DQ) in zip(keys, G, D):
+                wave_dict[key] = GI, GQ, DI, DQ
         return wave_dict
 
 
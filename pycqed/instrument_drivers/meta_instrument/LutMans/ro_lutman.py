@@ -72,6 +72,9 @@ class Base_RO_LutMan(Base_LutMan):
         self._resonator_combinations = [
             [self._resonator_codeword_bit_mapping[0]]]
         self._pulse_type = 'M_simple'
+        # Modulated waveforms of each resonator, stored together with the
+        # values of the parameters used to generate them.
+        self._resonator_wave_cache = {}
         super().__init__(name, **kw)
 
     def _set_resonator_combinations(self, value):
@@ -220,9 +223,39 @@ class Base_RO_LutMan(Base_LutMan):
     def generate_standard_waveforms(self):
         """
         Generates waveforms for reading out from each individual resonator.
+
+        The waveforms of a resonator are only regenerated if any of the
+        parameters they depend on has changed since they were last generated.
+        """
+        self._wave_dict = {}
+        for res in self._resonator_codeword_bit_mapping:
+            fingerprint = self._get_resonator_fingerprint(res)
+            cached = self._resonator_wave_cache.get(res, None)
+            if cached is None or cached[0] != fingerprint:
+                cached = (fingerprint, self._generate_resonator_waveforms(res))
+                self._resonator_wave_cache[res] = cached
+            self._wave_dict.update(**cached[1])
+
+        return self._wave_dict
+
+    def _get_resonator_fingerprint(self, res):
+        """
+        Returns the values of all parameters that determine the waveforms of
+        resonator "res".
+        """
+        global_pars = ['sampling_rate', 'pulse_primitive_shape',
+                       'gaussian_convolution', 'gaussian_convolution_sigma',
+                       'mixer_apply_predistortion_matrix', 'mixer_alpha',
+                       'mixer_phi']
+        res_pars = sorted(par for par in self.parameters.keys()
+                          if par.endswith('_R{}'.format(res)))
+        return tuple(self.get(par) for par in global_pars + res_pars)
+
+    def _generate_resonator_waveforms(self, res):
+        """
+        Generates the (modulated) waveforms of all pulse types for a single
+        resonator.
         """
-        # Only generate the combinations required/specified in the LutMap
-        # RO pulses
         sampling_rate = self.get('sampling_rate')
 
         # Prepare gauss pulse for convolution (if desired)
@@ -245,100 +278,94 @@ class Base_RO_LutMan(Base_LutMan):
         else:
             gauss_length = 0
 
-        # Prepare pulses for all resonators
-        self._wave_dict = {}
-        for res in self._resonator_codeword_bit_mapping:
-            res_wave_dict = {}
-            # 1. Generate Pulse envelopes
-            # Simple pulse
-            up_len = self.get('M_length_R{}'.format(res))-gauss_length
-            M = create_pulse(shape=self.pulse_primitive_shape(),
-                             amplitude=self.get('M_amp_R{}'.format(res)),
-                             length=up_len,
-                             delay=0,
-                             phase=self.get('M_phi_R{}'.format(res)),
-                             sampling_rate=sampling_rate)
-            res_wave_dict['M_simple_R{}'.format(res)] = M
-
-            # 3-step RO pulse with ramp-up and double depletion
-            up_len = self.get('M_length_R{}'.format(res))-gauss_length/2
-            M_up = create_pulse(shape=self.pulse_primitive_shape(),
-                                amplitude=self.get('M_amp_R{}'.format(res)),
-                                length=up_len,
-                                delay=0,
-                                phase=self.get('M_phi_R{}'.format(res)),
-                                sampling_rate=sampling_rate)
-
-            M_down0 = create_pulse(shape=self.pulse_primitive_shape(),
-                                   amplitude=self.get(
-                                       'M_down_amp0_R{}'.format(res)),
-                                   length=self.get(
-                                       'M_down_length0_R{}'.format(res)),  # ns
-                                   delay=0,
-                                   phase=self.get(
-                                       'M_down_phi0_R{}'.format(res)),
-                                   sampling_rate=sampling_rate)
-
-            down1_len = self.get(
-                'M_down_length1_R{}'.format(res))-gauss_length/2
-            M_down1 = create_pulse(shape=self.pulse_primitive_shape(),
-                                   amplitude=self.get(
-                                       'M_down_amp1_R{}'.format(res)),
-                                   length=down1_len,
-                                   delay=0,
-                                   phase=self.get(
-                                       'M_down_phi1_R{}'.format(res)),
-                                   sampling_rate=sampling_rate)
-
-            M_up_down_down = (np.concatenate((M_up[0], M_down0[0], M_down1[0])),
-                              np.concatenate((M_up[1], M_down0[1], M_down1[1])))
-            res_wave_dict['M_up_down_down_R{}'.format(res)] = M_up_down_down
-
-            # pulse with up, down, down depletion with an additional final
-            # strong measurement at some delay
-            M_final = create_pulse(shape=self.pulse_primitive_shape(),
-                                   amplitude=self.get(
-                                       'M_final_amp_R{}'.format(res)),
-                                   length=self.get(
-                                       'M_final_length_R{}'.format(res)),  # ns
-                                   delay=self.get(
-                                       'M_final_delay_R{}'.format(res)),
-                                   phase=self.get('M_phi_R{}'.format(res)),
-                                   sampling_rate=sampling_rate)
-
-            M_up_down_down_final = (np.concatenate((M_up_down_down[0], M_final[0])),
-                                    np.concatenate((M_up_down_down[1], M_final[1])))
-            res_wave_dict['M_up_down_down_final_R{}'.format(
-                res)] = M_up_down_down_final
-
-            # 2. convolve with gaussian (if desired)
-            if self.gaussian_convolution():
-                for key, val in res_wave_dict.items():
-                    M_conv0 = np.convolve(val[0], norm_gauss_p)
-                    M_conv1 = np.convolve(val[1], norm_gauss_p)
-                    #M_conv0 = M_conv0[hgsl: -hgsl+1]
-                    #M_conv1 = M_conv1[hgsl: -hgsl+1]
-                    res_wave_dict[key] = (
-                        M_conv0/sampling_rate, M_conv1/sampling_rate)
-
-            # 3. modulation with base frequency
+        res_wave_dict = {}
+        # 1. Generate Pulse envelopes
+        # Simple pulse
+        up_len = self.get('M_length_R{}'.format(res))-gauss_length
+        M = create_pulse(shape=self.pulse_primitive_shape(),
+                         amplitude=self.get('M_amp_R{}'.format(res)),
+                         length=up_len,
+                         delay=0,
+                         phase=self.get('M_phi_R{}'.format(res)),
+                         sampling_rate=sampling_rate)
+        res_wave_dict['M_simple_R{}'.format(res)] = M
+
+        # 3-step RO pulse with ramp-up and double depletion
+        up_len = self.get('M_length_R{}'.format(res))-gauss_length/2
+        M_up = create_pulse(shape=self.pulse_primitive_shape(),
+                            amplitude=self.get('M_amp_R{}'.format(res)),
+                            length=up_len,
+                            delay=0,
+                            phase=self.get('M_phi_R{}'.format(res)),
+                            sampling_rate=sampling_rate)
+
+        M_down0 = create_pulse(shape=self.pulse_primitive_shape(),
+                               amplitude=self.get(
+                                   'M_down_amp0_R{}'.format(res)),
+                               length=self.get(
+                                   'M_down_length0_R{}'.format(res)),  # ns
+                               delay=0,
+                               phase=self.get(
+                                   'M_down_phi0_R{}'.format(res)),
+                               sampling_rate=sampling_rate)
+
+        down1_len = self.get(
+            'M_down_length1_R{}'.format(res))-gauss_length/2
+        M_down1 = create_pulse(shape=self.pulse_primitive_shape(),
+                               amplitude=self.get(
+                                   'M_down_amp1_R{}'.format(res)),
+                               length=down1_len,
+                               delay=0,
+                               phase=self.get(
+                                   'M_down_phi1_R{}'.format(res)),
+                               sampling_rate=sampling_rate)
+
+        M_up_down_down = (np.concatenate((M_up[0], M_down0[0], M_down1[0])),
+                          np.concatenate((M_up[1], M_down0[1], M_down1[1])))
+        res_wave_dict['M_up_down_down_R{}'.format(res)] = M_up_down_down
+
+        # pulse with up, down, down depletion with an additional final
+        # strong measurement at some delay
+        M_final = create_pulse(shape=self.pulse_primitive_shape(),
+                               amplitude=self.get(
+                                   'M_final_amp_R{}'.format(res)),
+                               length=self.get(
+                                   'M_final_length_R{}'.format(res)),  # ns
+                               delay=self.get(
+                                   'M_final_delay_R{}'.format(res)),
+                               phase=self.get('M_phi_R{}'.format(res)),
+                               sampling_rate=sampling_rate)
+
+        M_up_down_down_final = (np.concatenate((M_up_down_down[0], M_final[0])),
+                                np.concatenate((M_up_down_down[1], M_final[1])))
+        res_wave_dict['M_up_down_down_final_R{}'.format(
+            res)] = M_up_down_down_final
+
+        # 2. convolve with gaussian (if desired)
+        if self.gaussian_convolution():
             for key, val in res_wave_dict.items():
-                res_wave_dict[key] = wf.mod_pulse(pulse_I=val[0], pulse_Q=val[1],
-                                                  f_modulation=self.get(
-                                                      'M_modulation_R{}'.format(res)),
-                                                  sampling_rate=self.get('sampling_rate'))
-
-            # 4. apply mixer predistortion
-            if self.mixer_apply_predistortion_matrix():
-                Mat = wf.mixer_predistortion_matrix(
-                    self.mixer_alpha(), self.mixer_phi())
-                for key, val in res_wave_dict.items():
-                    res_wave_dict[key] = np.dot(Mat, val)
-
-            # 5. Add to global dict
-            self._wave_dict.update(**res_wave_dict)
+                M_conv0 = np.convolve(val[0], norm_gauss_p)
+                M_conv1 = np.convolve(val[1], norm_gauss_p)
+                #M_conv0 = M_conv0[hgsl: -hgsl+1]
+                #M_conv1 = M_conv1[hgsl: -hgsl+1]
+                res_wave_dict[key] = (
+                    M_conv0/sampling_rate, M_conv1/sampling_rate)
+
+        # 3. modulation with base frequency
+        for key, val in res_wave_dict.items():
+            res_wave_dict[key] = wf.mod_pulse(pulse_I=val[0], pulse_Q=val[1],
+                                              f_modulation=self.get(
+                                                  'M_modulation_R{}'.format(res)),
+                                              sampling_rate=self.get('sampling_rate'))
+
+        # 4. apply mixer predistortion
+        if self.mixer_apply_predistortion_matrix():
+            Mat = wf.mixer_predistortion_matrix(
+                self.mixer_alpha(), self.mixer_phi())
+            for key, val in res_wave_dict.items():
+                res_wave_dict[key] = np.dot(Mat, val)
 
-        return self._wave_dict
+        return res_wave_dict
 
 
 class UHFQC_RO_LutMan(Base_RO_LutMan):
@@ -416,17 +443,11 @@ class UHFQC_RO_LutMan(Base_RO_LutMan):
         if wave_id not in self.LutMap().keys():
             wave_id = get_wf_idx_from_name(wave_id, self.LutMap())
 
-        # Create the combined waveform
-        I_wave = np.array([])
-        Q_wave = np.array([])
-        for resonator in self.LutMap()[wave_id]['resonators']:
-            # Create the waveform name
-            wavename = self.pulse_type() + '_R' + str(resonator)
-            # adding new wave (not necessarily same length)
-            I_wave = add_waves_different_length(
-                I_wave, self._wave_dict[wavename][0])
-            Q_wave = add_waves_different_length(
-                Q_wave, self._wave_dict[wavename][1])
+        # Create the combined waveform from the waveforms of the individual
+        # resonators (not necessarily same length)
+        I_wave, Q_wave = sum_waves_different_length(
+            [self._wave_dict[self.pulse_type() + '_R' + str(resonator)]
+             for resonator in self.LutMap()[wave_id]['resonators']])
 
         # clipping the waveform
         I_wave = np.clip(I_wave, self._voltage_min, self._voltage_max)
@@ -481,3 +502,24 @@ def add_waves_different_length(a, b):
         c = a.copy()
         c[:len(b)] += b
     return c
+
+
+def sum_waves_different_length(waves):
+    """
+    Sums a list of (I, Q) waveform pairs of different lengths in a single
+    vectorized operation. Shorter waveforms are padded with zeros.
+
+    Returns:
+        I_wave, Q_wave (array): the summed waveforms, empty if no waveforms
+            are given.
+    """
+    if len(waves) == 0:
+        return np.array([]), np.array([])
+
+    length = max(max(len(I), len(Q)) for I, Q in waves)
+    stack = np.zeros((len(waves), 2, length))
+    for i, (I, Q) in enumerate(waves):
+        stack[i, 0, :len(I)] = I
+        stack[i, 1, :len(Q)] = Q
+    I_wave, Q_wave = stack.sum(axis=0)
+    return I_wave, Q_wave
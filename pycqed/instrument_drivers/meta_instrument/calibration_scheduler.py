@@ -0,0 +1,451 @@
+"""
+Parallel execution of calibration dependency graphs.
+
+The dependency graphs of the qubit and device objects (AutoDepGraph_DAG,
+an edge (a, b) meaning that node a depends on node b) are maintained node
+by node. Calibrations of different qubits that do not share any hardware
+can however run at the same time.
+
+The CalibrationScheduler annotates every node with the resources it locks
+(e.g. the feedline, the microwave AWG channels and the flux line of a
+qubit) and runs the nodes in a thread pool:
+
+    - nodes that are in a 'good' state are not executed, other nodes are
+      checked (check_function) and calibrated if the check does not pass,
+      as in AutoDepGraph_DAG.maintain_node,
+    - a node is started as soon as all its dependencies succeeded and none
+      of its resources is locked by a running node,
+    - nodes on the critical path (the longest chain of nodes depending on
+      it) are started first,
+    - when a node fails, its direct dependencies are re-run and the node is
+      retried (up to `retries` times), after which the nodes depending on it
+      are skipped and the rest of the graph is completed.
+
+A resource can be given a capacity larger than 1, e.g. a feedline that
+supports multiplexed measurements of several qubits at once. Nodes without
+a resource annotation lock all resources, i.e. they run on their own.
+
+The central controller (instr_CC), the microwave LOs and the spectroscopy
+sources are resources as well. As all qubits of a device typically share a
+single CC, which runs one program at a time, the hardware calibrations of
+different qubits only run at the same time if the CC is given a capacity
+larger than 1. Only do so if the calibrations that run at the same time are
+executed multiplexed, i.e., through a single CC program.
+
+The MeasurementControl is not a resource: all qubits of a setup typically
+share a single MC, which would serialize all nodes. As the MC can run only
+one measurement at a time, every worker thread is given its own MC from
+measurement_controls, which is passed as the MC argument of the check and
+calibrate functions. Without measurement_controls the functions use the MC
+of the qubit, which is only safe if the qubits do not share an MC.
+
+Example:
+    >>> MCs = [MeasurementControl('MC_{}'.format(i)) for i in range(4)]
+    >>> scheduler = CalibrationScheduler(dag, measurement_controls=MCs)
+    >>> for qubit in qubits:
+    >>>     scheduler.annotate_qubit_resources(qubit)
+    >>> result = scheduler.run()
+"""
+import importlib
+import inspect
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import networkx as nx
+from qcodes.instrument.base import Instrument
+
+log = logging.getLogger(__name__)
+
+# Parameters of a qubit that refer to the hardware its calibrations lock.
+# The MC is not included, see measurement_controls of CalibrationScheduler.
+QUBIT_RESOURCE_PARAMETERS = (
+    'instr_CC',             # shared by all qubits of a device
+    'instr_acquisition',    # the feedline
+    'instr_LutMan_RO',
+    'instr_LutMan_MW',      # the microwave AWG channels
+    'instr_LutMan_Flux',    # the flux AWG channel
+    'instr_LO_mw',          # typically shared by several qubits
+    'instr_spec_source',
+)
+
+
+def qubit_resources(qubit) -> set:
+    """
+    Returns the resources locked by the calibrations of a qubit, the names
+    of the instruments it uses (see QUBIT_RESOURCE_PARAMETERS) and its DC
+    flux bias channel.
+    """
+    resources = set()
+    for par_name in QUBIT_RESOURCE_PARAMETERS:
+        if par_name in qubit.parameters:
+            instr_name = qubit.parameters[par_name].get_latest()
+            if instr_name is not None:
+                resources.add(instr_name)
+    if 'fl_dc_ch' in qubit.parameters:
+        fl_dc_ch = qubit.fl_dc_ch.get_latest()
+        if fl_dc_ch is not None:
+            flux_ctrl = qubit.instr_FluxCtrl.get_latest()
+            resources.add('{}.{}'.format(flux_ctrl, fl_dc_ch))
+    return resources
+
+
+def _accepts_MC(func) -> bool:
+    try:
+        return 'MC' in inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def _get_function(func):
+    """
+    Returns the function of a node, func is a callable or a string
+    "instrument_name.method_name" or "module.function_name".
+    """
+    if callable(func):
+        return func
+    instr_name, _, attr = func.partition('.')
+    try:
+        obj = Instrument.find_instrument(instr_name)
+    except KeyError:
+        module_name, attr = func.rsplit('.', 1)
+        obj = importlib.import_module(module_name)
+    for name in attr.split('.'):
+        obj = getattr(obj, name)
+    return obj
+
+
+class CalibrationScheduler(object):
+    """
+    Runs the nodes of a dependency graph, executing nodes that do not share
+    resources concurrently.
+
+    Args:
+        graph (AutoDepGraph_DAG): the dependency graph, any networkx
+            DiGraph of which the nodes have a 'calibrate_function'
+            attribute can be used.
+        max_workers (int): maximum number of nodes running at once.
+        retries (int): number of times a failed node is retried.
+        resource_capacity (dict): {resource: number of nodes that can use
+            the resource at once}, the capacity of other resources is 1.
+        measurement_controls (list): MeasurementControl instruments, one
+            for every worker thread, passed as the MC argument of the check
+            and calibrate functions that accept it. The number of nodes
+            running at once is limited to the number of MCs.
+    """
+
+    def __init__(self, graph, max_workers: int = 8, retries: int = 1,
+                 resource_capacity: dict = None,
+                 measurement_controls: list = None):
+        self.graph = graph
+        self.max_workers = max_workers
+        self.retries = retries
+        self.resource_capacity = {} if resource_capacity is None \
+            else dict(resource_capacity)
+        self.measurement_controls = measurement_controls
+        # holds the MC of a worker thread
+        self._local = threading.local()
+
+    def set_node_resources(self, node: str, resources):
+        """
+        Annotates a node with the resources it locks. resources=None makes
+        the node lock all resources.
+        """
+        self.graph.nodes[node]['resources'] = None if resources is None \
+            else frozenset(resources)
+
+    def annotate_qubit_resources(self, qubit, nodes=None):
+        """
+        Annotates the nodes of a qubit with the resources of the qubit.
+
+        Args:
+            qubit: the qubit object.
+            nodes (list): the nodes to annotate, by default the nodes whose
+                name starts with the name of the qubit or whose calibrate
+                function is a method of the qubit.
+        """
+        if nodes is None:
+            nodes = [node for node, attrs in self.graph.nodes(data=True)
+                     if node.startswith(qubit.name + ' ') or
+                     str(attrs.get('calibrate_function', '')).startswith(
+                         qubit.name + '.')]
+        resources = qubit_resources(qubit)
+        for node in nodes:
+            self.set_node_resources(node, resources)
+
+    def dependencies(self, node: str) -> list:
+        return list(self.graph.successors(node))
+
+    def _subgraph(self, nodes=None):
+        # a plain DiGraph, subgraph views require the graph class to be
+        # constructable without arguments
+        nodes = set(self.graph.nodes) if nodes is None else set(nodes)
+        graph = nx.DiGraph()
+        graph.add_nodes_from(nodes)
+        graph.add_edges_from((a, b) for a, b in self.graph.edges
+                             if a in nodes and b in nodes)
+        return graph
+
+    def topological_order(self, nodes=None) -> list:
+        """
+        Returns the nodes (by default all nodes) in an order in which every
+        node comes after its dependencies.
+        """
+        return list(reversed(list(nx.topological_sort(
+            self._subgraph(nodes)))))
+
+    def critical_path_lengths(self, nodes=None) -> dict:
+        """
+        Returns {node: estimated duration of the longest chain of nodes
+        that depend on the node, including the node}. The duration of a
+        node is its 'duration' attribute (default 1).
+        """
+        graph = self._subgraph(nodes)
+        lengths = {}
+        # dependants come before their dependencies in topological_sort
+        for node in nx.topological_sort(graph):
+            duration = self.graph.nodes[node].get('duration', 1)
+            lengths[node] = duration + max(
+                (lengths[dep] for dep in graph.predecessors(node)),
+                default=0)
+        return lengths
+
+    def _resources(self, node):
+        return self.graph.nodes[node].get('resources', None)
+
+    def _can_lock(self, node, locked: Counter, nr_running: int) -> bool:
+        resources = self._resources(node)
+        if resources is None:
+            return nr_running == 0
+        if locked[None]:
+            # a node locking all resources is running
+            return False
+        return all(locked[res] < self.resource_capacity.get(res, 1)
+                   for res in resources)
+
+    def _lock(self, node, locked: Counter, sign: int = 1):
+        resources = self._resources(node)
+        for res in ([None] if resources is None else resources):
+            locked[res] += sign
+
+    def _get_state(self, node) -> str:
+        if hasattr(self.graph, 'get_node_state'):
+            # accounts for the timeout of the node
+            return self.graph.get_node_state(node)
+        return self.graph.nodes[node].get('state', 'unknown')
+
+    def _set_state(self, node, state: str):
+        if hasattr(self.graph, 'set_node_state'):
+            # the monitor is not updated from the worker threads
+            self.graph.set_node_state(node, state, update_monitor=False)
+        else:
+            self.graph.nodes[node]['state'] = state
+
+    def _call(self, func, kwargs: dict):
+        func = _get_function(func)
+        MC = getattr(self._local, 'MC', None)
+        if MC is not None and 'MC' not in kwargs and _accepts_MC(func):
+            kwargs = dict(kwargs, MC=MC)
+        return func(**kwargs)
+
+    def check_node(self, node: str) -> str:
+        """
+        Executes the check function of a node and returns the resulting
+        state: 'good' if the result is a float below the tolerance of the
+        node, 'bad' if the result is False or the check raised an exception
+        and 'needs calibration' otherwise. Nodes without a check function
+        need calibration.
+        """
+        attrs = self.graph.nodes[node]
+        func = attrs.get('check_function', None)
+        if func is None:
+            return 'needs calibration'
+        try:
+            result = self._call(func, {})
+        except Exception as e:
+            log.warning('Check of node "{}" failed: {}'.format(node, e))
+            return 'bad'
+        if isinstance(result, float):
+            if result < attrs.get('tolerance', 0):
+                return 'good'
+            return 'needs calibration'
+        if result is False:
+            return 'bad'
+        return 'needs calibration'
+
+    def calibrate_node(self, node: str) -> bool:
+        """
+        Executes the calibrate function of a node. Returns False if the
+        function raised an exception or returned False. Nodes without a
+        calibrate function succeed.
+        """
+        attrs = self.graph.nodes[node]
+        func = attrs.get('calibrate_function', None)
+        if func is None:
+            return True
+        kwargs = {}
+        for key in ('calibrate_function_args', 'calibrate_function_kwargs'):
+            if isinstance(attrs.get(key, None), dict):
+                kwargs.update(attrs[key])
+        try:
+            result = self._call(func, kwargs)
+        except Exception as e:
+            log.warning('Node "{}" failed: {}'.format(node, e))
+            return False
+        return result is not False
+
+    def execute_node(self, node: str, state: str = None) -> bool:
+        """
+        Brings a node to a good state, as AutoDepGraph_DAG.maintain_node
+        does for a node of which the dependencies are good: unless the
+        node is known to need calibration it is checked first, and it is
+        calibrated only if the check does not pass. Returns True if the
+        node ends up in a good state.
+
+        Args:
+            node (str): the node.
+            state (str): the state of the node, by default its current
+                state.
+        """
+        if state is None:
+            state = self._get_state(node)
+        if state != 'needs calibration':
+            if self.check_node(node) == 'good':
+                return True
+        return self.calibrate_node(node)
+
+    def run(self, nodes=None) -> dict:
+        """
+        Runs nodes and all their dependencies, by default the whole graph.
+        Nodes that are in a 'good' state are not executed.
+
+        Returns:
+            dict with:
+                'order': the nodes in the order they were started,
+                'succeeded', 'failed', 'skipped': lists of the executed
+                    nodes that succeeded, failed and of the nodes that were
+                    not executed because a dependency failed,
+                'up_to_date': nodes that were good and not executed,
+                'durations': {node: duration of the last execution},
+                'serial_time': total duration of all executions,
+                'wall_time': time it took to run the graph.
+        """
+        if nodes is None:
+            nodes = set(self.graph.nodes)
+        else:
+            nodes = set(nodes)
+            for node in list(nodes):
+                nodes |= nx.descendants(self.graph, node)
+        priority = self.critical_path_lengths(nodes)
+        # ties are broken by the topological order, i.e. deterministically
+        rank = {node: i for i, node in
+                enumerate(self.topological_order(nodes))}
+
+        up_to_date = [node for node in self.topological_order(nodes)
+                      if self._get_state(node) == 'good']
+        pending = set(nodes) - set(up_to_date)
+        succeeded = set(up_to_date)
+        failed = []
+        skipped = []
+        order = []
+        durations = {}
+        serial_time = 0
+        attempts = Counter()
+        locked = Counter()
+        running = {}
+
+        nr_workers = self.max_workers
+        MCs = None
+        if self.measurement_controls is not None:
+            nr_workers = min(nr_workers, len(self.measurement_controls))
+            MCs = queue.Queue()
+            for MC in self.measurement_controls:
+                MCs.put(MC)
+
+        t_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=nr_workers,
+                                initializer=self._init_worker,
+                                initargs=(MCs, )) as executor:
+            while pending or running:
+                ready = [node for node in pending if all(
+                    dep in succeeded for dep in self.dependencies(node)
+                    if dep in nodes)]
+                for node in sorted(ready, key=lambda n: (-priority[n],
+                                                         rank[n])):
+                    if len(running) >= nr_workers:
+                        break
+                    if not self._can_lock(node, locked, len(running)):
+                        continue
+                    self._lock(node, locked)
+                    pending.remove(node)
+                    order.append(node)
+                    state = self._get_state(node)
+                    self._set_state(node, 'active')
+                    running[executor.submit(
+                        self._timed_execute, node, state)] = node
+
+                if not running:
+                    # the remaining nodes depend on failed nodes
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    node = running.pop(future)
+                    self._lock(node, locked, sign=-1)
+                    success, duration = future.result()
+                    durations[node] = duration
+                    serial_time += duration
+                    if success:
+                        self._set_state(node, 'good')
+                        succeeded.add(node)
+                    else:
+                        self._set_state(node, 'bad')
+                        self._replan(node, nodes, pending, succeeded,
+                                     failed, skipped, attempts)
+
+        skipped += sorted(pending, key=rank.get)
+        wall_time = time.perf_counter() - t_start
+        log.info('Ran {} nodes in {:.1f} s, serial execution {:.1f} s'.format(
+            len(order), wall_time, serial_time))
+        return {'order': order,
+                'succeeded': [n for n in dict.fromkeys(order)
+                              if n in succeeded],
+                'failed': failed, 'skipped': skipped,
+                'up_to_date': up_to_date, 'durations': durations,
+                'serial_time': serial_time,
+                'wall_time': wall_time}
+
+    def _init_worker(self, MCs):
+        self._local.MC = None if MCs is None else MCs.get_nowait()
+
+    def _timed_execute(self, node, state):
+        t0 = time.perf_counter()
+        success = self.execute_node(node, state)
+        return success, time.perf_counter() - t0
+
+    def _replan(self, node, nodes, pending, succeeded, failed, skipped,
+                attempts):
+        """
+        Reschedules a failed node after its direct dependencies, or gives
+        up on the node and the nodes depending on it.
+        """
+        attempts[node] += 1
+        if attempts[node] <= self.retries:
+            log.info('Retrying node "{}" after re-running its '
+                     'dependencies'.format(node))
+            pending.add(node)
+            self._set_state(node, 'needs calibration')
+            for dep in self.dependencies(node):
+                if dep in succeeded:
+                    succeeded.remove(dep)
+                    pending.add(dep)
+                    # checked again rather than assumed to be good
+                    self._set_state(dep, 'unknown')
+            return
+        failed.append(node)
+        dependants = nx.ancestors(self.graph, node) & pending
+        for dependant in dependants:
+            pending.remove(dependant)
+            skipped.append(dependant)
@@ -6,6 +6,7 @@ import adaptive
 import networkx as nx
 import datetime
 from collections import OrderedDict
+from contextlib import ExitStack
 from importlib import reload
 
 from qcodes.instrument.base import Instrument
@@ -33,6 +34,9 @@ from pycqed.instrument_drivers.physical_instruments.QuTech_CCL import CCL
 # from pycqed.instrument_drivers.physical_instruments.QuTechCC import QuTechCC
 
 from pycqed.utilities import learner1D_minimizer as l1dm
+from pycqed.instrument_drivers.meta_instrument.prepare_tracker import (
+    PrepareTracker,
+)
 
 reload(det)
 
@@ -196,6 +200,18 @@ class DeviceCCL(Instrument):
             vals=vals.Strings(),
         )
 
+        self.add_parameter(
+            "cfg_prepare_skip_unchanged",
+            docstring="If true, prepare_for_timedomain skips the prepare "
+            "stages for which none of the parameters of the instruments "
+            "involved changed since the stage was last executed. Changes "
+            "made to the hardware directly (e.g., a power cycle) are not "
+            "detected, use prepare_for_timedomain(force=True) in that case.",
+            parameter_class=ManualParameter,
+            vals=vals.Bool(),
+            initial_value=False,
+        )
+
         self.add_parameter(
             "ro_always_all",
             docstring="If true, configures the UHFQC to RO all qubits "
@@ -328,6 +344,9 @@ class DeviceCCL(Instrument):
             vals=vals.Dict(),
         )
 
+        # Keeps track of which prepare stages need to be executed
+        self.prepare_tracker = PrepareTracker()
+
     def _set_dio_map(self, dio_map_dict):
         allowed_keys = {"ro_", "mw_", "flux_"}
         for key in dio_map_dict:
@@ -471,18 +490,24 @@ class DeviceCCL(Instrument):
                 warnings.warn("Could not load flux pulses for {}".format(qb))
                 warnings.warn("Exception {}".format(e))
 
-    def prepare_readout(self, qubits):
+    def prepare_readout(self, qubits, force_upload: bool = True):
         """
         Configures readout for specified qubits.
 
         Args:
             qubits (list of str):
                 list of qubit names that have to be prepared
+            force_upload (bool):
+                upload all integration weights. If False, weights that are
+                equal to the cached values of the acquisition instruments
+                are not uploaded again. Only use False if the acquisition
+                instruments are not reset or modified by other means.
         """
         log.info("Configuring readout for {}".format(qubits))
         self._prep_ro_sources(qubits=qubits)
         acq_ch_map = self._prep_ro_assign_weights(qubits=qubits)
-        self._prep_ro_integration_weights(qubits=qubits)
+        self._prep_ro_integration_weights(
+            qubits=qubits, force_upload=force_upload)
         self._prep_ro_pulses(qubits=qubits)
 
         self._prep_ro_instantiate_detectors(qubits=qubits, acq_ch_map=acq_ch_map)
@@ -597,89 +622,111 @@ class DeviceCCL(Instrument):
 
         return acq_ch_map
 
-    def _prep_ro_integration_weights(self, qubits):
+    def _prep_ro_integration_weights(self, qubits, force_upload: bool = True):
         """
         Set the acquisition integration weights on each channel.
 
         Args:
             qubits (list of str):
                 list of qubit names that have to be prepared
+            force_upload (bool):
+                upload weights that are equal to the cached values
         """
         log.info("Setting integration weights")
 
-        if self.ro_acq_weight_type() == "SSB":
-            log.info("using SSB weights")
-            for qb_name in qubits:
-                qb = self.find_instrument(qb_name)
-                acq_instr = qb.instr_acquisition.get_instr()
-
-                acq_instr.prepare_SSB_weight_and_rotation(
-                    IF=qb.ro_freq_mod(),
-                    weight_function_I=qb.ro_acq_weight_chI(),
-                    weight_function_Q=qb.ro_acq_weight_chQ(),
-                )
-
-        elif self.ro_acq_weight_type() == "optimal":
-            log.info("using optimal weights")
-            for qb_name in qubits:
-                qb = self.find_instrument(qb_name)
-                acq_instr = qb.instr_acquisition.get_instr()
-                opt_WI = qb.ro_acq_weight_func_I()
-                opt_WQ = qb.ro_acq_weight_func_Q()
-                # N.B. no support for "delay samples" relating to #63
-                if opt_WI is None or opt_WQ is None:
-                    # do not raise an exception as it should be possible to
-                    # run input avg experiments to calibrate the optimal weights.
-                    log.warning(
-                        "No optimal weights defined for"
-                        " {}, not updating weights".format(qb_name)
-                    )
-                else:
-                    acq_instr.set(
-                        "qas_0_integration_weights_{}_real".format(
-                            qb.ro_acq_weight_chI()
-                        ),
-                        opt_WI,
-                    )
-                    acq_instr.set(
-                        "qas_0_integration_weights_{}_imag".format(
-                            qb.ro_acq_weight_chI()
-                        ),
-                        opt_WQ,
+        # The weights of all resonators that share an acquisition
+        # instrument (feedline) are generated and uploaded together.
+        acq_groups = self._group_qubits_by_acq_instr(qubits)
+
+        # The node writes of each acquisition instrument are collected and
+        # sent as a single transaction when leaving the context.
+        with ExitStack() as stack:
+            for acq_instr_name in acq_groups.keys():
+                stack.enter_context(self.find_instrument(acq_instr_name).batch())
+
+            if self.ro_acq_weight_type() == "SSB":
+                log.info("using SSB weights")
+                for acq_instr_name, qbs in acq_groups.items():
+                    # Qubits without a Q weight function (chQ is None) only
+                    # get an I weight, these entries are skipped by the UHFQC
+                    self.find_instrument(
+                        acq_instr_name).prepare_SSB_weights_and_rotations(
+                        IFs=[qb.ro_freq_mod() for qb in qbs],
+                        weight_functions_I=[qb.ro_acq_weight_chI() for qb in qbs],
+                        weight_functions_Q=[qb.ro_acq_weight_chQ() for qb in qbs],
+                        force_upload=force_upload,
                     )
-                    acq_instr.set(
-                        "qas_0_rotations_{}".format(qb.ro_acq_weight_chI()), 1.0 - 1.0j
+
+            elif self.ro_acq_weight_type() == "optimal":
+                log.info("using optimal weights")
+                for acq_instr_name, qbs in acq_groups.items():
+                    # N.B. no support for "delay samples" relating to #63
+                    qbs_with_weights = []
+                    for qb in qbs:
+                        if (qb.ro_acq_weight_func_I() is None or
+                                qb.ro_acq_weight_func_Q() is None):
+                            # do not raise an exception as it should be possible to
+                            # run input avg experiments to calibrate the optimal weights.
+                            log.warning(
+                                "No optimal weights defined for"
+                                " {}, not updating weights".format(qb.name)
+                            )
+                        else:
+                            qbs_with_weights.append(qb)
+
+                    self.find_instrument(
+                        acq_instr_name).upload_integration_weights(
+                        weight_functions=[qb.ro_acq_weight_chI()
+                                          for qb in qbs_with_weights],
+                        real=[qb.ro_acq_weight_func_I() for qb in qbs_with_weights],
+                        imag=[qb.ro_acq_weight_func_Q() for qb in qbs_with_weights],
+                        rotations=[1.0 - 1.0j]*len(qbs_with_weights),
+                        force_upload=force_upload,
                     )
-                if self.ro_acq_digitized():
-                    # Update the RO theshold
-                    if (
-                        qb.ro_acq_rotated_SSB_when_optimal()
-                        and abs(qb.ro_acq_threshold()) > 32
-                    ):
-                        threshold = 32
-                        log.warning(
-                            "Clipping ro_acq threshold of {} to 32".format(qb.name)
+
+                for qb_name in qubits:
+                    qb = self.find_instrument(qb_name)
+                    if self.ro_acq_digitized():
+                        # Update the RO theshold
+                        if (
+                            qb.ro_acq_rotated_SSB_when_optimal()
+                            and abs(qb.ro_acq_threshold()) > 32
+                        ):
+                            threshold = 32
+                            log.warning(
+                                "Clipping ro_acq threshold of {} to 32".format(qb.name)
+                            )
+                            # working around the limitation of threshold in UHFQC
+                            # which cannot be >abs(32).
+                            # See also self._prep_ro_integration_weights scaling the weights
+                        else:
+                            threshold = qb.ro_acq_threshold()
+
+                        qb.instr_acquisition.get_instr().set(
+                            "qas_0_thresholds_{}_level".format(qb.ro_acq_weight_chI()),
+                            threshold,
                         )
-                        # working around the limitation of threshold in UHFQC
-                        # which cannot be >abs(32).
-                        # See also self._prep_ro_integration_weights scaling the weights
-                    else:
-                        threshold = qb.ro_acq_threshold()
-
-                    qb.instr_acquisition.get_instr().set(
-                        "qas_0_thresholds_{}_level".format(qb.ro_acq_weight_chI()),
-                        threshold,
-                    )
-                    log.info("Setting threshold of {} to {}".format(qb.name, threshold))
+                        log.info("Setting threshold of {} to {}".format(qb.name, threshold))
 
-            # Note, no support for optimal IQ in mux RO
-            # Note, no support for ro_cq_rotated_SSB_when_optimal
-        else:
-            raise NotImplementedError(
-                'ro_acq_weight_type "{}" not supported'.format(
-                    self.ro_acq_weight_type()
+                # Note, no support for optimal IQ in mux RO
+                # Note, no support for ro_cq_rotated_SSB_when_optimal
+            else:
+                raise NotImplementedError(
+                    'ro_acq_weight_type "{}" not supported'.format(
+                        self.ro_acq_weight_type()
+                    )
                 )
-            )
+
+    def _group_qubits_by_acq_instr(self, qubits):
+        """
+        Returns an OrderedDict mapping the name of each acquisition
+        instrument to the list of qubit objects (in order) it reads out.
+        """
+        groups = OrderedDict()
+        for qb_name in qubits:
+            qb = self.find_instrument(qb_name)
+            groups.setdefault(qb.instr_acquisition(), []).append(qb)
+        return groups
 
     def _prep_ro_pulses(self, qubits):
         """
@@ -969,23 +1016,78 @@ class DeviceCCL(Instrument):
             #     'vsm_channel_delay{}'.format(qb.cfg_qubit_nr()),
             #     qb.mw_vsm_delay())
 
-    def prepare_for_timedomain(self, qubits: list):
+    def prepare_for_timedomain(self, qubits: list, force: bool = False):
         """
         Prepare setup for a timedomain experiment:
 
         Args:
             qubits (list of str):
                 list of qubit names that have to be prepared
-        """
-        self.prepare_readout(qubits=qubits)
-        if self.find_instrument(qubits[0]).instr_LutMan_Flux() != None:
-            self.prepare_fluxing(qubits=qubits)
-        self.prepare_timing()
-
-        for qb_name in qubits:
-            qb = self.find_instrument(qb_name)
-            qb._prep_td_sources()
-            qb._prep_mw_pulses()
+            force (bool):
+                execute all prepare stages. Only relevant if
+                cfg_prepare_skip_unchanged is True, in which case stages are
+                skipped when none of the parameters of the instruments they
+                configure changed since they were last executed. Use True
+                after modifying instruments directly.
+
+        The stages that were executed and their duration can be inspected
+        using self.prepare_tracker.print_report().
+        """
+        # Without cfg_prepare_skip_unchanged all stages are executed and no
+        # fingerprints are recorded
+        record = self.cfg_prepare_skip_unchanged()
+        force = force or not record
+        tracker = self.prepare_tracker
+        tracker.start_report()
+        qbs = [self.find_instrument(qb_name) for qb_name in qubits]
+
+        # Stages share instruments (e.g., the AWG of a MW LutMan used by
+        # several qubits), the fingerprints are recorded after all stages
+        # have been executed.
+        with tracker.sequence():
+            ro_instrs = [self]
+            for qb in qbs:
+                ro_lm = qb.instr_LutMan_RO.get_instr()
+                ro_instrs += [qb, _get_ref_instr(qb.instr_LO_ro),
+                              _get_ref_instr(qb.instr_acquisition),
+                              ro_lm, _get_ref_instr(ro_lm.AWG)]
+            # The cached integration weights are only trusted when the
+            # stages are skipped based on fingerprints as well.
+            tracker.run_stage(
+                "readout", self.prepare_readout, instruments=ro_instrs,
+                force=force, record=record, qubits=qubits,
+                force_upload=force)
+
+            if qbs[0].instr_LutMan_Flux() != None:
+                flux_instrs = []
+                for qb in qbs:
+                    if qb.instr_LutMan_Flux() is not None:
+                        fl_lm = qb.instr_LutMan_Flux.get_instr()
+                        flux_instrs += [fl_lm, _get_ref_instr(fl_lm.AWG)]
+                tracker.run_stage(
+                    "fluxing", self.prepare_fluxing, instruments=flux_instrs,
+                    force=force, record=record, qubits=qubits)
+
+            timing_instrs = [self, self.instr_CC.get_instr()]
+            for lat_key in self.dio_map():
+                if "mw" in lat_key or "flux" in lat_key:
+                    timing_instrs.append(_get_ref_instr(
+                        self.parameters["instr_AWG_{}".format(lat_key)]))
+            tracker.run_stage(
+                "timing", self.prepare_timing, instruments=timing_instrs,
+                force=force, record=record)
+
+            for qb in qbs:
+                tracker.run_stage(
+                    "td_sources_{}".format(qb.name), qb._prep_td_sources,
+                    instruments=[qb, qb.instr_LO_mw.get_instr(),
+                                 qb.instr_spec_source.get_instr()],
+                    force=force, record=record)
+                mw_lm = qb.instr_LutMan_MW.get_instr()
+                tracker.run_stage(
+                    "mw_pulses_{}".format(qb.name), qb._prep_mw_pulses,
+                    instruments=[qb, mw_lm, _get_ref_instr(mw_lm.AWG)],
+                    force=force, record=record)
 
         # self._prep_td_configure_VSM()
 
@@ -3909,3 +4011,13 @@ def _acq_ch_map_to_IQ_ch_map(acq_ch_map):
             acq_ch_map_IQ[acq_instr]["{} I".format(qubit)] = ch
             acq_ch_map_IQ[acq_instr]["{} Q".format(qubit)] = ch + 1
     return acq_ch_map_IQ
+
+
+def _get_ref_instr(instr_ref_par):
+    """
+    Returns the instrument an InstrumentRefParameter refers to, or None if
+    the parameter is not set.
+    """
+    if instr_ref_par() is None:
+        return None
+    return instr_ref_par.get_instr()
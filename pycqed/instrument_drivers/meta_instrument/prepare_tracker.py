@@ -0,0 +1,196 @@
+"""
+Tracks the state of the "prepare" stages of the qubit and device objects.
+
+Preparing a setup for a measurement (e.g., DeviceCCL.prepare_for_timedomain)
+consists of a number of stages such as configuring the readout, uploading
+the microwave pulses and setting the timing. Each stage is a function of the
+parameters of a small set of instruments. The PrepareTracker records a
+fingerprint of these parameters every time a stage is executed and skips
+the stage when it is requested again and none of the parameters has changed.
+
+The fingerprint is based on the cached raw values of the parameters, no
+communication with the instruments takes place (parameters that were never
+read or set have no cached value). Changes made directly to hardware (i.e.,
+not through the parameters of the tracked instruments) are not detected,
+use force=True in those cases.
+"""
+import time
+import hashlib
+import logging
+from contextlib import contextmanager
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+def _update_hash(h, value) -> None:
+    """
+    Adds a representation of a parameter value to a hashlib object.
+    Arrays are hashed based on their raw data, as the str representation
+    of large arrays is truncated.
+    """
+    if isinstance(value, np.ndarray):
+        h.update(str((value.dtype, value.shape)).encode())
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        h.update(type(value).__name__.encode())
+        for v in value:
+            _update_hash(h, v)
+    elif isinstance(value, dict):
+        h.update(b'dict')
+        for k in sorted(value.keys(), key=str):
+            h.update(str(k).encode())
+            _update_hash(h, value[k])
+    else:
+        h.update(repr(value).encode())
+
+
+def _cached_value(par):
+    """
+    Returns the cached raw value of a parameter without communicating with
+    the instrument.
+    """
+    cache = getattr(par, 'cache', None)
+    if cache is not None:
+        # qcodes >= 0.20, where get_latest gets never read parameters
+        return cache.raw_value
+    return par.get_latest()
+
+
+def instrument_fingerprint(instr) -> str:
+    """
+    Returns a hash of the cached values of all parameters of an instrument.
+    """
+    h = hashlib.sha1()
+    for par_name in sorted(instr.parameters.keys()):
+        h.update(par_name.encode())
+        _update_hash(h, _cached_value(instr.parameters[par_name]))
+    return h.hexdigest()
+
+
+class PrepareTracker():
+    """
+    Keeps track of the prepare stages executed by a qubit or device object.
+
+    Usage:
+        tracker.run_stage('readout', self._prep_readout,
+                          instruments=[self, ro_lutman])
+
+    A stage is executed when it has not been executed before, when any of
+    the parameters of the instruments it depends on has changed since it
+    was last executed, or when force=True. The fingerprint is recorded
+    after execution as the stage itself typically updates parameters of
+    the instruments it configures (e.g., the LutMans).
+
+    Stages that write to instruments shared with later stages (e.g., an
+    AWG used by several qubits) are run within a sequence, in which case the
+    fingerprints are recorded at the end of the sequence:
+
+        with tracker.sequence():
+            tracker.run_stage(...)
+            tracker.run_stage(...)
+
+    Every call to run_stage is recorded in the report, which can be reset
+    using start_report and inspected using print_report.
+    """
+
+    def __init__(self):
+        # maps stage names to a dict of {instrument name: fingerprint}
+        self._fingerprints = {}
+        # stages executed in the current sequence, None outside a sequence
+        self._sequence_stages = None
+        self.report = []
+
+    def run_stage(self, stage: str, func, instruments: list,
+                  force: bool = False, record: bool = True, **kw):
+        """
+        Executes func(**kw) unless the stage is up to date. The keyword
+        arguments are part of the fingerprint of the stage.
+
+        Args:
+            stage (str): unique name of the stage, e.g., 'mw_pulses_q0'.
+            func (callable): function that performs the stage.
+            instruments (list): instruments whose parameters determine the
+                outcome of the stage.
+            force (bool): execute the stage regardless of its state.
+            record (bool): record the fingerprint of the stage after
+                executing it. If False, the stage is always executed and no
+                fingerprints are computed, e.g., when skipping unchanged
+                stages is disabled.
+
+        Returns:
+            ran (bool): True if the stage was executed.
+        """
+        t0 = time.time()
+        force = force or not record
+
+        if not force and self._fingerprints.get(stage) == \
+                self._fingerprint(instruments, kw):
+            self.report.append(
+                {'stage': stage, 'ran': False, 'duration': time.time()-t0})
+            log.debug('Skipping prepare stage "{}": up to date'.format(stage))
+            return False
+
+        # Invalidate the stage first so that it is rerun if func fails
+        self._fingerprints.pop(stage, None)
+        func(**kw)
+        if record:
+            if self._sequence_stages is None:
+                self._fingerprints[stage] = self._fingerprint(instruments, kw)
+            else:
+                self._sequence_stages[stage] = (instruments, kw)
+
+        duration = time.time()-t0
+        self.report.append({'stage': stage, 'ran': True, 'duration': duration})
+        log.debug('Executed prepare stage "{}" in {:.3f}s'.format(
+            stage, duration))
+        return True
+
+    @contextmanager
+    def sequence(self):
+        """
+        Context in which the fingerprints of the executed stages are recorded
+        when leaving the context, i.e., after all stages of the sequence have
+        configured the instruments. If an exception is raised within the
+        context, the stages executed in it are not recorded.
+        """
+        self._sequence_stages = {}
+        try:
+            yield
+            for stage, (instruments, kw) in self._sequence_stages.items():
+                self._fingerprints[stage] = self._fingerprint(instruments, kw)
+        finally:
+            self._sequence_stages = None
+
+    def invalidate(self, stage: str = None) -> None:
+        """
+        Forces a stage (or all stages if stage is None) to be executed the
+        next time it is requested.
+        """
+        if stage is None:
+            self._fingerprints = {}
+        else:
+            self._fingerprints.pop(stage, None)
+
+    def start_report(self) -> None:
+        self.report = []
+
+    def print_report(self) -> None:
+        total = 0
+        for entry in self.report:
+            total += entry['duration']
+            print('{:<32} {:<8} {:8.1f} ms'.format(
+                entry['stage'], 'ran' if entry['ran'] else 'skipped',
+                entry['duration']*1e3))
+        print('{:<32} {:<8} {:8.1f} ms'.format('total', '', total*1e3))
+
+    @staticmethod
+    def _fingerprint(instruments: list, kw: dict) -> dict:
+        fingerprints = {}
+        for instr in instruments:
+            if instr is not None and instr.name not in fingerprints:
+                fingerprints[instr.name] = instrument_fingerprint(instr)
+        h = hashlib.sha1()
+        _update_hash(h, kw)
+        fingerprints['__kwargs__'] = h.hexdigest()
+        return fingerprints
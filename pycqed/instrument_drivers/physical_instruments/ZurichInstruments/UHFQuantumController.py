@@ -138,6 +138,46 @@ def array2vect(array, name):
     else:
         return 'wave ' + name + ' = ' + 'vect(' + ','.join(['{:.8f}'.format(x) for x in array]) + ');\n'
 
+
+def gen_SSB_integration_weights(IFs, rotation_angles=0,
+                                lengths=4096 / 1.8e9,
+                                trace_length: int = 4096,
+                                sampling_rate: float = 1.8e9):
+    """
+    Generates the SSB integration weights of multiple resonators in a single
+    vectorized operation.
+
+    Args:
+        IFs (array): intermediate frequencies of the N resonators (Hz).
+        rotation_angles (float or array): phase offset of the weights (rad).
+        lengths (float or array): integration length, samples beyond the
+            integration length are set to 0 (s).
+        trace_length (int): number of samples in each weight function.
+        sampling_rate (float): sampling rate of the weight functions (Hz).
+
+    Returns:
+        cos, sin (array): arrays of shape (N, trace_length) containing the
+            cosine and sine weights of each resonator.
+    """
+    IFs = np.atleast_1d(np.asarray(IFs, dtype=float))
+    rotation_angles = np.broadcast_to(rotation_angles, IFs.shape)
+    lengths = np.broadcast_to(lengths, IFs.shape)
+
+    tbase = np.arange(trace_length) * (1 / sampling_rate)
+    phases = 2 * np.pi * IFs[:, None] * tbase[None, :] + \
+        rotation_angles[:, None]
+    cos = np.cos(phases)
+    sin = np.sin(phases)
+
+    # setting the samples beyond the length to 0
+    max_samples = np.where(lengths < trace_length / sampling_rate,
+                           (lengths * sampling_rate).astype(int),
+                           trace_length)
+    mask = np.arange(trace_length)[None, :] >= max_samples[:, None]
+    cos[mask] = 0
+    sin[mask] = 0
+    return cos, sin
+
 ##########################################################################
 # Class
 ##########################################################################
@@ -217,6 +257,10 @@ class UHFQC(zibase.ZI_base_instrument):
         # Holds the DIO calibration delay
         self._dio_calibration_delay = 0
 
+        # Weight functions of which the cached integration weights are known
+        # to match the instrument, see upload_integration_weights
+        self._weights_cache_valid = set()
+
         # Define parameters that should not be part of the snapshot
         self._params_to_exclude = set(['features_code', 'system_fwlog', 'system_fwlogenable'])
 
@@ -486,70 +530,76 @@ class UHFQC(zibase.ZI_base_instrument):
         if upload_sequence:
             self.awg_sequence_acquisition()
 
-        # Setting the clock to external
-        self.system_extclk(1)
-
-        # Turn on both outputs
-        self.sigouts_0_on(1)
-        self.sigouts_1_on(1)
-
-        # Set the output channels to 50 ohm
-        self.sigouts_0_imp50(True)
-        self.sigouts_1_imp50(True)
-
-        # Configure the analog trigger input 1 of the AWG to assert on a rising
-        # edge on Ref_Trigger 1 (front-panel of the instrument)
-        self.awgs_0_triggers_0_rising(1)
-        self.awgs_0_triggers_0_level(0.000000000)
-        self.awgs_0_triggers_0_channel(2)
-
-        # Configure the digital trigger to be a rising-edge trigger
-        self.awgs_0_auxtriggers_0_slope(1)
-
-        # Straight connection, signal input 1 to channel 1, signal input 2 to
-        # channel 2
+        # The instrument is (partially) reset, so the cached weights can no
+        # longer be trusted
+        self.invalidate_integration_weights_cache()
 
-        self.qas_0_deskew_rows_0_cols_0(1.0)
-        self.qas_0_deskew_rows_0_cols_1(0.0)
-        self.qas_0_deskew_rows_1_cols_0(0.0)
-        self.qas_0_deskew_rows_1_cols_1(1.0)
+        # All remaining settings are sent to the instrument in one transaction
+        with self.batch():
+            # Setting the clock to external
+            self.system_extclk(1)
 
-        # Configure the codeword protocol
-        if self._use_dio:
-            self.dios_0_mode(2)  # QuExpress thresholds on DIO (mode == 2), AWG control of DIO (mode == 1)
-            self.dios_0_drive(0x3)  # Drive DIO bits 15 to 0
-            self.dios_0_extclk(2)  # 50 MHz clocking of the DIO
-            self.awgs_0_dio_strobe_slope(0)  # no edge, replaced by dios_0_extclk(2)
-            self.awgs_0_dio_strobe_index(15)  # NB: 15 for QCC (was 31 for CCL). Irrelevant now we use 50 MHz clocking
-            self.awgs_0_dio_valid_polarity(2)  # high polarity
-            self.awgs_0_dio_valid_index(16)
-
-        # No rotation on the output of the weighted integration unit, i.e. take
-        # real part of result
-        for i in range(0, self._nr_integration_channels):
-            self.set('qas_0_rotations_{}'.format(i), 1.0 + 0.0j)
-            # remove offsets to weight function
-            self.set('qas_0_trans_offset_weightfunction_{}'.format(i), 0.0)
-
-        # No cross-coupling in the matrix multiplication (identity matrix)
-        self.reset_crosstalk_matrix()
-
-        # disable correlation mode on all channels
-        self.reset_correlation_params()
-
-        # Configure the result logger to not do any averaging
-        self.qas_0_result_length(1000)
-        self.qas_0_result_averages(pow(2, LOG2_AVG_CNT))
-        # result_logging_mode 2 => raw (IQ)
-        self.qas_0_result_source(2)
-
-        # The custom firmware will feed through the signals on Signal Input 1 to Signal Output 1 and Signal Input 2 to Signal Output 2
-        # when the AWG is OFF. For most practical applications this is not really useful. We, therefore, disable the generation of
-        # these signals on the output here.
-        self.sigouts_0_enables_0(0)
-        self.sigouts_0_enables_1(0)
-        self.sigouts_1_enables_0(0)
-        self.sigouts_1_enables_1(0)
+            # Turn on both outputs
+            self.sigouts_0_on(1)
+            self.sigouts_1_on(1)
+
+            # Set the output channels to 50 ohm
+            self.sigouts_0_imp50(True)
+            self.sigouts_1_imp50(True)
+
+            # Configure the analog trigger input 1 of the AWG to assert on a rising
+            # edge on Ref_Trigger 1 (front-panel of the instrument)
+            self.awgs_0_triggers_0_rising(1)
+            self.awgs_0_triggers_0_level(0.000000000)
+            self.awgs_0_triggers_0_channel(2)
+
+            # Configure the digital trigger to be a rising-edge trigger
+            self.awgs_0_auxtriggers_0_slope(1)
+
+            # Straight connection, signal input 1 to channel 1, signal input 2 to
+            # channel 2
+
+            self.qas_0_deskew_rows_0_cols_0(1.0)
+            self.qas_0_deskew_rows_0_cols_1(0.0)
+            self.qas_0_deskew_rows_1_cols_0(0.0)
+            self.qas_0_deskew_rows_1_cols_1(1.0)
+
+            # Configure the codeword protocol
+            if self._use_dio:
+                self.dios_0_mode(2)  # QuExpress thresholds on DIO (mode == 2), AWG control of DIO (mode == 1)
+                self.dios_0_drive(0x3)  # Drive DIO bits 15 to 0
+                self.dios_0_extclk(2)  # 50 MHz clocking of the DIO
+                self.awgs_0_dio_strobe_slope(0)  # no edge, replaced by dios_0_extclk(2)
+                self.awgs_0_dio_strobe_index(15)  # NB: 15 for QCC (was 31 for CCL). Irrelevant now we use 50 MHz clocking
+                self.awgs_0_dio_valid_polarity(2)  # high polarity
+                self.awgs_0_dio_valid_index(16)
+
+            # No rotation on the output of the weighted integration unit, i.e. take
+            # real part of result
+            for i in range(0, self._nr_integration_channels):
+                self.set('qas_0_rotations_{}'.format(i), 1.0 + 0.0j)
+                # remove offsets to weight function
+                self.set('qas_0_trans_offset_weightfunction_{}'.format(i), 0.0)
+
+            # No cross-coupling in the matrix multiplication (identity matrix)
+            self.reset_crosstalk_matrix()
+
+            # disable correlation mode on all channels
+            self.reset_correlation_params()
+
+            # Configure the result logger to not do any averaging
+            self.qas_0_result_length(1000)
+            self.qas_0_result_averages(pow(2, LOG2_AVG_CNT))
+            # result_logging_mode 2 => raw (IQ)
+            self.qas_0_result_source(2)
+
+            # The custom firmware will feed through the signals on Signal Input 1 to Signal Output 1 and Signal Input 2 to Signal Output 2
+            # when the AWG is OFF. For most practical applications this is not really useful. We, therefore, disable the generation of
+            # these signals on the output here.
+            self.sigouts_0_enables_0(0)
+            self.sigouts_0_enables_1(0)
+            self.sigouts_1_enables_0(0)
+            self.sigouts_1_enables_1(0)
 
     ##########################################################################
     # Private methods
@@ -706,27 +756,30 @@ setUserReg(4, err_cnt);"""
 
     def reset_acquisition_params(self):
         log.info('Setting user registers to 0')
-        for i in range(16):
-            self.set('awgs_0_userregs_{}'.format(i), 0)
+        with self.batch():
+            for i in range(16):
+                self.set('awgs_0_userregs_{}'.format(i), 0)
 
-        self.reset_crosstalk_matrix()
-        self.reset_correlation_params()
-        self.reset_rotation_params()
+            self.reset_crosstalk_matrix()
+            self.reset_correlation_params()
+            self.reset_rotation_params()
 
     def reset_crosstalk_matrix(self):
         self.upload_crosstalk_matrix(np.eye(10))
 
     def reset_correlation_params(self):
-        for i in range(10):
-            self.set('qas_0_correlations_{}_enable'.format(i), 0)
-            self.set('qas_0_correlations_{}_source'.format(i), 0)
-        for i in range(10):
-            self.set('qas_0_thresholds_{}_correlation_enable'.format(i), 0)
-            self.set('qas_0_thresholds_{}_correlation_source'.format(i), 0)
+        with self.batch():
+            for i in range(10):
+                self.set('qas_0_correlations_{}_enable'.format(i), 0)
+                self.set('qas_0_correlations_{}_source'.format(i), 0)
+            for i in range(10):
+                self.set('qas_0_thresholds_{}_correlation_enable'.format(i), 0)
+                self.set('qas_0_thresholds_{}_correlation_source'.format(i), 0)
 
     def reset_rotation_params(self):
-        for i in range(10):
-            self.set('qas_0_rotations_{}'.format(i), 1+1j)
+        with self.batch():
+            for i in range(10):
+                self.set('qas_0_rotations_{}'.format(i), 1+1j)
 
     ##########################################################################
     # 'public' functions: generic AWG/waveform support
@@ -992,41 +1045,160 @@ setUserReg(4, err_cnt);"""
         Sets default integration weights for SSB modulation, beware does not
         load pulses or prepare the UFHQC progarm to do data acquisition
         """
-        trace_length = 4096
-        tbase = np.arange(0, trace_length / 1.8e9, 1 / 1.8e9)
-        cosI = np.array(np.cos(2 * np.pi * IF * tbase + rotation_angle))
-        sinI = np.array(np.sin(2 * np.pi * IF * tbase + rotation_angle))
-        if length < 4096 / 1.8e9:
-            max_sample = int(length * 1.8e9)
-            # setting the samples beyond the length to 0
-            cosI[max_sample:] = 0
-            sinI[max_sample:] = 0
-        self.set('qas_0_integration_weights_{}_real'.format(weight_function_I),
-                 np.array(cosI))
-        self.set('qas_0_integration_weights_{}_imag'.format(weight_function_I),
-                 np.array(sinI))
-        self.set('qas_0_rotations_{}'.format(
-            weight_function_I), scaling_factor*(1.0 + 1.0j))
-        if weight_function_Q != None:
-            self.set('qas_0_integration_weights_{}_real'.format(weight_function_Q),
-                     np.array(sinI))
-            self.set('qas_0_integration_weights_{}_imag'.format(weight_function_Q),
-                     np.array(cosI))
-            self.set('qas_0_rotations_{}'.format(
-                weight_function_Q), scaling_factor*(1.0 - 1.0j))
+        self.prepare_SSB_weights_and_rotations(
+            IFs=[IF], weight_functions_I=[weight_function_I],
+            weight_functions_Q=None if weight_function_Q is None
+            else [weight_function_Q],
+            rotation_angles=rotation_angle, lengths=length,
+            scaling_factor=scaling_factor, force_upload=True)
+
+    def prepare_SSB_weights_and_rotations(self, IFs,
+                                          weight_functions_I,
+                                          weight_functions_Q=None,
+                                          rotation_angles=0,
+                                          lengths=4096 / 1.8e9,
+                                          scaling_factor=1,
+                                          force_upload: bool = False) -> list:
+        """
+        Sets SSB integration weights for multiple resonators at once, e.g.,
+        all resonators on a feedline. The weights are generated in a single
+        vectorized operation and uploaded using upload_integration_weights.
+
+        Args:
+            IFs (array): intermediate frequencies of the resonators.
+            weight_functions_I (list of int): weight function used for
+                the I quadrature of each resonator.
+            weight_functions_Q (list of int): weight function used for
+                the Q quadrature of each resonator, None to only use I. An
+                entry can be None to only use I for that resonator.
+            rotation_angles, lengths: see gen_SSB_integration_weights.
+            scaling_factor (float): scaling of the rotations.
+            force_upload (bool): upload weights even if unchanged.
+
+        Returns:
+            list of weight functions that were uploaded.
+        """
+        cosI, sinI = gen_SSB_integration_weights(
+            IFs=IFs, rotation_angles=rotation_angles, lengths=lengths)
+
+        weight_functions = list(weight_functions_I)
+        real, imag = cosI, sinI
+        rotations = [scaling_factor*(1.0 + 1.0j)]*len(weight_functions_I)
+        if weight_functions_Q is not None:
+            has_Q = np.array([ch is not None for ch in weight_functions_Q],
+                             dtype=bool)
+            weight_functions += [ch for ch in weight_functions_Q
+                                 if ch is not None]
+            real = np.concatenate((cosI, sinI[has_Q]))
+            imag = np.concatenate((sinI, cosI[has_Q]))
+            rotations += [scaling_factor*(1.0 - 1.0j)]*int(np.sum(has_Q))
+
+        return self.upload_integration_weights(
+            weight_functions=weight_functions, real=real, imag=imag,
+            rotations=rotations, force_upload=force_upload)
+
+    def upload_integration_weights(self, weight_functions, real, imag,
+                                   rotations=None,
+                                   force_upload: bool = False) -> list:
+        """
+        Uploads the integration weights (and rotations) of multiple weight
+        functions in a single transaction.
+
+        Weights that are identical to the last values set on a weight
+        function are not uploaded again. The comparison is made against the
+        cached value of the corresponding parameter, so weights set through
+        the parameters (e.g., qas_0_integration_weights_0_real) are taken
+        into account. The cache is only trusted for weight functions that
+        were uploaded by this method since the last call to
+        invalidate_integration_weights_cache, which is called by
+        load_default_settings. Use force_upload (or invalidate the cache)
+        when the instrument may have been changed in another way, e.g., by
+        another client or a reset of the instrument.
+
+        Args:
+            weight_functions (list of int): indices of the weight functions.
+            real, imag (array or list of arrays): weights for each of the
+                weight functions, e.g., an array of shape
+                (len(weight_functions), samples).
+            rotations (list of complex): rotation of each weight function,
+                None to leave the rotations unchanged.
+            force_upload (bool): upload weights even if unchanged.
+
+        Returns:
+            list of weight functions of which any node was uploaded.
+        """
+        if rotations is None:
+            rotations = [None]*len(weight_functions)
+
+        updated = []
+        with self.batch():
+            for ch, w_real, w_imag, rot in zip(
+                    weight_functions, real, imag, rotations):
+                valid = ch in self._weights_cache_valid
+                force = force_upload or not valid
+                # The parameter cache is updated before a (batched) write is
+                # sent, so it is not trusted until the write has been sent
+                self._weights_cache_valid.discard(ch)
+                changed = self._set_if_changed(
+                    'qas_0_integration_weights_{}_real'.format(ch),
+                    np.array(w_real), force)
+                changed |= self._set_if_changed(
+                    'qas_0_integration_weights_{}_imag'.format(ch),
+                    np.array(w_imag), force)
+                if rot is not None:
+                    changed |= self._set_if_changed(
+                        'qas_0_rotations_{}'.format(ch), rot, force)
+                if changed:
+                    updated.append(ch)
+                elif valid:
+                    self._weights_cache_valid.add(ch)
+        # Only trust the cache once the outermost batch has been sent
+        uploaded = list(updated)
+        self._after_batch(lambda: self._weights_cache_valid.update(uploaded))
+
+        log.debug('{}: uploaded integration weights {}'.format(
+            self.devname, updated))
+        return updated
+
+    def invalidate_integration_weights_cache(self) -> None:
+        """
+        Makes the next call to upload_integration_weights upload all weights,
+        e.g., after the instrument was reset or changed by another client.
+        """
+        self._weights_cache_valid.clear()
+
+    def _set_if_changed(self, parameter_name: str, value,
+                        force: bool = False) -> bool:
+        """
+        Sets a parameter unless the value is equal to the cached value of
+        the parameter. Returns True if the parameter was set.
+        """
+        par = self.parameters[parameter_name]
+        if not force:
+            latest = par.get_latest()
+            if isinstance(value, np.ndarray):
+                unchanged = (latest is not None and
+                             np.array_equal(np.asarray(latest), value))
+            else:
+                unchanged = (latest == value)
+            if unchanged:
+                return False
+        par.set(value)
+        return True
 
     def prepare_DSB_weight_and_rotation(self, IF, weight_function_I=0, weight_function_Q=1) -> None:
         trace_length = 4096
         tbase = np.arange(0, trace_length/1.8e9, 1/1.8e9)
         cosI = np.array(np.cos(2 * np.pi*IF*tbase))
         sinI = np.array(np.sin(2 * np.pi*IF*tbase))
-        self.set('qas_0_integration_weights_{}_real'.format(weight_function_I),
-                 np.array(cosI))
-        self.set('qas_0_integration_weights_{}_real'.format(weight_function_Q),
-                 np.array(sinI))
-        # the factor 2 is needed so that scaling matches SSB downconversion
-        self.set('qas_0_rotations_{}'.format(weight_function_I), 2.0 + 0.0j)
-        self.set('qas_0_rotations_{}'.format(weight_function_Q), 2.0 + 0.0j)
+        with self.batch():
+            self.set('qas_0_integration_weights_{}_real'.format(weight_function_I),
+                     np.array(cosI))
+            self.set('qas_0_integration_weights_{}_real'.format(weight_function_Q),
+                     np.array(sinI))
+            # the factor 2 is needed so that scaling matches SSB downconversion
+            self.set('qas_0_rotations_{}'.format(weight_function_I), 2.0 + 0.0j)
+            self.set('qas_0_rotations_{}'.format(weight_function_Q), 2.0 + 0.0j)
 
     def upload_crosstalk_matrix(self, matrix) -> None:
         """
@@ -1034,10 +1206,11 @@ setUserReg(4, err_cnt);"""
 
         This method uses the 'qas_0_crosstalk_rows_*_cols_*' nodes.
         """
-        for i in range(np.shape(matrix)[0]):  # looping over the rows
-            for j in range(np.shape(matrix)[1]):  # looping over the colums
-                self.set('qas_0_crosstalk_rows_{}_cols_{}'.format(
-                    j, i), matrix[i][j])
+        with self.batch():
+            for i in range(np.shape(matrix)[0]):  # looping over the rows
+                for j in range(np.shape(matrix)[1]):  # looping over the colums
+                    self.set('qas_0_crosstalk_rows_{}_cols_{}'.format(
+                        j, i), matrix[i][j])
 
     def download_crosstalk_matrix(self, nr_rows=10, nr_cols=10):
         """
@@ -1045,12 +1218,12 @@ setUserReg(4, err_cnt);"""
 
         This method uses the 'qas_0_crosstalk_rows_*_cols_*' nodes.
         """
-        matrix = np.zeros([nr_rows, nr_cols])
-        for i in range(np.shape(matrix)[0]):  # looping over the rows
-            for j in range(np.shape(matrix)[1]):  # looping over the colums
-                matrix[i][j] = self.get(
-                    'qas_0_crosstalk_rows_{}_cols_{}'.format(j, i))
-        return matrix
+        paths = ['qas/0/crosstalk/rows/{}/cols/{}'.format(j, i)
+                 for i in range(nr_rows)    # looping over the rows
+                 for j in range(nr_cols)]   # looping over the colums
+        values = self.get_many(paths)
+        matrix = np.array([values[p] for p in paths], dtype=float)
+        return matrix.reshape((nr_rows, nr_cols))
 
     ##########################################################################
     """
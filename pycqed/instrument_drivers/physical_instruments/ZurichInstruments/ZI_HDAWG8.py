@@ -332,6 +332,22 @@ while (1) {
             self.system_awg_channelgrouping(0)
             self.sync()
 
+        # All DIO settings are sent to the instrument in one transaction
+        with self.batch():
+            self._configure_dio()
+
+        ####################################################
+        # Turn on device
+        ####################################################
+        time.sleep(.05)
+        for awg_nr in range(int(self._num_channels()//2)):
+            self.set('awgs_{}_enable'.format(awg_nr), 1)
+
+        # All output settings are sent to the instrument in one transaction
+        with self.batch():
+            self._configure_outputs()
+
+    def _configure_dio(self):
         # Use 50 MHz DIO clocking
         self.seti('raw/dios/0/extclk', 1)
 
@@ -429,13 +445,7 @@ while (1) {
                     elif awg_nr == 3:
                         self.set('awgs_{}_dio_mask_shift'.format(awg_nr), 22)
 
-        ####################################################
-        # Turn on device
-        ####################################################
-        time.sleep(.05)
-        for awg_nr in range(int(self._num_channels()//2)):
-            self.set('awgs_{}_enable'.format(awg_nr), 1)
-
+    def _configure_outputs(self):
         # Disable all function generators
         for param in [key for key in self.parameters.keys() if
                       re.match(r'sines_\d+_enables_\d+', key)]:
@@ -5,6 +5,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 import logging
 import re
+from contextlib import contextmanager
 
 from qcodes.instrument.base import Instrument
 from qcodes.utils import validators
@@ -172,6 +173,19 @@ def _gen_get_cmd(dev_get_func, node_path: str):
         return dev_get_func(node_path)
     return get_cmd
 
+
+def _extract_node_value(node_data):
+    """
+    Extracts the value of a single node from the (flat) data structure
+    returned by the 'get' method of the DAQ server. Scalar nodes are returned
+    as a dict containing a 'value' array, vector nodes as a list of dicts
+    containing a 'vector' entry.
+    """
+    if isinstance(node_data, dict):
+        return node_data['value'][0]
+    else:
+        return node_data[0]['vector']
+
 ##########################################################################
 # Exceptions
 ##########################################################################
@@ -255,6 +269,14 @@ class MockDAQServer():
         self.devtype = None
         self.poll_nodes = []
         self.verbose = verbose
+        # Number of calls made to the server, used to test batched access
+        self._round_trip_count = 0
+
+    def get_round_trip_count(self):
+        return self._round_trip_count
+
+    def reset_round_trip_count(self):
+        self._round_trip_count = 0
 
     def awgModule(self):
         return MockAwgModule(self)
@@ -341,6 +363,7 @@ class MockDAQServer():
         pass
 
     def getString(self, path):
+        self._round_trip_count += 1
         if path not in self.nodes:
             raise ziRuntimeError("Unknown node '" + path +
                                  "' used with mocked server and device!")
@@ -351,7 +374,22 @@ class MockDAQServer():
 
         return self.nodes[path]['value']
 
+    def setString(self, path, value):
+        self._round_trip_count += 1
+        if path not in self.nodes:
+            raise ziRuntimeError("Unknown node '" + path +
+                                 "' used with mocked server and device!")
+
+        if self.nodes[path]['type'] != 'String':
+            raise ziRuntimeError(
+                "Trying to set node '" + path + "' as string, but the type is '" + self.nodes[path]['type'] + "'!")
+
+        if self.verbose:
+            print('setString', path, value)
+        self.nodes[path]['value'] = value
+
     def getInt(self, path):
+        self._round_trip_count += 1
         if path not in self.nodes:
             raise ziRuntimeError("Unknown node '" + path +
                                  "' used with mocked server and device!")
@@ -362,6 +400,7 @@ class MockDAQServer():
         return int(self.nodes[path]['value'])
 
     def getDouble(self, path):
+        self._round_trip_count += 1
         if path not in self.nodes:
             raise ziRuntimeError("Unknown node '" + path +
                                  "' used with mocked server and device!")
@@ -372,6 +411,7 @@ class MockDAQServer():
         return float(self.nodes[path]['value'])
 
     def setInt(self, path, value):
+        self._round_trip_count += 1
         if path not in self.nodes:
             raise ziRuntimeError("Unknown node '" + path +
                                  "' used with mocked server and device!")
@@ -382,6 +422,7 @@ class MockDAQServer():
         self.nodes[path]['value'] = value
 
     def setDouble(self, path, value):
+        self._round_trip_count += 1
         if path not in self.nodes:
             raise ziRuntimeError("Unknown node '" + path +
                                  "' used with mocked server and device!")
@@ -390,6 +431,7 @@ class MockDAQServer():
         self.nodes[path]['value'] = value
 
     def setVector(self, path, value):
+        self._round_trip_count += 1
         if path not in self.nodes:
             raise ziRuntimeError("Unknown node '" + path +
                                  "' used with mocked server and device!")
@@ -401,6 +443,7 @@ class MockDAQServer():
         self.nodes[path]['value'] = value
 
     def setComplex(self, path, value):
+        self._round_trip_count += 1
         if path not in self.nodes:
             raise ziRuntimeError("Unknown node '" + path +
                                  "' used with mocked server and device!")
@@ -414,6 +457,7 @@ class MockDAQServer():
         self.nodes[path]['value'] = value
 
     def getComplex(self, path):
+        self._round_trip_count += 1
         if path not in self.nodes:
             raise ziRuntimeError("Unknown node '" + path +
                                  "' used with mocked server and device!")
@@ -427,16 +471,40 @@ class MockDAQServer():
         return self.nodes[path]['value']
 
     def get(self, path, flat, flags):
-        if path not in self.nodes:
-            raise ziRuntimeError("Unknown node '" + path +
-                                 "' used with mocked server and device!")
+        self._round_trip_count += 1
+        # Multiple nodes can be requested as a comma-separated list
+        data = {}
+        for p in path.split(','):
+            if p not in self.nodes:
+                raise ziRuntimeError("Unknown node '" + p +
+                                     "' used with mocked server and device!")
+            data[p] = [{'vector': self.nodes[p]['value']}]
+
+        return data
+
+    def set(self, items):
+        """
+        Sets multiple nodes in a single call. The 'items' argument is a list
+        of (path, value) tuples, which are applied in order.
+        """
+        self._round_trip_count += 1
+        for path, value in items:
+            if path not in self.nodes:
+                raise ziRuntimeError("Unknown node '" + path +
+                                     "' used with mocked server and device!")
+            if self.verbose:
+                print('set', path, value)
+            self.nodes[path]['value'] = value
 
-        return {path: [{'vector': self.nodes[path]['value']}]}
+    def sync(self):
+        self._round_trip_count += 1
 
     def getAsEvent(self, path):
+        self._round_trip_count += 1
         self.poll_nodes.append(path)
 
     def poll(self, poll_time, timeout, flags, flat):
+        self._round_trip_count += 1
         poll_data = {}
 
         for path in self.poll_nodes:
@@ -464,12 +532,14 @@ class MockDAQServer():
         return poll_data
 
     def subscribe(self, path):
+        self._round_trip_count += 1
         if self.verbose:
             print('subscribe', path)
 
         self.poll_nodes.append(path)
 
     def unsubscribe(self, path):
+        self._round_trip_count += 1
         if self.verbose:
             print('unsubscribe', path)
 
@@ -620,6 +690,12 @@ class ZI_base_instrument(Instrument):
         t0 = time.time()
         super().__init__(name=name, **kw)
 
+        # Node writes collected while inside a 'batch' context
+        self._batch_depth = 0
+        self._batch_settings = []
+        # Functions called once the queued node writes have been sent
+        self._batch_callbacks = []
+
         # Decide which server to use based on name
         if server == 'emulator':
             log.info('Connecting to mock DAQ server')
@@ -1207,26 +1283,37 @@ class ZI_base_instrument(Instrument):
     # Public methods: node helpers
     ##########################################################################
 
+    def _set_node(self, daq_set_func, path, value) -> None:
+        """
+        Writes a single node, or queues the write when inside a 'batch'
+        context.
+        """
+        path = self._get_full_path(path)
+        if self._batch_depth > 0:
+            self._batch_settings.append((path, value))
+        else:
+            daq_set_func(path, value)
+
     def setd(self, path, value) -> None:
-        self.daq.setDouble(self._get_full_path(path), value)
+        self._set_node(self.daq.setDouble, path, float(value))
 
     def getd(self, path):
         return self.daq.getDouble(self._get_full_path(path))
 
     def seti(self, path, value) -> None:
-        self.daq.setInt(self._get_full_path(path), value)
+        self._set_node(self.daq.setInt, path, int(value))
 
     def geti(self, path):
         return self.daq.getInt(self._get_full_path(path))
 
     def sets(self, path, value) -> None:
-        self.daq.setString(self._get_full_path(path), value)
+        self._set_node(self.daq.setString, path, value)
 
     def gets(self, path):
         return self.daq.getString(self._get_full_path(path))
 
     def setc(self, path, value) -> None:
-        self.daq.setComplex(self._get_full_path(path), value)
+        self._set_node(self.daq.setComplex, path, value)
 
     def getc(self, path):
         return self.daq.getComplex(self._get_full_path(path))
@@ -1234,8 +1321,11 @@ class ZI_base_instrument(Instrument):
     def setv(self, path, value) -> None:
         # Handle absolute path
         if self.use_setVector:
-            self.daq.setVector(self._get_full_path(path), value)
+            self._set_node(self.daq.setVector, path, value)
         else:
+            # Old API versions do not support vectors in multi-node sets.
+            # Send the queued writes first to preserve the order of writes.
+            self._flush_batch()
             self.daq.vectorWrite(self._get_full_path(path), value)
 
     def getv(self, path):
@@ -1246,6 +1336,85 @@ class ZI_base_instrument(Instrument):
         else:
             return value[path][0]['vector']
 
+    def get_many(self, paths) -> dict:
+        """
+        Reads multiple nodes using a single call to the server.
+
+        Args:
+            paths (list of str): node paths, either relative to the device
+                (e.g., 'qas/0/result/length') or absolute.
+
+        Returns:
+            dict mapping each of the requested paths to its value.
+        """
+        full_paths = [self._get_full_path(p) for p in paths]
+        data = self.daq.get(','.join(full_paths), True, 0)
+
+        values = {}
+        for path, full_path in zip(paths, full_paths):
+            if full_path not in data:
+                raise ziValueError('No value returned for path ' + full_path)
+            values[path] = _extract_node_value(data[full_path])
+
+        return values
+
+    @contextmanager
+    def batch(self):
+        """
+        Context manager that collects all node writes and sends them to the
+        instrument as a single multi-node 'set' followed by a single 'sync'
+        when the (outermost) context is exited.
+
+            with uhf.batch():
+                uhf.sigouts_0_on(1)
+                uhf.setd('sigouts/0/offset', 0.0)
+
+        Batches can be nested, only the outermost batch sends the data. Note
+        that reading a node inside a batch returns the value on the
+        instrument, i.e., queued writes are not visible yet. If an exception
+        is raised inside the batch, the queued writes are discarded.
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        except Exception:
+            if self._batch_depth == 1:
+                log.warning(f'{self.devname}: Discarding {len(self._batch_settings)} '
+                            'queued node writes due to an exception.')
+                self._batch_settings = []
+                self._batch_callbacks = []
+            raise
+        finally:
+            self._batch_depth -= 1
+
+        if self._batch_depth == 0:
+            self._flush_batch()
+
+    def _after_batch(self, callback) -> None:
+        """
+        Calls callback once the node writes queued so far have been sent to
+        the instrument, i.e., immediately when not inside a 'batch' context.
+        The callback is not called if the queued writes are discarded.
+        """
+        if self._batch_depth > 0:
+            self._batch_callbacks.append(callback)
+        else:
+            callback()
+
+    def _flush_batch(self) -> None:
+        """
+        Sends all queued node writes to the instrument in a single call.
+        """
+        settings, self._batch_settings = self._batch_settings, []
+        callbacks, self._batch_callbacks = self._batch_callbacks, []
+        if len(settings) > 0:
+            log.debug(f'{self.devname}: Setting {len(settings)} nodes in a single transaction')
+            self.daq.set(settings)
+            self.daq.sync()
+
+        for callback in callbacks:
+            callback()
+
     def getdeep(self, path, timeout=5.0):
         path = self._get_full_path(path)
 
@@ -0,0 +1,195 @@
+"""
+Incremental refreshing of the instrument monitor.
+
+Instead of taking a full station snapshot and rebuilding the complete
+parameter tree, the IncrementalSnapshotter takes snapshot(update=False) of
+the instruments that are due (each instrument can have its own refresh
+interval), compares the parameters with the previous snapshot and queues
+only the parameters that changed. The queued deltas have the same nested
+structure as the 'instruments' entry of a station snapshot, so they can be
+passed to QcSnaphotWidget.setData directly, which then only touches the
+changed nodes.
+
+The snapshotter does not depend on Qt and can run in a background thread,
+the deltas are collected through a thread-safe queue.
+"""
+import logging
+import queue
+import threading
+import time
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+def flatten_snapshot(instruments_snapshot: dict) -> dict:
+    """
+    Flattens the 'instruments' entry of a station snapshot.
+
+    Args:
+        instruments_snapshot (dict): {instrument name: instrument snapshot}
+
+    Returns:
+        dict {(instrument name, parameter name): parameter snapshot} of the
+        parameters that are shown in the instrument monitor, i.e. the ones
+        with a value that is not a dict.
+    """
+    flat = {}
+    for ins_name, ins_snapshot in instruments_snapshot.items():
+        for par_name, par_snap in ins_snapshot.get('parameters', {}).items():
+            if 'value' in par_snap and not isinstance(par_snap['value'],
+                                                      dict):
+                flat[(ins_name, par_name)] = par_snap
+    return flat
+
+
+def _values_equal(a, b) -> bool:
+    if a is b:
+        return True
+    try:
+        return bool(a == b)
+    except (ValueError, TypeError):
+        # e.g. arrays, for which == is elementwise
+        return np.array_equal(a, b)
+
+
+def changed_parameters(old_flat: dict, new_flat: dict) -> list:
+    """
+    Returns the keys of new_flat that are not in old_flat or for which the
+    value, unit or timestamp changed.
+    """
+    changed = []
+    for key, par_snap in new_flat.items():
+        old_snap = old_flat.get(key)
+        if old_snap is None or \
+                old_snap.get('ts') != par_snap.get('ts') or \
+                old_snap.get('unit') != par_snap.get('unit') or \
+                not _values_equal(old_snap['value'], par_snap['value']):
+            changed.append(key)
+    return changed
+
+
+def nest_parameters(flat: dict) -> dict:
+    """
+    Inverse of flatten_snapshot, returns {instrument name: {'parameters':
+    {parameter name: parameter snapshot}}}.
+    """
+    nested = {}
+    for (ins_name, par_name), par_snap in flat.items():
+        nested.setdefault(ins_name, {'parameters': {}})[
+            'parameters'][par_name] = par_snap
+    return nested
+
+
+class IncrementalSnapshotter(object):
+    """
+    Tracks the snapshots of a set of instruments and queues the changed
+    parameters.
+
+    Args:
+        get_instruments (callable): returns a dict {name: instrument} of the
+            instruments to monitor, e.g. the instruments of a station.
+        default_interval (float): refresh interval of an instrument in s.
+        refresh_intervals (dict): refresh interval per instrument name,
+            overrides the default_interval.
+        max_parameters (int): maximum number of parameters that are pushed
+            per refresh, the remaining changes are pushed in the following
+            refreshes. None for no limit.
+    """
+
+    def __init__(self, get_instruments, default_interval: float = 5,
+                 refresh_intervals: dict = None, max_parameters: int = None):
+        self.get_instruments = get_instruments
+        self.default_interval = default_interval
+        self.refresh_intervals = refresh_intervals \
+            if refresh_intervals is not None else {}
+        self.max_parameters = max_parameters
+
+        self.deltas = queue.Queue()
+        # parameter snapshots as last pushed to the queue
+        self._pushed = {}
+        # changed parameter snapshots not pushed yet due to max_parameters
+        self._pending = {}
+        self._last_refresh = {}
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def refresh(self, now: float = None) -> int:
+        """
+        Snapshots the instruments that are due and queues the changes.
+
+        Returns:
+            the number of parameters queued.
+        """
+        if now is None:
+            now = time.time()
+        for ins_name, ins in self.get_instruments().items():
+            interval = self.refresh_intervals.get(ins_name,
+                                                  self.default_interval)
+            if now - self._last_refresh.get(ins_name, -np.inf) < interval:
+                continue
+            self._last_refresh[ins_name] = now
+            try:
+                ins_snapshot = ins.snapshot(update=False)
+            except Exception as e:
+                log.warning('Could not snapshot {}: {}'.format(ins_name, e))
+                continue
+            new_flat = flatten_snapshot({ins_name: ins_snapshot})
+            for key in changed_parameters(self._pushed, new_flat):
+                self._pending[key] = new_flat[key]
+
+        nr_pushed = len(self._pending)
+        if self.max_parameters is not None:
+            nr_pushed = min(nr_pushed, self.max_parameters)
+        if nr_pushed == 0:
+            return 0
+        keys = list(self._pending)[:nr_pushed]
+        delta = {key: self._pending.pop(key) for key in keys}
+        self._pushed.update(delta)
+        self.deltas.put(nest_parameters(delta))
+        return nr_pushed
+
+    def get_delta(self) -> dict:
+        """
+        Returns all queued changes merged into one nested dict (empty if
+        nothing changed), does not block.
+        """
+        merged = {}
+        while True:
+            try:
+                delta = self.deltas.get_nowait()
+            except queue.Empty:
+                return merged
+            for ins_name, ins_delta in delta.items():
+                merged.setdefault(ins_name, {'parameters': {}})[
+                    'parameters'].update(ins_delta['parameters'])
+
+    def start(self, poll_interval: float = 0.1):
+        """
+        Starts refreshing in a background thread every poll_interval s.
+        """
+        if self.is_running():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(poll_interval, ),
+            name='IncrementalSnapshotter', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self, poll_interval):
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception:
+                log.exception('Instrument monitor refresh failed')
+            self._stop_event.wait(poll_interval)
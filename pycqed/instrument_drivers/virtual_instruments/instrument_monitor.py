@@ -6,11 +6,21 @@ import pyqtgraph.multiprocess as pgmp
 from qcodes.instrument.base import Instrument
 from qcodes.utils import validators as vals
 from qcodes.instrument.parameter import ManualParameter
+from pycqed.instrument_drivers.virtual_instruments.ins_mon.snapshot_diff \
+    import IncrementalSnapshotter
 
 
 class InstrumentMonitor(Instrument):
     """
-    Creates a pyqtgraph widget that displays
+    Creates a pyqtgraph widget that displays the parameters of the
+    instruments in the station.
+
+    By default every update takes a full station snapshot and passes it to
+    the widget. In incremental mode (the "incremental" parameter) the
+    instruments are snapshotted with update=False in a background thread,
+    each at its own refresh rate ("refresh_intervals"), and update only
+    pushes the parameters that changed to the widget, at most
+    "max_parameters_per_update" at a time.
     """
     proc = None
     rpg = None
@@ -29,7 +39,27 @@ class InstrumentMonitor(Instrument):
                            vals=vals.Numbers(min_value=0.001),
                            initial_value=5,
                            parameter_class=ManualParameter)
-        # self.add_parameter
+        self.add_parameter('incremental',
+                           docstring='If True only the changed parameters '
+                           'are refreshed, see the class docstring.',
+                           vals=vals.Bool(),
+                           initial_value=False,
+                           parameter_class=ManualParameter)
+        self.add_parameter('refresh_intervals',
+                           unit='s',
+                           docstring='Refresh interval per instrument name '
+                           'in incremental mode, instruments not in the dict '
+                           'are refreshed every update_interval.',
+                           vals=vals.Dict(),
+                           initial_value={},
+                           parameter_class=ManualParameter)
+        self.add_parameter('max_parameters_per_update',
+                           docstring='Maximum number of parameters pushed '
+                           'to the widget per update in incremental mode.',
+                           vals=vals.Ints(min_value=1),
+                           initial_value=1000,
+                           parameter_class=ManualParameter)
+        self._snapshotter = None
         if remote:
             if not self.__class__.proc:
                 self._init_qt()
@@ -41,12 +71,44 @@ class InstrumentMonitor(Instrument):
         self.create_tree(figsize=figsize)
 
     def update(self):
+        if self.incremental():
+            self._update_incremental()
+            return
+        self.stop_incremental_updates()
         time_since_last_update = time.time()-self.last_update_time
         if time_since_last_update > self.update_interval():
             self.last_update_time = time.time()
             snapshot = self.station.snapshot()
             self.tree.setData(snapshot['instruments'])
 
+    def _update_incremental(self):
+        if self._snapshotter is None:
+            self._snapshotter = IncrementalSnapshotter(
+                self._get_station_instruments)
+        # the settings are read by the background thread on every refresh
+        self._snapshotter.default_interval = self.update_interval()
+        self._snapshotter.refresh_intervals = self.refresh_intervals()
+        self._snapshotter.max_parameters = self.max_parameters_per_update()
+        if not self._snapshotter.is_running():
+            self._snapshotter.start()
+        delta = self._snapshotter.get_delta()
+        if delta:
+            self.tree.setData(delta)
+
+    def _get_station_instruments(self):
+        return {name: comp for name, comp in self.station.components.items()
+                if isinstance(comp, Instrument)}
+
+    def stop_incremental_updates(self):
+        # close can be called before __init__ has finished
+        if getattr(self, '_snapshotter', None) is not None:
+            self._snapshotter.stop()
+            self._snapshotter = None
+
+    def close(self):
+        self.stop_incremental_updates()
+        super().close()
+
     def _init_qt(self):
         # starting the process for the pyqtgraph plotting
         # You do not want a new process to be created every time you start a
@@ -8,9 +8,12 @@ Contains:
   object, adapted for usage with qcodes
 - name generators in the style of qtlab Data objects
 - functions to create standard data sets
+- functions to write and read (nested) dicts, either as a hierarchy of
+  groups and attributes or in the flat format (see write_dict_to_hdf5_flat)
 """
 
 import os
+import json
 import time
 import h5py
 import numpy as np
@@ -243,6 +246,11 @@ def read_dict_from_hdf5(data_dict: dict, h5_group):
         h5_group  (hdf5 group):
                 hdf5 file or group from which to read.
     """
+    if is_flat_dict_group(h5_group):
+        # Written with write_dict_to_hdf5_flat
+        data_dict.update(read_dict_from_hdf5_flat(h5_group))
+        return data_dict
+
     # if 'list_type' not in h5_group.attrs:
     for key, item in h5_group.items():
         if RepresentsInt(key):
@@ -252,27 +260,9 @@ def read_dict_from_hdf5(data_dict: dict, h5_group):
             data_dict[key] = read_dict_from_hdf5(data_dict[key],
                                                  item)
         else:  # item either a group or a dataset
-            if 'list_type' not in item.attrs:
-                data_dict[key] = item[()]  # changed deprecated item.value => item[()]
-            elif item.attrs['list_type'] == 'str':
-                # lists of strings needs some special care, see also
-                # the writing part in the writing function above.
-                list_of_str = [x[0] for x in item[()]]  # changed deprecated item.value => item[()]
-                data_dict[key] = list_of_str
-            elif item.attrs['list_type'] == 'array':
-                data_dict[key] = list(item[()])  # changed deprecated item.value => item[()]
-            else:
-                data_dict[key] = list(item[()])  # changed deprecated item.value => item[()]
+            data_dict[key] = _read_dataset(item)
     for key, item in h5_group.attrs.items():
-        if isinstance(item, str):
-            # Extracts "None" as an exception as h5py does not support
-            # storing None, nested if statement to avoid elementwise
-            # comparison warning
-            if item == 'NoneType:__None__':
-                item = None
-            elif item == 'NoneType:__emptylist__':
-                item = []
-        data_dict[key] = item
+        data_dict[key] = _read_attribute(item)
 
     if 'list_type' in h5_group.attrs:
         if (h5_group.attrs['list_type'] == 'generic_list' or
@@ -292,6 +282,299 @@ def read_dict_from_hdf5(data_dict: dict, h5_group):
     return data_dict
 
 
+def _read_dataset(item):
+    if 'list_type' not in item.attrs:
+        return item[()]  # changed deprecated item.value => item[()]
+    elif item.attrs['list_type'] == 'str':
+        # lists of strings needs some special care, see also
+        # the writing part in the writing function above.
+        return [x[0] for x in item[()]]  # changed deprecated item.value => item[()]
+    else:
+        return list(item[()])  # changed deprecated item.value => item[()]
+
+
+def _read_attribute(item):
+    if isinstance(item, str):
+        # Extracts "None" as an exception as h5py does not support
+        # storing None, nested if statement to avoid elementwise
+        # comparison warning
+        if item == 'NoneType:__None__':
+            item = None
+        elif item == 'NoneType:__emptylist__':
+            item = []
+    return item
+
+
+def read_dict_from_hdf5_path(h5_group, path: str):
+    """
+    Reads a single entry (sub-dict or value) of a dictionary written using
+    "write_dict_to_hdf5" or "write_dict_to_hdf5_flat" without reading the
+    rest of the dictionary.
+
+    Args:
+        h5_group  (hdf5 group):
+                hdf5 file or group from which to read.
+        path (str):
+                "/" separated path of the entry relative to h5_group,
+                e.g. "Snapshot/instruments/MC".
+
+    Returns:
+        the dict or value at path, raises a KeyError if it does not exist.
+    """
+    keys = [key for key in path.split('/') if key]
+    node = h5_group
+    for i, key in enumerate(keys):
+        if is_flat_dict_group(node):
+            return read_dict_from_hdf5_flat(node, path='/'.join(keys[i:]))
+        if not isinstance(node, h5py.Group):
+            raise KeyError(path)
+        if key in node:
+            node = node[key]
+        elif i == len(keys) - 1 and key in node.attrs:
+            return _read_attribute(node.attrs[key])
+        else:
+            raise KeyError(path)
+
+    if isinstance(node, h5py.Group):
+        return read_dict_from_hdf5({}, node)
+    return _read_dataset(node)
+
+
+# ######################################################################
+# Flat dict format
+# ######################################################################
+
+FLAT_DICT_FORMAT = 'flat_dict'
+FLAT_DICT_VERSION = 1
+
+
+def write_dict_to_hdf5_flat(data_dict: dict, entry_point):
+    """
+    Writes a (nested) dictionary to an hdf5 group in the flat format.
+
+    Instead of one group per dict and one attribute per value (see
+    "write_dict_to_hdf5"), the dictionary is flattened into "/" separated
+    paths of the leaves (e.g. "instruments/MC/parameters/verbose/value")
+    which are stored, sorted, in the "paths" dataset. The JSON encoded
+    values are stored in the "values" dataset and numeric arrays are
+    concatenated per dtype in the datasets of the "arrays" group. This
+    writes any dictionary in a handful of hdf5 calls.
+
+    The group can be read using "read_dict_from_hdf5" and
+    "read_dict_from_hdf5_path", or "read_dict_from_hdf5_flat" which can
+    also read a single sub-dict.
+
+    Args:
+        data_dict (dict): dictionary to write to hdf5 file, the keys are
+            converted to strings and must not contain "/".
+        entry_point (hdf5 group.file) : group to write to, this group
+            should not contain anything else.
+    """
+    leaves = {}
+    _flatten_dict(data_dict, '', leaves)
+    paths = sorted(leaves)
+
+    arrays = {}
+    values = [json.dumps(_encode_flat_value(leaves[path], arrays))
+              for path in paths]
+
+    dt = h5py.special_dtype(vlen=str)
+    entry_point.create_dataset('paths', data=np.array(paths, dtype=object),
+                               dtype=dt, shape=(len(paths), ))
+    entry_point.create_dataset('values',
+                               data=np.array(values, dtype=object),
+                               dtype=dt, shape=(len(values), ))
+    arrays_group = entry_point.create_group('arrays')
+    for dtype_str, arrs in arrays.items():
+        arrays_group.create_dataset(dtype_str, data=np.concatenate(arrs))
+    entry_point.attrs['dict_format'] = FLAT_DICT_FORMAT
+    entry_point.attrs['dict_format_version'] = FLAT_DICT_VERSION
+
+
+def is_flat_dict_group(h5_group) -> bool:
+    """
+    Returns True if h5_group was written using "write_dict_to_hdf5_flat".
+    """
+    return (isinstance(h5_group, h5py.Group) and
+            h5_group.attrs.get('dict_format', None) == FLAT_DICT_FORMAT)
+
+
+def read_dict_from_hdf5_flat(h5_group, path: str = None):
+    """
+    Reads a dictionary written using "write_dict_to_hdf5_flat".
+
+    Args:
+        h5_group  (hdf5 group):
+                hdf5 group to which the dictionary was written.
+        path (str):
+                "/" separated path of the sub-dict (or value) to read, only
+                the values of this sub-dict are read. If None the entire
+                dictionary is read.
+
+    Returns:
+        the dict or the value at path, raises a KeyError if the path does
+        not exist.
+    """
+    paths_dset = h5_group['paths']
+    if path is None:
+        prefix = ''
+        start, stop = 0, len(paths_dset)
+    else:
+        # The paths are sorted, so a sub-dict is a contiguous range of paths
+        # which is found by a binary search in the dataset
+        path = path.strip('/')
+        idx = _bisect_left_dset(paths_dset, path)
+        if idx < len(paths_dset) and _decode_str(paths_dset[idx]) == path:
+            # A single value
+            values = h5_group['values'][idx:idx + 1]
+            return _decode_flat_values(values, h5_group, preload=False)[0]
+        # '0' is the character following '/'
+        prefix = path + '/'
+        start = _bisect_left_dset(paths_dset, prefix, lo=idx)
+        stop = _bisect_left_dset(paths_dset, path + '0', lo=start)
+        if start == stop:
+            raise KeyError(path)
+
+    paths = [_decode_str(p) for p in paths_dset[start:stop]]
+    values = _decode_flat_values(h5_group['values'][start:stop], h5_group,
+                                 preload=path is None)
+    # The same keys and parent dicts occur many times, so both are cached
+    keys = {}
+    sub_dicts = {'': {}}
+
+    def get_key(key):
+        if key not in keys:
+            keys[key] = int(key) if RepresentsInt(key) else key
+        return keys[key]
+
+    def get_sub_dict(sub_path):
+        if sub_path not in sub_dicts:
+            parent_path, _, key = sub_path.rpartition('/')
+            sub_dicts[sub_path] = get_sub_dict(parent_path).setdefault(
+                get_key(key), {})
+        return sub_dicts[sub_path]
+
+    for p, value in zip(paths, values):
+        parent_path, _, key = p[len(prefix):].rpartition('/')
+        get_sub_dict(parent_path)[get_key(key)] = value
+    return sub_dicts['']
+
+
+def _bisect_left_dset(dset, value: str, lo: int = 0) -> int:
+    # bisect.bisect_left reading only the elements it compares
+    hi = len(dset)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _decode_str(dset[mid]) < value:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _flatten_dict(data_dict: dict, prefix: str, leaves: dict):
+    for key, item in data_dict.items():
+        key = str(key)
+        if '/' in key or key == '':
+            raise ValueError(
+                'Key "{}" at "{}" can not be stored in the flat format'.format(
+                    key, prefix))
+        path = prefix + key
+        if isinstance(item, UFloat):
+            item = {'nominal_value': item.nominal_value,
+                    'std_dev': item.std_dev}
+        if isinstance(item, dict) and len(item):
+            _flatten_dict(item, path + '/', leaves)
+        else:
+            leaves[path] = item
+
+
+def _encode_flat_value(item, arrays: dict):
+    """
+    Converts a value to an object that can be JSON encoded. Values that
+    JSON does not support are encoded as {"__<type>__": ...}. Numeric arrays
+    are appended to arrays {dtype: list of flattened arrays}.
+    """
+    if item is None or isinstance(item, (str, bool, int, float)):
+        return item
+    elif isinstance(item, np.bool_):
+        return bool(item)
+    elif isinstance(item, np.integer):
+        return int(item)
+    elif isinstance(item, np.floating):
+        return float(item)
+    elif isinstance(item, (complex, np.complexfloating)):
+        return {'__complex__': [item.real, item.imag]}
+    elif isinstance(item, np.ndarray) and item.dtype.kind in 'biufc':
+        dtype_str = item.dtype.str
+        arrs = arrays.setdefault(dtype_str, [])
+        offset = sum(arr.size for arr in arrs)
+        arrs.append(item.ravel())
+        return {'__ndarray__': [dtype_str, offset, list(item.shape)]}
+    elif isinstance(item, np.ndarray) and item.dtype.kind in 'US':
+        return {'__array__': [item.dtype.str, item.tolist()]}
+    elif isinstance(item, list):
+        return [_encode_flat_value(x, arrays) for x in item]
+    elif isinstance(item, tuple):
+        return {'__tuple__': [_encode_flat_value(x, arrays) for x in item]}
+    elif isinstance(item, UFloat):
+        return _encode_flat_value({'nominal_value': item.nominal_value,
+                                   'std_dev': item.std_dev}, arrays)
+    elif isinstance(item, dict):
+        # Dicts in lists (and empty dicts) keep the type of their keys
+        return {'__dict__': [[_encode_flat_value(k, arrays),
+                              _encode_flat_value(v, arrays)]
+                             for k, v in item.items()]}
+    else:
+        logging.warning(
+            'Type "{}" for "{}" not supported, storing as string'.format(
+                type(item), item))
+        return str(item)
+
+
+def _decode_flat_values(values, h5_group, preload: bool) -> list:
+    """
+    Decodes a list of JSON encoded values, if preload is True the arrays
+    are read completely, otherwise only the parts that are used.
+    """
+    arrays_group = h5_group['arrays']
+    arrays = {}
+    if preload:
+        arrays = {name: dset[()] for name, dset in arrays_group.items()}
+
+    def object_hook(obj):
+        if len(obj) != 1:
+            return obj
+        tag, content = next(iter(obj.items()))
+        if tag == '__ndarray__':
+            dtype_str, offset, shape = content
+            size = int(np.prod(shape, dtype=int))
+            if dtype_str in arrays:
+                arr = arrays[dtype_str][offset:offset + size]
+            else:
+                arr = arrays_group[dtype_str][offset:offset + size]
+            return arr.reshape(shape)
+        elif tag == '__array__':
+            return np.array(content[1], dtype=content[0])
+        elif tag == '__tuple__':
+            return tuple(content)
+        elif tag == '__complex__':
+            return complex(*content)
+        elif tag == '__dict__':
+            return {k: v for k, v in content}
+        return obj
+
+    # One JSON document for all values is faster than one per value
+    return json.loads(
+        '[' + ','.join(_decode_str(v) for v in values) + ']',
+        object_hook=object_hook)
+
+
+def _decode_str(s):
+    # h5py >= 3 returns bytes for variable length strings
+    return s.decode('utf-8') if isinstance(s, bytes) else s
+
+
 def extract_pars_from_datafile(filepath: str, param_spec: dict)-> dict:
     """
     Extract parameters from an hdf5 datafile.
@@ -6,6 +6,8 @@ import collections
 import operator
 from scipy.optimize import fmin_powell
 from pycqed.measurement import hdf5_data as h5d
+from pycqed.measurement.plot_buffer import DecimatingBuffer, ImageBuffer
+from pycqed.utilities.settings_restore import SnapshotIndex
 from pycqed.utilities.general import (
     dict_to_ordered_tuples,
     delete_keys_from_dict,
@@ -48,7 +50,7 @@ from adaptive.learner import SKOptLearner
 from pycqed.utilities.learner1D_minimizer import Learner1D_Minimizer
 from pycqed.utilities.learnerND_optimize import LearnerND_Optimize
 from pycqed.utilities.learnerND_minimizer import LearnerND_Minimizer
-from pycqed.utilities.learner_utils import evaluate_X
+from pycqed.utilities.learner_utils import evaluate_X, batch_runner
 
 from skopt import Optimizer  # imported for checking types
 
@@ -137,6 +139,37 @@ class MeasurementControl(Instrument):
             vals=vals.Ints(1),
             initial_value=4000,
         )
+        self.add_parameter(
+            "plotting_decimation",
+            docstring="If True the live plotting curves are kept in memory "
+            "and decimated to plotting_max_pts points (preserving the minima "
+            "and maxima), instead of not plotting datasets larger than "
+            "plotting_max_pts.",
+            parameter_class=ManualParameter,
+            vals=vals.Bool(),
+            initial_value=True,
+        )
+        self.add_parameter(
+            "snapshot_format",
+            docstring="Format in which the station snapshot is stored in the "
+            "datafile. 'hierarchical' stores it as hdf5 groups and attributes "
+            "(write_dict_to_hdf5), 'flat' stores it as a few path-keyed "
+            "datasets (write_dict_to_hdf5_flat) which is much faster to write "
+            "and read. Both are read by read_dict_from_hdf5.",
+            parameter_class=ManualParameter,
+            vals=vals.Enum("hierarchical", "flat"),
+            initial_value="hierarchical",
+        )
+        self.add_parameter(
+            "update_snapshot_index",
+            docstring="If True the snapshot index in the datadir is updated "
+            "every time the station snapshot is stored, such that "
+            "settings_restore.restore_settings finds the last datafile of "
+            "every instrument without scanning the datadir.",
+            parameter_class=ManualParameter,
+            vals=vals.Bool(),
+            initial_value=True,
+        )
         self.add_parameter(
             "verbose",
             parameter_class=ManualParameter,
@@ -283,6 +316,9 @@ class MeasurementControl(Instrument):
                 self.create_experimentaldata_dataset()
 
                 self.plotting_bins = None
+                # live plotting buffers, created by the plotmon initialization
+                self._plot_buffers = None
+                self._image_buffer = None
                 if exp_metadata is not None:
                     self.save_exp_metadata(exp_metadata, self.data_object)
                     if "bins" in exp_metadata.keys():
@@ -399,7 +435,11 @@ class MeasurementControl(Instrument):
 
         for sweep_function in self.sweep_functions:
             sweep_function.prepare()
-        self.detector_function.prepare()
+        # When sampling in batches, hard detectors are prepared with the
+        # sweep points of each batch, see `measurement_function_batch`
+        batched = any(af_pars.get("batch_size", 1) > 1 for af_pars in af_pars_list)
+        if not (batched and self.detector_function.detector_control == "hard"):
+            self.detector_function.prepare()
         self.get_measurement_preparetime()
 
         # ######################################################################
@@ -445,8 +485,11 @@ class MeasurementControl(Instrument):
 
                 if len(Xs) > 1 and X is not None:
                     opt_func = lambda x: self.mk_optimization_function()(flatten([x, X]))
+                    opt_func_batch = lambda x_batch: self.mk_optimization_function_batch()(
+                        [flatten([x, X]) for x in x_batch])
                 else:
                     opt_func = self.mk_optimization_function()
+                    opt_func_batch = self.mk_optimization_function_batch()
 
                 if is_subclass(self.adaptive_function, BaseLearner):
                     Learner = self.adaptive_function
@@ -500,9 +543,21 @@ class MeasurementControl(Instrument):
                     # rather it is the `adaptive.runner.simple` function. This
                     # ensures that everything runs in a single process, as is
                     # required by QCoDeS (May 2018) and makes things simpler.
-                    self.runner = runner.simple(
-                        learner=self.learner, goal=af_pars["goal"]
-                    )
+                    batch_size = af_pars.get("batch_size", 1)
+                    if batch_size > 1:
+                        # Same as `runner.simple` but the learner is asked for
+                        # `batch_size` points that are measured together, see
+                        # `measurement_function_batch`
+                        self.runner = batch_runner(
+                            learner=self.learner,
+                            goal=af_pars["goal"],
+                            batch_size=batch_size,
+                            evaluate_batch=opt_func_batch,
+                        )
+                    else:
+                        self.runner = runner.simple(
+                            learner=self.learner, goal=af_pars["goal"]
+                        )
 
                     # Only save optimization results if the sampling is a single
                     # adaptive run
@@ -537,7 +592,8 @@ class MeasurementControl(Instrument):
                         # exists so it is possible to extract the result
                         # of an optimization post experiment
                         af_pars_copy = dict(af_pars)
-                        non_used_pars = ["adaptive_function", "minimize", "f_termination"]
+                        non_used_pars = ["adaptive_function", "minimize",
+                                         "f_termination", "batch_size"]
                         for non_used_par in non_used_pars:
                             af_pars_copy.pop(non_used_par, None)
                         self.adaptive_result = self.adaptive_function(
@@ -627,6 +683,7 @@ class MeasurementControl(Instrument):
                 # There are some cases where the sweep points are not
                 # specified that you don't want to crash (e.g. on -off seq)
                 pass
+        self.append_to_plot_buffers(start_idx, stop_idx)
 
         check_keyboard_interrupt()
         self.update_instrument_monitor()
@@ -702,6 +759,7 @@ class MeasurementControl(Instrument):
         )
 
         self.dset[start_idx:stop_idx, :] = new_vals.astype(np.float64)
+        self.append_to_plot_buffers(start_idx, stop_idx)
         # update plotmon
         check_keyboard_interrupt()
         self.update_instrument_monitor()
@@ -717,6 +775,98 @@ class MeasurementControl(Instrument):
             self.print_progress_adaptive()
         return vals
 
+    def measurement_function_batch(self, X):
+        """
+        Measures a batch of points, used for batched adaptive sampling.
+
+        If the sweep functions and the detector are hard, the points are
+        measured in a single acquisition: the points are set as the sweep
+        points of the sweep functions, which are prepared, and the detector
+        is prepared with the sweep points of the first sweep function (as
+        in `measure`). Otherwise the points are measured one by one using
+        `measurement_function`.
+
+        Args:
+            X (list): points, each point has one value per sweep function.
+
+        Returns:
+            array of shape (len(X), number of detector values)
+        """
+        hard = self.detector_function.detector_control == "hard" and all(
+            sweep_function.sweep_control == "hard"
+            for sweep_function in self.sweep_functions
+        )
+        if not hard:
+            return np.array([self.measurement_function(x) for x in X])
+
+        X = np.array(X, dtype=np.float64).reshape(len(X), -1)
+        for i, sweep_function in enumerate(self.sweep_functions):
+            sweep_function.sweep_points = X[:, i]
+            sweep_function.prepare()
+        self.detector_function.prepare(sweep_points=X[:, 0])
+        vals = np.array(self.detector_function.get_values(), dtype=np.float64)
+        vals = vals.reshape(-1, len(X)).T
+
+        # Not using get_datawriting_indices_update_ctr, the shape of the
+        # data is known
+        start_idx = self.get_datawriting_start_idx()
+        stop_idx = start_idx + len(X)
+        self.total_nr_acquired_values += len(X)
+        new_datasetshape = (np.max([self.dset.shape[0], stop_idx]), self.dset.shape[1])
+        self.dset.resize(new_datasetshape)
+        self.dset[start_idx:stop_idx, :] = np.concatenate([X, vals], axis=1)
+        self.append_to_plot_buffers(start_idx, stop_idx)
+
+        check_keyboard_interrupt()
+        self.update_instrument_monitor()
+        self.update_plotmon()
+        if self.mode == "adaptive":
+            self.update_plotmon_adaptive()
+        self.iteration += 1
+        if self.mode != "adaptive":
+            self.print_progress(stop_idx)
+        else:
+            self.print_progress_adaptive()
+        return vals
+
+    def mk_optimization_function_batch(self):
+        """
+        Batched version of `mk_optimization_function`, returns a function
+        that measures a list of points using `measurement_function_batch`
+        and returns the list of values for the adaptive sampler.
+        """
+        def func(X):
+            if self.x_scale is not None:
+                scale_ = np.array(self.x_scale, dtype=np.float64)
+                X = [type(x)(np.array(x, dtype=np.float64) / scale_) for x in X]
+
+            start_idx = len(self.dset)
+            vals = self.measurement_function_batch(X)
+            vals = np.array(vals, dtype=np.float64).reshape(len(X), -1)
+            vals = vals[:, self.par_idx]
+
+            if self.mode == "adaptive":
+                # Keep track of the best seen points so far, see
+                # `mk_optimization_function`
+                col_indx = len(self.sweep_function_names) + self.par_idx
+                comp_op = operator.lt if self.minimize_optimization else operator.gt
+                for i, val in enumerate(vals):
+                    best_val = self.dset[self.adaptive_besteval_indxs[-1], col_indx]
+                    if comp_op(val, best_val):
+                        self.adaptive_besteval_indxs.append(start_idx + i)
+
+            if self.f_termination is not None:
+                if self.minimize_optimization:
+                    if np.any(vals < self.f_termination):
+                        raise StopIteration()
+                elif np.any(vals > self.f_termination):
+                    raise StopIteration()
+            if not self.minimize_optimization:
+                vals = np.multiply(-1, vals)
+
+            return list(vals)
+        return func
+
     def mk_optimization_function(self):
         """
         Returns a wrapper around the measurement function
@@ -786,6 +936,8 @@ class MeasurementControl(Instrument):
 
         for attr in [
             "TwoD_array",
+            "_plot_buffers",
+            "_image_buffer",
             "dset",
             "sweep_points",
             "sweep_points_2D",
@@ -958,10 +1110,55 @@ class MeasurementControl(Instrument):
                 j += 1
             self.main_QtPlot.win.nextRow()
 
+        if self.plotting_decimation():
+            self._plot_buffers = [
+                DecimatingBuffer(
+                    nr_x=len(self.sweep_function_names),
+                    max_points=self.plotting_max_pts())
+                for ylab in ylabels]
+
+    def append_to_plot_buffers(self, start_idx, stop_idx):
+        """
+        Adds the rows of the dataset that were just written to the in-memory
+        live plotting buffers (see pycqed.measurement.plot_buffer), such
+        that the plotmons do not have to read the dataset.
+        """
+        buffers = getattr(self, "_plot_buffers", None)
+        image_buffer = getattr(self, "_image_buffer", None)
+        if not self.live_plot_enabled() or (
+            buffers is None and image_buffer is None
+        ):
+            return
+        rows = self.dset[start_idx:stop_idx]
+        nr_sweep_funcs = len(self.sweep_function_names)
+        if buffers is not None:
+            if start_idx == len(buffers[0]):
+                for y_ind, buffer in enumerate(buffers):
+                    buffer.append(
+                        rows[:, :nr_sweep_funcs], rows[:, nr_sweep_funcs + y_ind]
+                    )
+            else:
+                # Data is overwritten (soft averages), the plotmon falls back
+                # to reading the dataset
+                self._plot_buffers = None
+        if image_buffer is not None:
+            image_buffer.fill(start_idx, rows[:, len(self.sweep_functions) :])
+
+    def _use_plot_buffers(self):
+        buffers = getattr(self, "_plot_buffers", None)
+        return (
+            buffers is not None
+            and self.plotting_bins is None
+            and len(buffers[0]) == self.dset.shape[0]
+        )
+
     def update_plotmon(self, force_update=False):
         # Note: plotting_max_pts takes precendence over force update
+        # unless the curves are decimated
+        use_buffers = self._use_plot_buffers()
         if self.live_plot_enabled() and (
-            self.dset.shape[0] < self.plotting_max_pts()
+            use_buffers
+            or self.dset.shape[0] < self.plotting_max_pts()
             or (self.plotting_bins is not None)
         ):
             i = 0
@@ -979,9 +1176,16 @@ class MeasurementControl(Instrument):
 
                     nr_sweep_funcs = len(self.sweep_function_names)
                     for y_ind in range(len(self.detector_function.value_names)):
+                        if use_buffers:
+                            buffer = self._plot_buffers[y_ind]
+                            buffer_x, buffer_y = buffer.get()
                         for x_ind in range(nr_sweep_funcs):
-                            x = self.dset[:, x_ind]
-                            y = self.dset[:, nr_sweep_funcs + y_ind]
+                            if use_buffers:
+                                x = buffer_x[:, x_ind]
+                                y = buffer_y
+                            else:
+                                x = self.dset[:, x_ind]
+                                y = self.dset[:, nr_sweep_funcs + y_ind]
 
                             # used to average e.g., single shot measuremnts
                             # can be specified in MC.run(exp_metadata['bins'])
@@ -1009,8 +1213,12 @@ class MeasurementControl(Instrument):
                             self.curves[i]["config"]["y"] = y
                             i += 1
                             if self.Learner_Minimizer_detected and y_ind == 0:
-                                min_x = np.min(x)
-                                max_x = np.max(x)
+                                if use_buffers:
+                                    min_x = buffer.x_min[x_ind]
+                                    max_x = buffer.x_max[x_ind]
+                                else:
+                                    min_x = np.min(x)
+                                    max_x = np.max(x)
                                 threshold = (
                                     self.learner.moving_threshold
                                     if self.learner.threshold is None
@@ -1046,8 +1254,11 @@ class MeasurementControl(Instrument):
             self.time_last_2Dplot_update = time.time()
             n = len(self.sweep_pts_y)
             m = len(self.sweep_pts_x)
-            self.TwoD_array = np.empty([n, m, len(self.detector_function.value_names)])
-            self.TwoD_array[:] = np.NAN
+            # filled by append_to_plot_buffers
+            self._image_buffer = ImageBuffer(
+                xlen=m, ylen=n, nr_z=len(self.detector_function.value_names)
+            )
+            self.TwoD_array = self._image_buffer.image
             self.secondary_QtPlot.clear()
             slabels = self.sweep_par_names
             sunits = self.sweep_par_units
@@ -1080,20 +1291,28 @@ class MeasurementControl(Instrument):
         """
         if self.live_plot_enabled():
             try:
-                i = int((self.iteration) % (self.xlen * self.ylen))
-                x_ind = int(i % self.xlen)
-                y_ind = int(i / self.xlen)
+                image_buffer = getattr(self, "_image_buffer", None)
+                if image_buffer is None:
+                    i = int((self.iteration) % (self.xlen * self.ylen))
+                    x_ind = int(i % self.xlen)
+                    y_ind = int(i / self.xlen)
+                    for j in range(len(self.detector_function.value_names)):
+                        z_ind = len(self.sweep_functions) + j
+                        self.TwoD_array[y_ind, x_ind, j] = self.dset[i, z_ind]
                 for j in range(len(self.detector_function.value_names)):
-                    z_ind = len(self.sweep_functions) + j
-                    self.TwoD_array[y_ind, x_ind, j] = self.dset[i, z_ind]
-                self.secondary_QtPlot.traces[j]["config"]["z"] = self.TwoD_array[
-                    :, :, j
-                ]
+                    self.secondary_QtPlot.traces[j]["config"][
+                        "z"
+                    ] = self.TwoD_array[:, :, j]
                 if (
                     time.time() - self.time_last_2Dplot_update
                     > self.plotting_interval()
                     or self.iteration == len(self.sweep_points)
                     or force_update
+                ) and (
+                    # only redraw if new points were measured
+                    image_buffer is None
+                    or image_buffer.get_changed_rows() is not None
+                    or force_update
                 ):
                     self.time_last_2Dplot_update = time.time()
                     self.secondary_QtPlot.update_plot()
@@ -1765,11 +1984,13 @@ class MeasurementControl(Instrument):
             if self.live_plot_enabled():
                 i = int((self.iteration) % self.ylen)
                 y_ind = i
+                image_buffer = getattr(self, "_image_buffer", None)
                 for j in range(len(self.detector_function.value_names)):
-                    z_ind = len(self.sweep_functions) + j
-                    self.TwoD_array[y_ind, :, j] = self.dset[
-                        i * self.xlen : (i + 1) * self.xlen, z_ind
-                    ]
+                    if image_buffer is None:
+                        z_ind = len(self.sweep_functions) + j
+                        self.TwoD_array[y_ind, :, j] = self.dset[
+                            i * self.xlen : (i + 1) * self.xlen, z_ind
+                        ]
                     self.secondary_QtPlot.traces[j]["config"]["z"] = self.TwoD_array[
                         :, :, j
                     ]
@@ -2030,7 +2251,19 @@ class MeasurementControl(Instrument):
             }
             cleaned_snapshot = delete_keys_from_dict(snap, exclude_keys)
 
-            h5d.write_dict_to_hdf5(cleaned_snapshot, entry_point=snap_grp)
+            if self.snapshot_format() == "flat":
+                h5d.write_dict_to_hdf5_flat(cleaned_snapshot, entry_point=snap_grp)
+            else:
+                h5d.write_dict_to_hdf5(cleaned_snapshot, entry_point=snap_grp)
+
+            if self.update_snapshot_index():
+                try:
+                    SnapshotIndex(self.datadir()).update(
+                        data_object.filepath,
+                        cleaned_snapshot.get("instruments", {}).keys(),
+                    )
+                except Exception as e:
+                    log.warning("Could not update the snapshot index: {}".format(e))
 
             # Below is old style saving of snapshot, exists for the sake of
             # preserving deprecated functionality
@@ -2326,6 +2559,11 @@ class MeasurementControl(Instrument):
                                     is smaller than this value
             "par_idx": 0            If a parameter returns multiple values,
                                     specifies which one to use.
+            "batch_size": 1         Number of points the adaptive learner
+                                    is asked for at once, if larger than 1
+                                    the points are measured in a single
+                                    acquisition for hard sweep functions and
+                                    detectors, see measurement_function_batch
 
         Common keywords (used in python nelder_mead implementation):
             "x0":                   list of initial values
@@ -0,0 +1,228 @@
+"""
+In-memory buffers for the live plotting of the MeasurementControl.
+
+The MC appends every chunk of data it writes to these buffers, such that
+refreshing the plotmon does not require reading the HDF5 dataset.
+
+DecimatingBuffer keeps a curve decimated to a fixed number of points using
+M4 decimation: the data is split in buckets of consecutive points and of
+every bucket the first, last, minimum and maximum point are kept. M4 is
+composable (the M4 of the M4s of two buckets is the M4 of the merged
+bucket), so when the buffer is full the bucket size is doubled by merging
+neighbouring buckets. Appending is O(new points) (amortized), getting the
+curve is O(max_points), independent of the number of points measured.
+Because the buckets are formed by acquisition order, non-monotonic sweeps
+are supported.
+
+ImageBuffer holds the image of the 2D plotmon and fills in only the newly
+measured points.
+"""
+import numpy as np
+
+
+def group_m4(idx, x, y, groups):
+    """
+    M4 decimation of consecutive groups of points.
+
+    Args:
+        idx (array): indices of the points in acquisition order (sorted).
+        x (array): shape (n, nr_x) x values of the points.
+        y (array): y values of the points.
+        groups (array): group label of the points, sorted.
+
+    Returns:
+        idx, x, y of the first, last, minimum and maximum point of every
+        group, shapes (nr_groups, 4), (nr_groups, 4, nr_x) and
+        (nr_groups, 4). The points of a group are sorted by index. NaN
+        values are only selected as minimum or maximum if all y values of
+        the group are NaN.
+    """
+    n = len(groups)
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    ends = np.r_[starts[1:], n]
+    nan = np.isnan(y)
+    order_min = np.lexsort((np.where(nan, np.inf, y), groups))
+    order_max = np.lexsort((np.where(nan, -np.inf, y), groups))
+    sel = np.stack([starts, ends - 1, order_min[starts],
+                    order_max[ends - 1]], axis=1)
+    sel = np.sort(sel, axis=1)
+    return idx[sel], x[sel], y[sel]
+
+
+class DecimatingBuffer(object):
+    """
+    Buffer of a curve that is decimated to at most max_points points.
+
+    Args:
+        nr_x (int): number of x values per point (e.g. one per sweep
+            function), all are decimated by the same y values.
+        max_points (int): display budget of the curve.
+    """
+
+    def __init__(self, nr_x: int = 1, max_points: int = 4000):
+        # 4 points per bucket, an even number of buckets plus the last,
+        # partially filled, bucket
+        self.max_buckets = max(2, 2*((max_points - 4)//8))
+        self.nr_x = nr_x
+        self.clear()
+
+    def clear(self):
+        self.bucket_size = 1
+        self.nr_points = 0
+        self.nr_buckets = 0
+        self._idx = np.zeros((self.max_buckets, 4), dtype=np.int64)
+        self._x = np.zeros((self.max_buckets, 4, self.nr_x))
+        self._y = np.zeros((self.max_buckets, 4))
+        # M4 of the bucket that is being filled
+        self._tail_idx = np.zeros(0, dtype=np.int64)
+        self._tail_x = np.zeros((0, self.nr_x))
+        self._tail_y = np.zeros(0)
+        # range of the x values of all points
+        self.x_min = np.full(self.nr_x, np.nan)
+        self.x_max = np.full(self.nr_x, np.nan)
+
+    def __len__(self):
+        return self.nr_points
+
+    def append(self, x, y):
+        """
+        Appends points to the curve.
+
+        Args:
+            x (array): shape (n, nr_x) or (n, ) if nr_x is 1.
+            y (array): shape (n, ).
+        """
+        y = np.asarray(y, dtype=float).ravel()
+        x = np.asarray(x, dtype=float).reshape(len(y), self.nr_x)
+        if len(y) == 0:
+            return
+        self.x_min = np.fmin(self.x_min, np.fmin.reduce(x, axis=0))
+        self.x_max = np.fmax(self.x_max, np.fmax.reduce(x, axis=0))
+        idx = np.arange(self.nr_points, self.nr_points + len(y))
+        self.nr_points += len(y)
+        self._add_points(np.r_[self._tail_idx, idx],
+                         np.concatenate([self._tail_x, x]),
+                         np.r_[self._tail_y, y])
+
+    def _add_points(self, idx, x, y):
+        groups = idx // self.bucket_size
+        idx, x, y = group_m4(idx, x, y, groups)
+        # the last bucket is complete if the next point starts a new one
+        if self.nr_points % self.bucket_size == 0:
+            nr_complete = len(idx)
+        else:
+            nr_complete = len(idx) - 1
+        self._tail_idx = idx[nr_complete:].ravel()
+        self._tail_x = x[nr_complete:].reshape(-1, self.nr_x)
+        self._tail_y = y[nr_complete:].ravel()
+
+        idx, x, y = idx[:nr_complete], x[:nr_complete], y[:nr_complete]
+        while len(idx):
+            n = min(len(idx), self.max_buckets - self.nr_buckets)
+            sl = slice(self.nr_buckets, self.nr_buckets + n)
+            self._idx[sl], self._x[sl], self._y[sl] = idx[:n], x[:n], y[:n]
+            self.nr_buckets += n
+            idx, x, y = idx[n:], x[n:], y[n:]
+            if self.nr_buckets == self.max_buckets:
+                self._merge_buckets()
+                if len(idx):
+                    # the remaining buckets are merged via the tail
+                    self._add_points(
+                        np.r_[idx.ravel(), self._tail_idx],
+                        np.concatenate([x.reshape(-1, self.nr_x),
+                                        self._tail_x]),
+                        np.r_[y.ravel(), self._tail_y])
+                    return
+
+    def _merge_buckets(self):
+        # max_buckets is even, merges neighbouring pairs of buckets
+        self.bucket_size *= 2
+        n = self.nr_buckets
+        idx = self._idx[:n].reshape(n//2, 8)
+        x = self._x[:n].reshape(n//2, 8, self.nr_x)
+        y = self._y[:n].reshape(n//2, 8)
+        rows = np.arange(n//2)[:, None]
+        nan = np.isnan(y)
+        i_min = np.argmin(np.where(nan, np.inf, y), axis=1)
+        i_max = np.argmax(np.where(nan, -np.inf, y), axis=1)
+        # the points of a bucket are sorted by index
+        sel = np.sort(np.stack([np.zeros(n//2, dtype=int),
+                                np.full(n//2, 7), i_min, i_max], axis=1),
+                      axis=1)
+        self.nr_buckets = n//2
+        self._idx[:n//2] = idx[rows, sel]
+        self._x[:n//2] = x[rows, sel]
+        self._y[:n//2] = y[rows, sel]
+
+    def get(self):
+        """
+        Returns:
+            x (array): shape (nr_displayed, nr_x)
+            y (array): shape (nr_displayed, )
+        """
+        n = self.nr_buckets
+        keep = self._unique(np.r_[self._idx[:n].ravel(), self._tail_idx])
+        x = np.concatenate([self._x[:n].reshape(-1, self.nr_x), self._tail_x])
+        y = np.r_[self._y[:n].ravel(), self._tail_y]
+        return x[keep], y[keep]
+
+    def get_indices(self):
+        """
+        Returns the acquisition indices of the displayed points.
+        """
+        idx = np.r_[self._idx[:self.nr_buckets].ravel(), self._tail_idx]
+        return idx[self._unique(idx)]
+
+    @staticmethod
+    def _unique(idx):
+        # small buckets contain the same point more than once
+        return np.r_[True, idx[1:] != idx[:-1]]
+
+
+class ImageBuffer(object):
+    """
+    Image of a 2D sweep on a regular grid, the points are measured row by
+    row (the inner sweep is along x).
+
+    Args:
+        xlen (int): number of points of the inner sweep.
+        ylen (int): number of points of the outer sweep.
+        nr_z (int): number of images (e.g. one per detector value).
+    """
+
+    def __init__(self, xlen: int, ylen: int, nr_z: int = 1):
+        self.xlen = xlen
+        self.ylen = ylen
+        self.image = np.full((ylen, xlen, nr_z), np.nan)
+        # range of rows changed since the last call of get_changed_rows
+        self._changed = None
+
+    def fill(self, start_idx: int, z):
+        """
+        Fills in the points start_idx ... start_idx + len(z) of the
+        flattened grid.
+
+        Args:
+            start_idx (int): index of the first point in acquisition order,
+                indices wrap around the grid (e.g. for soft averages).
+            z (array): shape (n, nr_z) values of the points.
+        """
+        z = np.asarray(z, dtype=float).reshape(-1, self.image.shape[2])
+        size = self.xlen*self.ylen
+        flat = self.image.reshape(size, self.image.shape[2])
+        flat_idx = (start_idx + np.arange(len(z))) % size
+        flat[flat_idx] = z
+        rows = flat_idx // self.xlen
+        first, last = rows.min(), rows.max() + 1
+        if self._changed is not None:
+            first = min(first, self._changed[0])
+            last = max(last, self._changed[1])
+        self._changed = (first, last)
+
+    def get_changed_rows(self):
+        """
+        Returns the (start, stop) range of the rows that changed since the
+        last call, or None if nothing changed.
+        """
+        changed, self._changed = self._changed, None
+        return changed
@@ -19,6 +19,7 @@ frequencies. See e.g., "waveform_control_CC/waveforms_flux.py".
 import logging
 import numpy as np
 import scipy
+from functools import lru_cache
 from pycqed.analysis.fitting_models import Qubit_freq_to_dac
 
 
@@ -329,3 +330,178 @@ def mod_square_VSM(amp_G, amp_D, length, f_modulation,
     D_I_mod, D_Q_mod = mod_pulse(D_I, D_Q, f_modulation,
                                  sampling_rate=sampling_rate)
     return G_I_mod, G_Q_mod, D_I_mod, D_Q_mod
+
+
+#####################################################
+# Memoized and batched pulse library
+#####################################################
+# The lookuptable based AWGs require a table of 8-32 pulses that only differ
+# in amplitude and phase. The functions below generate such a table in a
+# single vectorized operation, reusing the (cached) envelopes and modulation
+# carriers. The cache is keyed on the arguments rounded to
+# _CACHE_SIGNIFICANT_DIGITS, so that numerical noise on e.g., parameter
+# values does not result in cache misses.
+
+_CACHE_SIGNIFICANT_DIGITS = 12
+
+
+def _round_arg(x):
+    return float('{:.{}g}'.format(x, _CACHE_SIGNIFICANT_DIGITS))
+
+
+def _read_only(*arrays):
+    for arr in arrays:
+        arr.flags.writeable = False
+    return arrays
+
+
+@lru_cache(maxsize=128)
+def _cached_gauss_envelope(sigma_length: float, nr_sigma: int,
+                           sampling_rate: float, motzoi: float,
+                           delay: float, subtract_offset: str):
+    G, D = gauss_pulse(amp=1, sigma_length=sigma_length, nr_sigma=nr_sigma,
+                       sampling_rate=sampling_rate, motzoi=motzoi,
+                       delay=delay, subtract_offset=subtract_offset)
+    return _read_only(G, D)
+
+
+@lru_cache(maxsize=128)
+def _cached_modulation_carrier(nr_samples: int, f_modulation: float,
+                               sampling_rate: float, Q_phase_delay: float):
+    Q_phase_delay_rad = 2*np.pi * Q_phase_delay/360.
+    pulse_samples = np.linspace(0, nr_samples, nr_samples, endpoint=False)
+    wt = 2*np.pi*f_modulation/sampling_rate*pulse_samples
+    return _read_only(np.cos(wt), np.sin(wt),
+                      np.cos(wt + Q_phase_delay_rad),
+                      np.sin(wt + Q_phase_delay_rad))
+
+
+def gauss_envelope(sigma_length: float, nr_sigma: int=4,
+                   sampling_rate: float=2e8, motzoi: float=0,
+                   delay: float=0, subtract_offset: str='average'):
+    """
+    Memoized unit amplitude DRAG envelope, see gauss_pulse for the arguments.
+
+    Returns:
+        G, D (array): read-only Gaussian and derivative components.
+    """
+    return _cached_gauss_envelope(
+        _round_arg(sigma_length), int(nr_sigma), _round_arg(sampling_rate),
+        _round_arg(motzoi), _round_arg(delay), subtract_offset)
+
+
+def modulation_carrier(nr_samples: int, f_modulation: float,
+                       sampling_rate: float=2e8, Q_phase_delay: float=0):
+    """
+    Memoized carrier used for single sideband modulation, see mod_pulse.
+
+    Returns:
+        cos_wt, sin_wt, cos_wt_Q, sin_wt_Q (array): read-only carriers, the
+            last two include the Q_phase_delay.
+    """
+    return _cached_modulation_carrier(
+        int(nr_samples), _round_arg(f_modulation), _round_arg(sampling_rate),
+        _round_arg(Q_phase_delay))
+
+
+def clear_pulse_cache():
+    """Clears the cached envelopes and modulation carriers."""
+    _cached_gauss_envelope.cache_clear()
+    _cached_modulation_carrier.cache_clear()
+
+
+def _mod_pulse_stack(pulse_I, pulse_Q, carrier):
+    """SSB modulation of stacked envelopes, identical to mod_pulse."""
+    cos_wt, sin_wt, cos_wt_Q, sin_wt_Q = carrier
+    return (pulse_I*cos_wt + pulse_Q*sin_wt,
+            pulse_I*-sin_wt_Q + pulse_Q*cos_wt_Q)
+
+
+def mod_gauss_batch(amps, phases, sigma_length: float, f_modulation: float,
+                    nr_sigma: int=4, motzoi: float=0,
+                    sampling_rate: float=2e8, Q_phase_delay: float=0,
+                    delay: float=0):
+    """
+    Generates a set of modulated DRAG pulses (see mod_gauss) that only differ
+    in amplitude and phase in a single vectorized operation.
+
+    Args:
+        amps (array): amplitudes of the pulses.
+        phases (array): phases of the pulses in degree, broadcasted
+            against amps.
+
+    Returns:
+        waves (array): shape (nr_pulses, 2, nr_samples) containing the
+            I and Q quadratures of each pulse.
+    """
+    amps, phases = np.broadcast_arrays(np.atleast_1d(amps).astype(float),
+                                       np.atleast_1d(phases).astype(float))
+    G, D = gauss_envelope(sigma_length, nr_sigma=nr_sigma,
+                          sampling_rate=sampling_rate, motzoi=motzoi,
+                          delay=delay)
+    carrier = modulation_carrier(len(G), f_modulation,
+                                 sampling_rate=sampling_rate,
+                                 Q_phase_delay=Q_phase_delay)
+
+    angles = np.deg2rad(phases)
+    c = (amps*np.cos(angles))[:, np.newaxis]
+    s = (amps*np.sin(angles))[:, np.newaxis]
+    pulse_I, pulse_Q = _mod_pulse_stack(c*G - s*D, s*G + c*D, carrier)
+    return np.stack((pulse_I, pulse_Q), axis=1)
+
+
+def mod_gauss_VSM_batch(amps, phases, sigma_length: float,
+                        f_modulation: float, nr_sigma: int=4,
+                        motzoi: float=0, sampling_rate: float=2e8,
+                        Q_phase_delay: float=0, delay: float=0):
+    """
+    Batched version of mod_gauss_VSM, see mod_gauss_batch.
+
+    Returns:
+        waves (array): shape (nr_pulses, 4, nr_samples) containing the
+            G_I, G_Q, D_I and D_Q components of each pulse.
+    """
+    amps, phases = np.broadcast_arrays(np.atleast_1d(amps).astype(float),
+                                       np.atleast_1d(phases).astype(float))
+    G, D = gauss_envelope(sigma_length, nr_sigma=nr_sigma,
+                          sampling_rate=sampling_rate, motzoi=motzoi,
+                          delay=delay)
+    carrier = modulation_carrier(len(G), f_modulation,
+                                 sampling_rate=sampling_rate,
+                                 Q_phase_delay=Q_phase_delay)
+
+    angles = np.deg2rad(phases)
+    c = (amps*np.cos(angles))[:, np.newaxis]
+    s = (amps*np.sin(angles))[:, np.newaxis]
+    # D is in the Q quadrature because it should be 90 deg out of phase
+    G_I_mod, G_Q_mod = _mod_pulse_stack(c*G, s*G, carrier)
+    D_I_mod, D_Q_mod = _mod_pulse_stack(-s*D, c*D, carrier)
+    return np.stack((G_I_mod, G_Q_mod, D_I_mod, D_Q_mod), axis=1)
+
+
+def apply_mixer_predistortion(predistortion_matrix, waves):
+    """
+    Applies a mixer predistortion matrix to a stack of waveforms.
+
+    Args:
+        predistortion_matrix (array): 2x2 matrix, see
+            mixer_predistortion_matrix.
+        waves (array): shape (..., 2, nr_samples).
+    """
+    return np.matmul(predistortion_matrix, waves)
+
+
+def stack_waves(wave_dict: dict):
+    """
+    Groups the waveforms in a wave dict by shape and stacks them, such that
+    operations can be applied to all waveforms of a group at once.
+
+    Returns:
+        list of (keys, waves) tuples where waves is an array of shape
+            (len(keys), nr_channels, nr_samples).
+    """
+    groups = {}
+    for key, val in wave_dict.items():
+        groups.setdefault(np.shape(val), []).append(key)
+    return [(keys, np.array([wave_dict[key] for key in keys]))
+            for keys in groups.values()]
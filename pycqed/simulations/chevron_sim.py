@@ -71,3 +71,139 @@ def chevron_slice(e0, energy, g, t, dt, sf):
     """
     def energy_func(energy, t): return e0*(1.-(energy*sf(t))**2)
     return qamp(rabisim(lambda t: energy_func(energy, t), g, t, dt))
+
+
+# Vectorized simulation
+#
+# The propagator of a single time step is exp(i dt H) with
+# H = e/2 sigma_z + g sigma_x, which has the closed form (Rodrigues formula)
+#     cos(theta) I + i sin(theta) (n_z sigma_z + n_x sigma_x),
+# with theta = dt*sqrt(e**2/4 + g**2) and n the unit vector along (e/2, g).
+# This is an SU(2) matrix [[a, b], [-b*, a*]], which is stored as the pair
+# of complex arrays (a, b). The propagators of all (energy, time) pairs are
+# computed at once and multiplied with a parallel prefix scan along time.
+
+
+def _time_vec(t, dt):
+    # the time steps of rabisim
+    return np.arange(1., t+0.5*dt, dt)
+
+
+def su2_propagators(e, g, dt):
+    """
+    Closed form of evol(e, g, dt) for an array of energies.
+
+    Returns:
+        a, b (arrays): the propagators [[a, b], [-b*, a*]], with the shape
+            of e.
+    """
+    half_e = 0.5*np.asarray(e, dtype=float)
+    norm = np.sqrt(half_e**2 + g**2)
+    theta = dt*norm
+    # sin(theta)/norm, which is dt for norm = 0
+    sinc = dt*np.sinc(theta/np.pi)
+    a = np.cos(theta) + 1j*sinc*half_e
+    b = 1j*sinc*g
+    return a, b
+
+
+def su2_prefix_products(a, b):
+    """
+    Cumulative products U_k ... U_1 U_0 of SU(2) matrices along the last
+    axis, using a parallel (Hillis-Steele) prefix scan of log2(n) steps.
+
+    Args:
+        a, b (arrays): the matrices [[a, b], [-b*, a*]] along the last axis.
+
+    Returns:
+        a, b (arrays): the cumulative products.
+    """
+    a = np.array(a, dtype=complex)
+    b = np.array(b, dtype=complex)
+    n = a.shape[-1]
+    shift = 1
+    while shift < n:
+        # P_k <- P_k P_{k-shift}, P_k covering the last 2*shift matrices
+        a1, b1 = a[..., shift:], b[..., shift:]
+        a2, b2 = a[..., :-shift], b[..., :-shift]
+        a_new = a1*a2 - b1*np.conj(b2)
+        b_new = a1*b2 + b1*np.conj(a2)
+        a[..., shift:], b[..., shift:] = a_new, b_new
+        shift *= 2
+    return a, b
+
+
+def rabisim_vectorized(energies, g, dt):
+    """
+    Vectorized version of rabisim.
+
+    Inputs:
+            energies, energy parameter at the times (1, 1+dt, ..., t),
+                array of shape (..., nr_times) e.g. one row per chevron
+                energy.
+            g,      Coupling parameter
+            dt,     Stepsize of the time evolution
+    Outputs:
+            f_vec,  Evolution of shape (..., nr_times, 2) for times
+                (1, 1+dt, ..., t)
+    """
+    energies = np.asarray(energies, dtype=float)
+    # the state at time k is the product of the propagators at the
+    # times 0 ... k-1 applied to (1, 0)
+    a, b = su2_prefix_products(*su2_propagators(energies[..., :-1], g, dt))
+    f_vec = np.zeros(energies.shape + (2, ), dtype=np.complex128)
+    f_vec[..., 0, 0] = 1
+    f_vec[..., 1:, 0] = a
+    f_vec[..., 1:, 1] = -np.conj(b)
+    return f_vec
+
+
+def _sample_step_function(sf, t, dt):
+    ts = _time_vec(t, dt)
+    if callable(sf):
+        return np.array([sf(ti) for ti in ts], dtype=float)
+    sf = np.asarray(sf, dtype=float)
+    if sf.shape != ts.shape:
+        raise ValueError('The sampled step function must contain the {} '
+                         'values at the times (1, 1+dt, ..., t), got shape '
+                         '{}'.format(len(ts), sf.shape))
+    return sf
+
+
+def chevron_vectorized(e0, emin, emax, n, g, t, dt, sf):
+    """
+    Vectorized version of chevron, simulates all energies and times at once.
+
+    Inputs:
+            e0,     set energy scale at the center(detuning).
+            emin,   sets min energy to simulate, in e0 units.
+            emax,   sets max energy to simulate, in e0 units.
+            n,      sets number of points in energy array.
+            g,      Coupling parameter.
+            t,      Final time of the evolution.
+            dt,     Stepsize of the time evolution.
+            sf,     Step function of the distortion kernel, a function of
+                time or an array sampled at the times (1, 1+dt, ..., t).
+    """
+    sf_vec = _sample_step_function(sf, t, dt)
+    energy_vec = np.arange(1+emin, 1+emax, (emax-emin)/(n-1))
+    energies = e0*(1.-(energy_vec[:, None]*sf_vec[None, :])**2)
+    return np.abs(rabisim_vectorized(energies, g, dt)[..., 1])**2
+
+
+def chevron_slice_vectorized(e0, energy, g, t, dt, sf):
+    """
+    Vectorized version of chevron_slice.
+
+    Inputs:
+            e0,     set energy scale at the center(detuning).
+            energy, energy of the slice to simulate, in e0 units.
+            g,      Coupling parameter.
+            t,      Final time of the evolution.
+            dt,     Stepsize of the time evolution.
+            sf,     Step function of the distortion kernel, a function of
+                time or an array sampled at the times (1, 1+dt, ..., t).
+    """
+    sf_vec = _sample_step_function(sf, t, dt)
+    energies = e0*(1.-(energy*sf_vec)**2)
+    return qamp(rabisim_vectorized(energies, g, dt))
@@ -0,0 +1,123 @@
+import unittest
+import numpy as np
+import lmfit
+from pycqed.analysis import fitting_models as fit_mods
+from pycqed.analysis.tools import batch_fitting as bf
+
+
+class Test_BatchFitting(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        self.rng = np.random.RandomState(42)
+
+    def test_exp_decay_equals_lmfit(self):
+        t = np.linspace(0, 50e-6, 60)
+        taus = self.rng.uniform(5e-6, 20e-6, 20)
+        y = fit_mods.ExpDecayFunc(t, taus[:, None], 0.9, 0.05, 1) + \
+            self.rng.normal(0, 0.01, (20, 60))
+        results = bf.batch_fit(fit_mods.ExpDecayFunc, t, y)
+        assert len(results) == 20
+
+        for fit_res, y_i in zip(results[:3], y[:3]):
+            assert isinstance(fit_res, lmfit.model.ModelResult)
+            assert fit_res.success
+            assert not fit_res.params['n'].vary
+            lmfit_res = fit_mods.ExpDecayModel.fit(
+                y_i, t=t, params=fit_res.init_params)
+            for par in ['tau', 'amplitude', 'offset']:
+                np.testing.assert_allclose(fit_res.params[par].value,
+                                           lmfit_res.params[par].value,
+                                           rtol=1e-5)
+                np.testing.assert_allclose(fit_res.params[par].stderr,
+                                           lmfit_res.params[par].stderr,
+                                           rtol=1e-3)
+            np.testing.assert_allclose(fit_res.chisqr, lmfit_res.chisqr,
+                                       rtol=1e-6)
+
+    def test_cos_and_damped_oscillation(self):
+        t = np.linspace(0, 2e-6, 80)
+        freqs = self.rng.uniform(1e6, 4e6, 10)
+        y = fit_mods.CosFunc(t, 0.4, freqs[:, None], 0.3, 0.5) + \
+            self.rng.normal(0, 0.01, (10, 80))
+        results = bf.batch_fit(fit_mods.CosFunc, t, y)
+        np.testing.assert_allclose(
+            [r.params['frequency'].value for r in results], freqs, rtol=1e-2)
+
+        y = fit_mods.ExpDampOscFunc(t, 1e-6, 1, freqs[:, None], 0.3, 0.4,
+                                    0, 0.5) + \
+            self.rng.normal(0, 0.01, (10, 80))
+        results = bf.batch_fit(
+            fit_mods.ExpDampOscFunc, t, y,
+            guess_dicts={'n': {'value': 1, 'vary': False},
+                         'oscillation_offset': {'value': 0, 'vary': False}})
+        np.testing.assert_allclose(
+            [r.params['frequency'].value for r in results], freqs, rtol=1e-2)
+        assert results[0].nvarys == 5
+
+    def test_lorentz_and_rb(self):
+        f = np.linspace(-10, 10, 101)
+        centers = self.rng.uniform(-3, 3, 10)
+        y = fit_mods.LorentzFunc(f, 2, centers[:, None], 0.7) + \
+            self.rng.normal(0, 0.01, (10, 101))
+        results = bf.batch_fit(fit_mods.LorentzFunc, f, y)
+        np.testing.assert_allclose(
+            [r.params['center'].value for r in results], centers, atol=0.05)
+
+        ncl = np.array([1, 2, 4, 8, 16, 32, 64, 128, 256, 512])
+        ps = self.rng.uniform(0.98, 0.999, 10)
+        y = fit_mods.RandomizedBenchmarkingDecay(ncl, 0.5, ps[:, None], 0.5) + \
+            self.rng.normal(0, 0.005, (10, 10))
+        results = bf.batch_fit(fit_mods.RandomizedBenchmarkingDecay, ncl, y)
+        np.testing.assert_allclose(
+            [r.params['p'].value for r in results], ps, atol=5e-3)
+        # the results support the lmfit reporting and evaluation
+        results[0].fit_report()
+        np.testing.assert_allclose(
+            results[0].eval(numCliff=ncl), results[0].best_fit)
+
+    def test_param_hints_and_single_guess(self):
+        t = np.linspace(0, 50e-6, 60)
+        taus = self.rng.uniform(5e-6, 20e-6, 5)
+        y = fit_mods.ExpDecayFunc(t, taus[:, None], 0.9, 0.05, 1) + \
+            self.rng.normal(0, 0.01, (5, 60))
+
+        batch_model = bf.batch_models[fit_mods.ExpDecayFunc]
+        guess = batch_model.guess
+        nr_calls = []
+
+        def counting_guess(x, y):
+            nr_calls.append(1)
+            return guess(x, y)
+        batch_model.guess = counting_guess
+        try:
+            # the hints of the model are used as in an lmfit model fit, the
+            # guess overrides the values but not vary, min and max
+            model = lmfit.Model(fit_mods.ExpDecayFunc)
+            model.set_param_hint('amplitude', vary=False)
+            model.set_param_hint('tau', min=0, max=1e-3)
+            results = bf.batch_fit(fit_mods.ExpDecayFunc, t, y, model=model)
+        finally:
+            batch_model.guess = guess
+        assert len(nr_calls) == 1
+        for fit_res in results:
+            assert fit_res.model is model
+            assert not fit_res.params['amplitude'].vary
+            assert fit_res.params['amplitude'].value == \
+                fit_res.init_values['amplitude']
+            assert fit_res.params['tau'].max == 1e-3
+        np.testing.assert_allclose(
+            [r.params['tau'].value for r in results], taus, rtol=0.1)
+
+        # without the guess the initial values are taken from the hints
+        hints = {'tau': {'value': 10e-6}, 'amplitude': {'value': 1},
+                 'offset': {'value': 0}, 'n': {'value': 1, 'vary': False}}
+        results = bf.batch_fit(fit_mods.ExpDecayFunc, t, y, guess=False,
+                               param_hints=hints)
+        assert results[0].init_values == {'tau': 10e-6, 'amplitude': 1,
+                                          'offset': 0, 'n': 1}
+        np.testing.assert_allclose(
+            [r.params['tau'].value for r in results], taus, rtol=0.1)
+
+        assert not bf.supports_hints({'tau': {'expr': '2*amplitude'}})
+        assert bf.supports_hints(hints)
@@ -0,0 +1,107 @@
+import time
+import unittest
+import numpy as np
+from pycqed.analysis.tools import cryoscope_tools as ct
+
+
+class Test_BatchCryoscope(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        self.rng = np.random.RandomState(0)
+        self.sampling_rate = 2.4e9
+        self.times = np.arange(200) / self.sampling_rate
+        self.amps = np.linspace(0.05, 0.6, 64)
+        self.data = self.mk_cryoscope_data(nr_qubits=7)
+
+    @classmethod
+    def mk_cryoscope_data(self, nr_qubits):
+        """
+        Cryoscope traces of shape (nr_qubits, nr_amps, nr_times) with a
+        detuning that settles with a 20 ns time constant.
+        """
+        t = self.times
+        data = np.zeros((nr_qubits, len(self.amps), len(t)), dtype=complex)
+        for i in range(nr_qubits):
+            freqs = np.polyval([-2.5e9*(1 + 0.05*i), 5e7, 0], self.amps)
+            freqs_t = freqs[:, None] * (1 - 0.02*np.exp(-t/20e-9))
+            phase = 2*np.pi*np.cumsum(freqs_t, axis=1) / self.sampling_rate
+            noise = self.rng.normal(0, 0.02, (2, ) + phase.shape)
+            data[i] = 0.45*np.exp(1j*phase)*np.exp(-t/400e-9) + \
+                0.5 + 0.5j + noise[0] + 1j*noise[1]
+        return data
+
+    def test_fft_freq_guess_batch_equals_per_trace(self):
+        norm_data = ct.normalize_sincos(self.data[0], window_size=11)
+        guesses = ct.fft_based_freq_guess_complex(norm_data)
+        for i, nd in enumerate(norm_data):
+            guess = ct.fft_based_freq_guess_complex(nd)
+            assert np.isscalar(guess[0])
+            np.testing.assert_array_equal(guess, [g[i] for g in guesses])
+
+    def test_batch_analyzer_equals_per_trace(self):
+        for kw in [{}, {'demod_smooth': (9, 2)},
+                   {'derivative_window_length': 3e-9, 'nyquist_order': 1}]:
+            batch_ca = ct.BatchCryoscopeAnalyzer(self.times, self.data, **kw)
+            self.assertEqual(batch_ca.detuning.shape, self.data.shape)
+            for i, j in [(0, 0), (3, 17), (6, 63)]:
+                ca = ct.CryoscopeAnalyzer(self.times, self.data[i, j], **kw)
+                self.assertEqual(ca.demod_freq, batch_ca.demod_freq[i, j])
+                for attr in ['norm_data', 'demod_data', 'phase',
+                             'detuning', 'real_detuning']:
+                    np.testing.assert_allclose(
+                        getattr(batch_ca, attr)[i, j], getattr(ca, attr),
+                        rtol=1e-12, atol=1e-12*np.max(
+                            np.abs(getattr(ca, attr))))
+
+        demod_freqs = np.linspace(-3e8, -1e8, 64)
+        nyquist_orders = np.arange(64) % 2
+        batch_ca = ct.BatchCryoscopeAnalyzer(
+            self.times, self.data[2], demod_freq=demod_freqs,
+            nyquist_order=nyquist_orders)
+        ca = ct.CryoscopeAnalyzer(self.times, self.data[2, 5],
+                                  demod_freq=demod_freqs[5],
+                                  nyquist_order=nyquist_orders[5])
+        np.testing.assert_allclose(batch_ca.real_detuning[5],
+                                   ca.real_detuning, rtol=1e-12)
+
+    def test_dac_arch_batch_fit_equals_curve_fit(self):
+        dac_arch = ct.DacArchAnalysis(self.times, self.amps, self.data[0],
+                                      batch_fit=False)
+        batch_dac_arch = ct.DacArchAnalysis(self.times, self.amps,
+                                            self.data[0], batch_fit=True)
+        # the tolerance is limited by the convergence of curve_fit
+        np.testing.assert_allclose(batch_dac_arch.freqs, dac_arch.freqs,
+                                   rtol=1e-4)
+        np.testing.assert_allclose(batch_dac_arch.poly_fit,
+                                   dac_arch.poly_fit, rtol=1e-4)
+
+        dac_arches = ct.batch_dac_arch_analysis(
+            self.times, self.amps, self.data[:3])
+        self.assertEqual(len(dac_arches), 3)
+        np.testing.assert_array_equal(dac_arches[0].freqs,
+                                      batch_dac_arch.freqs)
+
+    def test_benchmark_64_amps_7_qubits(self):
+        t0 = time.perf_counter()
+        analyzers = [[ct.CryoscopeAnalyzer(self.times, d) for d in data_q]
+                     for data_q in self.data]
+        t_loop = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        batch_ca = ct.BatchCryoscopeAnalyzer(self.times, self.data)
+        t_batch = time.perf_counter() - t0
+        np.testing.assert_allclose(
+            batch_ca.real_detuning,
+            [[ca.real_detuning for ca in row] for row in analyzers],
+            rtol=1e-9)
+        assert t_batch < t_loop
+
+        t0 = time.perf_counter()
+        for data_q in self.data:
+            ct.DacArchAnalysis(self.times, self.amps, data_q, batch_fit=False)
+        t_loop = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        ct.batch_dac_arch_analysis(self.times, self.amps, self.data)
+        t_batch = time.perf_counter() - t0
+        assert t_batch < t_loop
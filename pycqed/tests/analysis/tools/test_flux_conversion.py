@@ -0,0 +1,49 @@
+import unittest
+import numpy as np
+from pycqed.analysis.tools import flux_conversion as flux_conv
+from pycqed.analysis.tools import cryoscope_tools as ct
+
+
+class Test_FluxConversion(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        self.rng = np.random.RandomState(0)
+
+    def test_poly_inverse_equals_roots(self):
+        def roots_inverse(value, poly_coeffs, positive_branch):
+            sols = (np.poly1d(poly_coeffs)-value).roots
+            sol = np.max(sols) if positive_branch else np.min(sols)
+            return np.real(sol)
+
+        for poly_coeffs in [[-2e9, 1e6, 6e9], [3e9, -1e8, 0],
+                            [0, 2e9, 5e9], [1e9, 2e8, -3e9, 5e9]]:
+            # includes values outside of the range of the polynomial
+            values = np.polyval(poly_coeffs, np.linspace(-1, 1, 51)) + \
+                self.rng.normal(0, 1e8, 51)
+            for positive_branch in [True, False]:
+                amps = flux_conv.poly_inverse(values, poly_coeffs,
+                                              positive_branch)
+                amps_roots = [roots_inverse(v, poly_coeffs, positive_branch)
+                              for v in values]
+                np.testing.assert_allclose(amps, amps_roots, rtol=1e-9)
+
+    def test_poly_inverse_parabola(self):
+        poly_coeffs = [-2e9, 0.1e9, 6e9]
+        amps = np.linspace(.1, 1, 21)
+        freqs = np.polyval(poly_coeffs, amps)
+        np.testing.assert_allclose(
+            flux_conv.poly_inverse(freqs, poly_coeffs), amps)
+        np.testing.assert_allclose(
+            flux_conv.poly_inverse(freqs.reshape(3, 7), poly_coeffs),
+            amps.reshape(3, 7))
+        np.testing.assert_allclose(
+            ct.freq_to_amp_root_parabola(list(freqs), poly_coeffs), amps)
+
+        amp = flux_conv.poly_inverse(freqs[0], poly_coeffs,
+                                     positive_branch=False)
+        assert isinstance(amp, float)
+        self.assertAlmostEqual(amp, 0.05 - amps[0])
+        # above the sweetspot the extremum is returned
+        self.assertAlmostEqual(flux_conv.poly_inverse(7e9, poly_coeffs),
+                               0.025)
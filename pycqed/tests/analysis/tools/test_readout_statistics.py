@@ -0,0 +1,67 @@
+import unittest
+import numpy as np
+from scipy.optimize import minimize
+from pycqed.analysis.fitting_models import ro_CDF
+from pycqed.analysis.tools import readout_statistics as ro_stats
+
+
+class Test_ReadoutStatistics(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        rng = np.random.RandomState(3)
+        self.shots_0 = np.concatenate([rng.normal(0, 1, 9700),
+                                       rng.normal(3, 1.3, 300)])
+        self.shots_1 = np.concatenate([rng.normal(3, 1.3, 9000),
+                                       rng.normal(0, 1, 1000)])
+
+    def test_empirical_cdf(self):
+        x, cdf = ro_stats.empirical_cdf([3, 1, 2, 2])
+        np.testing.assert_array_equal(x, [1, 2, 3])
+        np.testing.assert_array_equal(cdf, [.25, .75, 1])
+        _, cdf = ro_stats.empirical_cdf([3, 1, 2, 2], x=[0, 2.5])
+        np.testing.assert_array_equal(cdf, [0, .75])
+
+    def test_raw_assignment_fidelity_brute_force(self):
+        F, th = ro_stats.raw_assignment_fidelity(self.shots_0, self.shots_1)
+
+        thresholds = np.unique(np.concatenate([self.shots_0, self.shots_1]))
+        F_vs_th = [1 - (np.mean(self.shots_0 > t) +
+                        np.mean(self.shots_1 <= t))/2
+                   for t in thresholds[::50]]
+        assert F >= np.max(F_vs_th) - 1e-12
+        np.testing.assert_almost_equal(
+            F, 1 - (np.mean(self.shots_0 > th) +
+                    np.mean(self.shots_1 <= th))/2)
+
+        # perfectly separated shots
+        F, th = ro_stats.raw_assignment_fidelity([0, 1, 2], [5, 6])
+        assert F == 1
+        assert th == 2
+
+    def test_double_gauss_threshold(self):
+        pars = {'A_center': 0, 'A_sigma': 1, 'B_center': 3, 'B_sigma': 1.3,
+                'A_spurious': 0.03, 'B_spurious': 0.1,
+                'A_amplitude': 1, 'B_amplitude': 1}
+
+        def infid_vs_th(x):
+            cdf = ro_CDF(x=[x, x], **pars)
+            return (1-np.abs(cdf[0] - cdf[1]))/2
+
+        opt = minimize(infid_vs_th, 1.5)
+        th, F = ro_stats.double_gauss_threshold(0, 1, 3, 1.3, 0.03, 0.1)
+        np.testing.assert_almost_equal(th, opt['x'][0], decimal=4)
+        np.testing.assert_almost_equal(F, 1 - opt['fun'], decimal=8)
+
+        # equal widths give the midpoint, works on arrays
+        th, F = ro_stats.double_gauss_threshold(
+            np.array([0, -1]), 1, np.array([3, 1]), 1)
+        np.testing.assert_almost_equal(th, [1.5, 0])
+
+    def test_SNR_and_angle(self):
+        np.testing.assert_almost_equal(ro_stats.SNR(0, 1, 3, 2), 2)
+        shots_0 = np.array([self.shots_0, self.shots_0])
+        shots_1 = np.array([self.shots_1, self.shots_1])
+        angle, centers = ro_stats.iq_rotation_angle(shots_0, shots_1)
+        np.testing.assert_almost_equal(angle, np.pi/4)
+        assert centers.shape == (2, 2)
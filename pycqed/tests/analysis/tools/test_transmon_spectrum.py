@@ -0,0 +1,96 @@
+import unittest
+import numpy as np
+from pycqed.analysis import analysis_toolbox as a_tools
+from pycqed.analysis.tools import transmon_spectrum as tspec
+
+
+class Test_TransmonSpectrum(unittest.TestCase):
+
+    def test_transmon_transitions_batched(self):
+        fluxes = np.linspace(0, .4, 21)
+        f01_f12 = a_tools.calculate_transmon_transitions(
+            300e6, 20e9, asym=.1, reduced_flux=fluxes)
+        assert f01_f12.shape == (21, 2)
+        for fl, trans in zip(fluxes[::5], f01_f12[::5]):
+            # direct diagonalization of the charge-basis Hamiltonian
+            dim = 20
+            EJphi = 20e9 * np.sqrt(
+                .1 ** 2 + (1 - .1 ** 2) * np.cos(np.pi * fl) ** 2)
+            ham = 4 * 300e6 * np.diag(np.arange(-dim, dim + 1) ** 2) - \
+                EJphi / 2 * (np.eye(2 * dim + 1, k=+1) +
+                             np.eye(2 * dim + 1, k=-1))
+            np.testing.assert_allclose(
+                trans, np.diff(np.linalg.eigvalsh(ham))[:2], rtol=1e-10)
+
+        # large EJ/EC limit
+        f01, f12 = a_tools.calculate_transmon_transitions(300e6, 20e9)
+        np.testing.assert_allclose(f01, np.sqrt(8*20e9*300e6) - 300e6,
+                                   rtol=5e-3)
+        np.testing.assert_allclose(f01 - f12, 300e6, rtol=0.15)
+
+    def test_charge_matrix_elements(self):
+        (f01, f12), injs = a_tools.calculate_transmon_transitions(
+            300e6, 20e9, dim=10, return_injs=True)
+        assert injs.shape == (10, 10)
+        np.testing.assert_allclose(injs, injs.T, atol=1e-12)
+        # the charge operator only couples neighbouring levels of a transmon
+        self.assertAlmostEqual(abs(injs[1, 2]/injs[0, 1]), np.sqrt(2),
+                               places=1)
+
+    def test_transmon_and_resonator_dispersive_limit(self):
+        EC, EJ, f_bus, g = 300e6, 20e9, 8e9, 20e6
+        f01, f12 = a_tools.calculate_transmon_transitions(EC, EJ, dim=10)
+        f01_d, f12_d, f_bus_d, f01_shifted, f_bus_shifted = \
+            a_tools.calculate_transmon_and_resonator_transitions(
+                EC, EJ, f_bus, g)
+        delta = f01 - f_bus
+        np.testing.assert_allclose(f01_d - f01, g**2/delta, rtol=1e-2)
+        np.testing.assert_allclose(f_bus_d - f_bus, -g**2/delta, rtol=1e-2)
+        assert f01_shifted < f01_d
+
+        # uncoupled buses are bare
+        f01_d, _, f_bus_d, _, _ = \
+            a_tools.calculate_transmon_and_resonator_transitions(
+                EC, EJ, [7e9, 8e9], [0., 0.])
+        np.testing.assert_allclose(f01_d, f01)
+        np.testing.assert_allclose(f_bus_d, [7e9, 8e9])
+
+    def test_batched_spectrum_equals_single_points(self):
+        EJ = np.linspace(10e9, 20e9, 11)
+        batched = a_tools.calculate_transmon_and_resonator_transitions(
+            300e6, EJ, [7e9, 5e9], [EJ/1e3, 40e6])
+        for i in [0, 5, 10]:
+            single = a_tools.calculate_transmon_and_resonator_transitions(
+                300e6, EJ[i], [7e9, 5e9], [EJ[i]/1e3, 40e6])
+            for b, s in zip(batched, single):
+                np.testing.assert_allclose(np.array(b)[..., i], s)
+
+    def test_spectrum_cache(self):
+        tspec.clear_spectrum_cache()
+        fluxes = np.linspace(0, .3, 11)
+        a = tspec.transmon_transitions(300e6, 20e9, reduced_flux=fluxes)
+        # values that only differ beyond the rounding hit the cache
+        b = tspec.transmon_transitions(300e6*(1 + 1e-15), 20e9,
+                                       reduced_flux=fluxes)
+        info = tspec._transmon_eigensystem_cached.cache_info()
+        assert info.hits == 1
+        assert info.misses == 1
+        np.testing.assert_array_equal(a, b)
+        # the returned arrays are copies
+        a[:] = 0
+        np.testing.assert_array_equal(
+            b, tspec.transmon_transitions(300e6, 20e9, reduced_flux=fluxes))
+
+    def test_fit_EC_EJ_g_f_res_ng(self):
+        EC, EJmax, f_r, g, asym = 300e6, 20e9, 7.5e9, 60e6, 0.2
+        fluxes = np.linspace(0, .3, 15)
+        EJ = EJmax*np.sqrt(asym**2 + (1 - asym**2)*np.cos(np.pi*fluxes)**2)
+        g_flux = (EJ/EJmax)**(1/4)*g
+        f01, f12, f_r_d, _, _ = \
+            a_tools.calculate_transmon_and_resonator_transitions(
+                EC, EJ, f_r, [g_flux])
+
+        pars = a_tools.fit_EC_EJ_g_f_res_ng(
+            fluxes, f01, fluxes, f12, fluxes, f_r_d)
+        np.testing.assert_allclose(pars, [EC, EJmax, f_r, g, asym],
+                                   rtol=1e-4)
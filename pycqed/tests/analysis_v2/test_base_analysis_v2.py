@@ -1,11 +1,14 @@
 import unittest
 import h5py
 import json
+import lmfit
 import numpy as np
 import os
+from functools import partial
 import pycqed as pq
 import matplotlib.pyplot as plt
 import pycqed.analysis.analysis_toolbox as a_tools
+from pycqed.analysis import fitting_models as fit_mods
 import pycqed.analysis_v2.base_analysis as ba
 import pycqed.analysis_v2.measurement_analysis as ma2
 
@@ -145,3 +148,63 @@ class Test_base_analysis(unittest.TestCase):
                           -5.655511651379513, -11.782325134462313,
                           -18.545062293081163, -3.0447784441939847]
                 })
+
+    def test_deferred_plotting(self):
+        a = ma2.Singleshot_Readout_Analysis(
+            t_start='20180508_182642',
+            options_dict={'deferred_plotting': True, 'save_figs': True})
+        # no figures are drawn in this process
+        assert len(a.figs) == 0
+        savenames = a.deferred_figures.result(timeout=120)
+        ax_ids = {pdict.get('ax_id', key)
+                  for key, pdict in a.plot_dicts.items()}
+        assert len(savenames) == len(ax_ids)
+        for fn in savenames:
+            assert os.path.dirname(fn) == a.raw_data_dict['folder']
+            assert os.path.isfile(fn)
+        ba.shutdown_figure_rendering()
+
+    def test_batch_fitting_uses_fit_dict_options(self):
+        rng = np.random.RandomState(0)
+        t = np.linspace(0, 50e-6, 60)
+        a = ba.BaseDataAnalysis()
+        a.options_dict['batch_fitting'] = True
+
+        def mk_fit_dict(tau, **kw):
+            model = lmfit.Model(fit_mods.ExpDecayFunc)
+            model.guess = partial(fit_mods.exp_dec_guess, model)
+            model.set_param_hint('tau', min=1e-6, max=1e-4)
+            y = fit_mods.ExpDecayFunc(t, tau, 0.9, 0.05, 1) + \
+                rng.normal(0, 0.01, len(t))
+            return dict(model=model, fit_xvals={'t': t},
+                        fit_yvals={'data': y}, **kw)
+
+        a.fit_dicts = {
+            'plain': mk_fit_dict(10e-6),
+            'fixed_offset': mk_fit_dict(
+                12e-6, guess_dict={'offset': {'value': 0.05,
+                                              'vary': False}}),
+            'max_nfev': mk_fit_dict(8e-6, fit_kwargs={'max_nfev': 100}),
+            # not supported by the batched solver, fitted with lmfit
+            'expr': mk_fit_dict(9e-6, guess_dict={
+                'offset': {'expr': '0.05*amplitude/0.9'}})}
+        a.run_fitting()
+
+        batched = {key for key, fit_res in a.fit_res.items()
+                   if fit_res.method == 'batched_leastsq'}
+        assert batched == {'plain', 'fixed_offset', 'max_nfev'}
+        for key in batched:
+            fit_res = a.fit_res[key]
+            assert fit_res.params['tau'].max == 1e-4
+            assert not fit_res.params['n'].vary
+        assert not a.fit_res['fixed_offset'].params['offset'].vary
+        assert a.fit_res['fixed_offset'].params['offset'].value == 0.05
+
+        # the per-trace fits give the same result
+        a.options_dict['batch_fitting'] = False
+        batch_res = dict(a.fit_res)
+        a.run_fitting()
+        for key in batched:
+            np.testing.assert_allclose(
+                batch_res[key].params['tau'].value,
+                a.fit_res[key].params['tau'].value, rtol=1e-4)
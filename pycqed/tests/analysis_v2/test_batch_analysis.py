@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pycqed as pq
+from pycqed.analysis_v2 import measurement_analysis as ma
+from pycqed.analysis_v2 import batch_analysis as bta
+
+
+class Test_BatchAnalysis(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        self.datadir = os.path.join(pq.__path__[0], 'tests', 'test_data')
+        ma.a_tools.datadir = self.datadir
+        self.t_start = '20180508_182642'
+        self.t_stop = '20180508_182726'
+
+    def test_batch_SSRO_analysis(self):
+        results, failures = bta.run_batch_analysis(
+            'Singleshot_Readout_Analysis', self.t_start, self.t_stop,
+            label='SSRO', processes=2)
+        assert len(failures) == 0
+        assert list(results.index) == ['20180508_182642', '20180508_182657',
+                                       '20180508_182711', '20180508_182726']
+        assert {'SNR', 'F_a', 'F_d', 'shots_all.SNR'} <= set(results.columns)
+
+        a = ma.Singleshot_Readout_Analysis(t_start='20180508_182711',
+                                           extract_only=True)
+        np.testing.assert_allclose(results.loc['20180508_182711', 'F_a'],
+                                   a.proc_data_dict['F_assignment_raw'])
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fn = os.path.join(tmpdir, 'batch.hdf5')
+            bta.save_batch_results(fn, results, failures)
+            results_loaded, failures_loaded = bta.load_batch_results(fn)
+        np.testing.assert_allclose(results_loaded['F_a'], results['F_a'])
+        assert list(results_loaded.index) == list(results.index)
+        assert len(failures_loaded) == 0
+
+    def test_batch_analysis_reports_failures(self):
+        # predict_qubit_temp requires the qubit frequency
+        results, failures = bta.run_batch_analysis(
+            'Singleshot_Readout_Analysis', self.t_start, self.t_stop,
+            label='SSRO', processes=1,
+            analysis_kw={'options_dict': {'predict_qubit_temp': True}})
+        assert len(results) == 0
+        assert len(failures) == 4
+        assert failures['error'].str.startswith('KeyError').all()
+
+    def test_batch_analysis_datadir(self):
+        with tempfile.TemporaryDirectory() as other_datadir:
+            ma.a_tools.datadir = other_datadir
+            try:
+                for processes in [1, 2]:
+                    results, failures = bta.run_batch_analysis(
+                        'Singleshot_Readout_Analysis', self.t_start,
+                        self.t_stop, label='SSRO', processes=processes,
+                        datadir=self.datadir)
+                    assert len(failures) == 0
+                    assert len(results) == 4
+                    assert ma.a_tools.datadir == other_datadir
+            finally:
+                ma.a_tools.datadir = self.datadir
+
+    def test_flatten_quantities(self):
+        from uncertainties import ufloat
+        cols = bta.flatten_quantities(
+            {'T1': ufloat(10e-6, 1e-6), 'q': {'F': np.float64(.9)},
+             'trace': np.arange(3), 'name': 'QL'})
+        assert cols == {'T1': 10e-6, 'T1_stderr': 1e-6, 'q.F': .9,
+                        'name': 'QL'}
@@ -0,0 +1,70 @@
+import json
+import subprocess
+import sys
+import unittest
+
+# Import time of pycqed.analysis_v2.measurement_analysis on top of pycqed
+IMPORT_TIME_BUDGET = 1.0  # s
+
+_IMPORT_SCRIPT = """
+import json, sys, time
+import pycqed
+before = set(sys.modules)
+t0 = time.perf_counter()
+import pycqed.analysis_v2.measurement_analysis as ma2
+dt = time.perf_counter() - t0
+new_modules = sorted(set(sys.modules) - before)
+ma2.a_tools.datadir = 'custom_datadir'
+ma2.Singleshot_Readout_Analysis
+print(json.dumps({'import_time': dt, 'new_modules': new_modules,
+                  'readout_imported': 'pycqed.analysis_v2.readout_analysis'
+                  in sys.modules,
+                  'datadir': ma2.a_tools.datadir}))
+"""
+
+
+class Test_MeasurementAnalysisImport(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        # a fresh interpreter, other tests have imported the modules already
+        out = subprocess.run([sys.executable, '-c', _IMPORT_SCRIPT],
+                             stdout=subprocess.PIPE, check=True)
+        self.result = json.loads(out.stdout.decode().splitlines()[-1])
+
+    def test_import_time_budget(self):
+        assert self.result['import_time'] < IMPORT_TIME_BUDGET
+
+    def test_no_heavy_imports(self):
+        new_modules = self.result['new_modules']
+        for prefix in ['matplotlib.pyplot', 'matplotlib.backends', 'qutip',
+                       'pycqed.analysis_v2.readout_analysis']:
+            assert not [m for m in new_modules if m.startswith(prefix)], \
+                prefix
+
+    def test_lazy_attribute_access(self):
+        assert self.result['readout_imported']
+        import pycqed.analysis_v2.measurement_analysis as ma2
+        from pycqed.analysis_v2 import readout_analysis as ra
+        assert ma2.Singleshot_Readout_Analysis is \
+            ra.Singleshot_Readout_Analysis
+        assert ma2.ra is ra
+        assert 'Singleshot_Readout_Analysis' in dir(ma2)
+        with self.assertRaises(AttributeError):
+            ma2.Not_An_Analysis
+
+    def test_lazy_import_keeps_datadir(self):
+        # importing base_analysis reloads a_tools
+        assert self.result['datadir'] == 'custom_datadir'
+
+    def test_reload_analysis_modules(self):
+        import pycqed.analysis_v2.measurement_analysis as ma2
+        old_cls = ma2.Singleshot_Readout_Analysis
+        datadir = ma2.a_tools.datadir
+        reloaded = ma2.reload_analysis_modules()
+        assert ma2.a_tools.datadir == datadir
+        assert reloaded[0] == 'pycqed.analysis_v2.base_analysis'
+        assert 'pycqed.analysis_v2.readout_analysis' in reloaded
+        new_cls = ma2.Singleshot_Readout_Analysis
+        assert new_cls is not old_cls
+        assert issubclass(new_cls, ma2.ba.BaseDataAnalysis)
@@ -0,0 +1,76 @@
+import unittest
+import numpy as np
+from pycqed.analysis_v2 import pytomo
+
+
+def projector(v):
+    v = np.array(v)/np.linalg.norm(v)
+    return np.outer(v, v.conj())
+
+
+# Single qubit Pauli eigenstates, used both as inputs and observables
+pauli_states = [projector(v) for v in
+                [[1, 0], [0, 1], [1, 1], [1, -1], [1, 1j], [1, -1j]]]
+
+
+class Test_pytomo_mle(unittest.TestCase):
+
+    def test_gellmann_matrices(self):
+        G = pytomo.gellmann_matrices(3)
+        overlaps = np.einsum('mij,nji->mn', G, G)
+        np.testing.assert_almost_equal(overlaps, np.eye(9))
+
+    def test_state_tomo(self):
+        rho_target = 0.9*projector([1, 1j]) + 0.1*np.eye(2)/2
+        observables = pauli_states
+        data = 1000*np.array([np.trace(E @ rho_target).real
+                              for E in observables])
+        weights = np.ones(len(data))
+
+        rho = pytomo.tomo_state(data, observables, weights)
+        np.testing.assert_almost_equal(rho/1000, rho_target, decimal=5)
+        rho = pytomo.tomo_state(data, observables, weights,
+                                tomo_options={'normalised': True})
+        np.testing.assert_almost_equal(np.trace(rho), 1)
+
+    def test_state_tomo_physical(self):
+        # data that corresponds to an unphysical state (<Z> = <X> = 1)
+        observables = pauli_states[:4]
+        data = np.array([1000, 1, 1000, 1])
+        rho = pytomo.tomo_state_mle(data, observables, np.ones(4))
+        assert np.min(np.linalg.eigvalsh(rho)) > -1e-6
+
+    def test_state_tomo_batched(self):
+        rho_target = 0.8*projector([1, 0]) + 0.2*projector([0, 1])
+        exp = 1000*np.array([np.trace(E @ rho_target).real
+                             for E in pauli_states])
+        data = np.random.poisson(exp, size=(10, len(exp))) + 1
+        rhos = pytomo.tomo_state_mle(data, pauli_states,
+                                     np.ones(len(exp)), fixedweight=False)
+        assert rhos.shape == (10, 2, 2)
+        rho_3 = pytomo.tomo_state_mle(data[3], pauli_states,
+                                      np.ones(len(exp)), fixedweight=False)
+        np.testing.assert_allclose(rhos[3], rho_3, atol=1e-3)
+
+    def test_process_tomo(self):
+        # depolarized X90 rotation
+        U = np.array([[1, -1j], [-1j, 1]])/np.sqrt(2)
+
+        def channel(r):
+            return 0.95*U @ r @ U.conj().T + 0.05*np.eye(2)/2
+
+        inputs, observables, data = [], [], []
+        for R in pauli_states[::2] + [pauli_states[3]]:
+            for E in pauli_states:
+                inputs.append(R)
+                observables.append(E)
+                data.append(1000*np.trace(E @ channel(R)).real)
+
+        chi = pytomo.tomo_process(data, inputs, observables,
+                                  np.ones(len(data)))
+        predicted = [2*np.trace(np.kron(R.T, E) @ chi).real
+                     for R, E in zip(inputs, observables)]
+        np.testing.assert_allclose(predicted, data, atol=1e-3)
+        # trace preserving
+        tr2 = np.einsum('acbc->ab', chi.reshape(2, 2, 2, 2))
+        np.testing.assert_allclose(tr2, 500*np.eye(2), atol=1e-3)
@@ -2,7 +2,9 @@ import unittest
 from matplotlib import rcParams
 import pycqed as pq
 import os
+import numpy as np
 from pycqed.analysis_v2 import measurement_analysis as ma
+from pycqed.analysis_v2 import randomized_benchmarking_analysis as rba
 
 
 class Test_RBAnalysis(unittest.TestCase):
@@ -68,6 +70,50 @@ class Test_RBAnalysis(unittest.TestCase):
         self.assertAlmostEqual(u_dec['u'].value, 0.7354, places=3)
         self.assertAlmostEqual(u_dec['eps'].value, 0.1068, places=3)
 
+    def test_streaming_two_qubit_RB_analysis(self):
+        ts = '20180727_182529'
+        a = ma.RandomizedBenchmarking_TwoQubit_Analysis(
+            t_start=ts, classification_method='rates', rates_ch_idxs=[1, 3],
+            extract_only=True)
+        stream = rba.StreamingRBAnalysis(
+            rba.RandomizedBenchmarking_TwoQubit_Analysis,
+            bins=a.raw_data_dict['bins'],
+            value_names=a.raw_data_dict['value_names'], t_start=ts,
+            data_file_path=ma.a_tools.measurement_filename(
+                a.raw_data_dict['folder']),
+            analysis_kw={'rates_ch_idxs': [1, 3], 'extract_only': True})
+        assert stream.read_new_shots() > 0
+        assert stream.read_new_shots() == 0
+        b = stream.refit()
+        np.testing.assert_allclose(b.proc_data_dict['M0'],
+                                   a.proc_data_dict['M0'])
+        self.assertAlmostEqual(b.fit_res['rb_decay'].params['eps'].value,
+                               a.fit_res['rb_decay'].params['eps'].value,
+                               places=6)
+
+    def test_streaming_bin_averager(self):
+        nr_bins, nr_seeds, shots_per_seed = 37, 5, 3
+        shots = np.random.randn(4, nr_bins*nr_seeds*shots_per_seed)
+        # missed triggers
+        shots[:, [3, 100, 101]] = 0
+
+        averager = rba.StreamingBinAverager(
+            nr_bins=nr_bins, nr_channels=4, shots_per_group=shots_per_seed)
+        for chunk in np.array_split(shots, 7, axis=1):
+            averager.add_shots(chunk)
+        means = averager.binned_means()
+        assert means.shape == (4, nr_bins, nr_seeds)
+
+        shots[:, [3, 100, 101]] = np.nan
+        binned = np.reshape(shots, (4, nr_bins, -1), order='F').reshape(
+            4, nr_bins, nr_seeds, shots_per_seed)
+        np.testing.assert_allclose(means, np.nanmean(binned, axis=3))
+
+        # incomplete seeds are excluded
+        averager.reset()
+        averager.add_shots(shots[:, :nr_bins*shots_per_seed + 5])
+        assert averager.binned_means().shape == (4, nr_bins, 1)
+
 
 
 
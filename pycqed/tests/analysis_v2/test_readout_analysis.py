@@ -5,6 +5,7 @@ import os
 import matplotlib.pyplot as plt
 from pycqed.analysis_v2 import measurement_analysis as ma
 from pycqed.analysis_v2 import readout_analysis as ra
+from pycqed.analysis_v2 import multiplexed_readout_analysis as mra
 
 # Add test: 20180508\182642 - 183214
 
@@ -216,3 +217,54 @@ class Test_multiplexed_readout_analysis(unittest.TestCase):
     #     a = ma.Multiplexed_Readout_Analysis(t_start=t_start, t_stop=t_stop,
     #                                         qubit_names=['QR', 'QL'])
     #     np.testing.assert_equal(a.proc_data_dict['qubit_names'], ['QR', 'QL'])
+
+    def test_calc_assignment_prob_matrix(self):
+        combinations = ['00', '01', '10', '11']
+        # perfect readout except for shot 5 (prepared '01', declared '11')
+        digitized_data = np.array([[0, 0], [0, 1], [1, 0], [1, 1]]*4)
+        digitized_data[5] = [1, 1]
+        mat = mra.calc_assignment_prob_matrix(combinations, digitized_data)
+        expected = np.eye(4)
+        expected[1, 1] = 0.75
+        expected[1, 3] = 0.25
+        np.testing.assert_almost_equal(mat, expected)
+
+        # Declared states not in the valid combinations are not allowed
+        with self.assertRaises(ValueError):
+            mra.calc_assignment_prob_matrix(
+                combinations, digitized_data,
+                valid_combinations=['00', '01', '10'])
+
+        # post-selected data are normalized per prepared state
+        dig_dict = {'q0': {c: digitized_data[i::4, 0]
+                           for i, c in enumerate(combinations)},
+                    'q1': {c: digitized_data[i::4, 1]
+                           for i, c in enumerate(combinations)}}
+        dig_dict['q0']['00'] = dig_dict['q0']['00'][:2]
+        dig_dict['q1']['00'] = dig_dict['q1']['00'][:2]
+        mat_ps = mra.calc_assignment_prob_matrix(
+            combinations, dig_dict, post_selection=True)
+        np.testing.assert_almost_equal(mat_ps, expected)
+
+        cross_fid = mra.calc_cross_fidelity_matrix(expected, combinations)
+        # only the first qubit is declared in the wrong state
+        np.testing.assert_almost_equal(cross_fid[0, 0], 1-0.25/2)
+        np.testing.assert_almost_equal(cross_fid[1, 1], 1)
+
+    def test_state_codes(self):
+        codes = mra.digitized_to_state_codes([[0, 1, 1], [1, 0, 0]])
+        np.testing.assert_equal(codes, [3, 4])
+        np.testing.assert_equal(
+            mra.combinations_to_state_codes(['011', '100', '012']),
+            [3, 4, -1])
+
+    def test_histogram_per_combination(self):
+        shots = np.random.randn(1000)
+        prepared = np.arange(1000) % 3
+        counts, bin_centers = mra.histogram_per_combination(
+            shots, prepared, 3, bins=20, range=(-1, 1))
+        for i in range(3):
+            cnts, edges = np.histogram(shots[i::3], bins=20, range=(-1, 1))
+            np.testing.assert_equal(counts[i], cnts)
+        np.testing.assert_almost_equal(bin_centers,
+                                       edges[:-1] + (edges[1]-edges[0])/2)
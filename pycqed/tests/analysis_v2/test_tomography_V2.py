@@ -0,0 +1,50 @@
+import unittest
+import numpy as np
+import qutip as qt
+from pycqed.analysis_v2 import tomography_V2 as tomo
+
+
+class Test_TomoAnalysis_batch(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        self.tomo_an = tomo.TomoAnalysis(n_qubits=2)
+        self.M = self.tomo_an.calibrate_measurement_operator(
+            [1, 0.4, -0.3, -1])
+        self.bell = qt.ket2dm(
+            (qt.tensor(qt.basis(2, 0), qt.basis(2, 0)) +
+             qt.tensor(qt.basis(2, 1), qt.basis(2, 1))).unit())
+        self.meas_tomo = np.array(
+            [(Mi * self.bell).tr().real
+             for Mi in self.tomo_an.get_measurement_vector(self.M)])
+
+    def test_batch_equals_single(self):
+        data = tomo.resample_tomo_data(self.meas_tomo, 0.02, n_resamples=5)
+        result = self.tomo_an.execute_pseudo_inverse_tomo_batch(
+            self.M, data, project_physical=False)
+        for i in range(5):
+            _, rho = self.tomo_an.execute_pseudo_inverse_tomo(self.M, data[i])
+            np.testing.assert_almost_equal(result['rhos'][i], rho.full())
+
+    def test_fidelity_and_purity(self):
+        result = self.tomo_an.execute_pseudo_inverse_tomo_batch(
+            self.M, self.meas_tomo, target_rho=self.bell)
+        np.testing.assert_almost_equal(result['fidelities'], [1])
+        np.testing.assert_almost_equal(result['purities'], [1])
+
+        data = tomo.resample_tomo_data(self.meas_tomo, 0.05,
+                                       n_resamples=500)
+        result = self.tomo_an.execute_pseudo_inverse_tomo_batch(
+            self.M, data, target_rho=self.bell)
+        assert result['rhos'].shape == (500, 4, 4)
+        assert np.all(result['fidelities'] <= 1 + 1e-9)
+        # projected states are physical
+        assert np.min(np.linalg.eigvalsh(result['rhos'])) > -1e-9
+        np.testing.assert_almost_equal(
+            np.trace(result['rhos'], axis1=1, axis2=2), np.ones(500))
+
+    def test_pseudo_inverse_cached(self):
+        self.tomo_an.execute_pseudo_inverse_tomo(self.M, self.meas_tomo)
+        nr_cached = len(self.tomo_an._LI_pinv_cache)
+        self.tomo_an.execute_pseudo_inverse_tomo_batch(self.M, self.meas_tomo)
+        assert len(self.tomo_an._LI_pinv_cache) == nr_cached
@@ -0,0 +1,247 @@
+import time
+import threading
+import unittest
+from functools import partial
+
+import pycqed.instrument_drivers.meta_instrument.qubit_objects.mock_CCL_Transmon as ct
+from pycqed.instrument_drivers.meta_instrument import calibration_scheduler as cs
+# autodepgraph imports qcodes, which has to be imported after pycqed
+from autodepgraph import AutoDepGraph_DAG
+
+
+# (node, dependencies) of the calibration graph of every qubit
+QUBIT_NODES = [
+    ('Frequency Coarse', []),
+    ('Rabi', ['Frequency Coarse']),
+    ('Frequency Fine', ['Rabi']),
+    ('Flipping', ['Frequency Fine']),
+    ('MOTZOI Calibration', ['Flipping']),
+    ('ALLXY', ['MOTZOI Calibration', 'Frequency Fine']),
+    ('SSRO Coarse tune-up', ['Rabi']),
+    ('SSRO Optimization', ['SSRO Coarse tune-up']),
+    ('T1', ['Frequency Fine']),
+    ('T2_Echo', ['Frequency Fine']),
+]
+
+
+class Test_CalibrationScheduler(unittest.TestCase):
+
+    nr_qubits = 7
+    # Surface-7 like layout with 3 feedlines
+    feedlines = [0, 0, 1, 1, 1, 2, 2]
+    node_duration = 0.02
+
+    @classmethod
+    def setUpClass(self):
+        self.qubits = []
+        for i in range(self.nr_qubits):
+            qubit = ct.Mock_CCLight_Transmon('sched_q{}'.format(i))
+            # all qubits share the MC, as on a real setup
+            qubit.instr_MC('MC')
+            qubit.instr_CC('CC')
+            qubit.instr_LO_mw('MW_LO_{}'.format(i))
+            qubit.instr_spec_source('spec_source_{}'.format(i))
+            qubit.instr_acquisition('UHFQC_{}'.format(self.feedlines[i]))
+            qubit.instr_LutMan_RO('RO_lutman_{}'.format(self.feedlines[i]))
+            qubit.instr_LutMan_MW('MW_lutman_{}'.format(i))
+            qubit.instr_FluxCtrl('fluxcurrent')
+            qubit.fl_dc_ch('FBL_{}'.format(i))
+            self.qubits.append(qubit)
+
+    @classmethod
+    def tearDownClass(self):
+        for qubit in self.qubits:
+            qubit.close()
+
+    def setUp(self):
+        # the calibrations run multiplexed through the CC
+        self.capacity = {'CC': 8}
+        self.log = []
+        self.checks = []
+        self.log_lock = threading.Lock()
+        self.failures = {}
+        self.check_results = {}
+        # stand-ins for MeasurementControl instruments
+        self.MCs = ['sched_MC_{}'.format(i) for i in range(8)]
+
+    def mock_calibration(self, node, MC=None):
+        t0 = time.perf_counter()
+        time.sleep(self.node_duration)
+        with self.log_lock:
+            self.log.append((node, t0, time.perf_counter(), MC))
+            if self.failures.get(node, 0):
+                self.failures[node] -= 1
+                return False
+        return True
+
+    def mock_check(self, node, MC=None):
+        with self.log_lock:
+            self.checks.append(node)
+        return self.check_results.get(node, 1.0)
+
+    def mk_scheduler(self, **kw):
+        kw.setdefault('measurement_controls', self.MCs)
+        kw.setdefault('resource_capacity', self.capacity)
+        dag = AutoDepGraph_DAG('sched_DAG', cfg_plot_mode=None)
+        dag.add_node('All Qubits at Sweetspot',
+                     calibrate_function=partial(
+                         self.mock_calibration, 'All Qubits at Sweetspot'))
+        for qubit in self.qubits:
+            for node, deps in QUBIT_NODES:
+                name = qubit.name + ' ' + node
+                dag.add_node(name, tolerance=0.1,
+                             calibrate_function=partial(
+                                 self.mock_calibration, name),
+                             check_function=partial(self.mock_check, name))
+                for dep in deps:
+                    dag.add_edge(name, qubit.name + ' ' + dep)
+            dag.add_edge(qubit.name + ' Frequency Coarse',
+                         'All Qubits at Sweetspot')
+
+        scheduler = cs.CalibrationScheduler(dag, **kw)
+        for qubit in self.qubits:
+            scheduler.annotate_qubit_resources(qubit)
+        return scheduler
+
+    def assert_no_resource_conflicts(self, scheduler):
+        graph = scheduler.graph
+        events = sorted([(t0, 1, node) for node, t0, _, _ in self.log] +
+                        [(t1, -1, node) for node, _, t1, _ in self.log])
+        in_use = {}
+        for _, sign, node in events:
+            resources = graph.nodes[node].get('resources', None)
+            for res in (['all'] if resources is None else resources):
+                in_use[res] = in_use.get(res, 0) + sign
+                self.assertLessEqual(
+                    in_use[res], scheduler.resource_capacity.get(res, 1))
+            if resources is None and sign == 1:
+                self.assertEqual(sum(in_use.values()), 1)
+
+        # every running node uses its own MC
+        for i, (_, t0, t1, MC) in enumerate(self.log):
+            self.assertIn(MC, self.MCs)
+            for _, t0_other, t1_other, MC_other in self.log[i+1:]:
+                if t0 < t1_other and t0_other < t1:
+                    self.assertNotEqual(MC, MC_other)
+
+    def test_qubit_resources(self):
+        # the shared MC is not a resource
+        self.assertEqual(cs.qubit_resources(self.qubits[2]),
+                         {'CC', 'UHFQC_1', 'RO_lutman_1', 'MW_lutman_2',
+                          'MW_LO_2', 'spec_source_2', 'fluxcurrent.FBL_2'})
+
+    def test_topological_order(self):
+        scheduler = self.mk_scheduler()
+        order = scheduler.topological_order()
+        self.assertEqual(len(order), 1 + self.nr_qubits*len(QUBIT_NODES))
+        for node in order:
+            for dep in scheduler.dependencies(node):
+                self.assertLess(order.index(dep), order.index(node))
+
+    def test_parallel_speedup_7_qubits(self):
+        result_serial = self.mk_scheduler(max_workers=1).run()
+        scheduler = self.mk_scheduler(max_workers=8)
+        self.log = []
+        result = scheduler.run()
+
+        nr_nodes = 1 + self.nr_qubits*len(QUBIT_NODES)
+        for res in [result_serial, result]:
+            self.assertEqual(len(res['succeeded']), nr_nodes)
+            self.assertEqual(res['failed'], [])
+            self.assertEqual(res['skipped'], [])
+        for node in result['order']:
+            self.assertEqual(scheduler.graph.nodes[node]['state'], 'good')
+            for dep in scheduler.dependencies(node):
+                self.assertLess(result['order'].index(dep),
+                                result['order'].index(node))
+        self.assert_no_resource_conflicts(scheduler)
+
+        # limited by the 3 feedlines
+        assert result_serial['wall_time'] / result['wall_time'] > 2
+
+        # multiplexed readout on the feedlines
+        capacity = {res: 3 for i in range(3) for res in
+                    ['UHFQC_{}'.format(i), 'RO_lutman_{}'.format(i)]}
+        capacity.update(self.capacity)
+        scheduler = self.mk_scheduler(max_workers=8,
+                                      resource_capacity=capacity)
+        self.log = []
+        result_mux = scheduler.run()
+        self.assert_no_resource_conflicts(scheduler)
+        assert result_mux['wall_time'] < result['wall_time']
+
+        # the number of nodes running at once is limited by the MCs
+        self.log = []
+        self.mk_scheduler(measurement_controls=self.MCs[:1]).run()
+        self.assert_no_resource_conflicts(scheduler)
+        for (_, _, t1, _), (_, t0, _, _) in zip(self.log[:-1], self.log[1:]):
+            assert t1 <= t0
+
+    def test_shared_CC(self):
+        # without multiplexing, the shared CC runs one node at a time
+        scheduler = self.mk_scheduler(max_workers=8, resource_capacity={})
+        scheduler.run()
+        self.assert_no_resource_conflicts(scheduler)
+        log = sorted(self.log, key=lambda entry: entry[1])
+        for (_, _, t1, _), (_, t0, _, _) in zip(log[:-1], log[1:]):
+            assert t1 <= t0
+
+    def test_good_nodes_and_checks(self):
+        q0, q1 = self.qubits[0].name, self.qubits[1].name
+        scheduler = self.mk_scheduler()
+        graph = scheduler.graph
+        # e.g. calibrated in a previous run
+        for node in graph.nodes:
+            if not node.startswith(q0 + ' ') and \
+                    not node.startswith(q1 + ' '):
+                graph.set_node_state(node, 'good', update_monitor=False)
+        # passes the check, is not calibrated
+        self.check_results[q0 + ' Rabi'] = 0.05
+        # known to need calibration, is not checked
+        graph.set_node_state(q1 + ' T1', 'needs calibration',
+                             update_monitor=False)
+
+        result = scheduler.run()
+        nodes_q01 = {q + ' ' + node for q in [q0, q1]
+                     for node, _ in QUBIT_NODES}
+        self.assertEqual(set(result['order']), nodes_q01)
+        self.assertEqual(len(result['up_to_date']),
+                         len(graph.nodes) - len(nodes_q01))
+        self.assertEqual(result['failed'], [])
+        for node in graph.nodes:
+            self.assertEqual(graph.nodes[node]['state'], 'good')
+
+        calibrated = {node for node, _, _, _ in self.log}
+        self.assertEqual(calibrated, nodes_q01 - {q0 + ' Rabi'})
+        self.assertEqual(set(self.checks), nodes_q01 - {q1 + ' T1'})
+
+        # all nodes are good, nothing is executed
+        self.log = []
+        result = scheduler.run()
+        self.assertEqual(result['order'], [])
+        self.assertEqual(self.log, [])
+
+    def test_replan_on_failure(self):
+        q0, q3 = self.qubits[0].name, self.qubits[3].name
+        # fails once, is retried after re-running its dependencies
+        self.failures[q0 + ' Flipping'] = 1
+        # keeps failing, the nodes depending on it are skipped
+        self.failures[q3 + ' Rabi'] = 10
+        scheduler = self.mk_scheduler(retries=1)
+        result = scheduler.run()
+
+        self.assertIn(q0 + ' ALLXY', result['succeeded'])
+        self.assertEqual(result['order'].count(q0 + ' Flipping'), 2)
+        self.assertEqual(result['order'].count(q0 + ' Frequency Fine'), 2)
+        # the dependencies are checked again, the failed node is not
+        self.assertEqual(self.checks.count(q0 + ' Frequency Fine'), 2)
+        self.assertEqual(self.checks.count(q0 + ' Flipping'), 1)
+
+        self.assertEqual(result['failed'], [q3 + ' Rabi'])
+        self.assertEqual(scheduler.graph.nodes[q3 + ' Rabi']['state'], 'bad')
+        self.assertEqual(
+            set(result['skipped']),
+            {q3 + ' ' + node for node, _ in QUBIT_NODES[2:]})
+        self.assertEqual(len(result['succeeded']),
+                         1 + self.nr_qubits*len(QUBIT_NODES) - 9)
+        self.assert_no_resource_conflicts(scheduler)
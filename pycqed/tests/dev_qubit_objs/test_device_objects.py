@@ -72,6 +72,7 @@ class Test_Device_obj(unittest.TestCase):
         self.MC = measurement_control.MeasurementControl(
             'MC', live_plot_enabled=False, verbose=False)
         self.MC.station = self.station
+        self.MC.update_snapshot_index(False)
         self.station.add_component(self.MC)
 
         # Required to set it to the testing datadir
@@ -520,6 +521,44 @@ class Test_Device_obj(unittest.TestCase):
     def test_prepare_readout_mixer_settings(self):
         pass
 
+    def test_prepare_for_timedomain_skip_unchanged(self):
+        self.device.instr_CC(self.CCL.name)
+        qubits = ['q2', 'q3']
+        tracker = self.device.prepare_tracker
+
+        def ran_stages():
+            return {e['stage'] for e in tracker.report if e['ran']}
+
+        # Skipping stages is opt-in
+        self.device.prepare_for_timedomain(qubits=qubits)
+        self.device.prepare_for_timedomain(qubits=qubits)
+        assert all(e['ran'] for e in tracker.report)
+
+        self.device.cfg_prepare_skip_unchanged(True)
+        try:
+            self.device.prepare_for_timedomain(qubits=qubits)
+            self.device.prepare_for_timedomain(qubits=qubits)
+            assert ran_stages() == set()
+
+            # e.g. another client writing to the UHFQC of the feedline
+            uhf = self.device.find_instrument('UHFQC_2')
+            uhf.qas_0_correlations_5_enable(1)
+            self.device.prepare_for_timedomain(qubits=qubits)
+            assert ran_stages() == {'readout'}
+            assert uhf.qas_0_correlations_5_enable() == 0
+
+            # the MW AWG is shared by the qubits and used in the timing stage
+            self.AWG_mw_0.sigouts_7_offset(0.1)
+            self.device.prepare_for_timedomain(qubits=qubits)
+            assert ran_stages() == {'timing', 'mw_pulses_q2', 'mw_pulses_q3'}
+
+            self.device.prepare_for_timedomain(qubits=qubits)
+            assert ran_stages() == set()
+            self.device.prepare_for_timedomain(qubits=qubits, force=True)
+            assert all(e['ran'] for e in tracker.report)
+        finally:
+            self.device.cfg_prepare_skip_unchanged(False)
+
     @classmethod
     def tearDownClass(self):
         for instr_name in list(self.device._all_instruments):
@@ -65,6 +65,7 @@ class Test_Mock_CCL(unittest.TestCase):
         self.MC = measurement_control.MeasurementControl(
             'MC', live_plot_enabled=False, verbose=False)
         self.MC.station = self.station
+        self.MC.update_snapshot_index(False)
         self.station.add_component(self.MC)
 
         # Required to set it to the testing datadir
@@ -514,6 +514,7 @@ class TestMultiQubitFluxLutMan:
 
         self.MC = mc.MeasurementControl('MC', live_plot_enabled=False)
         self.MC.station = self.station
+        self.MC.update_snapshot_index(False)
         # Ensures datadir of experiment and analysis are identical
         self.MC.datadir(a_tools.datadir)
 
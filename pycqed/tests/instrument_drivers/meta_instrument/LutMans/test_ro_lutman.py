@@ -5,7 +5,8 @@ import numpy
 
 import pycqed.instrument_drivers.physical_instruments.ZurichInstruments.ZI_base_instrument as zibi
 import pycqed.instrument_drivers.physical_instruments.ZurichInstruments.UHFQuantumController as UHF
-from pycqed.instrument_drivers.meta_instrument.LutMans.ro_lutman import UHFQC_RO_LutMan
+from pycqed.instrument_drivers.meta_instrument.LutMans.ro_lutman import \
+    UHFQC_RO_LutMan, sum_waves_different_length, add_waves_different_length
 
 
 class Test_ro_lutman(unittest.TestCase):
@@ -22,3 +23,41 @@ class Test_ro_lutman(unittest.TestCase):
 
     def test_ro_lutman(self):
         pass
+
+    def test_resonator_waveform_cache(self):
+        # e.g. R0 and R2 on feedline 0
+        res_a, res_b = self.ro_lutman._resonator_codeword_bit_mapping[:2]
+        wf_a = 'M_simple_R{}'.format(res_a)
+        wf_b = 'M_simple_R{}'.format(res_b)
+        amp_b = self.ro_lutman.parameters['M_amp_R{}'.format(res_b)]
+
+        wave_dict = self.ro_lutman.generate_standard_waveforms()
+        M_a = wave_dict[wf_a]
+        M_b = wave_dict[wf_b]
+
+        # Unchanged resonators are not regenerated
+        amp_b(amp_b()/2)
+        wave_dict = self.ro_lutman.generate_standard_waveforms()
+        assert wave_dict[wf_a] is M_a
+        assert wave_dict[wf_b] is not M_b
+        numpy.testing.assert_allclose(wave_dict[wf_b], numpy.array(M_b)/2)
+
+        # Global parameters affect all resonators
+        self.ro_lutman.mixer_phi(self.ro_lutman.mixer_phi() + 10)
+        wave_dict = self.ro_lutman.generate_standard_waveforms()
+        assert wave_dict[wf_a] is not M_a
+
+    def test_sum_waves_different_length(self):
+        waves = [(numpy.ones(10), -numpy.ones(10)),
+                 (numpy.arange(25.), numpy.arange(25.)),
+                 (numpy.ones(3), numpy.zeros(3))]
+        I_wave, Q_wave = sum_waves_different_length(waves)
+        I_ref, Q_ref = numpy.array([]), numpy.array([])
+        for I, Q in waves:
+            I_ref = add_waves_different_length(I_ref, I)
+            Q_ref = add_waves_different_length(Q_ref, Q)
+        numpy.testing.assert_allclose(I_wave, I_ref)
+        numpy.testing.assert_allclose(Q_wave, Q_ref)
+
+        I_wave, Q_wave = sum_waves_different_length([])
+        assert len(I_wave) == 0 and len(Q_wave) == 0
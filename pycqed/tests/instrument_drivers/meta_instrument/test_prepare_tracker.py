@@ -0,0 +1,151 @@
+import unittest
+import numpy as np
+
+from qcodes.instrument.base import Instrument
+from qcodes.instrument.parameter import ManualParameter
+from pycqed.instrument_drivers.meta_instrument.prepare_tracker import \
+    PrepareTracker, instrument_fingerprint
+
+
+class DummyPrepInstrument(Instrument):
+    def __init__(self, name, **kw):
+        super().__init__(name, **kw)
+        self.add_parameter('amp', initial_value=0.5,
+                           parameter_class=ManualParameter)
+        self.add_parameter('waveform', initial_value=np.zeros(4096),
+                           parameter_class=ManualParameter)
+        # e.g. an instrument node that was never read
+        self.nr_reads = 0
+        self.add_parameter('node', get_cmd=self._get_node, set_cmd=None)
+
+    def _get_node(self):
+        self.nr_reads += 1
+        return 0
+
+
+class Test_PrepareTracker(unittest.TestCase):
+    @classmethod
+    def setUpClass(self):
+        self.instr_a = DummyPrepInstrument('prep_instr_a')
+        self.instr_b = DummyPrepInstrument('prep_instr_b')
+
+    @classmethod
+    def tearDownClass(self):
+        self.instr_a.close()
+        self.instr_b.close()
+
+    def setUp(self):
+        self.tracker = PrepareTracker()
+        self.nr_calls = 0
+
+    def _stage(self, **kw):
+        self.nr_calls += 1
+
+    def test_skips_unchanged_stage(self):
+        for i in range(3):
+            self.tracker.run_stage('stage', self._stage,
+                                   instruments=[self.instr_a])
+        assert self.nr_calls == 1
+        assert [e['ran'] for e in self.tracker.report] == [True, False, False]
+
+    def test_reruns_on_changed_parameter(self):
+        self.tracker.run_stage('stage', self._stage,
+                               instruments=[self.instr_a, self.instr_b])
+        self.instr_b.amp(0.3)
+        self.tracker.run_stage('stage', self._stage,
+                               instruments=[self.instr_a, self.instr_b])
+        assert self.nr_calls == 2
+
+        # Changes beyond the truncated str representation of an array
+        wf = self.instr_a.waveform().copy()
+        wf[2000] = 1
+        self.instr_a.waveform(wf)
+        self.tracker.run_stage('stage', self._stage,
+                               instruments=[self.instr_a, self.instr_b])
+        assert self.nr_calls == 3
+
+    def test_reruns_on_changed_kwargs(self):
+        self.tracker.run_stage('stage', self._stage,
+                               instruments=[self.instr_a], qubits=['q0'])
+        self.tracker.run_stage('stage', self._stage,
+                               instruments=[self.instr_a], qubits=['q1'])
+        assert self.nr_calls == 2
+
+    def test_force_and_invalidate(self):
+        self.tracker.run_stage('stage', self._stage,
+                               instruments=[self.instr_a])
+        self.tracker.run_stage('stage', self._stage,
+                               instruments=[self.instr_a], force=True)
+        assert self.nr_calls == 2
+        self.tracker.invalidate('stage')
+        self.tracker.run_stage('stage', self._stage,
+                               instruments=[self.instr_a])
+        assert self.nr_calls == 3
+
+    def test_failed_stage_is_rerun(self):
+        def failing_stage():
+            raise RuntimeError('Upload failed')
+
+        with self.assertRaises(RuntimeError):
+            self.tracker.run_stage('stage', failing_stage,
+                                   instruments=[self.instr_a])
+        self.tracker.run_stage('stage', self._stage,
+                               instruments=[self.instr_a])
+        assert self.nr_calls == 1
+
+    def test_fingerprint_records_stage_side_effects(self):
+        def stage_setting_amp():
+            self.nr_calls += 1
+            self.instr_a.amp(0.9)
+
+        self.tracker.run_stage('stage', stage_setting_amp,
+                               instruments=[self.instr_a])
+        self.tracker.run_stage('stage', stage_setting_amp,
+                               instruments=[self.instr_a])
+        assert self.nr_calls == 1
+
+    def test_sequence_records_fingerprints_at_end(self):
+        def stage_a():
+            self.nr_calls += 1
+            self.instr_a.amp(0.1)
+
+        def stage_b():
+            # writes to the instrument of stage_a
+            self.instr_a.amp(0.2)
+
+        for i in range(2):
+            with self.tracker.sequence():
+                self.tracker.run_stage('a', stage_a,
+                                       instruments=[self.instr_a])
+                self.tracker.run_stage('b', stage_b,
+                                       instruments=[self.instr_a])
+        assert self.nr_calls == 1
+
+        with self.assertRaises(RuntimeError):
+            with self.tracker.sequence():
+                self.tracker.run_stage('a', stage_a, force=True,
+                                       instruments=[self.instr_a])
+                raise RuntimeError('Upload failed')
+        self.tracker.run_stage('a', stage_a, instruments=[self.instr_a])
+        assert self.nr_calls == 3
+
+    def test_no_instrument_communication(self):
+        self.instr_a.nr_reads = 0
+        for i in range(2):
+            self.tracker.run_stage('stage', self._stage,
+                                   instruments=[self.instr_a])
+        assert self.nr_calls == 1
+        assert self.instr_a.nr_reads == 0
+
+    def test_record_disabled(self):
+        for i in range(2):
+            self.tracker.run_stage('stage', self._stage, record=False,
+                                   instruments=[self.instr_a])
+        assert self.nr_calls == 2
+        assert self.tracker._fingerprints == {}
+
+    def test_instrument_fingerprint(self):
+        fp = instrument_fingerprint(self.instr_a)
+        assert fp == instrument_fingerprint(self.instr_a)
+        self.instr_a.amp(self.instr_a.amp() + 0.1)
+        assert fp != instrument_fingerprint(self.instr_a)
@@ -161,6 +161,152 @@ class Test_UHFQC(unittest.TestCase):
         assert self.uhf.qas_0_rotations_3() == (1-1j)
         self.uhf.reset_rotation_params
 
+    def test_batch_single_round_trip(self):
+        daq = self.uhf.daq
+
+        daq.reset_round_trip_count()
+        self.uhf.reset_correlation_params()
+        # 40 node writes followed by a single sync
+        assert daq.get_round_trip_count() == 2
+
+        daq.reset_round_trip_count()
+        with self.uhf.batch():
+            self.uhf.qas_0_correlations_5_enable(1)
+            self.uhf.setd('qas/0/thresholds/5/level', 0.5)
+            # Nested batches are only sent by the outermost batch
+            self.uhf.reset_rotation_params()
+            assert daq.get_round_trip_count() == 0
+        assert daq.get_round_trip_count() == 2
+
+        assert self.uhf.qas_0_correlations_5_enable() == 1
+        assert self.uhf.getd('qas/0/thresholds/5/level') == 0.5
+        assert self.uhf.qas_0_rotations_9() == (1+1j)
+
+    def test_batch_discarded_on_exception(self):
+        self.uhf.qas_0_correlations_7_source(0)
+        with self.assertRaises(ValueError):
+            with self.uhf.batch():
+                self.uhf.seti('qas/0/correlations/7/source', 2)
+                raise ValueError('Abort transaction')
+        assert self.uhf.geti('qas/0/correlations/7/source') == 0
+        assert self.uhf._batch_settings == []
+
+    def test_get_many(self):
+        daq = self.uhf.daq
+        self.uhf.qas_0_result_length(123)
+        self.uhf.qas_0_thresholds_2_level(0.25)
+
+        daq.reset_round_trip_count()
+        values = self.uhf.get_many(
+            ['qas/0/result/length', 'qas/0/thresholds/2/level'])
+        assert daq.get_round_trip_count() == 1
+        assert values['qas/0/result/length'] == 123
+        assert values['qas/0/thresholds/2/level'] == 0.25
+
+    def test_load_default_settings_batched(self):
+        daq = self.uhf.daq
+        daq.reset_round_trip_count()
+        self.uhf.load_default_settings(upload_sequence=False)
+        assert daq.get_round_trip_count() == 2
+        assert self.uhf.qas_0_result_length() == 1000
+
+    def test_gen_SSB_integration_weights(self):
+        IFs = [-50e6, 20e6, 133e6]
+        cos, sin = UHF.gen_SSB_integration_weights(
+            IFs, rotation_angles=[0, 0.3, 1], lengths=[1e-6, 4e-6, 2e-6])
+        assert cos.shape == (3, 4096)
+        tbase = np.arange(4096)/1.8e9
+        assert np.allclose(cos[1, :], np.cos(2*np.pi*20e6*tbase + 0.3))
+        assert np.allclose(sin[2, :3600], np.sin(2*np.pi*133e6*tbase[:3600] + 1))
+        # samples beyond the integration length are 0
+        assert np.all(cos[0, 1800:] == 0)
+        assert np.all(sin[2, 3600:] == 0)
+
+    def test_prepare_SSB_weights_and_rotations(self):
+        IFs = [-50e6, 20e6, 133e6]
+        self.uhf.prepare_SSB_weights_and_rotations(
+            IFs, weight_functions_I=[0, 2, 4], weight_functions_Q=[1, 3, 5],
+            force_upload=True)
+        w2_real = self.uhf.qas_0_integration_weights_2_real()
+        w3_imag = self.uhf.qas_0_integration_weights_3_imag()
+
+        self.uhf.prepare_SSB_weight_and_rotation(
+            20e6, weight_function_I=6, weight_function_Q=7)
+        assert np.allclose(w2_real,
+                           self.uhf.qas_0_integration_weights_6_real())
+        assert np.allclose(w3_imag,
+                           self.uhf.qas_0_integration_weights_7_imag())
+        assert self.uhf.qas_0_rotations_2() == (1+1j)
+        assert self.uhf.qas_0_rotations_3() == (1-1j)
+
+    def test_upload_integration_weights_cached(self):
+        daq = self.uhf.daq
+        IFs = [-50e6, 20e6]
+        updated = self.uhf.prepare_SSB_weights_and_rotations(
+            IFs, weight_functions_I=[0, 2], weight_functions_Q=[1, 3],
+            force_upload=True)
+        assert updated == [0, 2, 1, 3]
+
+        # Unchanged weights are not uploaded again
+        daq.reset_round_trip_count()
+        updated = self.uhf.prepare_SSB_weights_and_rotations(
+            IFs, weight_functions_I=[0, 2], weight_functions_Q=[1, 3])
+        assert updated == []
+        assert daq.get_round_trip_count() == 0
+
+        # Only the weights of the changed resonator are uploaded
+        updated = self.uhf.prepare_SSB_weights_and_rotations(
+            [-50e6, 25e6], weight_functions_I=[0, 2],
+            weight_functions_Q=[1, 3])
+        assert updated == [2, 3]
+
+        # The cache is not trusted after it is invalidated, e.g., by a reset
+        self.uhf.invalidate_integration_weights_cache()
+        updated = self.uhf.prepare_SSB_weights_and_rotations(
+            [-50e6, 25e6], weight_functions_I=[0, 2],
+            weight_functions_Q=[1, 3])
+        assert updated == [0, 2, 1, 3]
+
+    def test_upload_integration_weights_discarded_batch(self):
+        IFs = [-50e6, 20e6]
+        self.uhf.prepare_SSB_weights_and_rotations(
+            IFs, weight_functions_I=[0, 2], weight_functions_Q=[1, 3],
+            force_upload=True)
+
+        # The parameter cache holds the new weights, but they never reach
+        # the instrument
+        with self.assertRaises(RuntimeError):
+            with self.uhf.batch():
+                self.uhf.prepare_SSB_weights_and_rotations(
+                    [-50e6, 25e6], weight_functions_I=[0, 2],
+                    weight_functions_Q=[1, 3])
+                raise RuntimeError('Aborted')
+        updated = self.uhf.prepare_SSB_weights_and_rotations(
+            [-50e6, 25e6], weight_functions_I=[0, 2],
+            weight_functions_Q=[1, 3])
+        assert updated == [2, 3]
+
+    def test_prepare_SSB_weight_and_rotation_uploads(self):
+        daq = self.uhf.daq
+        self.uhf.prepare_SSB_weight_and_rotation(
+            20e6, weight_function_I=4, weight_function_Q=5)
+        # The single channel API always uploads
+        daq.reset_round_trip_count()
+        self.uhf.prepare_SSB_weight_and_rotation(
+            20e6, weight_function_I=4, weight_function_Q=5)
+        assert daq.get_round_trip_count() > 0
+
+    def test_prepare_SSB_weights_without_Q(self):
+        updated = self.uhf.prepare_SSB_weights_and_rotations(
+            [-50e6, 20e6], weight_functions_I=[0, 2],
+            weight_functions_Q=[1, None], force_upload=True)
+        assert updated == [0, 2, 1]
+
+        self.uhf.prepare_SSB_weight_and_rotation(
+            -50e6, weight_function_I=6, weight_function_Q=7)
+        assert np.allclose(self.uhf.qas_0_integration_weights_1_real(),
+                           self.uhf.qas_0_integration_weights_7_real())
+
     def test_close_open(self):
         # Close the instrument, then reopen to make sure that we can reconnect
         Test_UHFQC.uhf.close()
@@ -0,0 +1,85 @@
+import time
+import unittest
+from qcodes.instrument.base import Instrument
+from qcodes.instrument.parameter import ManualParameter
+from pycqed.instrument_drivers.virtual_instruments.ins_mon import \
+    snapshot_diff as sd
+
+
+class Test_IncrementalSnapshotter(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        # 50 dummy instruments x 200 parameters
+        self.instruments = {}
+        for i in range(50):
+            ins = Instrument('snapshot_diff_ins_{}'.format(i))
+            for j in range(200):
+                ins.add_parameter('par_{}'.format(j), unit='V',
+                                  initial_value=0.,
+                                  parameter_class=ManualParameter)
+            self.instruments[ins.name] = ins
+
+    @classmethod
+    def tearDownClass(self):
+        for ins in self.instruments.values():
+            ins.close()
+
+    def setUp(self):
+        self.snapshotter = sd.IncrementalSnapshotter(
+            lambda: self.instruments, default_interval=0)
+        self.snapshotter.refresh()
+        self.snapshotter.get_delta()
+
+    def test_only_changed_parameters_refreshed(self):
+        # a full refresh pushes all parameters to the widget
+        full = sd.flatten_snapshot(
+            {name: ins.snapshot(update=False)
+             for name, ins in self.instruments.items()})
+        assert len(full) >= 50*200
+
+        assert self.snapshotter.refresh() == 0
+        assert self.snapshotter.get_delta() == {}
+
+        changed = ['snapshot_diff_ins_{}'.format(i) for i in range(0, 50, 5)]
+        for name in changed:
+            self.instruments[name].par_3(1.)
+        assert self.snapshotter.refresh() == 10
+        delta = self.snapshotter.get_delta()
+
+        assert sorted(delta) == sorted(changed)
+        for name in changed:
+            assert list(delta[name]['parameters']) == ['par_3']
+            assert delta[name]['parameters']['par_3']['value'] == 1.
+
+    def test_max_parameters(self):
+        self.snapshotter.max_parameters = 4
+        ins = self.instruments['snapshot_diff_ins_1']
+        for j in range(10):
+            ins.parameters['par_{}'.format(j)](2.)
+        assert [self.snapshotter.refresh() for i in range(4)] == [4, 4, 2, 0]
+        delta = self.snapshotter.get_delta()
+        assert sorted(delta['snapshot_diff_ins_1']['parameters']) == \
+            sorted('par_{}'.format(j) for j in range(10))
+
+    def test_refresh_intervals(self):
+        self.snapshotter.refresh_intervals = {'snapshot_diff_ins_2': 1e3}
+        self.instruments['snapshot_diff_ins_2'].par_0(3.)
+        self.instruments['snapshot_diff_ins_3'].par_0(3.)
+        assert self.snapshotter.refresh() == 1
+        assert list(self.snapshotter.get_delta()) == ['snapshot_diff_ins_3']
+
+    def test_background_thread(self):
+        self.snapshotter.start(poll_interval=0.01)
+        try:
+            self.instruments['snapshot_diff_ins_4'].par_7(4.)
+            t0 = time.time()
+            delta = {}
+            while not delta and time.time() - t0 < 10:
+                time.sleep(0.01)
+                delta = self.snapshotter.get_delta()
+        finally:
+            self.snapshotter.stop()
+        assert not self.snapshotter.is_running()
+        assert delta['snapshot_diff_ins_4']['parameters']['par_7'][
+            'value'] == 4.
@@ -1,4 +1,5 @@
 import os
+import time
 import pycqed as pq
 import unittest
 import numpy as np
@@ -17,6 +18,7 @@ from pycqed.instrument_drivers.physical_instruments.dummy_instruments import (
 from pycqed.measurement.optimization import nelder_mead, SPSA
 from pycqed.utilities.learner1D_minimizer import (Learner1D_Minimizer,
     mk_minimization_loss_func, mk_minimization_goal_func)
+from pycqed.utilities import learnerND_minimizer as lndm
 from pycqed.analysis import measurement_analysis as ma
 from pycqed.utilities.get_default_datadir import get_default_datadir
 from pycqed.measurement.hdf5_data import read_dict_from_hdf5
@@ -24,6 +26,24 @@ from qcodes.instrument.parameter import ManualParameter
 from qcodes import station
 
 
+class Point_By_Point_Detector(det.Soft_Detector):
+    """
+    Acquires a hard detector at the value of a parameter, one point per
+    acquisition.
+    """
+
+    def __init__(self, par, hard_det, **kw):
+        super().__init__(**kw)
+        self.par = par
+        self.hard_det = hard_det
+        self.value_names = hard_det.value_names
+        self.value_units = hard_det.value_units
+
+    def acquire_data_point(self, **kw):
+        self.hard_det.prepare(sweep_points=np.array([self.par()]))
+        return self.hard_det.get_values()[:, 0]
+
+
 class Test_MeasurementControl(unittest.TestCase):
     @classmethod
     def setUpClass(self):
@@ -32,6 +52,7 @@ class Test_MeasurementControl(unittest.TestCase):
             "MC", live_plot_enabled=True, verbose=True
         )
         self.MC.station = self.station
+        self.MC.update_snapshot_index(False)
         self.station.add_component(self.MC)
 
         self.mock_parabola = DummyParHolder("mock_parabola")
@@ -161,6 +182,22 @@ class Test_MeasurementControl(unittest.TestCase):
         d = self.MC.detector_function
         self.assertEqual(d.times_called, 1)
 
+    def test_hard_sweep_1D_decimated_plotmon(self):
+        # more points than plotting_max_pts are decimated for live plotting
+        sweep_pts = np.linspace(0, 10, 20000)
+        self.MC.set_sweep_function(None_Sweep(sweep_control="hard"))
+        self.MC.set_sweep_points(sweep_pts)
+        self.MC.set_detector_function(det.Dummy_Detector_Hard())
+        dat = self.MC.run("1D_hard_decimated")
+        dset = dat["dset"]
+        for i in range(2):
+            x = np.array(self.MC.curves[i]["config"]["x"])
+            y = np.array(self.MC.curves[i]["config"]["y"])
+            assert 0 < len(y) <= self.MC.plotting_max_pts()
+            assert x[0] == sweep_pts[0] and x[-1] == sweep_pts[-1]
+            self.assertEqual(np.max(y), np.max(dset[:, i + 1]))
+            self.assertEqual(np.min(y), np.min(dset[:, i + 1]))
+
     def test_soft_sweep_2D(self):
         sweep_pts = np.linspace(0, 10, 30)
         sweep_pts_2D = np.linspace(0, 10, 5)
@@ -185,6 +222,12 @@ class Test_MeasurementControl(unittest.TestCase):
         np.testing.assert_array_almost_equal(z0, z[0, :])
         np.testing.assert_array_almost_equal(z1, z[1, :])
 
+        # the 2D plotmon is filled from the plot buffer
+        for j in range(2):
+            z_plot = self.MC.secondary_QtPlot.traces[j]["config"]["z"]
+            np.testing.assert_array_almost_equal(
+                np.ravel(z_plot), z[j, :])
+
     def test_soft_sweep_2D_with_reading_of_set_parameter(self):
         sweep_pts = np.linspace(0, 10, 30)
         sweep_pts_2D = np.linspace(0, 10, 5)
@@ -677,6 +720,70 @@ class Test_MeasurementControl(unittest.TestCase):
         self.MC.set_detector_function(self.mock_parabola.parabola_float_int)
         dat = self.MC.run("1D adaptive plus 1D linear sweep test", mode="adaptive")
 
+    def test_adaptive_batched_hard_Learner1D_Minimizer(self):
+        """
+        Compares the time to convergence of the batched adaptive runner, that
+        measures 8 points per acquisition, with the serial runner.
+        """
+        self.MC.soft_avg(1)
+        hard_det = det.Dummy_Detector_Hard(noise=0.01, delay=0.02)
+        x_opt = -np.pi ** 2 / 2  # minimum of sin(x/pi)
+        af_pars = {
+            "adaptive_function": Learner1D_Minimizer,
+            "goal": lambda l: l.npoints >= 40,
+            "bounds": (-10.0, 0.0),
+            "loss_per_interval": mk_minimization_loss_func(),
+            "minimize": True,
+        }
+
+        self.MC.set_sweep_function(None_Sweep(sweep_control="hard"))
+        self.MC.set_adaptive_function_parameters(dict(af_pars, batch_size=8))
+        self.MC.set_detector_function(hard_det)
+        t0 = time.time()
+        dat = self.MC.run("1D adaptive batched", mode="adaptive")
+        t_batched = time.time() - t0
+        dset = dat["dset"]
+        self.assertGreaterEqual(len(dset), 40)
+        self.assertLessEqual(hard_det.times_called, 40 / 8 + 2)
+        x_best = dset[np.argmin(dset[:, 1]), 0]
+        self.assertAlmostEqual(x_best, x_opt, delta=0.75)
+
+        # the serial runner triggers the same detector point by point
+        serial_det = Point_By_Point_Detector(
+            self.mock_parabola.x, det.Dummy_Detector_Hard(noise=0.01, delay=0.02))
+        self.MC.set_sweep_function(self.mock_parabola.x)
+        self.MC.set_adaptive_function_parameters(dict(af_pars))
+        self.MC.set_detector_function(serial_det)
+        t0 = time.time()
+        dat = self.MC.run("1D adaptive serial", mode="adaptive")
+        t_serial = time.time() - t0
+        self.assertEqual(serial_det.hard_det.times_called, len(dat["dset"]))
+        self.assertLess(t_batched, t_serial)
+
+    def test_adaptive_batched_LearnerND_Minimizer(self):
+        # a soft detector, the batch is measured point by point
+        self.MC.soft_avg(1)
+        self.mock_parabola.noise(0.05)
+        self.MC.set_sweep_functions([self.mock_parabola.x, self.mock_parabola.y])
+        goal = lndm.mk_minimization_goal_func()
+        self.MC.set_adaptive_function_parameters(
+            {
+                "adaptive_function": lndm.LearnerND_Minimizer,
+                "goal": lambda l: goal(l) or l.npoints >= 60,
+                "bounds": ((-5.0, 5.0), (-5.0, 5.0)),
+                "loss_per_simplex": lndm.mk_minimization_loss_func(),
+                "batch_size": 6,
+            }
+        )
+        self.MC.set_detector_function(self.mock_parabola.parabola)
+        dat = self.MC.run("2D adaptive batched", mode="adaptive")
+        dset = dat["dset"]
+        self.assertGreaterEqual(len(dset), 60)
+        xf, yf, pf = dset[np.argmin(dset[:, 2])]
+        self.assertLess(abs(xf), 1)
+        self.assertLess(abs(yf), 1)
+        self.mock_parabola.noise(0)
+
     def test_plotmon_2D_monkey_patching(self):
         self.MC.soft_avg(1)
         self.mock_parabola.noise(0)
@@ -1,4 +1,6 @@
+import time
 import numpy as np
+import pytest
 
 from pycqed.simulations import chevron_sim as chs
 
@@ -34,3 +36,45 @@ class TestChevronSim:
                              self.time_step,
                              self.distortion)
         assert np.shape(result) == (len(self.freq_vec), len(self.time_vec)+1)
+
+    def test_vectorized_chevron_equals_chevron(self):
+        args = (2.*np.pi*(6.552 - 4.8), self.e_min, self.e_max,
+                self.e_points, np.pi*0.0385, self.time_stop, self.time_step)
+        result = chs.chevron(*args, self.distortion)
+        np.testing.assert_allclose(
+            chs.chevron_vectorized(*args, self.distortion), result,
+            rtol=0, atol=1e-12)
+
+        # distortion given as sampled array
+        sf_vec = self.distortion(chs._time_vec(self.time_stop,
+                                               self.time_step))
+        np.testing.assert_allclose(chs.chevron_vectorized(*args, sf_vec),
+                                   result, rtol=0, atol=1e-12)
+        with pytest.raises(ValueError):
+            chs.chevron_vectorized(*args, sf_vec[:-1])
+
+        slice_args = (2.*np.pi*(6.552 - 4.8), 1.01, np.pi*0.0385,
+                      self.time_stop, self.time_step, self.distortion)
+        np.testing.assert_allclose(
+            chs.chevron_slice_vectorized(*slice_args),
+            chs.chevron_slice(*slice_args), rtol=0, atol=1e-12)
+
+    def test_su2_propagators_equal_expm(self):
+        for e in [0., 0.3, -7.5, 120.]:
+            for g in [0., 0.1]:
+                a, b = chs.su2_propagators(e, g, 0.7)
+                np.testing.assert_allclose(
+                    [[a, b], [-np.conj(b), np.conj(a)]], chs.evol(e, g, 0.7),
+                    atol=1e-14)
+
+    def test_benchmark_chevron_101x500(self):
+        args = (2.*np.pi*(6.552 - 4.8), self.e_min, self.e_max, 101,
+                np.pi*0.0385, 500, 1)
+        t0 = time.perf_counter()
+        result = chs.chevron(*args, self.distortion)
+        t_loop = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        result_vec = chs.chevron_vectorized(*args, self.distortion)
+        t_vec = time.perf_counter() - t0
+        np.testing.assert_allclose(result_vec, result, rtol=0, atol=1e-12)
+        assert t_vec < t_loop
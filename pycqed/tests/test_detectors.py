@@ -18,6 +18,7 @@ class TestDetectors:
         cls.MC = measurement_control.MeasurementControl(
             'MC', live_plot_enabled=False, verbose=False)
         cls.MC.station = cls.station
+        cls.MC.update_snapshot_index(False)
         cls.station.add_component(cls.MC)
 
         cls.mock_parabola = DummyParHolder('mock_parabola')
@@ -1,4 +1,6 @@
 import os
+import tempfile
+import time
 import pycqed as pq
 import unittest
 import h5py
@@ -26,6 +28,7 @@ class Test_HDF5(unittest.TestCase):
         self.MC = measurement_control.MeasurementControl(
             'MC', live_plot_enabled=False, verbose=False)
         self.MC.station = self.station
+        self.MC.update_snapshot_index(False)
         self.MC.datadir(self.datadir)
         a_tools.datadir = self.datadir
         self.station.add_component(self.MC)
@@ -211,6 +214,136 @@ class Test_HDF5(unittest.TestCase):
         self.assertEqual(self.mock_parabola_2.dict_like(),
                          {'a': {'b': [2, 3, 5]}})
 
+    def test_writing_and_reading_dicts_to_hdf5_flat(self):
+        test_dict = {
+            'list_of_ints': list(np.arange(5)),
+            'list_of_floats': list(np.arange(5.1)),
+            'some_bool': True,
+            'weird_dict': {'a': 5},
+            'empty_dict': {},
+            'none': None,
+            'empty_list': [],
+            'dataset1': np.linspace(0, 20, 31),
+            'dataset2': np.array([[2, 3, 4, 5],
+                                  [2, 3, 1, 2]]),
+            'list_of_mixed_type': ['hello', 4, 4.2, {'a': 5}, [4, 3]],
+            'tuple_of_mixed_type': tuple(['hello', 4, 4.2, {'a': 5}, [4, 3]]),
+            'a list of strings': ['my ', 'name ', 'is ', 'earl.'],
+            'list_of_dicts': [{'a': 5}, {'b': 3}],
+            'int_keys': {0: {'name': 'I'}, 1: {'name': 'rX180'}},
+            'some_np_float': np.float64(3.5),
+        }
+        data_object = h5d.Data(name='test_object_flat', datadir=self.datadir)
+        h5d.write_dict_to_hdf5_flat(test_dict, data_object)
+        data_object.close()
+
+        with h5py.File(data_object.filepath, 'r') as f:
+            assert h5d.is_flat_dict_group(f)
+            # The flat format is read by the existing reader
+            new_dict = h5d.read_dict_from_hdf5({}, f)
+            sub_dict = h5d.read_dict_from_hdf5_flat(f, path='int_keys/1')
+            dataset2 = h5d.read_dict_from_hdf5_path(f, 'dataset2')
+
+        self.assertEqual(test_dict.keys(), new_dict.keys())
+        for key in ['list_of_ints', 'list_of_floats', 'some_bool',
+                    'weird_dict', 'empty_dict', 'none', 'empty_list',
+                    'list_of_mixed_type', 'tuple_of_mixed_type',
+                    'a list of strings', 'list_of_dicts', 'int_keys',
+                    'some_np_float']:
+            self.assertEqual(test_dict[key], new_dict[key])
+        self.assertEqual(type(new_dict['tuple_of_mixed_type']), tuple)
+        np.testing.assert_array_equal(test_dict['dataset1'],
+                                      new_dict['dataset1'])
+        np.testing.assert_array_equal(test_dict['dataset2'], dataset2)
+        self.assertEqual(sub_dict, {'name': 'rX180'})
+
+    def test_loading_settings_onto_instrument_flat_snapshot(self):
+        self.mock_parabola.x(12.5)
+        self.mock_parabola.array_like(np.arange(4.))
+        self.MC.snapshot_format('flat')
+        try:
+            self.MC.set_sweep_function(self.mock_parabola.x)
+            self.MC.set_sweep_points([0, 1])
+            self.MC.set_detector_function(self.mock_parabola.skewed_parabola)
+            self.MC.run('test_MC_flat_snapshot_storing')
+        finally:
+            self.MC.snapshot_format('hierarchical')
+
+        fp = a_tools.measurement_filename(
+            a_tools.get_folder(label='test_MC_flat_snapshot_storing'))
+        with h5py.File(fp, 'r') as f:
+            assert h5d.is_flat_dict_group(f['Snapshot'])
+            pars = h5d.read_dict_from_hdf5_path(
+                f, 'Snapshot/instruments/mock_parabola/parameters')
+        np.testing.assert_array_equal(pars['array_like']['value'],
+                                      np.arange(4.))
+
+        self.mock_parabola_2.x(3)
+        gen.load_settings_onto_instrument_v2(
+            self.mock_parabola_2, load_from_instr=self.mock_parabola.name,
+            label='test_MC_flat_snapshot_storing')
+        self.assertEqual(self.mock_parabola_2.x(), 12.5)
+        np.testing.assert_array_equal(self.mock_parabola_2.array_like(),
+                                      np.arange(4.))
+
+
+def mk_instruments_snapshot(nr_instruments: int = 20, nr_pars: int = 100):
+    """
+    Snapshot with the structure of a station snapshot.
+    """
+    instruments = {}
+    for i in range(nr_instruments):
+        parameters = {}
+        for j in range(nr_pars):
+            value = [float(j), j, 'mode_{}'.format(j), None,
+                     np.linspace(0, 1, 16), bool(j % 2)][j % 6]
+            parameters['par_{}'.format(j)] = {
+                'value': value, 'ts': '2020-01-01 12:00:00',
+                'name': 'par_{}'.format(j), 'label': 'Parameter {}'.format(j),
+                'unit': 'Hz', 'raw_value': value,
+                'instrument': 'pycqed.Instrument'}
+        instruments['ins_{}'.format(i)] = {
+            'name': 'ins_{}'.format(i), 'functions': {},
+            'submodules': {}, 'parameters': parameters}
+    return {'instruments': instruments, 'parameters': {}, 'components': {},
+            'config': None}
+
+
+def test_flat_dict_benchmark_20_instruments():
+    snap = mk_instruments_snapshot(nr_instruments=20)
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for fmt, write in [('hierarchical', h5d.write_dict_to_hdf5),
+                           ('flat', h5d.write_dict_to_hdf5_flat)]:
+            fn = os.path.join(tmpdir, '{}.hdf5'.format(fmt))
+            t0 = time.perf_counter()
+            with h5py.File(fn, 'w') as f:
+                write(snap, f.create_group('Snapshot'))
+            t_write = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            with h5py.File(fn, 'r') as f:
+                snap_read = h5d.read_dict_from_hdf5({}, f['Snapshot'])
+            t_read = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            with h5py.File(fn, 'r') as f:
+                ins_read = h5d.read_dict_from_hdf5_path(
+                    f, 'Snapshot/instruments/ins_7')
+            t_read_ins = time.perf_counter() - t0
+
+            timings[fmt] = (t_write, t_read, t_read_ins)
+
+            assert snap_read['instruments'].keys() == \
+                snap['instruments'].keys()
+            pars = ins_read['parameters']
+            assert pars['par_2']['value'] == 'mode_2'
+            np.testing.assert_array_equal(pars['par_4']['value'],
+                                          np.linspace(0, 1, 16))
+
+    assert timings['flat'][0] < timings['hierarchical'][0]
+    assert timings['flat'][1] < timings['hierarchical'][1]
+
 
 def test_wr_rd_hdf5_array():
     datadir = os.path.join(pq.__path__[0], 'tests', 'test_data')
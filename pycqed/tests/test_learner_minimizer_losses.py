@@ -0,0 +1,157 @@
+import time
+import unittest
+import numpy as np
+from adaptive.learner.learner1D import default_loss
+from adaptive.learner.learnerND import uniform_loss, volume
+from pycqed.utilities import learner1D_minimizer as l1dm
+from pycqed.utilities import learnerND_minimizer as lndm
+
+
+def multi_min(x):
+    return np.sin(20 * x) * np.exp(-x ** 2) + 0.05 * np.sin(1e4 * x)
+
+
+def multi_min_2D(X):
+    return (X[0] ** 2 + (X[1] - 1) ** 2
+            + 0.3 * np.sin(7 * X[0]) * np.cos(5 * X[1]))
+
+
+def sample(learner, func, npoints, goal=None, n_ask=1, n_pending=0):
+    """
+    Samples the learner and returns the points in the order they were
+    asked. Up to `n_pending` points are kept pending.
+    """
+    points = []
+    pending = []
+    while len(points) < npoints:
+        if goal is not None:
+            goal(learner)
+        new_points, _ = learner.ask(n_ask)
+        pending += list(new_points)
+        while len(pending) > n_pending:
+            point = pending.pop(0)
+            points.append(point)
+            learner.tell(point, func(point))
+    return points
+
+
+class Test_Learner1D_Minimizer_VectorizedLosses(unittest.TestCase):
+
+    loss_funcs = {
+        'minimization': (l1dm.mk_minimization_loss_func, True),
+        'threshold': (lambda: l1dm.mk_minimization_loss_func(
+            threshold=-0.8, min_distance=1e-3), True),
+        'resolution': (lambda: l1dm.mk_minimization_loss_func(
+            min_distance=0.01, max_distance=0.3), True),
+        'res_minimization': (lambda: l1dm.mk_res_loss_func(
+            l1dm.mk_minimization_loss(), min_distance=1e-3,
+            max_distance=0.5), True),
+        'non_uniform_res': (lambda: l1dm.mk_non_uniform_res_loss_func(
+            default_loss), False),
+        'default': (lambda: None, False),
+    }
+
+    def mk_learner(self, mk_loss, vectorized_losses):
+        return l1dm.Learner1D_Minimizer(
+            multi_min, bounds=(-2., 2.), loss_per_interval=mk_loss(),
+            vectorized_losses=vectorized_losses)
+
+    def test_identical_point_selection(self):
+        for name, (mk_loss, use_goal) in self.loss_funcs.items():
+            points = {}
+            for vectorized_losses in (True, False):
+                learner = self.mk_learner(mk_loss, vectorized_losses)
+                self.assertEqual(learner._vectorized_loss is not None,
+                                 vectorized_losses)
+                goal = l1dm.mk_minimization_goal_func() if use_goal else None
+                points[vectorized_losses] = sample(
+                    learner, multi_min, 400, goal=goal)
+            self.assertEqual(points[True], points[False], msg=name)
+
+    def test_identical_losses_with_pending_points(self):
+        learners = {}
+        for vectorized_losses in (True, False):
+            learner = self.mk_learner(l1dm.mk_minimization_loss_func,
+                                      vectorized_losses)
+            sample(learner, multi_min, 300,
+                   goal=l1dm.mk_minimization_goal_func(),
+                   n_ask=2, n_pending=2)
+            learner.moving_threshold = learner._bbox[1][0] + 0.1
+            learner._recompute_all_losses()
+            learners[vectorized_losses] = learner
+
+        l_vec, l_ref = learners[True], learners[False]
+        assert len(l_vec.pending_points) == 2
+        self.assertEqual(list(l_vec.losses.items()),
+                         list(l_ref.losses.items()))
+        self.assertEqual(list(l_vec.losses_combined.items()),
+                         list(l_ref.losses_combined.items()))
+
+    def test_recompute_all_losses_updates_all_intervals(self):
+        learner = self.mk_learner(l1dm.mk_minimization_loss_func, True)
+        sample(learner, multi_min, 500, goal=l1dm.mk_minimization_goal_func())
+        learner.moving_threshold = learner._bbox[1][0] + 0.3
+        learner._recompute_all_losses()
+        for interval, loss in learner.losses.items():
+            self.assertEqual(loss, learner._get_loss_in_interval(*interval))
+
+    def test_benchmark_ask_overhead_1e4_points(self):
+        x = np.linspace(-2., 2., 10 ** 4)
+        timings = {}
+        for vectorized_losses in (True, False):
+            learner = self.mk_learner(l1dm.mk_minimization_loss_func,
+                                      vectorized_losses)
+            learner.tell_many(x, multi_min(x))
+            learner.moving_threshold = learner._bbox[1][0]
+
+            t0 = time.perf_counter()
+            learner._recompute_all_losses()
+            t_recompute = time.perf_counter() - t0
+
+            goal = l1dm.mk_minimization_goal_func()
+            n_asks = 50
+            t0 = time.perf_counter()
+            sample(learner, multi_min, n_asks, goal=goal)
+            t_ask = (time.perf_counter() - t0) / n_asks
+            timings[vectorized_losses] = (t_recompute, t_ask)
+
+        assert timings[True][0] < timings[False][0]
+
+
+class Test_LearnerND_Minimizer_VectorizedLosses(unittest.TestCase):
+
+    bounds = [(-2., 2.), (-2., 2.)]
+
+    def test_simplex_volumes(self):
+        rng = np.random.RandomState(0)
+        for ndim in (2, 3, 4):
+            simplices = rng.rand(20, ndim + 1, ndim)
+            np.testing.assert_allclose(
+                lndm.simplex_volumes(simplices),
+                [volume(simplex) for simplex in simplices],
+                rtol=1e-12)
+
+    def test_identical_point_selection(self):
+        loss_funcs = {
+            'minimization': (lndm.mk_minimization_loss_func, True),
+            'threshold': (lambda: lndm.mk_minimization_loss_func(
+                threshold=0.2, volume_weight=0.1), True),
+            'non_uniform_res': (lambda: lndm.mk_minimization_loss_func(
+                bounds=self.bounds, npoints=200, res_bounds=(0.5, 3.)),
+                True),
+            'uniform': (lambda: uniform_loss, False),
+        }
+        for name, (mk_loss, use_goal) in loss_funcs.items():
+            points = {}
+            for vectorized_losses in (True, False):
+                learner = lndm.LearnerND_Minimizer(
+                    multi_min_2D, bounds=self.bounds,
+                    loss_per_simplex=mk_loss(),
+                    vectorized_losses=vectorized_losses)
+                self.assertEqual(learner._vectorized_loss is not None,
+                                 vectorized_losses)
+                goal = lndm.mk_minimization_goal_func() if use_goal else None
+                points[vectorized_losses] = sample(
+                    learner, multi_min_2D, 200, goal=goal,
+                    n_ask=2, n_pending=2)
+            self.assertEqual(points[True], points[False], msg=name)
@@ -0,0 +1,61 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from adaptive.learner import Learner1D
+from pycqed.utilities import learner_utils as lu
+from pycqed.utilities import learner1D_minimizer as l1dm
+from pycqed.utilities import learnerND_minimizer as lndm
+
+
+def noisy_sin(x):
+    return np.sin(x / np.pi) + 0.005 * np.random.randn()
+
+
+def noisy_parabola(X):
+    return X[0] ** 2 + (X[1] - 1) ** 2 + 0.01 * np.random.randn()
+
+
+class Test_BatchRunners(unittest.TestCase):
+
+    def test_batch_runner_evaluate_batch(self):
+        batches = []
+
+        def evaluate_batch(X):
+            batches.append(len(X))
+            return np.cos(X)
+
+        learner = Learner1D(np.cos, bounds=(-2., 3.))
+        lu.batch_runner(learner, goal=lambda l: l.npoints >= 40,
+                        batch_size=8, evaluate_batch=evaluate_batch)
+        assert learner.npoints == 40
+        assert batches == [8] * 5
+        for x, y in learner.data.items():
+            self.assertAlmostEqual(y, np.cos(x))
+
+    def test_executor_runner_Learner1D_Minimizer(self):
+        np.random.seed(0)
+        goal = l1dm.mk_minimization_goal_func()
+        learner = l1dm.Learner1D_Minimizer(
+            noisy_sin, bounds=(-10., 0.),
+            loss_per_interval=l1dm.mk_minimization_loss_func())
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            lu.executor_runner(
+                learner, goal=lambda l: goal(l) or l.npoints >= 40,
+                executor=executor)
+        assert learner.npoints >= 40
+        x_best = min(learner.data, key=learner.data.get)
+        self.assertAlmostEqual(x_best, -np.pi ** 2 / 2, delta=0.75)
+
+    def test_executor_runner_LearnerND_Minimizer(self):
+        np.random.seed(0)
+        goal = lndm.mk_minimization_goal_func()
+        learner = lndm.LearnerND_Minimizer(
+            noisy_parabola, bounds=((-3., 3.), (-3., 3.)),
+            loss_per_simplex=lndm.mk_minimization_loss_func())
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            lu.executor_runner(
+                learner, goal=lambda l: goal(l) or l.npoints >= 60,
+                executor=executor, batch_size=6)
+        assert learner.npoints >= 60
+        x_best = min(learner.data, key=learner.data.get)
+        np.testing.assert_allclose(x_best, [0, 1], atol=.75)
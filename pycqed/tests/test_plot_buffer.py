@@ -0,0 +1,99 @@
+import time
+import unittest
+import numpy as np
+from pycqed.measurement.plot_buffer import (
+    DecimatingBuffer, ImageBuffer, group_m4)
+
+
+def m4_reference(y, bucket_size):
+    """
+    Indices of the first, last, minimum and maximum point of every bucket.
+    """
+    indices = []
+    for start in range(0, len(y), bucket_size):
+        bucket = y[start:start+bucket_size]
+        sel = {0, len(bucket) - 1}
+        if not np.all(np.isnan(bucket)):
+            sel |= {np.nanargmin(bucket), np.nanargmax(bucket)}
+        indices += sorted(start + i for i in sel)
+    return np.array(indices)
+
+
+class Test_DecimatingBuffer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        self.rng = np.random.RandomState(0)
+
+    def test_equals_m4_of_dataset(self):
+        for nr_points in [1, 5, 99, 2000, 12345]:
+            for chunk in [1, 7, 1000]:
+                y = self.rng.randn(nr_points)
+                y[self.rng.rand(nr_points) < .01] = np.nan
+                x = np.stack([np.arange(nr_points),
+                              -np.arange(nr_points)], axis=1)
+                buffer = DecimatingBuffer(nr_x=2, max_points=100)
+                for start in range(0, nr_points, chunk):
+                    buffer.append(x[start:start+chunk], y[start:start+chunk])
+
+                assert len(buffer) == nr_points
+                x_dec, y_dec = buffer.get()
+                assert len(y_dec) <= 100
+                idx = buffer.get_indices()
+                np.testing.assert_array_equal(
+                    idx, m4_reference(y, buffer.bucket_size))
+                np.testing.assert_array_equal(x_dec, x[idx])
+                np.testing.assert_array_equal(y_dec, y[idx])
+                np.testing.assert_array_equal(buffer.x_min, [0, 1-nr_points])
+                np.testing.assert_array_equal(buffer.x_max, [nr_points-1, 0])
+
+    def test_small_datasets_not_decimated(self):
+        buffer = DecimatingBuffer(max_points=4000)
+        y = self.rng.randn(500)
+        buffer.append(np.arange(500), y)
+        x_dec, y_dec = buffer.get()
+        np.testing.assert_array_equal(x_dec[:, 0], np.arange(500))
+        np.testing.assert_array_equal(y_dec, y)
+
+    def test_group_m4(self):
+        y = np.array([1., 5, -2, 3, np.nan, 0, 4])
+        groups = np.array([0, 0, 0, 0, 1, 1, 1])
+        idx, x, y_m4 = group_m4(np.arange(7), np.arange(7)[:, None], y,
+                                groups)
+        np.testing.assert_array_equal(idx, [[0, 1, 2, 3], [4, 5, 6, 6]])
+        np.testing.assert_array_equal(y_m4[0], [1, 5, -2, 3])
+
+    def test_refresh_cost_is_flat(self):
+        # headless benchmark of appending a chunk and getting the curve
+        buffer = DecimatingBuffer(max_points=4000)
+        chunk = 1000
+        times = []
+        for i in range(1000):
+            t0 = time.perf_counter()
+            buffer.append(np.arange(chunk) + i*chunk, self.rng.randn(chunk))
+            buffer.get()
+            times.append(time.perf_counter() - t0)
+        assert len(buffer) == int(1e6)
+        assert len(buffer.get()[1]) <= 4000
+        # 10^4 vs 10^6 points, cost would grow 100x if linear
+        assert np.median(times[-100:]) < 5*np.median(times[10:110])
+
+
+class Test_ImageBuffer(unittest.TestCase):
+
+    def test_fill_rows(self):
+        buffer = ImageBuffer(xlen=4, ylen=3, nr_z=2)
+        assert buffer.get_changed_rows() is None
+        z = np.arange(24.).reshape(12, 2)
+        buffer.fill(0, z[:3])
+        assert buffer.get_changed_rows() == (0, 1)
+        buffer.fill(3, z[3:9])
+        assert buffer.get_changed_rows() == (0, 3)
+        assert np.isnan(buffer.image[2, 1:]).all()
+        buffer.fill(9, z[9:])
+        np.testing.assert_array_equal(buffer.image.reshape(12, 2), z)
+        assert buffer.get_changed_rows() == (2, 3)
+        # indices wrap around for soft averages
+        buffer.fill(12, -z[:2])
+        assert buffer.get_changed_rows() == (0, 1)
+        np.testing.assert_array_equal(buffer.image[0, :2], -z[:2])
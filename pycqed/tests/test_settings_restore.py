@@ -0,0 +1,237 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from qcodes import station
+from qcodes.instrument.base import Instrument
+from qcodes.instrument.parameter import ManualParameter
+from qcodes.utils import validators as vals
+
+import pycqed.utilities.general as gen
+from pycqed.analysis import analysis_toolbox as a_tools
+from pycqed.measurement import measurement_control
+from pycqed.utilities import settings_restore as sr
+
+
+class MockQubit(Instrument):
+    """
+    Qubit-like instrument of which every set takes set_delay seconds, to
+    mimic the communication with the instruments.
+    """
+
+    def __init__(self, name, nr_pars: int = 60, set_delay: float = 2e-4,
+                 **kw):
+        super().__init__(name, **kw)
+        self.set_delay = set_delay
+        self.set_log = []
+        for i in range(nr_pars):
+            par_name = 'par_{}'.format(i)
+            if i % 3 == 0:
+                kwargs = dict(vals=vals.Strings(), initial_value='mode_0')
+            elif i % 3 == 1:
+                kwargs = dict(vals=vals.Ints(), initial_value=0)
+            else:
+                kwargs = dict(vals=vals.Numbers(), initial_value=0.)
+            self.add_parameter(
+                par_name, get_cmd=None,
+                set_cmd=self._mk_set_cmd(par_name), **kwargs)
+        self.add_parameter('sweep_par', parameter_class=ManualParameter,
+                           initial_value=0)
+        self.add_parameter('signal', get_cmd=lambda: self.sweep_par()**2,
+                           unit='V')
+        self.set_log = []
+
+    def _mk_set_cmd(self, par_name):
+        def set_cmd(value):
+            time.sleep(self.set_delay)
+            self.set_log.append(par_name)
+        return set_cmd
+
+
+class Test_SettingsRestore(unittest.TestCase):
+
+    nr_qubits = 20
+
+    @classmethod
+    def setUpClass(self):
+        self.datadir = tempfile.mkdtemp()
+        self.old_datadir = a_tools.datadir
+        a_tools.datadir = self.datadir
+        self.station = station.Station()
+        self.MC = measurement_control.MeasurementControl(
+            'MC_settings_restore', live_plot_enabled=False, verbose=False)
+        self.MC.station = self.station
+        self.MC.datadir(self.datadir)
+        self.station.add_component(self.MC)
+        self.qubits = [MockQubit('mock_qubit_{}'.format(i))
+                       for i in range(self.nr_qubits)]
+        for qubit in self.qubits:
+            self.station.add_component(qubit)
+
+    @classmethod
+    def tearDownClass(self):
+        self.MC.close()
+        for qubit in self.qubits:
+            qubit.close()
+        a_tools.datadir = self.old_datadir
+        shutil.rmtree(self.datadir)
+
+    def set_values(self, offset):
+        for i, qubit in enumerate(self.qubits):
+            for j in range(0, 60, 3):
+                qubit.set('par_{}'.format(j), 'mode_{}'.format(i + offset))
+                qubit.set('par_{}'.format(j + 1), i*j + offset)
+                qubit.set('par_{}'.format(j + 2), 0.1*i*j + offset)
+            qubit.set_log.clear()
+
+    def measure(self, label):
+        qubit = self.qubits[0]
+        self.MC.set_sweep_function(qubit.sweep_par)
+        self.MC.set_sweep_points(np.arange(3))
+        self.MC.set_detector_function(qubit.signal)
+        self.MC.run(label)
+        return a_tools.measurement_filename(
+            a_tools.get_folder(label=label))
+
+    def assert_restored(self):
+        for i, qubit in enumerate(self.qubits):
+            self.assertEqual(qubit.par_3(), 'mode_{}'.format(i))
+            self.assertEqual(qubit.par_4(), i*3)
+            self.assertEqual(qubit.par_5(), 0.1*i*3)
+
+    def test_snapshot_index(self):
+        self.set_values(0)
+        filepath = self.measure('test_snapshot_index')
+        index = sr.SnapshotIndex(self.datadir).load()
+        for qubit in self.qubits:
+            self.assertEqual(os.path.normpath(index[qubit.name]),
+                             os.path.normpath(filepath))
+
+        self.MC.update_snapshot_index(False)
+        try:
+            self.measure('test_snapshot_index_not_updated')
+        finally:
+            self.MC.update_snapshot_index(True)
+        self.assertEqual(sr.SnapshotIndex(self.datadir).load(), index)
+
+    def test_restore_only_changed_parameters(self):
+        self.set_values(0)
+        self.measure('test_restore_only_changed')
+        qubit = self.qubits[3]
+        qubit.par_4(-1)
+        qubit.par_5(-1.5)
+        qubit.set_log.clear()
+
+        restored = sr.restore_settings(
+            [q.name for q in self.qubits],
+            ignore_pars={self.qubits[0].name: {'sweep_par'}})
+        self.assertEqual(sorted(restored[qubit.name]), ['par_4', 'par_5'])
+        self.assertEqual(sorted(qubit.set_log), ['par_4', 'par_5'])
+        for q in self.qubits[:3] + self.qubits[4:]:
+            self.assertEqual(q.set_log, [])
+        self.assert_restored()
+
+    def test_restore_without_index(self):
+        self.set_values(0)
+        self.measure('test_restore_without_index')
+        self.set_values(1)
+        restored = sr.restore_settings(self.qubits, use_index=False,
+                                       label='test_restore_without_index')
+        self.assertTrue(all(pars for pars in restored.values()))
+        self.assert_restored()
+
+    def test_changed_parameters_not_read(self):
+        # e.g. a freshly created instrument, the parameters were never read
+        instr = Instrument('settings_restore_instr')
+        reads = []
+        instr.add_parameter('node', vals=vals.Ints(),
+                            get_cmd=lambda: reads.append(1) or 0,
+                            set_cmd=lambda value: None)
+        try:
+            snapshot = {'parameters': {'node': {'value': 0}}}
+            self.assertEqual(sr.changed_parameter_values(instr, snapshot),
+                             {'node': 0})
+            self.assertEqual(reads, [])
+            instr.node(0)
+            self.assertEqual(sr.changed_parameter_values(instr, snapshot), {})
+            self.assertEqual(reads, [])
+        finally:
+            instr.close()
+
+    def test_restore_from_other_datadir(self):
+        self.set_values(0)
+        filepath = self.measure('test_restore_from_other_datadir')
+        self.set_values(1)
+        other_datadir = tempfile.mkdtemp()
+        a_tools.datadir = other_datadir
+        try:
+            files = sr.find_settings_files(
+                [self.qubits[0].name], label='test_restore_from_other_datadir',
+                datadir=self.datadir)
+            self.assertEqual(files, {filepath: [self.qubits[0].name]})
+            sr.restore_settings(self.qubits, use_index=False,
+                                datadir=self.datadir)
+        finally:
+            a_tools.datadir = self.datadir
+            shutil.rmtree(other_datadir)
+        self.assert_restored()
+
+    def test_concurrent_index_updates(self):
+        datadir = tempfile.mkdtemp()
+        try:
+            def update(i):
+                sr.SnapshotIndex(datadir).update(
+                    os.path.join(datadir, 'file_{}.hdf5'.format(i)),
+                    ['instr_{}'.format(i)])
+
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(update, range(32)))
+            index = sr.SnapshotIndex(datadir).load()
+            self.assertEqual(len(index), 32)
+            self.assertEqual(os.listdir(datadir),
+                             [sr.SNAPSHOT_INDEX_FILENAME])
+        finally:
+            shutil.rmtree(datadir)
+
+    def test_restore_from_other_instrument(self):
+        self.set_values(0)
+        self.measure('test_restore_from_other_instrument')
+        qubit = self.qubits[1]
+        restored = sr.restore_settings(
+            [qubit], load_from={qubit.name: self.qubits[2].name})
+        self.assertEqual(qubit.par_3(), 'mode_2')
+        self.assertEqual(qubit.par_4(), 6)
+        self.assertEqual(sorted(restored[qubit.name]), sorted(qubit.set_log))
+
+    def test_benchmark_restore_20_qubits(self):
+        self.set_values(0)
+        self.measure('test_benchmark_restore')
+
+        timings = {}
+        nr_sets = {}
+        for method in ('load_settings_onto_instrument_v2', 'restore_settings'):
+            # change a few parameters of every qubit
+            for qubit in self.qubits:
+                qubit.par_3('changed')
+                qubit.par_4(-1)
+                qubit.par_5(-1.5)
+                qubit.set_log.clear()
+            t0 = time.perf_counter()
+            if method == 'restore_settings':
+                sr.restore_settings(self.qubits)
+            else:
+                for qubit in self.qubits:
+                    gen.load_settings_onto_instrument_v2(qubit)
+            timings[method] = time.perf_counter() - t0
+            nr_sets[method] = sum(len(q.set_log) for q in self.qubits)
+            self.assert_restored()
+
+        # only the parameters that differ are set
+        self.assertEqual(nr_sets['restore_settings'], 3*self.nr_qubits)
+        self.assertEqual(nr_sets['load_settings_onto_instrument_v2'],
+                         60*self.nr_qubits)
+        assert timings['restore_settings'] < \
+            timings['load_settings_onto_instrument_v2']
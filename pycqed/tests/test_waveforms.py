@@ -117,3 +117,42 @@ class Test_Waveforms(unittest.TestCase):
         np.testing.assert_almost_equal(waveform[1], np.zeros(20))
         np.testing.assert_almost_equal(waveform[2], np.ones(20))
         np.testing.assert_almost_equal(waveform[3], np.zeros(20))
+
+    def test_mod_gauss_batch(self):
+        amps = [0, 0.5, -0.25, 0.3]
+        phases = [0, 90, 0, 45]
+        waves = wf.mod_gauss_batch(amps, phases, sigma_length=4e-9,
+                                   f_modulation=100e6, motzoi=0.2,
+                                   sampling_rate=2.4e9)
+        waves_VSM = wf.mod_gauss_VSM_batch(amps, phases, sigma_length=4e-9,
+                                           f_modulation=100e6, motzoi=0.2,
+                                           sampling_rate=2.4e9)
+        self.assertEqual(waves.shape[:2], (4, 2))
+        self.assertEqual(waves_VSM.shape[:2], (4, 4))
+        for i, (amp, phase) in enumerate(zip(amps, phases)):
+            np.testing.assert_almost_equal(
+                waves[i], wf.mod_gauss(amp, 4e-9, 100e6, phase=phase,
+                                       motzoi=0.2, sampling_rate=2.4e9))
+            np.testing.assert_almost_equal(
+                waves_VSM[i], wf.mod_gauss_VSM(amp, 4e-9, 100e6, phase=phase,
+                                               motzoi=0.2, sampling_rate=2.4e9))
+
+    def test_pulse_cache(self):
+        wf.clear_pulse_cache()
+        G, D = wf.gauss_envelope(4e-9, sampling_rate=2.4e9)
+        # Numerical noise on the arguments does not result in a cache miss
+        G2, D2 = wf.gauss_envelope(4e-9*(1+1e-15), sampling_rate=2.4e9)
+        self.assertIs(G, G2)
+        with self.assertRaises(ValueError):
+            G[0] = 1
+
+    def test_apply_mixer_predistortion(self):
+        M = wf.mixer_predistortion_matrix(0.9, 5)
+        wave_dict = {0: wf.mod_gauss(0.5, 4e-9, 100e6, sampling_rate=1e9),
+                     1: wf.mod_gauss(0.2, 4e-9, 100e6, sampling_rate=1e9),
+                     2: wf.block_pulse(0.5, 20e-9, sampling_rate=1e9)}
+        for keys, waves in wf.stack_waves(wave_dict):
+            corrected = wf.apply_mixer_predistortion(M, waves)
+            for key, wave in zip(keys, corrected):
+                np.testing.assert_almost_equal(
+                    wave, np.dot(M, wave_dict[key]))
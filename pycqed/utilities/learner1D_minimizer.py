@@ -10,7 +10,9 @@ I hope it survives any changes that the `adaptive` package might suffer
 """
 
 from adaptive.learner import Learner1D
+from adaptive.learner.learner1D import default_loss, uniform_loss
 import numpy as np
+from copy import deepcopy
 from functools import partial
 import logging
 import operator
@@ -35,13 +37,29 @@ class Learner1D_Minimizer(Learner1D):
 
     The resolution loss function in this doc are built such that some
     other loss function is used when the resolution boundaries are respected
+
+    When the loss function has a vectorized version (see
+    `get_vectorized_loss`) and `vectorized_losses` is True, all losses are
+    recomputed in a single pass over numpy arrays and written in bulk into
+    the loss structures of the learner, otherwise the losses are recomputed
+    interval by interval.
     """
 
-    def __init__(self, func, bounds, loss_per_interval=None):
+    def __init__(
+        self, func, bounds, loss_per_interval=None, vectorized_losses: bool = True
+    ):
         # Sanity check that can save hours of debugging...
         assert bounds[1] > bounds[0]
 
         super().__init__(func, bounds, loss_per_interval)
+
+        vectorized_loss = None
+        if vectorized_losses and self.nth_neighbors == 0:
+            vectorized_loss = get_vectorized_loss(self.loss_per_interval)
+        self._vectorized_loss = (
+            None if vectorized_loss is None else partial(vectorized_loss, learner=self)
+        )
+
         # Keep the orignal learner behaviour but pass extra arguments to
         # the provided input loss function
         if hasattr(self.loss_per_interval, "needs_learner_access"):
@@ -91,23 +109,125 @@ class Learner1D_Minimizer(Learner1D):
         # This happens in `adaptive.Learner1D.tell`
         self._recompute_losses_factor = 1
 
+    def tell(self, x, y):
+        # `Learner1D.tell` recomputes all losses when the scale grows, this is
+        # done here instead such that it uses `_recompute_all_losses`
+        recompute_losses_factor = self._recompute_losses_factor
+        self._recompute_losses_factor = np.inf
+        try:
+            super().tell(x, y)
+        finally:
+            self._recompute_losses_factor = recompute_losses_factor
+
+        if self._scale[1] > self._recompute_losses_factor * self._oldscale[1]:
+            self._recompute_all_losses()
+            self._oldscale = deepcopy(self._scale)
+
     def _recompute_all_losses(self):
         """
         This is the equivalent fucntion that exists in LearnernND for this
         purpuse.
 
-        It is just a copy paste of a few lines from the `Learner1D.tell`
-
         It is used to recompute losses when the `Learner1D_Minimizer` is "done"
-        with sampling a local minimum.
+        with sampling a local minimum and when the function scale changes.
+
+        NB: the loop in `Learner1D.tell` updates the losses while iterating
+        over them, which skips some of the intervals. Here the intervals are
+        collected first such that all losses are recomputed.
         """
 
         # NB: We are not updating the scale here as the `tell` method does
         # because we assume this method will be called only after sampling
         # `max_no_improve_in_local` points in the local minimum
 
-        for interval in reversed(self.losses):
-            self._update_interpolated_loss_in_interval(*interval)
+        if len(self.losses) == 0:
+            return
+        if self._vectorized_loss is None:
+            for interval in list(self.losses):
+                self._update_interpolated_loss_in_interval(*interval)
+        else:
+            self._update_all_losses_vectorized()
+
+    def _update_all_losses_vectorized(self):
+        """
+        Recomputes the losses of all intervals with the vectorized loss
+        function and updates `losses` and `losses_combined` in bulk.
+        """
+        # The intervals are formed by consecutive real points
+        points = list(self.neighbors.keys())
+        x = np.array(points, dtype=float)
+        y = np.array([self.data[p] for p in points], dtype=float)
+
+        xs = np.stack([x[:-1], x[1:]]) / self._scale[0]
+        y_scaled = y / (self._scale[1] or 1)
+        ys = np.stack([y_scaled[:-1], y_scaled[1:]])
+
+        dx = x[1:] - x[:-1]
+        losses = np.array(self._vectorized_loss(xs, ys), dtype=float)
+        losses[dx < self._dx_eps] = 0.0
+
+        intervals = list(zip(points[:-1], points[1:]))
+        self.losses.update(zip(intervals, losses.tolist()))
+
+        # Interpolate the losses of the real intervals over the intervals
+        # that contain pending points, the intervals outside the real points
+        # keep their (infinite) losses
+        points_comb = list(self.neighbors_combined.keys())
+        x_comb = np.array(points_comb, dtype=float)
+        a, b = x_comb[:-1], x_comb[1:]
+        inside = np.flatnonzero((a >= x[0]) & (b <= x[-1]))
+        ival_idx = np.searchsorted(x, a[inside], side="right") - 1
+        losses_comb = (b[inside] - a[inside]) * losses[ival_idx] / dx[ival_idx]
+        self.losses_combined.update(
+            ((points_comb[i], points_comb[i + 1]), loss)
+            for i, loss in zip(inside.tolist(), losses_comb.tolist())
+        )
+
+
+# ######################################################################
+# Vectorized loss functions
+# ######################################################################
+
+
+def _vectorized_uniform_loss(xs, ys, learner=None):
+    return xs[1] - xs[0]
+
+
+def _vectorized_default_loss(xs, ys, learner=None):
+    dx = xs[1] - xs[0]
+    if ys.ndim > 2:
+        # Vector output, `ys` has shape (2, n_intervals, vdim)
+        return np.hypot(dx[:, None], np.abs(ys[1] - ys[0])).max(axis=1)
+    return np.hypot(dx, ys[1] - ys[0])
+
+
+_VECTORIZED_LOSSES = {
+    uniform_loss: _vectorized_uniform_loss,
+    default_loss: _vectorized_default_loss,
+}
+
+
+def get_vectorized_loss(loss_per_interval):
+    """
+    Returns the vectorized version of a loss function or None if there is
+    none.
+
+    A vectorized loss function takes `xs` and `ys`, arrays of shape
+    (2, n_intervals) (or (2, n_intervals, vdim) for `ys` of a vector output)
+    of the scaled left and right points and values of all intervals, and the
+    `learner` keyword argument. It returns the losses of all intervals.
+
+    The loss functions made with this module and the `default_loss` and
+    `uniform_loss` of `adaptive.learner.learner1D` have one.
+    """
+    vectorized = getattr(loss_per_interval, "vectorized", None)
+    if vectorized is None:
+        try:
+            vectorized = _VECTORIZED_LOSSES.get(loss_per_interval)
+        except TypeError:
+            # Unhashable callable
+            vectorized = None
+    return vectorized
 
 
 # ######################################################################
@@ -121,13 +241,16 @@ def mk_res_loss_func(
     min_distance_orig = min_distance
     max_distance_orig = max_distance
 
-    def func(xs, values, *args, **kw):
+    def distance_limits(learner):
         if dist_is_norm:
-            min_distance_used = min_distance_orig
-            max_distance_used = max_distance_orig
-        else:
-            min_distance_used = min_distance_orig / kw["learner"]._scale[0]
-            max_distance_used = max_distance_orig / kw["learner"]._scale[0]
+            return min_distance_orig, max_distance_orig
+        return (
+            min_distance_orig / learner._scale[0],
+            max_distance_orig / learner._scale[0],
+        )
+
+    def func(xs, values, *args, **kw):
+        min_distance_used, max_distance_used = distance_limits(kw.get("learner"))
 
         # `dist` is normalised 0 <= dist <= 1 because xs are scaled
         dist = abs(xs[1] - xs[0])
@@ -142,6 +265,18 @@ def mk_res_loss_func(
             loss = default_loss_func(xs, values, *args, **kw)
         return loss
 
+    default_loss_vectorized = get_vectorized_loss(default_loss_func)
+    if default_loss_vectorized is not None:
+
+        def vectorized(xs, values, learner=None):
+            min_distance_used, max_distance_used = distance_limits(learner)
+            dist = np.abs(xs[1] - xs[0])
+            loss = default_loss_vectorized(xs, values, learner=learner)
+            loss = np.where(dist > max_distance_used, np.inf, loss)
+            return np.where(dist < min_distance_used, 0.0, loss)
+
+        func.vectorized = vectorized
+
     if not dist_is_norm:
         func.needs_learner_access = True
 
@@ -216,12 +351,16 @@ def mk_minimization_loss(
             out = A_not * np.arctan(np.divide(dist, scale * w_not))
         return out
 
-    def func(xs, values, learner, *args, **kw):
-        threshold_is_None = threshold is None
-        comp_threshold = learner.moving_threshold if threshold_is_None else threshold
+    def threshold_and_compare_op(learner):
+        comp_threshold = learner.moving_threshold if threshold is None else threshold
         compare_op = (
             compare_op_start if learner.compare_op is None else learner.compare_op
         )
+        return comp_threshold, compare_op
+
+    def func(xs, values, learner, *args, **kw):
+        threshold_is_None = threshold is None
+        comp_threshold, compare_op = threshold_and_compare_op(learner)
 
         # `dist` is normalised 0 <= dist <= 1 because xs are scaled
         dist = np.abs(xs[0] - xs[1])
@@ -284,6 +423,40 @@ def mk_minimization_loss(
 
         return loss
 
+    def vectorized(xs, values, learner, *args, **kw):
+        """
+        Same as `func` for all intervals at once, `xs` and `values` have
+        shape (2, n_intervals).
+        """
+        comp_threshold, compare_op = threshold_and_compare_op(learner)
+        dist = np.abs(xs[0] - xs[1])
+        min_values = np.min(values, axis=0)
+        dist_best_val_in_interval = (
+            learner._bbox[1][1] - min_values * learner._scale[1]
+        )
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scaled_threshold = np.divide(comp_threshold, learner._scale[1])
+            beyond_threshold = np.any(compare_op(values, scaled_threshold), axis=0)
+            if threshold is None:
+                loss_beyond = dist_best_val_in_interval + dist
+            else:
+                side_weight = dist * (1.0 + scaled_threshold - min_values)
+                loss_beyond = (learner._bbox[1][1] - comp_threshold) + side_weight
+            loss_not_beyond = close_to_optimal_factor(
+                learner._scale[1], dist_best_val_in_interval
+            ) * interval_factor(dist)
+
+        loss = np.where(beyond_threshold, loss_beyond, loss_not_beyond)
+        # In case the function landscape is constant so far
+        loss = np.where(dist_best_val_in_interval == 0.0, dist, loss)
+
+        if randomize_global_search:
+            loss = np.array([random.uniform(0.0, l) for l in loss])
+
+        return loss
+
+    func.vectorized = vectorized
     return func
 
 
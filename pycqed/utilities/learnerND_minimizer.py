@@ -1,8 +1,11 @@
 from adaptive.learner import LearnerND
-from adaptive.learner.learnerND import volume
+from adaptive.learner.learnerND import volume, uniform_loss
+from adaptive.learner.learnerND import _simplex_evaluation_priority
+from sortedcontainers import SortedKeyList
 import numpy as np
 from functools import partial
 import logging
+import math
 import operator
 import random
 import scipy
@@ -35,10 +38,25 @@ class LearnerND_Minimizer(LearnerND):
 
     The resolution loss function in this doc are built such that some
     other loss function is used when the resolution boundaries are respected
+
+    When the loss function has a vectorized version (see
+    `get_vectorized_loss`) and `vectorized_losses` is True, all losses are
+    recomputed in a single pass over numpy arrays and the simplex queue is
+    rebuilt in bulk.
     """
 
-    def __init__(self, func, bounds, loss_per_simplex=None):
+    def __init__(
+        self, func, bounds, loss_per_simplex=None, vectorized_losses: bool = True
+    ):
         super().__init__(func, bounds, loss_per_simplex)
+
+        vectorized_loss = None
+        if vectorized_losses and self.nth_neighbors == 0:
+            vectorized_loss = get_vectorized_loss(self.loss_per_simplex)
+        self._vectorized_loss = (
+            None if vectorized_loss is None else partial(vectorized_loss, learner=self)
+        )
+
         # Keep the orignal learner behaviour but pass extra arguments to
         # the provided input loss function
         if hasattr(self.loss_per_simplex, "needs_learner_access"):
@@ -101,6 +119,110 @@ class LearnerND_Minimizer(LearnerND):
         # by `adaptive.LearnerND.tell`
         self._recompute_losses_factor = 1
 
+    def _recompute_all_losses(self):
+        """
+        Same as `LearnerND._recompute_all_losses` but computes the losses of
+        all simplices at once if the loss function is vectorized.
+        """
+        if self._vectorized_loss is None or self.tri is None:
+            return super()._recompute_all_losses()
+
+        simplices = list(self.tri.simplices)
+        losses = self._compute_losses_vectorized(simplices)
+        self._losses.update(zip(simplices, losses))
+
+        # The queue is sorted in one go, the order in which the items
+        # are added does not matter as the keys are unique
+        self._simplex_queue = SortedKeyList(
+            [
+                (loss, simplex, None)
+                for simplex, loss in zip(simplices, losses)
+                if simplex not in self._subtriangulations
+            ],
+            key=_simplex_evaluation_priority,
+        )
+        for simplex in simplices:
+            if simplex in self._subtriangulations:
+                self._update_subsimplex_losses(
+                    simplex, self._subtriangulations[simplex].simplices
+                )
+
+    def _compute_losses_vectorized(self, simplices):
+        """
+        Vectorized `LearnerND._compute_loss` for a list of simplices.
+        """
+        vertices = self.tri.vertices
+        vertex_values = np.array([self.data[tuple(v)] for v in vertices])
+
+        # scale them to a cube with sides 1
+        idx = np.array(simplices)
+        simplex_vertices = np.array(vertices, dtype=float)[idx] @ self._transform
+        values = self._output_multiplier * vertex_values[idx]
+
+        losses = self._vectorized_loss(
+            simplex_vertices, values, self._output_multiplier
+        )
+        return np.asarray(losses, dtype=float).tolist()
+
+
+# ######################################################################
+# Vectorized loss functions
+# ######################################################################
+
+
+def simplex_volumes(simplices):
+    """
+    Vectorized `adaptive.learner.learnerND.volume`.
+
+    Args:
+        simplices (array): shape (n_simplices, ndim + 1, ndim)
+
+    Returns:
+        array of the volumes of the simplices
+    """
+    matrix = np.subtract(simplices[:, :-1], simplices[:, -1:], dtype=float)
+    dim = matrix.shape[1]
+    # Same as `adaptive.learner.triangulation.fast_det`
+    if dim == 2:
+        det = matrix[:, 0, 0] * matrix[:, 1, 1] - matrix[:, 1, 0] * matrix[:, 0, 1]
+    elif dim == 3:
+        a, b, c, d, e, f, g, h, i = np.moveaxis(matrix.reshape(-1, 9), 1, 0)
+        det = a * (e * i - f * h) - b * (d * i - f * g) + c * (d * h - e * g)
+    else:
+        det = np.linalg.det(matrix)
+    return np.abs(det) / math.factorial(dim)
+
+
+def _vectorized_uniform_loss(simplices, values, value_scale, learner=None):
+    return simplex_volumes(simplices)
+
+
+_VECTORIZED_LOSSES = {uniform_loss: _vectorized_uniform_loss}
+
+
+def get_vectorized_loss(loss_per_simplex):
+    """
+    Returns the vectorized version of a loss function or None if there is
+    none.
+
+    A vectorized loss function takes `simplices`, an array of shape
+    (n_simplices, ndim + 1, ndim) of the scaled vertices, `values`, an array
+    of shape (n_simplices, ndim + 1) of the scaled values, the `value_scale`
+    and the `learner` keyword argument. It returns the losses of all
+    simplices.
+
+    The loss functions made with this module and the `uniform_loss` of
+    `adaptive.learner.learnerND` have one.
+    """
+    vectorized = getattr(loss_per_simplex, "vectorized", None)
+    if vectorized is None:
+        try:
+            vectorized = _VECTORIZED_LOSSES.get(loss_per_simplex)
+        except TypeError:
+            # Unhashable callable
+            vectorized = None
+    return vectorized
+
 
 # ######################################################################
 # Loss function utilities for adaptive.learner.learnerND
@@ -113,17 +235,19 @@ def mk_vol_limits_loss_func(
     min_vol_orig = min_volume
     max_vol_orig = max_volume
 
-    def func(simplex, values, value_scale, *args, **kw):
-
+    def volume_limits(learner):
         if vol_is_norm:
             # We want to the normalization to be with respect to the
             # hull's volume in case the domain is a hull
-            min_vol_used = min_vol_orig * kw["learner"].hull_vol_factor
-            max_vol_used = max_vol_orig * kw["learner"].hull_vol_factor
-        else:
-            vol_bbox = kw["learner"].vol_bbox
-            min_vol_used = min_vol_orig / vol_bbox
-            max_vol_used = max_vol_orig / vol_bbox
+            return (
+                min_vol_orig * learner.hull_vol_factor,
+                max_vol_orig * learner.hull_vol_factor,
+            )
+        vol_bbox = learner.vol_bbox
+        return min_vol_orig / vol_bbox, max_vol_orig / vol_bbox
+
+    def func(simplex, values, value_scale, *args, **kw):
+        min_vol_used, max_vol_used = volume_limits(kw["learner"])
 
         vol = volume(simplex)
         if vol < min_vol_used:
@@ -133,6 +257,20 @@ def mk_vol_limits_loss_func(
         else:
             return default_loss_func(simplex, values, value_scale, *args, **kw)
 
+    default_loss_vectorized = get_vectorized_loss(default_loss_func)
+    if default_loss_vectorized is not None:
+
+        def vectorized(simplices, values, value_scale, learner=None):
+            min_vol_used, max_vol_used = volume_limits(learner)
+            vol = simplex_volumes(simplices)
+            loss = default_loss_vectorized(
+                simplices, values, value_scale, learner=learner
+            )
+            loss = np.where(vol > max_vol_used, np.inf, loss)
+            return np.where(vol < min_vol_used, 0.0, loss)
+
+        func.vectorized = vectorized
+
     # Preserve loss function atribute in case a loss function from
     # adaptive.learner.learnerND is given
     if hasattr(default_loss_func, "nth_neighbors"):
@@ -200,12 +338,16 @@ def mk_minimization_loss(
             out = A_not * np.arctan(np.divide(dist, scale * w_not))
         return out
 
-    def func(simplex, values, value_scale, learner, *args, **kw):
-        threshold_is_None = threshold is None
-        comp_threshold = learner.moving_threshold if threshold_is_None else threshold
+    def threshold_and_compare_op(learner):
+        comp_threshold = learner.moving_threshold if threshold is None else threshold
         compare_op = (
             compare_op_start if learner.compare_op is None else learner.compare_op
         )
+        return comp_threshold, compare_op
+
+    def func(simplex, values, value_scale, learner, *args, **kw):
+        threshold_is_None = threshold is None
+        comp_threshold, compare_op = threshold_and_compare_op(learner)
 
         # `vol` is normalised 0 <= vol <= 1 because the domain is scaled to a
         # unit hypercube
@@ -278,6 +420,40 @@ def mk_minimization_loss(
 
         return loss
 
+    def vectorized(simplices, values, value_scale, learner, *args, **kw):
+        """
+        Same as `func` for all simplices at once, `simplices` has shape
+        (n_simplices, ndim + 1, ndim) and `values` (n_simplices, ndim + 1).
+        """
+        comp_threshold, compare_op = threshold_and_compare_op(learner)
+        vol = simplex_volumes(simplices)
+        dist_best = np.average(
+            learner._max_value - np.sort(values, axis=1)[:, :-1] * learner._scale,
+            axis=1,
+        )
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scaled_threshold = np.divide(comp_threshold, learner._scale)
+            beyond_threshold = np.any(compare_op(values, scaled_threshold), axis=1)
+            if threshold is None:
+                loss_beyond = dist_best + vol
+            else:
+                side_weight = vol * (1.0 + scaled_threshold - np.min(values, axis=1))
+                loss_beyond = (learner._max_value - comp_threshold) + side_weight
+            loss_not_beyond = close_to_optimal_factor(
+                learner._scale, dist_best
+            ) * vol_factor(vol)
+
+        loss = np.where(beyond_threshold, loss_beyond, loss_not_beyond)
+        # In case the function landscape is constant so far
+        loss = np.where(dist_best == 0.0, vol, loss)
+
+        if randomize_global_search:
+            loss = np.array([random.uniform(0.0, l) for l in loss])
+
+        return loss
+
+    func.vectorized = vectorized
     func.needs_learner_access = True
     return func
 
@@ -57,6 +57,68 @@ def tell_X_Y(learner, X, Y):
         learner.tell_many(X, Y)
 
 
+# ######################################################################
+# Batched runners
+# ######################################################################
+
+
+def batch_runner(learner, goal, batch_size: int = 10, evaluate_batch=None):
+    """
+    Runs the learner until the goal is reached, evaluating batches of points.
+
+    Like `adaptive.runner.simple`, everything runs in the calling process,
+    but instead of asking for a single point at a time, the learner is
+    asked for `batch_size` points, which are evaluated together and told
+    to the learner with `tell_many`. This allows e.g. measuring all points
+    of a batch in a single acquisition.
+
+    Arguments:
+        learner: (BaseLearner) an instance of the learner
+        goal: (callable) takes the learner and returns True when done
+        batch_size: (int) number of points asked per iteration
+        evaluate_batch: (callable) takes a list of points and returns the
+            list of the corresponding values, defaults to evaluating
+            learner.function point by point.
+    """
+    if evaluate_batch is None:
+        def evaluate_batch(X):
+            return [learner.function(Xi) for Xi in X]
+
+    while not goal(learner):
+        X, _ = learner.ask(batch_size)
+        if not len(X):
+            # the learner has no more points to suggest
+            break
+        Y = evaluate_batch(X)
+        learner.tell_many(X, Y)
+
+
+def executor_runner(learner, goal, executor, batch_size: int = None):
+    """
+    batch_runner that evaluates the points of a batch in parallel using a
+    `concurrent.futures` executor.
+
+    Intended for objective functions that do not use instruments, e.g.
+    simulations. For a ProcessPoolExecutor the learner.function must be
+    picklable.
+
+    Arguments:
+        learner: (BaseLearner) an instance of the learner
+        goal: (callable) takes the learner and returns True when done
+        executor: (concurrent.futures.Executor) executes the evaluations
+        batch_size: (int) number of points asked per iteration, defaults to
+            the number of workers of the executor
+    """
+    if batch_size is None:
+        batch_size = getattr(executor, "_max_workers", 1)
+
+    def evaluate_batch(X):
+        return list(executor.map(learner.function, X))
+
+    batch_runner(learner, goal, batch_size=batch_size,
+                 evaluate_batch=evaluate_batch)
+
+
 # ######################################################################
 # pycqed especific
 # ######################################################################
@@ -0,0 +1,347 @@
+"""
+Restoring instrument settings from the snapshots stored in the datafiles.
+
+Compared to load_settings_onto_instrument_v2 (pycqed.utilities.general)
+the settings restore:
+    - reads only the "Snapshot/instruments/<name>" entries of the
+      instruments that are restored, reading every file only once,
+    - sets only the parameters for which the stored value differs from the
+      cached value of the parameter, within a single instr.batch()
+      transaction if the driver supports it (e.g. the ZI instruments),
+    - finds the last datafile containing the snapshot of an instrument using
+      a small index file in the datadir, which the MeasurementControl
+      updates every time it stores a snapshot, instead of scanning the
+      datadir folders.
+
+Example:
+    >>> restore_settings([qubit.name for qubit in device_qubits])
+"""
+import json
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+import h5py
+import numpy as np
+
+from pycqed.analysis import analysis_toolbox as a_tools
+from pycqed.measurement import hdf5_data as h5d
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_INDEX_FILENAME = 'snapshot_index.json'
+
+
+class SnapshotIndex(object):
+    """
+    Index of the last datafile containing the snapshot of each instrument.
+
+    The index is a json file {"instruments": {instrument name: path}} in the
+    datadir, the paths are stored relative to the datadir. Updates are done
+    while holding a lock file, as several processes (e.g. multiple
+    MeasurementControls) can store their snapshots in the same datadir.
+
+    Args:
+        datadir (str): data directory, a_tools.datadir if None.
+    """
+
+    def __init__(self, datadir: str = None):
+        self.datadir = a_tools.datadir if datadir is None else datadir
+        self.filepath = os.path.join(self.datadir, SNAPSHOT_INDEX_FILENAME)
+
+    def load(self) -> dict:
+        """
+        Returns {instrument name: absolute path of the datafile}.
+        """
+        try:
+            with open(self.filepath, 'r') as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            log.warning('Could not read the snapshot index "{}": {}'.format(
+                self.filepath, e))
+            return {}
+        return {name: os.path.join(self.datadir, path)
+                for name, path in index.get('instruments', {}).items()}
+
+    def get(self, instrument_name: str) -> str:
+        """
+        Returns the path of the last datafile containing the snapshot of the
+        instrument, or None if the instrument is not in the index.
+        """
+        return self.load().get(instrument_name)
+
+    def update(self, filepath: str, instrument_names):
+        """
+        Sets filepath as the last datafile of the instruments.
+        """
+        relpath = os.path.relpath(filepath, self.datadir)
+        with self._locked():
+            index = {name: os.path.relpath(path, self.datadir)
+                     for name, path in self.load().items()}
+            index.update({name: relpath for name in instrument_names})
+            self._write(index)
+
+    def remove(self, instrument_names):
+        with self._locked():
+            index = {name: os.path.relpath(path, self.datadir)
+                     for name, path in self.load().items()
+                     if name not in instrument_names}
+            self._write(index)
+
+    @contextmanager
+    def _locked(self, timeout: float = 5.):
+        """
+        Holds the lock file of the index. A lock that is held for longer
+        than timeout (e.g. by a process that crashed) is removed.
+        """
+        lock_filepath = self.filepath + '.lock'
+        t0 = time.time()
+        while True:
+            try:
+                fd = os.open(lock_filepath,
+                             os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                if time.time() - t0 < timeout:
+                    time.sleep(0.01)
+                    continue
+                log.warning('Removing stale lock "{}"'.format(lock_filepath))
+                try:
+                    os.remove(lock_filepath)
+                except FileNotFoundError:
+                    pass
+                t0 = time.time()
+        try:
+            yield
+        finally:
+            os.close(fd)
+            os.remove(lock_filepath)
+
+    def _write(self, index: dict):
+        # Write to a (unique) temporary file first such that the index is
+        # never partially written
+        fd, tmp_filepath = tempfile.mkstemp(
+            dir=self.datadir, prefix=SNAPSHOT_INDEX_FILENAME, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'instruments': index}, f, indent=1,
+                          sort_keys=True)
+            os.replace(tmp_filepath, self.filepath)
+        except Exception:
+            os.remove(tmp_filepath)
+            raise
+
+
+def read_instrument_snapshots(filepath: str, instrument_names) -> dict:
+    """
+    Reads the snapshots of the instruments from a datafile, without reading
+    the snapshots of the other instruments.
+
+    Returns:
+        {instrument name: instrument snapshot} of the instruments that are
+        in the file.
+    """
+    snapshots = {}
+    with h5py.File(filepath, 'r') as f:
+        for name in instrument_names:
+            try:
+                snapshots[name] = h5d.read_dict_from_hdf5_path(
+                    f, 'Snapshot/instruments/{}'.format(name))
+            except KeyError:
+                pass
+    return snapshots
+
+
+def _values_equal(a, b) -> bool:
+    try:
+        return bool(a == b)
+    except (ValueError, TypeError):
+        # e.g. arrays, for which == is elementwise
+        try:
+            return np.array_equal(a, b)
+        except Exception:
+            return False
+
+
+def _get_cached(par):
+    """
+    Returns the cached value of a parameter without communicating with the
+    instrument, None if the parameter was never read or set.
+    """
+    cache = getattr(par, 'cache', None)
+    if cache is None:
+        # qcodes < 0.20, get_latest does not communicate with the instrument
+        return par.get_latest()
+    if cache.timestamp is None:
+        return None
+    return cache.get(get_if_invalid=False)
+
+
+def changed_parameter_values(instrument, instrument_snapshot: dict,
+                             ignore_pars: set = None) -> dict:
+    """
+    Compares the parameter values of an instrument snapshot with the cached
+    values of the instrument parameters (no instrument communication).
+    Parameters that were never read or set are considered changed.
+
+    Returns:
+        {parameter name: stored value} of the settable parameters for which
+        the stored value is not None and differs from the cached value.
+    """
+    changed = {}
+    for par_name, par_snap in instrument_snapshot.get(
+            'parameters', {}).items():
+        if ignore_pars is not None and par_name in ignore_pars:
+            continue
+        par = instrument.parameters.get(par_name, None)
+        value = par_snap.get('value', None)
+        if par is None or value is None or not hasattr(par, 'set'):
+            continue
+        if not _values_equal(_get_cached(par), value):
+            changed[par_name] = value
+    return changed
+
+
+def restore_instrument_settings(instrument, instrument_snapshot: dict,
+                                ignore_pars: set = None) -> list:
+    """
+    Sets the parameters of the instrument that differ from the snapshot.
+
+    Returns:
+        list of the names of the parameters that were set.
+    """
+    changed = changed_parameter_values(instrument, instrument_snapshot,
+                                       ignore_pars=ignore_pars)
+    if not changed:
+        return []
+
+    set_pars = []
+
+    def set_changed():
+        for par_name, value in changed.items():
+            try:
+                instrument.set(par_name, value)
+                set_pars.append(par_name)
+            except Exception as e:
+                log.warning('Could not set parameter: "{}" to "{}" for '
+                            'instrument "{}": {}'.format(
+                                par_name, value, instrument.name, e))
+
+    if hasattr(instrument, 'batch'):
+        # e.g. ZI instruments, the node writes are sent in one transaction
+        with instrument.batch():
+            set_changed()
+    else:
+        set_changed()
+    return set_pars
+
+
+def find_settings_files(instrument_names, label: str = None,
+                        timestamp: str = None, datadir: str = None,
+                        use_index: bool = True) -> dict:
+    """
+    Finds the datafiles containing the snapshots of the instruments.
+
+    If no label or timestamp is specified the last datafile of every
+    instrument is taken from the snapshot index, the instruments that are
+    not in the index are looked up in the last datafile.
+
+    Returns:
+        {filepath: [instrument names]}
+    """
+    files = {}
+    remaining = list(instrument_names)
+    if use_index and not label and timestamp is None:
+        index = SnapshotIndex(datadir).load()
+        remaining = []
+        for name in instrument_names:
+            if name in index and os.path.isfile(index[name]):
+                files.setdefault(index[name], []).append(name)
+            else:
+                remaining.append(name)
+
+    if remaining:
+        folder = a_tools.get_folder(timestamp=timestamp,
+                                    label='' if label is None else label,
+                                    folder=datadir)
+        filepath = a_tools.measurement_filename(folder)
+        if filepath is not None:
+            files.setdefault(filepath, []).extend(remaining)
+    return files
+
+
+def restore_settings(instruments, label: str = None, timestamp: str = None,
+                     filepath: str = None, load_from: dict = None,
+                     ignore_pars: dict = None, datadir: str = None,
+                     use_index: bool = True) -> dict:
+    """
+    Restores the settings of several instruments (e.g. all qubits of a
+    device) from the snapshots in the datafiles.
+
+    Args:
+        instruments (list): instruments or names of instruments.
+        label (str), timestamp (str): label/timestamp of the datafile, by
+            default the last datafile of every instrument is used.
+        filepath (str): exact filepath of the datafile, takes precedence
+            over the other file locating options.
+        load_from (dict): {instrument name: name of the instrument in the
+            snapshot} to load the settings of another instrument.
+        ignore_pars (dict): {instrument name: set of parameter names} that
+            are not restored.
+        datadir (str): data directory containing the snapshot index and the
+            datafiles, a_tools.datadir if None.
+        use_index (bool): if False the index is not used.
+
+    Returns:
+        {instrument name: list of names of the parameters that were set}, the
+        value is None if the settings of the instrument could not be found.
+    """
+    from qcodes.instrument.base import Instrument
+
+    instruments = [Instrument.find_instrument(ins) if isinstance(ins, str)
+                   else ins for ins in instruments]
+    load_from = {} if load_from is None else load_from
+    ignore_pars = {} if ignore_pars is None else ignore_pars
+    # name of the snapshot entry -> instruments restored from it
+    snap_names = {}
+    for ins in instruments:
+        snap_names.setdefault(load_from.get(ins.name, ins.name), []).append(
+            ins)
+
+    restored = {ins.name: None for ins in instruments}
+    missing = list(snap_names)
+    # If a datafile of the index can not be read, the instruments are looked
+    # up in the last datafile
+    for index_used in ([True, False] if use_index else [False]):
+        if filepath is not None:
+            files = {filepath: missing}
+        else:
+            files = find_settings_files(
+                missing, label=label, timestamp=timestamp, datadir=datadir,
+                use_index=index_used)
+
+        for fp, names in files.items():
+            try:
+                snapshots = read_instrument_snapshots(fp, names)
+            except Exception as e:
+                log.warning(
+                    'Could not read the snapshots from "{}": {}'.format(fp, e))
+                continue
+            for snap_name, snapshot in snapshots.items():
+                missing.remove(snap_name)
+                for ins in snap_names[snap_name]:
+                    restored[ins.name] = restore_instrument_settings(
+                        ins, snapshot, ignore_pars=ignore_pars.get(ins.name))
+
+        if not missing or filepath is not None:
+            break
+
+    for name, set_pars in restored.items():
+        if set_pars is None:
+            log.warning('Could not find settings for instrument "{}"'.format(
+                name))
+    return restored